@@ -1,6 +1,12 @@
 
+import threading
+import time
+
+from utils.metrics import metrics, timed
+
+
 class FREDDataManager:
-    def __init__(self):
+    def __init__(self, load=True):
         self.fred = None
         self.indicators = {
             'Real GDP': 'GDP',
@@ -26,7 +32,16 @@ class FREDDataManager:
             'Exports': 'EXPGS'
         }
         self.EconomicViewRowData = {}
+        #series id -> [Series, fetched at], for get_series
+        self._series = {}
+        self._series_lock = threading.Lock()
+
+        #load=False gives an empty manager (benchmarks, offline use) without touching the API
+        if load:
+            self._init_client()
+            self.load_all()
 
+    def _init_client(self):
         try:
             from fredapi import Fred
             from .config import FRED_API_KEY
@@ -36,22 +51,56 @@ class FREDDataManager:
         except Exception as e:
             print("Error initializing FRED API:", e)
 
+    def get_series(self, series_ids, max_age=3600.0):
+        """
+        purpose: full history of FRED series, cached
+        arguments:
+            series_ids: FRED series ids (e.g. 'DGS10', 'UNRATE')
+            max_age: seconds before a cached series is fetched again
+        returns:
+            dict series id -> Series indexed by date; ids FRED has no data for are left out
+        note: the api client is created on first use, so a load=False manager can fetch too
+        """
+        now = time.time()
+        with self._series_lock:
+            wanted = [s for s in dict.fromkeys(series_ids)
+                      if s not in self._series or now - self._series[s][1] > max_age]
+        if wanted and self.fred is None:
+            self._init_client()
+        for series_id in wanted:
+            if self.fred is None:
+                break
+            try:
+                with metrics.timer('fred', 'get_series'):
+                    data = self.fred.get_series(series_id)
+            except Exception as e:
+                print(f"Error fetching {series_id}: {e}")
+                continue
+            with self._series_lock:
+                self._series[series_id] = [data.dropna(), now]
+        with self._series_lock:
+            return {s: self._series[s][0] for s in series_ids if s in self._series}
+
+    def load_all(self):
         for name, series_id in self.indicators.items():
             try:
-                data = self.fred.get_series(series_id)
+                with metrics.timer('fred', 'get_series'):
+                    data = self.fred.get_series(series_id)
                 self.process_data(data, name)
             except Exception as e:
                 print(f"Error fetching {name}: {e}")
 
+    @timed('fred', 'process_data')
     def process_data(self,data, name):
         if not data.empty:
             values = data.iloc[-1:-6:-1].values.tolist()
             latest_value = values[0]
             latest_date = data.index[-1].strftime('%Y-%m-%d')
+            previous_value = data.iloc[-2] if len(data) > 1 else latest_value
             self.EconomicViewRowData[name] = {
                 'current': latest_value,
-                'change': round(data.iloc[-2] - latest_value,2),
-                'change_pct': round((data.iloc[-2] - latest_value) / latest_value * 100,2),
+                'change': round(previous_value - latest_value,2),
+                'change_pct': round((previous_value - latest_value) / latest_value * 100,2),
                 'date': latest_date,
                 'values': values,
                 'last_3': values[1:4:1],
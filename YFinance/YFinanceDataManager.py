@@ -1,14 +1,29 @@
-import yfinance as yf
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Iterable, Optional, Tuple
+from data_providers.market_data import HISTORY_WORKERS, market_data_provider_from_config
+from utils.metrics import metrics
+
+#what the title shows when the provider has no info for a symbol
+NO_INFO = {'open': 0, 'dayHigh': 0, 'dayLow': 0, 'marketCap': 0, 'fiftyTwoWeekLow': 0, 'fiftyTwoWeekHigh': 0}
 
 
 class YFinanceDataManager:
     """
-    manages data fetching from yfinance.
+    manages chart and analytics data: caches in front of a market data provider
+    (data_providers/market_data.py), yfinance unless config.py names another.
     """
     
-    def __init__(self):
+    def __init__(self, max_workers: int = HISTORY_WORKERS, provider=None):
+        """
+        arguments:
+            max_workers: concurrent provider requests when fetching history for many symbols
+            provider: MarketDataProvider; None for the one MARKET_DATA_PROVIDER names
+        """
+        self.max_workers = max_workers
+        self.provider = provider if provider is not None else market_data_provider_from_config()
         self.timeframe_intervals = {
             "1d": "1m",
             "5d": "5m",
@@ -19,6 +34,11 @@ class YFinanceDataManager:
             "5y": "1wk",
             "max": "1wk",
         }
+        #(symbol, period, interval) -> [Close/Volume frame, fetched at]; shared by worker threads
+        self._history = {}
+        self._history_lock = threading.Lock()
+        #symbol -> [trailing eps Series, fetched at]
+        self._eps = {}
     
     def get_symbol_data(self, symbol: str, period: str) -> Tuple[Optional[pd.DataFrame], Optional[Dict[str, Any]]]:
         """
@@ -39,20 +59,15 @@ class YFinanceDataManager:
             #translation from ui to yfinance interval
             interval = self.timeframe_intervals.get(period, "1d")
             
-            symbol_data = yf.download(symbol, period=period, interval=interval)
+            with metrics.timer('yfinance', 'download'):
+                symbol_data = self.provider.history(symbol, period, interval)
             
-            if symbol_data.empty:
+            symbol_closes = self._process_symbol_data(symbol_data)
+            if symbol_closes is None:
                 return None, None
-                
-            # drop na's from the close prices
-            symbol_closes = symbol_data[['Close']].dropna()
-            if 'Ticker' in symbol_closes.columns.names:
-                #drop irrelevant ticker column
-                symbol_closes.columns = symbol_closes.columns.droplevel('Ticker')
             
             # fetch ticker info
-            ticker = yf.Ticker(symbol)
-            ticker_info = self._get_ticker_info(ticker)
+            ticker_info = self.provider.info(symbol) or dict(NO_INFO)
             
             return symbol_closes, ticker_info
             
@@ -60,53 +75,125 @@ class YFinanceDataManager:
             print(f"Error fetching data for {symbol}: {e}")
             return None, None
     
-    def _get_ticker_info(self, ticker: yf.Ticker) -> Dict[str, Any]:
+    def get_price_history(self, symbols: Iterable[str], period: str = "1y", interval: str = "1d",
+                          max_age: float = 900.0, field: str = "Close") -> pd.DataFrame:
         """
-        purpose: get relevant ticker information safely
+        purpose: history for many symbols at once, aligned on one index
         arguments:
-            ticker: yfinance ticker object
+            symbols: ticker symbols
+            period, interval: yfinance period/interval of the history
+            max_age: seconds before a cached symbol is topped up with its latest bars
+            field: 'Close' or 'Volume'
         returns:
-            dict w/ the relevant ticker information
-        note: learned Dict[str, Any] return can be key str and value any
+            DataFrame dates x symbols of field; symbols the provider has no data for are left out
+        note: the first call downloads the full period, at most self.max_workers symbols at a
+              time; after that only the last few days are downloaded and merged in, so new and
+              revised bars arrive without refetching the history
         """
-        try:
-            info = ticker.info
-            
-            return {
-                'open': self._safe_get_info(info, 'open', 0),
-                'dayHigh': self._safe_get_info(info, 'dayHigh', 0),
-                'dayLow': self._safe_get_info(info, 'dayLow', 0),
-                'marketCap': self._safe_get_info(info, 'marketCap', 0),
-                'fiftyTwoWeekLow': self._safe_get_info(info, 'fiftyTwoWeekLow', 0),
-                'fiftyTwoWeekHigh': self._safe_get_info(info, 'fiftyTwoWeekHigh', 0)
-            }
-        except Exception as e:
-            print(f"Error getting ticker info: {e}")
-            return {
-                'open': 0,
-                'dayHigh': 0,
-                'dayLow': 0,
-                'marketCap': 0,
-                'fiftyTwoWeekLow': 0,
-                'fiftyTwoWeekHigh': 0
-            }
-    
-    def _safe_get_info(self, ticker_info: Dict, key: str, default: Any = "N/A") -> Any:
+        frames = self._cached_history(symbols, period, interval, max_age)
+        if not frames:
+            return pd.DataFrame()
+        return pd.DataFrame({s: frame[field] for s, frame in frames.items()}).sort_index()
+
+    def get_history_columns(self, symbols: Iterable[str], period: str = "1y", interval: str = "1d",
+                            max_age: float = 900.0, field: str = "Close") -> Dict[str, Tuple[Any, Any]]:
+        """
+        purpose: get_price_history without joining the symbols onto one index
+        returns:
+            dict symbol -> (int64 ns timestamps, float values) straight from the cache, for
+            analytics.alignment.align_columns; UTC timestamps for intraday bars
+        """
+        frames = self._cached_history(symbols, period, interval, max_age)
+        return {s: (frame.index.as_unit('ns').asi8, frame[field].to_numpy(dtype=float))
+                for s, frame in frames.items()}
+
+    def _cached_history(self, symbols, period, interval, max_age):
+        """
+        returns:
+            dict symbol -> Close/Volume frame, fetched or topped up as needed (see get_price_history)
+        """
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        now = time.time()
+        with self._history_lock:
+            missing = [s for s in symbols if (s, period, interval) not in self._history]
+            stale = [s for s in symbols if (s, period, interval) in self._history
+                     and now - self._history[(s, period, interval)][1] > max_age]
+
+        fetched = self._download_history(missing, period, interval)
+        recent = self._download_history(stale, "5d", interval)
+        with self._history_lock:
+            for symbol, frame in fetched.items():
+                self._history[(symbol, period, interval)] = [frame, now]
+            for symbol, frame in recent.items():
+                entry = self._history[(symbol, period, interval)]
+                #downloaded bars win: the last one is revised until the close
+                entry[0] = frame.combine_first(entry[0])
+                entry[1] = now
+            return {s: self._history[(s, period, interval)][0] for s in symbols
+                    if (s, period, interval) in self._history}
+
+    def _download_history(self, symbols, period, interval):
+        """
+        returns:
+            dict symbol -> DataFrame with 'Close' and 'Volume' for the symbols the provider returned data for
+        note: the provider's batch_history makes at most self.max_workers requests at a time
         """
-        purpose: prevent key errors when getting info from ticker_info dict
+        if not symbols:
+            return {}
+        history = {}
+        for symbol, data in self.provider.batch_history(symbols, period, interval, self.max_workers).items():
+            if 'Close' not in data.columns:
+                continue
+            frame = data[['Close', 'Volume']].dropna(subset=['Close'])
+            if interval[-1] not in "mh" and frame.index.tz is not None:
+                #daily and longer bars line up across exchanges by date, not by instant
+                frame.index = frame.index.tz_localize(None)
+            history[symbol] = frame
+        return history
+
+    def get_eps_history(self, symbols: Iterable[str], max_age: float = 86400.0) -> Dict[str, pd.Series]:
+        """
+        purpose: trailing twelve month diluted EPS over time, for P/E history
         arguments:
-            ticker_info: dict containing ticker information
-            key: keyto retrieve
-            default: default value if key not found or None
+            symbols: ticker symbols
+            max_age: seconds before a cached symbol's statements are fetched again
         returns:
-            value from ticker_info or default
+            dict symbol -> Series of trailing EPS indexed by fiscal period end; symbols without
+            income statements (ETFs, funds) are left out
         """
-        try:
-            value = ticker_info.get(key, default)
-            return value if value is not None else default
-        except:
-            return default
-    
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        now = time.time()
+        with self._history_lock:
+            wanted = [s for s in symbols if s not in self._eps or now - self._eps[s][1] > max_age]
+        if wanted:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(wanted))) as pool:
+                fetched = list(pool.map(self.provider.eps, wanted))
+            with self._history_lock:
+                for symbol, eps in zip(wanted, fetched):
+                    self._eps[symbol] = [eps, now]
+        with self._history_lock:
+            return {s: self._eps[s][0] for s in symbols if s in self._eps and self._eps[s][0] is not None}
+
+    def _process_symbol_data(self, symbol_data: pd.DataFrame) -> Optional[pd.DataFrame]:
+        """
+        purpose: turn a raw yfinance frame into the Close-only frame the charts use
+        arguments:
+            symbol_data: frame returned by Ticker.history or yf.download for a single symbol
+        returns:
+            DataFrame with a 'Close' column (plus 'Volume' when yfinance has it, for VWAP),
+            or None if there is no data
+        """
+        if symbol_data is None or symbol_data.empty:
+            return None
+
+        columns = ['Close', 'Volume'] if 'Volume' in symbol_data.columns.get_level_values(0) else ['Close']
+        symbol_closes = symbol_data[columns]
+        if 'Ticker' in symbol_closes.columns.names:
+            #drop irrelevant ticker column
+            symbol_closes.columns = symbol_closes.columns.droplevel('Ticker')
+        # drop na's from the close prices
+        return symbol_closes.dropna(subset=['Close'])
+
     def format_large_number(self, num: float) -> str:
         """
         purpose: format large numbers for market cap display
@@ -0,0 +1,405 @@
+"""
+Alerts: user rules over positions, quotes, FRED indicators and daily price
+history, re-checked on every data update.
+
+A rule is a subject - a symbol or FRED series id - and a condition on it:
+
+    NVDA daysGainPct < -3
+    HYG close below sma(50)
+    UNRATE change > 0.2
+
+The condition is the screen language of analytics/scanner.py ('below' and
+'above' read as < and >). Names are fields the feeds supply for the subject:
+position columns (daysGainPct, totalGainPct, marketValue, ...), quote fields
+(lastTrade, change, changePct, volume, and close = the last trade), FRED
+value, change and change_pct. The scanner's functions - sma(n), ema(n),
+rsi(n), high(n), low(n), avg_volume(n), change(n) - are computed on daily
+closes.
+
+Rules are compiled to templates with their numbers pulled out as parameters,
+so "NVDA daysGainPct < -3" and "AAPL daysGainPct < -5" are one template,
+evaluated for both in one NumPy pass. Updates are written into a board of
+subject x field values; a template is only evaluated when a field it reads
+changed, and then only for the rules whose subject changed.
+
+A rule alerts when its condition becomes true, not while it stays true, and
+at most once per cooldown.
+"""
+
+import ast
+import json
+import os
+import re
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from analytics.scanner import FUNCTIONS, NAMES, ScanData, _BINARY, _COMPARE
+from utils.metrics import metrics, timed
+
+DEFAULT_COOLDOWN_S = 15 * 60
+DEFAULT_RULES_PATH = "alert_rules.json"
+#alerts kept for the panel
+HISTORY_SIZE = 200
+_WORDS = {'below': '<', 'above': '>'}
+
+
+class AlertRule:
+    """
+    purpose: a compiled rule
+    arguments:
+        text: 'SUBJECT condition', see the module docstring
+    note: raises ValueError for anything outside the rule language
+    """
+
+    def __init__(self, text):
+        parts = text.strip().split(None, 1)
+        if len(parts) < 2:
+            raise ValueError("a rule is a symbol or FRED series followed by a condition")
+        self.subject = parts[0].upper()
+        self.text = f"{self.subject} {parts[1].strip()}"
+        condition = re.sub(r'\b(below|above)\b', lambda m: _WORDS[m.group(1)], parts[1])
+        try:
+            tree = ast.parse(condition.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"invalid rule: {e.msg}")
+        self.fields = []    # field names read, function terms like 'sma(50)' included
+        self.calls = {}     # function term -> (name, args)
+        self.params = []    # the numbers in the condition, in order
+        self.template = self._compile(tree.body)
+        # rules differing only in subject and numbers share a key
+        self.key = ast.dump(self.template)
+
+    def _field(self, name):
+        if name not in self.fields:
+            self.fields.append(name)
+        return ast.Name(id=name)
+
+    def _compile(self, node):
+        if isinstance(node, ast.BoolOp):
+            return ast.BoolOp(op=node.op, values=[self._compile(v) for v in node.values])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            return ast.UnaryOp(op=node.op, operand=self._compile(node.operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            return ast.BinOp(left=self._compile(node.left), op=node.op, right=self._compile(node.right))
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+            return ast.Compare(left=self._compile(node.left), ops=node.ops,
+                               comparators=[self._compile(c) for c in node.comparators])
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise ValueError(f"unknown function: {ast.unparse(node.func)}")
+            if node.keywords or not all(isinstance(a, ast.Constant) and isinstance(a.value, (int, float))
+                                        and not isinstance(a.value, bool) for a in node.args):
+                raise ValueError(f"{node.func.id}() takes numbers only")
+            term = ast.unparse(node)
+            self.calls[term] = (node.func.id, tuple(a.value for a in node.args))
+            return self._field(term)
+        if isinstance(node, ast.Name):
+            return self._field(node.id)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                and not isinstance(node.value, bool):
+            self.params.append(float(node.value))
+            return ast.Name(id=f'${len(self.params) - 1}')
+        raise ValueError(f"not allowed in a rule: {ast.unparse(node)}")
+
+
+class _Group:
+    """
+    purpose: the rules sharing one template, as arrays
+    """
+
+    def __init__(self, rule):
+        self.template = rule.template
+        self.fields = list(rule.fields)
+        self.rules = []
+        self.rows = np.empty(0, dtype=np.intp)     # board row of each rule's subject
+        self.params = np.empty((0, len(rule.params)))
+        self.active = np.empty(0, dtype=bool)       # condition true at the last check
+        self.fired_at = np.empty(0)                 # epoch s of the last alert
+
+    def add(self, rule, row):
+        self.rules.append(rule)
+        self.rows = np.append(self.rows, row)
+        self.params = np.vstack([self.params, [rule.params]])
+        self.active = np.append(self.active, False)
+        self.fired_at = np.append(self.fired_at, -np.inf)
+
+    def remove(self, rule):
+        keep = np.array([r is not rule for r in self.rules], dtype=bool)
+        self.rules = [r for r in self.rules if r is not rule]
+        self.rows, self.params = self.rows[keep], self.params[keep]
+        self.active, self.fired_at = self.active[keep], self.fired_at[keep]
+
+
+class AlertEngine:
+    """
+    purpose: the compiled rules, the board of latest values they read, and recent alerts
+    arguments:
+        cooldown_s: seconds before a rule that alerted may alert again
+    note: not thread safe; the dashboard feeds it from the gui thread
+    """
+
+    def __init__(self, cooldown_s=DEFAULT_COOLDOWN_S):
+        self.cooldown_s = cooldown_s
+        self.rules = {}             # text -> AlertRule
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self._groups = {}           # template key -> _Group
+        self._by_field = {}         # field -> groups reading it
+        self._rows = {}             # subject -> board row
+        self._subjects = None       # pd.Index of the subjects in row order, rebuilt after an add
+        self._board = {}            # field -> value per subject, by board row
+        self._calls = {}            # function term -> (name, args)
+        self._live_close = set()    # board rows whose close came from a quote or position
+
+    def __len__(self):
+        return len(self.rules)
+
+    def add(self, text):
+        """
+        returns:
+            the AlertRule; a rule already added (same text) is returned as it is
+        note: raises ValueError for an invalid rule
+        """
+        rule = AlertRule(text)
+        if rule.text in self.rules:
+            return self.rules[rule.text]
+        if rule.subject not in self._rows:
+            self._rows[rule.subject] = len(self._rows)
+            self._subjects = None
+            for field, values in self._board.items():
+                self._board[field] = np.append(values, np.nan)
+        for field in rule.fields:
+            self._board.setdefault(field, np.full(len(self._rows), np.nan))
+        self._calls.update(rule.calls)
+
+        group = self._groups.get(rule.key)
+        if group is None:
+            group = self._groups[rule.key] = _Group(rule)
+            for field in group.fields:
+                self._by_field.setdefault(field, []).append(group)
+        group.add(rule, self._rows[rule.subject])
+        self.rules[rule.text] = rule
+        return rule
+
+    def remove(self, text):
+        rule = self.rules.pop(text, None)
+        if rule is None:
+            return
+        group = self._groups[rule.key]
+        group.remove(rule)
+        if not group.rules:
+            del self._groups[rule.key]
+            for field in group.fields:
+                self._by_field[field].remove(group)
+                if not self._by_field[field]:
+                    del self._by_field[field]
+
+    def subjects(self):
+        return sorted({rule.subject for rule in self.rules.values()})
+
+    def history_symbols(self):
+        """
+        returns:
+            subjects with a rule on daily history (a function term), which need daily closes
+        """
+        return sorted({rule.subject for rule in self.rules.values() if rule.calls})
+
+    def history_bars(self):
+        """
+        returns:
+            daily bars the function terms need at most
+        """
+        return max((int(args[0]) if args else 14 for name, args in self._calls.values()), default=0) + 1
+
+    def value(self, subject, field):
+        if subject not in self._rows or field not in self._board:
+            return np.nan
+        return self._board[field][self._rows[subject]]
+
+    def _subject_index(self):
+        if self._subjects is None:
+            self._subjects = pd.Index(list(self._rows), dtype=object)
+        return self._subjects
+
+    @timed('alerts', 'update')
+    def update(self, values, now=None):
+        """
+        purpose: take new values and re-check the rules that read them
+        arguments:
+            values: DataFrame indexed by subject with a column per field, or dict subject -> {field: value};
+                    subjects and fields no rule reads are ignored, and so are nan values (no data
+                    is not a change)
+        returns:
+            list of alerts raised, see _alert
+        """
+        return self._update(values, time.time() if now is None else now, live=True)
+
+    def _update(self, values, now, live):
+        if not self.rules:
+            return []
+        frame = values if isinstance(values, pd.DataFrame) else pd.DataFrame.from_dict(values, orient='index')
+        rows = self._subject_index().get_indexer(frame.index.astype(str).str.upper())
+        known = rows >= 0
+        if not known.any():
+            return []
+        rows = rows[known]
+        changed = {}
+        for field in frame.columns.intersection(list(self._by_field)):
+            new = pd.to_numeric(frame[field], errors='coerce').to_numpy(dtype=float)[known]
+            if field == 'close':
+                if live:
+                    self._live_close.update(rows[~np.isnan(new)].tolist())
+                else:
+                    # a quote's close is fresher than the last daily bar
+                    new = np.where(np.isin(rows, list(self._live_close)), np.nan, new)
+            board = self._board[field]
+            old = board[rows]
+            differs = ~np.isnan(new) & (new != old)
+            if differs.any():
+                board[rows[differs]] = new[differs]
+                flags = np.zeros(len(self._rows), dtype=bool)
+                flags[rows[differs]] = True
+                changed[field] = flags
+        return self._evaluate(changed, now)
+
+    def update_history(self, closes, volumes=None, now=None):
+        """
+        purpose: recompute the function terms from daily history and re-check their rules
+        arguments:
+            closes, volumes: DataFrames dates x symbols (volumes only for avg_volume)
+        note: close comes from here only for subjects that never had a quote; a fresher
+              last trade is not overwritten by the last daily bar
+        """
+        symbols = [s for s in closes.columns if s in self._rows]
+        if not symbols:
+            return []
+        data = ScanData(closes[symbols], volumes)
+        columns = {term: np.broadcast_to(data.value(*call), (len(symbols),)) for term, call in self._calls.items()}
+        columns['close'] = NAMES['close'](data)
+        return self._update(pd.DataFrame(columns, index=symbols), time.time() if now is None else now, live=False)
+
+    def needs_volume(self):
+        return any(name == 'avg_volume' for name, _ in self._calls.values())
+
+    def _evaluate(self, changed, now):
+        groups = {id(group): group for field in changed for group in self._by_field.get(field, [])}
+        alerts = []
+        checked = 0
+        for group in groups.values():
+            dirty = np.zeros(len(group.rules), dtype=bool)
+            for field in group.fields:
+                if field in changed:
+                    dirty |= changed[field][group.rows]
+            positions = np.flatnonzero(dirty)
+            if not len(positions):
+                continue
+            checked += len(positions)
+            result = np.broadcast_to(np.asarray(self._eval(group.template, group, positions), dtype=bool),
+                                     positions.shape)
+            rising = result & ~group.active[positions]
+            group.active[positions] = result
+            due = rising & (now - group.fired_at[positions] >= self.cooldown_s)
+            if (rising & ~due).any():
+                metrics.increment('alerts', 'suppressed', int((rising & ~due).sum()))
+            for position in positions[due]:
+                group.fired_at[position] = now
+                alerts.append(self._alert(group.rules[position], group.rows[position], now))
+        metrics.increment('alerts', 'checked', checked)
+        if alerts:
+            metrics.increment('alerts', 'raised', len(alerts))
+            self.history.extend(alerts)
+        return alerts
+
+    def _alert(self, rule, row, now):
+        """
+        returns:
+            dict with time (epoch s), rule (text), subject, values (field -> value) and message
+        """
+        values = {field: float(self._board[field][row]) for field in rule.fields}
+        shown = ", ".join(f"{field} {value:,.2f}" for field, value in values.items())
+        return {'time': now, 'rule': rule.text, 'subject': rule.subject, 'values': values,
+                'message': f"{rule.text}  ({shown})"}
+
+    def _eval(self, node, group, positions):
+        if isinstance(node, ast.BoolOp):
+            values = [self._eval(v, group, positions) for v in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = values[0]
+            for value in values[1:]:
+                result = combine(result, value)
+            return result
+        if isinstance(node, ast.UnaryOp):
+            value = self._eval(node.operand, group, positions)
+            return np.logical_not(value) if isinstance(node.op, ast.Not) else -value
+        if isinstance(node, ast.BinOp):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return _BINARY[type(node.op)](self._eval(node.left, group, positions),
+                                              self._eval(node.right, group, positions))
+        if isinstance(node, ast.Compare):
+            left = self._eval(node.left, group, positions)
+            result = True
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._eval(comparator, group, positions)
+                # a field not supplied yet is nan, and nan never matches
+                with np.errstate(invalid='ignore'):
+                    result = np.logical_and(result, _COMPARE[type(op)](left, right))
+                left = right
+            return result
+        if node.id.startswith('$'):
+            return group.params[positions, int(node.id[1:])]
+        return self._board[node.id][group.rows[positions]]
+
+
+def load_rules(path=DEFAULT_RULES_PATH):
+    """
+    returns:
+        list of rule texts saved at path, None if there is no readable file
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            rules = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error reading alert rules {path}: {e}")
+        return None
+    return [str(rule) for rule in rules] if isinstance(rules, list) else None
+
+
+def save_rules(texts, path=DEFAULT_RULES_PATH):
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(list(texts), f, indent=1)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saving alert rules {path}: {e}")
+
+
+def alert_engine_from_config():
+    """
+    purpose: build the AlertEngine described by config.py with its rules, or None if ALERTS_ENABLED is off
+    returns:
+        (engine, rules path, [(rule text, error)] for rules that did not compile)
+    note: rules come from the rules file once it exists (the alerts panel saves it), else ALERT_RULES
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    if not getattr(config, 'ALERTS_ENABLED', True):
+        return None, None, []
+    path = getattr(config, 'ALERT_RULES_PATH', DEFAULT_RULES_PATH)
+    engine = AlertEngine(getattr(config, 'ALERT_COOLDOWN_S', DEFAULT_COOLDOWN_S))
+    texts = load_rules(path)
+    if texts is None:
+        texts = getattr(config, 'ALERT_RULES', [])
+    errors = []
+    for text in texts:
+        try:
+            engine.add(text)
+        except ValueError as e:
+            errors.append((text, str(e)))
+    return engine, path, errors
@@ -0,0 +1,101 @@
+"""
+Aligning series that trade on different calendars onto one time axis.
+
+Every column comes in as its own (times, values) arrays - a fund's weekday
+closes, a crypto ETF's bars, a monthly FRED series - and is placed on the union
+of all their timestamps "as of" each time: the value shown is the column's last
+observation at or before it. So a column is flat over the times its own
+calendar skips, holds the value in force when a window opens, and is empty
+before its first observation.
+
+All columns are resolved together on one matrix - one sort of the combined
+timestamps, a scatter per block of columns, one running maximum for the
+carry-forward - instead of a join per column, so adding a symbol adds a
+column, not another pass.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def index_ns(index):
+    """
+    returns:
+        int64 nanoseconds for a DatetimeIndex (UTC for tz-aware indexes)
+    """
+    return index.as_unit('ns').asi8
+
+
+def align_columns(times, values, start=None):
+    """
+    purpose: as-of alignment of many columns on the union of their timestamps
+    arguments:
+        times: list of int64 arrays (ns), one per block of columns sharing those timestamps
+        values: list of float arrays, one per times array - 1-D for a single column, or
+                rows x columns; NaN counts as no observation
+        start: int ns; rows before it are dropped (what was in force at start is kept)
+    returns:
+        (union timestamps from start on, float matrix rows x columns, blocks side by side)
+    """
+    blocks = [np.asarray(v, dtype=float) for v in values]
+    blocks = [block if block.ndim == 2 else block[:, None] for block in blocks]
+    if not times:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0))
+    union, rank = np.unique(np.concatenate(times).astype(np.int64), return_inverse=True)
+
+    # scatter every block into its rows, then carry each column's last observation down
+    # with one running maximum over the row numbers that hold a value
+    matrix = np.full((len(union), sum(block.shape[1] for block in blocks)), np.nan)
+    row, column = 0, 0
+    for t, block in zip(times, blocks):
+        matrix[rank[row:row + len(t)], column:column + block.shape[1]] = block
+        row += len(t)
+        column += block.shape[1]
+    gaps = np.isnan(matrix).any(axis=0)
+    if gaps.any():
+        # only columns with holes need the carry; a shared calendar costs nothing here
+        holes = matrix[:, gaps]
+        rows = np.where(np.isnan(holes), 0, np.arange(len(union))[:, None])
+        np.maximum.accumulate(rows, axis=0, out=rows)
+        matrix[:, gaps] = np.take_along_axis(holes, rows, axis=0)
+
+    first = 0 if start is None else int(np.searchsorted(union, start, side='left'))
+    return union[first:], matrix[first:]
+
+
+def rebase(matrix):
+    """
+    returns:
+        % change of every column from its first value in the matrix
+    """
+    if not len(matrix):
+        return matrix
+    first = np.argmax(~np.isnan(matrix), axis=0)
+    base = matrix[first, np.arange(matrix.shape[1])]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (matrix / base - 1.0) * 100.0
+
+
+def align_frames(frames, start=None):
+    """
+    purpose: align_columns for DataFrames/Series indexed by date
+    arguments:
+        frames: DataFrames/Series (tz-naive or all in one tz)
+        start: Timestamp; rows before it are dropped
+    returns:
+        list of DataFrames with the same columns, all on the union index
+    """
+    frames = [f.to_frame() if isinstance(f, pd.Series) else f for f in frames]
+    # a frame's columns share its index, so each frame goes in as one block
+    times = [index_ns(pd.DatetimeIndex(f.index)) if len(f.columns) else np.empty(0, dtype=np.int64)
+             for f in frames]
+    values = [f.to_numpy(dtype=float) if len(f.columns) else np.empty((0, 0)) for f in frames]
+    tz = next((f.index.tz for f in frames if len(f.columns) and getattr(f.index, 'tz', None) is not None), None)
+    union, matrix = align_columns(times, values, None if start is None else pd.Timestamp(start).value)
+    index = pd.DatetimeIndex(union, tz='UTC').tz_convert(tz) if tz is not None else pd.DatetimeIndex(union)
+    aligned, j = [], 0
+    for frame in frames:
+        width = len(frame.columns)
+        aligned.append(pd.DataFrame(matrix[:, j:j + width], index=index, columns=frame.columns))
+        j += width
+    return aligned
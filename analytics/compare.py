@@ -0,0 +1,253 @@
+"""
+Compare console commands: parse a CMP command, plan the data it needs as a few
+batched requests, run them concurrently and hand back the series aligned on
+one date index.
+
+    CMP IONQ PRICE PE -RANGE 2 YEARS
+    CMP SPY TLT IBIT RETURN -RANGE 6M
+    CMP NVDA AMD RETURN VOLUME FRED:DGS10 -RANGE YTD
+
+Symbols, fields and FRED series (FRED:<series id>) may come in any order after
+CMP. Fields: PRICE, RETURN (% from the start of the range), VOLUME, PE, EPS
+(trailing twelve months); PRICE is the default. -RANGE takes a number and a
+unit (D, W, M, Y, spelled out or not), YTD or MAX; one year by default.
+
+Planning turns a command into at most three requests, whatever the number of
+symbols and fields: one history request for every symbol (closes and volumes
+come out of the same download), one statements request for every symbol that
+needs EPS, and one FRED request. Each is cached by the data manager behind it,
+and history is fetched for a fixed tier of periods rather than the exact range,
+so a refined command (another range in the same tier, a subset of the symbols,
+an extra field) is served from memory. Whole results are cached as well, so an
+exact repeat only costs a dictionary lookup.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from analytics.alignment import align_frames
+from utils.metrics import timed
+
+FIELDS = ('PRICE', 'RETURN', 'VOLUME', 'PE', 'EPS')
+DEFAULT_RANGE = '1Y'
+RESULT_CACHE_SIZE = 32
+# history is downloaded for the smallest tier covering the range, then sliced
+PERIOD_TIERS = ((366, '1y'), (5 * 366, '5y'))
+_UNITS = {'D': 'days', 'DAY': 'days', 'DAYS': 'days', 'W': 'weeks', 'WEEK': 'weeks', 'WEEKS': 'weeks',
+          'M': 'months', 'MONTH': 'months', 'MONTHS': 'months', 'Y': 'years', 'YEAR': 'years', 'YEARS': 'years'}
+_SYMBOL = re.compile(r'^[A-Z0-9^][A-Z0-9.\-=]{0,14}$')
+_HISTORY_FIELDS = {'PRICE', 'RETURN', 'VOLUME', 'PE'}
+
+
+class Command:
+    """
+    purpose: a parsed CMP command
+    arguments:
+        text: command as typed, see the module docstring
+    note: raises ValueError for anything that is not a valid command
+    """
+
+    def __init__(self, text):
+        self.text = ' '.join(text.split())
+        tokens = self.text.upper().split()
+        if not tokens or tokens[0] not in ('CMP', 'COMPARE'):
+            raise ValueError("commands start with CMP, e.g. CMP IONQ PRICE PE -RANGE 2 YEARS")
+        self.symbols, self.fields, self.fred = [], [], []
+        self.range = DEFAULT_RANGE
+        i = 1
+        while i < len(tokens):
+            token = tokens[i]
+            if token == '-RANGE':
+                i = self._parse_range(tokens, i + 1)
+                continue
+            if token.startswith('-'):
+                raise ValueError(f"unknown option: {token}")
+            if token in FIELDS:
+                self.fields.append(token)
+            elif token.startswith('FRED:') and len(token) > 5:
+                self.fred.append(token[5:])
+            elif _SYMBOL.match(token):
+                self.symbols.append(token)
+            else:
+                raise ValueError(f"not a symbol, field or option: {token}")
+            i += 1
+        # repeats are dropped, first mention keeps its place
+        self.symbols, self.fields, self.fred = [list(dict.fromkeys(items))
+                                                for items in (self.symbols, self.fields, self.fred)]
+        if not self.symbols and not self.fred:
+            raise ValueError("nothing to compare: give at least one symbol or FRED:<series>")
+        if self.symbols and not self.fields:
+            self.fields = ['PRICE']
+
+    def _parse_range(self, tokens, i):
+        if i >= len(tokens):
+            raise ValueError("-RANGE needs a value, e.g. -RANGE 2 YEARS")
+        token = tokens[i]
+        if token in ('YTD', 'MAX'):
+            self.range = token
+            return i + 1
+        match = re.fullmatch(r'(\d+)([A-Z]*)', token)
+        if match is None or int(match.group(1)) == 0:
+            raise ValueError(f"bad range: {token}")
+        count, unit = match.groups()
+        if not unit and i + 1 < len(tokens):
+            unit = tokens[i + 1]
+            i += 1
+        if unit not in _UNITS:
+            raise ValueError(f"bad range unit: {unit or '(none)'}")
+        self.range = f"{int(count)}{_UNITS[unit][0].upper()}"
+        return i + 1
+
+    def start(self, today=None):
+        """
+        returns:
+            first date of the range (None for MAX)
+        """
+        today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+        if self.range == 'MAX':
+            return None
+        if self.range == 'YTD':
+            return pd.Timestamp(year=today.year, month=1, day=1)
+        unit = {'D': 'days', 'W': 'weeks', 'M': 'months', 'Y': 'years'}[self.range[-1]]
+        return today - pd.DateOffset(**{unit: int(self.range[:-1])})
+
+    def key(self):
+        return tuple(self.symbols), tuple(self.fields), tuple(self.fred), self.range
+
+
+def history_tier(start, today=None):
+    """
+    returns:
+        yfinance period to download so the history reaches back to start
+    """
+    if start is None:
+        return 'max'
+    days = (pd.Timestamp(today or pd.Timestamp.now()).normalize() - start).days
+    for limit, period in PERIOD_TIERS:
+        if days <= limit:
+            return period
+    return 'max'
+
+
+def plan(command, today=None):
+    """
+    purpose: the batched requests a command needs
+    returns:
+        list of (kind, symbols or series ids, period) - kind is 'history', 'eps' or 'fred';
+        at most one request of each kind
+    """
+    requests = []
+    if any(f in _HISTORY_FIELDS for f in command.fields):
+        requests.append(('history', tuple(command.symbols), history_tier(command.start(today), today)))
+    if any(f in ('PE', 'EPS') for f in command.fields):
+        requests.append(('eps', tuple(command.symbols), None))
+    if command.fred:
+        requests.append(('fred', tuple(command.fred), None))
+    return requests
+
+
+class CompareEngine:
+    """
+    purpose: runs CMP commands against the shared data managers
+    arguments:
+        history: YFinanceDataManager (price history and statements)
+        fred: FREDDataManager; created on the first FRED request when None
+        max_age: seconds a whole result, or a cached history download, stays fresh
+    """
+
+    def __init__(self, history, fred=None, max_age=900.0):
+        self.history = history
+        self.fred = fred
+        self.max_age = max_age
+        self._results = OrderedDict()       # command key -> (result, computed at)
+        self._lock = threading.Lock()
+
+    def _fred_manager(self):
+        if self.fred is None:
+            from FRED.FREDDataManager import FREDDataManager
+            self.fred = FREDDataManager(load=False)
+        return self.fred
+
+    def _fetch(self, request):
+        kind, names, period = request
+        if kind == 'history':
+            # one download per symbol feeds both fields; the second call is served from cache
+            closes = self.history.get_price_history(names, period, "1d", self.max_age)
+            volumes = self.history.get_price_history(names, period, "1d", self.max_age, field='Volume')
+            return closes, volumes
+        if kind == 'eps':
+            return self.history.get_eps_history(names)
+        return self._fred_manager().get_series(names)
+
+    @timed('compare', 'run')
+    def run(self, command, today=None):
+        """
+        arguments:
+            command: Command or command text
+        returns:
+            dict with 'command', 'start', 'frames' (field or 'FRED' -> DataFrame dates x
+            symbols/series, all on one index), 'missing' (names with no data), 'requests',
+            'cached' (True for a result cache hit) and 'elapsed_ms'
+        """
+        began = time.perf_counter()
+        if not isinstance(command, Command):
+            command = Command(command)
+        key = command.key()
+        with self._lock:
+            hit = self._results.get(key)
+            if hit is not None and time.time() - hit[1] <= self.max_age:
+                self._results.move_to_end(key)
+                return dict(hit[0], cached=True, elapsed_ms=(time.perf_counter() - began) * 1000.0)
+
+        requests = plan(command, today)
+        with ThreadPoolExecutor(max_workers=max(len(requests), 1)) as pool:
+            fetched = dict(zip((r[0] for r in requests), pool.map(self._fetch, requests)))
+
+        start = command.start(today)
+        frames, missing = self._build(command, fetched, start)
+        result = {'command': command, 'start': start, 'frames': frames, 'missing': missing,
+                  'requests': requests}
+        with self._lock:
+            self._results[key] = (result, time.time())
+            while len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+        return dict(result, cached=False, elapsed_ms=(time.perf_counter() - began) * 1000.0)
+
+    def _build(self, command, fetched, start):
+        closes, volumes = fetched.get('history', (pd.DataFrame(), pd.DataFrame()))
+        eps = fetched.get('eps', {})
+        fred = fetched.get('fred', {})
+        if 'history' in fetched:
+            missing = [s for s in command.symbols if s not in closes.columns]
+        else:
+            missing = [s for s in command.symbols if s not in eps]
+        if 'eps' in fetched:
+            missing += [f"{s} EPS" for s in command.symbols if s not in eps and s not in missing]
+        missing += [f"FRED:{s}" for s in command.fred if s not in fred]
+
+        eps_frame = pd.DataFrame({s: eps[s] for s in command.symbols if s in eps})
+        fred_frame = pd.DataFrame({s: fred[s] for s in command.fred if s in fred})
+        closes, volumes, eps_frame, fred_frame = align_frames([closes, volumes, eps_frame, fred_frame], start)
+
+        frames = {}
+        for field in command.fields:
+            if field == 'PRICE':
+                frames[field] = closes
+            elif field == 'RETURN':
+                frames[field] = (closes / closes.bfill().iloc[0] - 1.0) * 100.0 if len(closes) else closes
+            elif field == 'VOLUME':
+                frames[field] = volumes
+            elif field == 'EPS':
+                frames[field] = eps_frame
+            elif field == 'PE':
+                eps_on_closes = eps_frame.reindex(columns=closes.columns)
+                # negative earnings have no meaningful multiple
+                frames[field] = closes / eps_on_closes.where(eps_on_closes > 0)
+        frames['FRED'] = fred_frame
+        frames = {k: v.dropna(axis=1, how='all').dropna(how='all') for k, v in frames.items()}
+        return {k: v for k, v in frames.items() if len(v.columns)}, missing
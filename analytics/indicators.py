@@ -0,0 +1,489 @@
+"""
+Technical indicators for the chart panes: SMA, EMA, RSI, MACD, Bollinger bands
+and session VWAP.
+
+Each indicator computes its full history in one vectorized pass and keeps just
+enough rolling state (a window buffer and running sums, or the last EMA values)
+to extend the series by one bar in O(1). IndicatorCache holds that state per
+(symbol, interval), so panes showing the same symbol and interval share it, and
+a chart refresh only feeds in the bars that are new since the last one. The
+last bar is revised in place while it is still forming: each indicator is
+checkpointed before its last bar and replayed from there.
+
+usage:
+    cache = IndicatorCache()
+    overlays = cache.overlays("QQQ", "5m", closes_frame, ["SMA(20)", "RSI(14)"])
+    # -> {"SMA(20)": (indicator, {"SMA(20)": array}), "RSI(14)": (indicator, {"RSI(14)": array})}
+"""
+
+import copy
+import re
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import timed
+
+DEFAULT_OVERLAYS = ['SMA(20)', 'SMA(50)', 'SMA(200)', 'EMA(20)', 'BB(20,2)', 'VWAP', 'RSI(14)', 'MACD(12,26,9)']
+SPEC_RE = re.compile(r'^\s*([A-Za-z]+)\s*(?:\(([^)]*)\))?\s*$')
+
+
+def _ewm(values, alpha, min_periods):
+    # pandas' ewm runs the recursion in C; adjust=False is the same recursion push() continues
+    if len(values) == 0:
+        return np.zeros(0)
+    return pd.Series(values).ewm(alpha=alpha, adjust=False, min_periods=min_periods).mean().to_numpy()
+
+
+class Indicator:
+    """
+    purpose: base class; subclasses set lines and implement compute and push
+    note: price_overlay indicators are drawn over the price line, the rest in a pane below it
+    """
+    price_overlay = True
+    needs_volume = False
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.lines = [spec]
+
+    def compute(self, close, volume, times):
+        """
+        purpose: values for the whole series; leaves the state ready for push
+        arguments:
+            close, volume: float arrays (volume may be None)
+            times: DatetimeIndex of the bars
+        returns:
+            dict line -> array the length of close
+        """
+        raise NotImplementedError
+
+    def push(self, close, volume, time):
+        """
+        purpose: extend by one bar
+        returns:
+            dict line -> value for the new bar
+        """
+        raise NotImplementedError
+
+
+class _Window:
+    """fixed-size ring buffer with running sum and sum of squares"""
+
+    def __init__(self, period, history):
+        self.period = period
+        self.buffer = np.zeros(period)
+        tail = np.asarray(history[-period:], dtype=float)
+        self.count = len(tail)
+        self.buffer[:self.count] = tail
+        self.head = self.count % period
+        self._resum()
+
+    def _resum(self):
+        filled = self.buffer[:self.count] if self.count < self.period else self.buffer
+        self.total = float(filled.sum())
+        self.total_sq = float((filled * filled).sum())
+
+    def push(self, x):
+        if self.count == self.period:
+            old = self.buffer[self.head]
+            self.total -= old
+            self.total_sq -= old * old
+        else:
+            self.count += 1
+        self.buffer[self.head] = x
+        self.total += x
+        self.total_sq += x * x
+        self.head = (self.head + 1) % self.period
+        if self.head == 0:
+            # once per period: re-sum so add/subtract rounding cannot accumulate
+            self._resum()
+
+    def full(self):
+        return self.count == self.period
+
+    def mean(self):
+        return self.total / self.period
+
+    def std(self):
+        mean = self.mean()
+        return np.sqrt(max(self.total_sq / self.period - mean * mean, 0.0))
+
+
+def _rolling_sums(values, period):
+    # window sums from cumulative sums, taken about the first value to limit cancellation
+    shifted = values - values[0] if len(values) else values
+    c = np.concatenate(([0.0], np.cumsum(shifted)))
+    c2 = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+    return c[period:] - c[:-period], c2[period:] - c2[:-period], (values[0] if len(values) else 0.0)
+
+
+class SMA(Indicator):
+    def __init__(self, spec, period=20):
+        super().__init__(spec)
+        self.period = int(period)
+
+    def compute(self, close, volume, times):
+        out = np.full(len(close), np.nan)
+        if len(close) >= self.period:
+            sums, _, base = _rolling_sums(close, self.period)
+            out[self.period - 1:] = sums / self.period + base
+        self.window = _Window(self.period, close)
+        return {self.spec: out}
+
+    def push(self, close, volume, time):
+        self.window.push(close)
+        return {self.spec: self.window.mean() if self.window.full() else np.nan}
+
+
+class EMA(Indicator):
+    def __init__(self, spec, period=20):
+        super().__init__(spec)
+        self.period = int(period)
+        self.alpha = 2.0 / (self.period + 1.0)
+
+    def compute(self, close, volume, times):
+        out = _ewm(close, self.alpha, 1)
+        self.value = out[-1] if len(out) else None
+        self.count = len(close)
+        shown = out.copy()
+        shown[:self.period - 1] = np.nan
+        return {self.spec: shown}
+
+    def push(self, close, volume, time):
+        self.value = close if self.value is None else self.value + self.alpha * (close - self.value)
+        self.count += 1
+        return {self.spec: self.value if self.count >= self.period else np.nan}
+
+
+class RSI(Indicator):
+    """Wilder's RSI: gains and losses smoothed with alpha = 1/period"""
+    price_overlay = False
+
+    def __init__(self, spec, period=14):
+        super().__init__(spec)
+        self.period = int(period)
+        self.alpha = 1.0 / self.period
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+
+    def compute(self, close, volume, times):
+        out = np.full(len(close), np.nan)
+        self.prev = close[-1] if len(close) else None
+        self.avg_gain = self.avg_loss = None
+        self.count = max(len(close) - 1, 0)
+        if len(close) >= 2:
+            delta = np.diff(close)
+            gain = _ewm(np.clip(delta, 0.0, None), self.alpha, 1)
+            loss = _ewm(np.clip(-delta, 0.0, None), self.alpha, 1)
+            out[1:] = self._rsi(gain, loss)
+            out[:self.period] = np.nan
+            self.avg_gain, self.avg_loss = gain[-1], loss[-1]
+        return {self.spec: out}
+
+    def push(self, close, volume, time):
+        if self.prev is None:
+            self.prev = close
+            return {self.spec: np.nan}
+        delta = close - self.prev
+        self.prev = close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        if self.avg_gain is None:
+            self.avg_gain, self.avg_loss = gain, loss
+        else:
+            self.avg_gain += self.alpha * (gain - self.avg_gain)
+            self.avg_loss += self.alpha * (loss - self.avg_loss)
+        self.count += 1
+        value = float(self._rsi(self.avg_gain, self.avg_loss))
+        return {self.spec: value if self.count >= self.period else np.nan}
+
+
+class MACD(Indicator):
+    price_overlay = False
+
+    def __init__(self, spec, fast=12, slow=26, signal=9):
+        super().__init__(spec)
+        self.fast, self.slow, self.signal = int(fast), int(slow), int(signal)
+        self.alphas = (2.0 / (self.fast + 1.0), 2.0 / (self.slow + 1.0), 2.0 / (self.signal + 1.0))
+        self.lines = [f'{spec} macd', f'{spec} signal', f'{spec} hist']
+
+    def _output(self, macd, signal, warm):
+        macd, signal = np.array(macd, dtype=float, ndmin=1), np.array(signal, dtype=float, ndmin=1)
+        macd[warm < self.slow] = np.nan
+        signal[warm < self.slow + self.signal - 1] = np.nan
+        return dict(zip(self.lines, (macd, signal, macd - signal)))
+
+    def compute(self, close, volume, times):
+        fast = _ewm(close, self.alphas[0], 1)
+        slow = _ewm(close, self.alphas[1], 1)
+        macd = fast - slow
+        signal = _ewm(macd, self.alphas[2], 1)
+        self.count = len(close)
+        self.state = (fast[-1], slow[-1], signal[-1]) if len(close) else None
+        return self._output(macd, signal, np.arange(1, len(close) + 1))
+
+    def push(self, close, volume, time):
+        if self.state is None:
+            fast = slow = close
+            signal = 0.0
+        else:
+            fast, slow, signal = self.state
+            fast += self.alphas[0] * (close - fast)
+            slow += self.alphas[1] * (close - slow)
+            signal += self.alphas[2] * ((fast - slow) - signal)
+        self.state = (fast, slow, signal)
+        self.count += 1
+        out = self._output(fast - slow, signal, np.array([self.count]))
+        return {line: float(values[0]) for line, values in out.items()}
+
+
+class Bollinger(Indicator):
+    def __init__(self, spec, period=20, width=2.0):
+        super().__init__(spec)
+        self.period = int(period)
+        self.width = float(width)
+        self.lines = [f'{spec} upper', f'{spec} mid', f'{spec} lower']
+
+    def compute(self, close, volume, times):
+        n = len(close)
+        mid, std = np.full(n, np.nan), np.full(n, np.nan)
+        if n >= self.period:
+            sums, sums_sq, base = _rolling_sums(close, self.period)
+            mean = sums / self.period
+            mid[self.period - 1:] = mean + base
+            std[self.period - 1:] = np.sqrt(np.clip(sums_sq / self.period - mean * mean, 0.0, None))
+        self.window = _Window(self.period, close)
+        return dict(zip(self.lines, (mid + self.width * std, mid, mid - self.width * std)))
+
+    def push(self, close, volume, time):
+        self.window.push(close)
+        if not self.window.full():
+            return {line: np.nan for line in self.lines}
+        mid, std = self.window.mean(), self.window.std()
+        return dict(zip(self.lines, (mid + self.width * std, mid, mid - self.width * std)))
+
+
+class VWAP(Indicator):
+    """session VWAP for intraday bars, reset each trading day; the bar close stands in for typical price"""
+    needs_volume = True
+
+    def compute(self, close, volume, times):
+        days = times.normalize() if len(times) else times
+        pv = pd.Series(close * volume).groupby(days).cumsum().to_numpy()
+        v = pd.Series(volume).groupby(days).cumsum().to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out = np.where(v > 0, pv / v, np.nan)
+        self.day = days[-1] if len(times) else None
+        self.pv = pv[-1] if len(times) else 0.0
+        self.v = v[-1] if len(times) else 0.0
+        return {self.spec: out}
+
+    def push(self, close, volume, time):
+        day = time.normalize()
+        if day != self.day:
+            self.day, self.pv, self.v = day, 0.0, 0.0
+        self.pv += close * volume
+        self.v += volume
+        return {self.spec: self.pv / self.v if self.v > 0 else np.nan}
+
+
+INDICATORS = {'SMA': SMA, 'EMA': EMA, 'RSI': RSI, 'MACD': MACD, 'BB': Bollinger, 'VWAP': VWAP}
+
+
+def parse_spec(spec):
+    """
+    purpose: build an indicator from text like 'SMA(50)', 'BB(20,2)' or 'VWAP'
+    returns:
+        Indicator; raises ValueError for unknown names or bad parameters
+    """
+    match = SPEC_RE.match(spec or '')
+    if not match or match.group(1).upper() not in INDICATORS:
+        raise ValueError(f"unknown indicator: {spec!r}")
+    name = match.group(1).upper()
+    args = [float(a) for a in (match.group(2) or '').split(',') if a.strip()]
+    canonical = name + (f"({','.join(f'{a:g}' for a in args)})" if args else '')
+    try:
+        return INDICATORS[name](canonical, *args)
+    except TypeError:
+        raise ValueError(f"bad parameters for {name}: {spec!r}")
+
+
+class _Buffer:
+    """growable array with amortised O(1) append"""
+
+    def __init__(self, values, dtype=float):
+        values = np.asarray(values, dtype=dtype)
+        self.data = np.empty(max(16, 2 * len(values)), dtype=dtype)
+        self.data[:len(values)] = values
+        self.size = len(values)
+
+    def append(self, value):
+        if self.size == len(self.data):
+            grown = np.empty(2 * len(self.data), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size] = value
+        self.size += 1
+
+    def set_last(self, value):
+        self.data[self.size - 1] = value
+
+    def drop_first(self, count):
+        self.data = self.data[count:self.size].copy()
+        self.size -= count
+
+    def view(self):
+        return self.data[:self.size]
+
+
+class IndicatorSeries:
+    """
+    purpose: retained bars of one symbol/interval and the indicators computed over them
+    """
+
+    def __init__(self, frame):
+        self.indicators = {}        # spec -> (indicator, checkpoint before the last bar)
+        self.values = {}            # line -> _Buffer
+        self._reset(frame)
+
+    def _reset(self, frame):
+        self.tz = frame.index.tz
+        # nanoseconds whatever unit the index carries, so appended bars compare equal
+        self.times = _Buffer(frame.index.as_unit('ns').asi8, dtype=np.int64)
+        self.close = _Buffer(frame['Close'].to_numpy(dtype=float))
+        self.volume = _Buffer(frame['Volume'].to_numpy(dtype=float)) if 'Volume' in frame else None
+        specs = list(self.indicators)
+        self.indicators, self.values = {}, {}
+        for spec in specs:
+            self.add(spec)
+
+    def _index(self):
+        index = pd.to_datetime(self.times.view(), utc=self.tz is not None)
+        return index.tz_convert(self.tz) if self.tz is not None else index
+
+    def add(self, spec):
+        """
+        purpose: compute an indicator over every retained bar
+        """
+        indicator = parse_spec(spec)
+        if indicator.needs_volume and self.volume is None:
+            raise ValueError(f"{spec} needs volume")
+        close = self.close.view()
+        volume = self.volume.view() if self.volume is not None else None
+        index = self._index()
+        # all but the last bar in one pass, then the last one through push, checkpointed first
+        head = indicator.compute(close[:-1], volume[:-1] if volume is not None else None, index[:-1])
+        checkpoint = copy.deepcopy(indicator)
+        last = indicator.push(close[-1], volume[-1] if volume is not None else None, index[-1])
+        for line in indicator.lines:
+            self.values[line] = _Buffer(np.append(head[line], last[line]))
+        self.indicators[indicator.spec] = (indicator, checkpoint)
+        return indicator.spec
+
+    def sync(self, frame):
+        """
+        purpose: bring the retained bars in line with frame, pushing only what changed
+        returns:
+            slice of the retained bars that frame covers
+        """
+        t = frame.index.as_unit('ns').asi8
+        close = frame['Close'].to_numpy(dtype=float)
+        volume = frame['Volume'].to_numpy(dtype=float) if 'Volume' in frame and self.volume is not None else None
+        times = self.times.view()
+        start = int(np.searchsorted(times, t[0]))
+        last = int(np.searchsorted(t, times[-1]))
+        consistent = (start < len(times) and times[start] == t[0] and last < len(t) and t[last] == times[-1]
+                      and len(times) - start == last + 1 and (volume is not None) == (self.volume is not None))
+        if not consistent:
+            # gap, rewrite of older bars or a different interval: start over from this frame
+            self._reset(frame)
+            return slice(0, len(t))
+
+        if close[last] != self.close.view()[-1] or \
+                (volume is not None and volume[last] != self.volume.view()[-1]):
+            self._revise_last(frame.index[last], close[last], volume[last] if volume is not None else None)
+        for i in range(last + 1, len(t)):
+            self._push(t[i], frame.index[i], close[i], volume[i] if volume is not None else None)
+
+        # a long session keeps adding bars; drop retained history well past what is shown
+        excess = start - max(len(t), 1000)
+        if excess > 0:
+            for buffer in [self.times, self.close, self.volume, *self.values.values()]:
+                if buffer is not None:
+                    buffer.drop_first(excess)
+            start -= excess
+        return slice(start, start + len(t))
+
+    def _push(self, ns, time, close, volume):
+        self.times.append(ns)
+        self.close.append(close)
+        if self.volume is not None:
+            self.volume.append(volume)
+        for spec, (indicator, _) in self.indicators.items():
+            checkpoint = copy.deepcopy(indicator)
+            for line, value in indicator.push(close, volume, time).items():
+                self.values[line].append(value)
+            self.indicators[spec] = (indicator, checkpoint)
+
+    def _revise_last(self, time, close, volume):
+        self.close.set_last(close)
+        if self.volume is not None:
+            self.volume.set_last(volume)
+        for spec, (_, checkpoint) in self.indicators.items():
+            indicator = copy.deepcopy(checkpoint)
+            for line, value in indicator.push(close, volume, time).items():
+                self.values[line].set_last(value)
+            self.indicators[spec] = (indicator, checkpoint)
+
+
+class IndicatorCache:
+    """
+    purpose: indicator state shared by every pane, keyed by (symbol, interval)
+    arguments:
+        max_series: symbol/interval pairs kept before the least recently used is dropped
+    """
+
+    def __init__(self, max_series=32):
+        self.max_series = max_series
+        self._series = OrderedDict()
+
+    @timed('indicators', 'overlays')
+    def overlays(self, symbol, interval, frame, specs):
+        """
+        arguments:
+            frame: DataFrame indexed by time with 'Close' (and 'Volume' for VWAP)
+            specs: indicator specs, see parse_spec
+        returns:
+            dict spec -> (indicator, dict line -> array aligned with frame); specs that cannot be
+            computed (bad text, VWAP without volume) are left out
+        """
+        if frame is None or frame.empty or not specs:
+            return {}
+        key = (symbol, interval)
+        series = self._series.get(key)
+        if series is None:
+            series = IndicatorSeries(frame)
+            self._series[key] = series
+            window = slice(0, len(frame))
+        else:
+            window = series.sync(frame)
+        self._series.move_to_end(key)
+        while len(self._series) > self.max_series:
+            self._series.popitem(last=False)
+
+        result = {}
+        for spec in specs:
+            try:
+                indicator = parse_spec(spec)
+                if indicator.spec not in series.indicators:
+                    series.add(spec)
+            except ValueError as e:
+                print(f"Indicator {spec}: {e}")
+                continue
+            indicator = series.indicators[indicator.spec][0]
+            result[spec] = (indicator, {line: series.values[line].view()[window] for line in indicator.lines})
+        return result
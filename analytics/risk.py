@@ -0,0 +1,331 @@
+"""
+Portfolio risk across every account: volatility, beta against benchmarks,
+correlations, historical and parametric VaR/CVaR, and each holding's share of
+total risk.
+
+RiskEngine keeps a rolling window of daily returns for all holdings as one
+NumPy matrix, plus the running sums the covariance is built from (sum of
+returns, and returns' cross products). A new bar is a rank-1 update of those
+sums - dropping the oldest row and adding the newest - so the covariance is
+current after O(N^2) work instead of a full O(T*N^2) rebuild. The sums are
+rebuilt from the window every REBUILD_EVERY updates to keep rounding drift out.
+
+usage:
+    engine = RiskEngine(lookback=252)
+    engine.update(closes)            # wide frame of daily closes, holdings + benchmarks
+    engine.set_exposures(*exposures_from_accounts(manager.accounts_list))
+    report = engine.report()
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import timed
+
+DEFAULT_BENCHMARKS = ('SPY', 'QQQ')
+TRADING_DAYS = 252
+REBUILD_EVERY = 250
+# same rule as pnl.py: options have no daily close history under their Product.symbol
+MODELLED_TYPES = {'EQ', 'MF', 'ETF'}
+
+
+def history_period(lookback):
+    """
+    returns:
+        shortest yfinance period that covers lookback daily returns
+    """
+    if lookback <= 200:
+        return '1y'
+    if lookback <= 450:
+        return '2y'
+    return '5y'
+
+
+def exposures_from_accounts(accounts):
+    """
+    purpose: dollar exposure per symbol summed over every account's positions
+    arguments:
+        accounts: list of Account (AccountsManager.accounts_list)
+    returns:
+        (dict symbol -> market value, market value left out because it cannot be modelled)
+    """
+    frames = [account.positions for account in accounts
+              if account.positions is not None and not account.positions.empty]
+    if not frames:
+        return {}, 0.0
+    positions = pd.concat([f[['symbol', 'securityType', 'marketValue']] for f in frames], ignore_index=True)
+    value = pd.to_numeric(positions['marketValue'], errors='coerce').fillna(0.0)
+    modelled = positions['securityType'].astype(str).isin(MODELLED_TYPES).to_numpy()
+    exposures = value[modelled].groupby(positions['symbol'][modelled].astype(str)).sum()
+    return exposures[exposures != 0].to_dict(), float(value[~modelled].sum())
+
+
+class RiskEngine:
+    """
+    purpose: incremental risk model over a rolling window of daily returns
+    arguments:
+        lookback: returns kept in the window
+        benchmarks: symbols betas are measured against; their closes come in the same frame
+        confidence: VaR/CVaR confidence level
+        periods_per_year: annualisation factor for volatility
+    """
+
+    def __init__(self, lookback=TRADING_DAYS, benchmarks=DEFAULT_BENCHMARKS, confidence=0.95,
+                 periods_per_year=TRADING_DAYS):
+        self.lookback = int(lookback)
+        self.benchmarks = list(benchmarks)
+        self.confidence = float(confidence)
+        self.periods_per_year = periods_per_year
+        self.symbols = []
+        self._bench_cols = []       # benchmarks present in the closes, in window column order
+        self._exposure_map = {}
+        self.exposures = np.zeros(0)
+        self.unmodelled_value = 0.0
+        self.missing = []
+        self.as_of = None
+        self._reset_window(0)
+
+    def _reset_window(self, width):
+        # returns ring buffer: holdings in the first columns, benchmarks after them
+        self._window = np.zeros((self.lookback, width))
+        self._head = 0          # row the next return goes into
+        self._count = 0         # rows filled
+        self._sum = np.zeros(width)
+        self._cross = np.zeros((width, width))
+        self._updates = 0
+        self._last_time = None
+        self._last_close = None
+        self._prev_close = None
+
+    # ---- returns window ----
+
+    @timed('risk', 'update')
+    def update(self, closes):
+        """
+        purpose: bring the returns window up to date with a frame of daily closes
+        arguments:
+            closes: DataFrame, dates x symbols (holdings and benchmarks), as from
+                    YFinanceDataManager.get_price_history
+        returns:
+            'rebuilt', 'appended', 'revised' or 'unchanged'
+        """
+        if closes is None or closes.empty:
+            return 'unchanged'
+        columns = [s for s in closes.columns if s not in self.benchmarks] + \
+                  [b for b in self.benchmarks if b in closes.columns]
+        closes = closes.sort_index()
+        if columns != self.symbols + self._bench_cols or self._last_time is None:
+            self._rebuild(closes, columns)
+            return 'rebuilt'
+
+        closes = closes[columns].ffill()
+        newer = closes.loc[closes.index > self._last_time].to_numpy(dtype=float)
+        status = 'unchanged'
+        if self._last_time in closes.index:
+            # today's bar is still moving until the close; replace its return in place
+            latest = closes.loc[self._last_time].to_numpy(dtype=float)
+            if not np.array_equal(np.nan_to_num(latest), np.nan_to_num(self._last_close)):
+                self._revise(self._returns(self._prev_close, latest), latest)
+                status = 'revised'
+        for row in newer:
+            self._append(self._returns(self._last_close, row), row)
+            status = 'appended'
+        if len(newer):
+            self._last_time = closes.index[-1]
+            self.as_of = self._last_time
+        if self._updates >= REBUILD_EVERY:
+            self._recompute_sums()
+        return status
+
+    @staticmethod
+    def _returns(previous, current):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = current / previous - 1.0
+        # no price on either side (not listed yet, halted) counts as flat
+        return np.where(np.isfinite(r), r, 0.0)
+
+    def _rebuild(self, closes, columns):
+        self._bench_cols = [c for c in columns if c in self.benchmarks]
+        self.symbols = [c for c in columns if c not in self.benchmarks]
+        closes = closes[columns].ffill()
+        values = closes.to_numpy(dtype=float)
+        self._reset_window(len(columns))
+        self._align_exposures()
+        if len(values) < 2:
+            return
+        returns = self._returns(values[:-1], values[1:])[-self.lookback:]
+        n = len(returns)
+        self._window[:n] = returns
+        self._head = n % self.lookback
+        self._count = n
+        self._recompute_sums()
+        self._last_time = closes.index[-1]
+        self._last_close = values[-1]
+        self._prev_close = values[-2]
+        self.as_of = self._last_time
+
+    def _recompute_sums(self):
+        filled = self._window[:self._count]
+        self._sum = filled.sum(axis=0)
+        self._cross = filled.T @ filled
+        self._updates = 0
+
+    def _append(self, r, close):
+        close = np.where(np.isnan(close), self._last_close, close)
+        if self._count == self.lookback:
+            old = self._window[self._head]
+            self._sum -= old
+            self._cross -= np.outer(old, old)
+        else:
+            self._count += 1
+        self._window[self._head] = r
+        self._sum += r
+        self._cross += np.outer(r, r)
+        self._head = (self._head + 1) % self.lookback
+        self._prev_close, self._last_close = self._last_close, close
+        self._updates += 1
+
+    def _revise(self, r, close):
+        last = (self._head - 1) % self.lookback
+        old = self._window[last]
+        self._sum += r - old
+        self._cross += np.outer(r, r) - np.outer(old, old)
+        self._window[last] = r
+        self._last_close = close
+        self._updates += 1
+
+    # ---- exposures ----
+
+    def set_exposures(self, exposures, unmodelled_value=0.0):
+        """
+        arguments:
+            exposures: dict symbol -> dollar market value (negative for shorts)
+            unmodelled_value: market value outside the model (options), reported as-is
+        """
+        self._exposure_map = dict(exposures)
+        self.unmodelled_value = unmodelled_value
+        self._align_exposures()
+
+    def _align_exposures(self):
+        exposures = self._exposure_map
+        self.exposures = np.array([exposures.get(s, 0.0) for s in self.symbols], dtype=float)
+        self.missing = sorted(set(exposures) - set(self.symbols))
+
+    def needed_symbols(self):
+        """
+        returns:
+            every symbol the engine wants closes for: current exposures plus benchmarks
+        """
+        return sorted(set(self._exposure_map) | set(self.benchmarks))
+
+    # ---- statistics ----
+
+    def covariance(self):
+        n = self._count
+        if n < 2:
+            return None, None
+        mean = self._sum / n
+        cov = (self._cross - n * np.outer(mean, mean)) / (n - 1)
+        return mean, cov
+
+    @timed('risk', 'report')
+    def report(self, top_pairs=10):
+        """
+        returns:
+            dict with the portfolio figures (daily, as fractions of modelled value unless noted),
+            a per-holding table as a DataFrame, and the most correlated pairs; None before
+            there are at least two returns
+        """
+        mean, cov = self.covariance()
+        k = len(self.symbols)
+        value = self.exposures.sum()
+        gross = np.abs(self.exposures).sum()
+        if mean is None or k == 0 or gross == 0:
+            return None
+        # net long books are measured against their value, anything else against gross exposure
+        base = value if value > 0 else gross
+        w = self.exposures / base
+
+        cov_h = cov[:k, :k]
+        sigma_w = cov_h @ w
+        variance = max(float(w @ sigma_w), 0.0)
+        vol = np.sqrt(variance)
+        mu = float(w @ mean[:k])
+
+        asset_vol = np.sqrt(np.clip(np.diag(cov_h), 0.0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            contribution = w * sigma_w / vol if vol else np.zeros(k)
+            contribution_pct = contribution / vol if vol else np.zeros(k)
+
+        betas = {}
+        asset_beta = {}
+        for j, bench in enumerate(self._bench_cols):
+            var_b = cov[k + j, k + j]
+            beta_i = cov[:k, k + j] / var_b if var_b > 0 else np.zeros(k)
+            asset_beta[bench] = beta_i
+            betas[bench] = float(w @ beta_i)
+
+        # historical: the book's P&L replayed over the window, today's weights
+        pnl = self._window[:self._count, :k] @ w
+        alpha = 1.0 - self.confidence
+        cutoff = np.quantile(pnl, alpha)
+        tail = pnl[pnl <= cutoff]
+        z = NormalDist().inv_cdf(alpha)
+
+        holdings = pd.DataFrame({
+            'symbol': self.symbols,
+            'exposure': self.exposures,
+            'weight': w * 100.0,
+            'vol': asset_vol * np.sqrt(self.periods_per_year) * 100.0,
+            **{f'beta {b}': asset_beta[b] for b in asset_beta},
+            'risk %': contribution_pct * 100.0,
+        })
+        holdings = holdings[holdings['exposure'] != 0].sort_values('risk %', ascending=False)
+
+        return {
+            'as_of': self.as_of,
+            'observations': self._count,
+            'value': float(base),
+            'unmodelled_value': self.unmodelled_value,
+            'missing': self.missing,
+            'vol_daily': vol,
+            'vol_annual': vol * np.sqrt(self.periods_per_year),
+            'betas': betas,
+            'confidence': self.confidence,
+            'var_hist': float(-cutoff),
+            'cvar_hist': float(-tail.mean()) if len(tail) else float(-cutoff),
+            'var_param': -(mu + z * vol),
+            'cvar_param': vol * NormalDist().pdf(z) / alpha - mu,
+            'holdings': holdings,
+            'top_pairs': self._top_pairs(cov_h, asset_vol, top_pairs),
+        }
+
+    def correlation(self):
+        """
+        returns:
+            holdings x holdings correlation DataFrame (None before two returns)
+        """
+        _, cov = self.covariance()
+        if cov is None:
+            return None
+        k = len(self.symbols)
+        sd = np.sqrt(np.clip(np.diag(cov[:k, :k]), 0.0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov[:k, :k] / np.outer(sd, sd)
+        return pd.DataFrame(np.nan_to_num(corr), index=self.symbols, columns=self.symbols)
+
+    def _top_pairs(self, cov, sd, count):
+        held = np.flatnonzero(self.exposures)
+        if len(held) < 2:
+            return []
+        sub = cov[np.ix_(held, held)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.nan_to_num(sub / np.outer(sd[held], sd[held]))
+        i, j = np.triu_indices(len(held), k=1)
+        values = corr[i, j]
+        count = min(count, len(values))
+        best = np.argpartition(-np.abs(values), count - 1)[:count]
+        best = best[np.argsort(-np.abs(values[best]))]
+        return [(self.symbols[held[i[b]]], self.symbols[held[j[b]]], float(values[b])) for b in best]
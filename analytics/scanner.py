@@ -0,0 +1,266 @@
+"""
+Watchlist screens: small boolean expressions over price and volume, evaluated
+for every symbol at once on a symbols x time matrix.
+
+A screen reads like a condition on the latest bar:
+
+    close > sma(200) and rsi(14) < 30
+    close >= 0.97 * high(252)
+    volume > 2 * avg_volume(20)
+
+Names: close, volume (latest bar). Functions (n bars, each evaluated for all
+symbols in one NumPy/pandas pass): sma(n), ema(n), rsi(n), high(n), low(n),
+avg_volume(n) (the n bars before the latest), change(n) (% over n bars).
+Arithmetic, comparisons (chains included), and/or/not and numbers are allowed;
+anything else is rejected when the screen is compiled, and expressions are
+never passed to eval.
+"""
+
+import ast
+import operator
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import timed
+
+PRESET_SCREENS = {
+    'Oversold in uptrend': 'close > sma(200) and rsi(14) < 30',
+    'Near 52-week high': 'close >= 0.97 * high(252)',
+    'Volume spike': 'volume > 2 * avg_volume(20)',
+    'Above 50d and 200d': 'close > sma(50) and sma(50) > sma(200)',
+}
+
+_BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+_COMPARE = {ast.Gt: operator.gt, ast.GtE: operator.ge, ast.Lt: operator.lt, ast.LtE: operator.le,
+            ast.Eq: operator.eq, ast.NotEq: operator.ne}
+
+
+def _window(matrix, n, offset=0):
+    """last n rows (ending offset rows before the end); None when the history is too short"""
+    end = len(matrix) - offset
+    if n < 1 or end - n < 0:
+        return None
+    return matrix[end - n:end]
+
+
+def _mean(matrix, n, offset=0):
+    window = _window(matrix, n, offset)
+    if window is None:
+        return np.full(matrix.shape[1], np.nan)
+    with np.errstate(invalid='ignore'):
+        # symbols with gaps in the window have no value rather than a mean of fewer bars
+        return np.where(np.isnan(window).any(axis=0), np.nan, window.sum(axis=0) / n)
+
+
+class ScanData:
+    """
+    purpose: the matrices a screen is evaluated on, plus memoised function results
+    arguments:
+        closes, volumes: DataFrames dates x symbols (volumes may be None)
+    """
+
+    def __init__(self, closes, volumes=None):
+        self.symbols = list(closes.columns)
+        self.close = closes.ffill().to_numpy(dtype=float)
+        if volumes is not None:
+            volumes = volumes.reindex(index=closes.index, columns=closes.columns)
+            self.volume = volumes.to_numpy(dtype=float)
+        else:
+            self.volume = np.full(self.close.shape, np.nan)
+        self._cache = {}
+
+    def value(self, name, args):
+        key = (name, args)
+        if key not in self._cache:
+            self._cache[key] = FUNCTIONS[name](self, *args)
+        return self._cache[key]
+
+
+def _sma(data, n):
+    return _mean(data.close, int(n))
+
+
+def _ewm_last(matrix, alpha, min_periods=1):
+    """
+    purpose: last value of an exponentially weighted mean (adjust=False) for every column
+    note: steps through the rows with whole-row NumPy operations; pandas' ewm loops per
+          column and is much slower on a wide watchlist
+    """
+    out = np.full(matrix.shape[1], np.nan)
+    for row in matrix:
+        with np.errstate(invalid='ignore'):
+            out = np.where(np.isnan(out), row, np.where(np.isnan(row), out, out + alpha * (row - out)))
+    return np.where((~np.isnan(matrix)).sum(axis=0) >= min_periods, out, np.nan)
+
+
+def _ema(data, n):
+    return _ewm_last(data.close, 2.0 / (int(n) + 1.0), int(n))
+
+
+def _rsi(data, n=14):
+    delta = np.diff(data.close, axis=0)
+    if len(delta) < n:
+        return np.full(len(data.symbols), np.nan)
+    # gains and losses side by side so one pass smooths both
+    smoothed = _ewm_last(np.hstack([np.clip(delta, 0.0, None), np.clip(-delta, 0.0, None)]), 1.0 / n, n)
+    gain, loss = smoothed[:len(data.symbols)], smoothed[len(data.symbols):]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(loss == 0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+
+
+def _extreme(reduce):
+    def extreme(data, n):
+        window = _window(data.close, int(n))
+        if window is None:
+            # shorter history than asked for: use what there is
+            window = data.close
+        with np.errstate(invalid='ignore'):
+            return reduce(window, axis=0) if len(window) else np.full(len(data.symbols), np.nan)
+    return extreme
+
+
+def _avg_volume(data, n):
+    return _mean(data.volume, int(n), offset=1)
+
+
+def _change(data, n=1):
+    n = int(n)
+    if len(data.close) <= n:
+        return np.full(len(data.symbols), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (data.close[-1] / data.close[-1 - n] - 1.0) * 100.0
+
+
+FUNCTIONS = {
+    'sma': _sma,
+    'ema': _ema,
+    'rsi': _rsi,
+    'high': _extreme(np.nanmax),
+    'low': _extreme(np.nanmin),
+    'avg_volume': _avg_volume,
+    'change': _change,
+}
+NAMES = {
+    'close': lambda data: data.close[-1] if len(data.close) else np.full(len(data.symbols), np.nan),
+    'volume': lambda data: data.volume[-1] if len(data.volume) else np.full(len(data.symbols), np.nan),
+}
+
+
+class Screen:
+    """
+    purpose: a compiled screen expression
+    arguments:
+        text: expression, see the module docstring
+        name: label for the ui (defaults to the text)
+    note: raises ValueError for anything outside the screen language
+    """
+
+    def __init__(self, text, name=None):
+        self.text = text.strip()
+        self.name = name or self.text
+        try:
+            tree = ast.parse(self.text, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"invalid screen: {e.msg}")
+        self.terms = {}     # function calls in the expression (text -> node), shown as result columns
+        self._check(tree.body)
+        self.tree = tree.body
+
+    def _check(self, node):
+        if isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._check(value)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            self._check(node.operand)
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+            for value in [node.left, *node.comparators]:
+                self._check(value)
+        elif isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise ValueError(f"unknown function: {ast.unparse(node.func)}")
+            if node.keywords or not all(isinstance(a, ast.Constant) and isinstance(a.value, (int, float))
+                                        for a in node.args):
+                raise ValueError(f"{node.func.id}() takes numbers only")
+            self.terms.setdefault(ast.unparse(node), node)
+        elif isinstance(node, ast.Name):
+            if node.id not in NAMES:
+                raise ValueError(f"unknown name: {node.id}")
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            pass
+        else:
+            raise ValueError(f"not allowed in a screen: {ast.unparse(node)}")
+
+    def _eval(self, node, data):
+        if isinstance(node, ast.BoolOp):
+            values = [self._eval(v, data) for v in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = values[0]
+            for value in values[1:]:
+                result = combine(result, value)
+            return result
+        if isinstance(node, ast.UnaryOp):
+            value = self._eval(node.operand, data)
+            return np.logical_not(value) if isinstance(node.op, ast.Not) else -value
+        if isinstance(node, ast.BinOp):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return _BINARY[type(node.op)](self._eval(node.left, data), self._eval(node.right, data))
+        if isinstance(node, ast.Compare):
+            left = self._eval(node.left, data)
+            result = True
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._eval(comparator, data)
+                # NaN compares False, so symbols without enough history never match
+                with np.errstate(invalid='ignore'):
+                    result = np.logical_and(result, _COMPARE[type(op)](left, right))
+                left = right
+            return result
+        if isinstance(node, ast.Call):
+            return data.value(node.func.id, tuple(a.value for a in node.args))
+        if isinstance(node, ast.Name):
+            return NAMES[node.id](data)
+        return node.value
+
+    @timed('scanner', 'evaluate')
+    def evaluate(self, closes, volumes=None):
+        """
+        arguments:
+            closes, volumes: DataFrames dates x symbols
+        returns:
+            DataFrame per symbol: close, change % (1 bar), each function term in the screen and
+            'match'; symbols with no data at all are left out
+        """
+        closes = closes.dropna(axis=1, how='all')
+        data = ScanData(closes, volumes)
+        n = len(data.symbols)
+        match = np.broadcast_to(np.asarray(self._eval(self.tree, data), dtype=bool), (n,))
+        columns = {'symbol': data.symbols, 'close': NAMES['close'](data), 'change %': _change(data, 1)}
+        for term, call in self.terms.items():
+            columns[term] = np.broadcast_to(self._eval(call, data), (n,))
+        columns['match'] = match
+        return pd.DataFrame(columns)
+
+
+def scan(symbols, fetch, screen, batch_size=100):
+    """
+    purpose: evaluate a screen over a long watchlist batch by batch, so results can be shown
+             as they come in
+    arguments:
+        symbols: tickers
+        fetch: callable(batch) -> (closes, volumes) DataFrames dates x symbols
+        screen: Screen
+        batch_size: symbols per fetch
+    returns:
+        generator of (result DataFrame for the batch, symbols done so far)
+    """
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+    for start in range(0, len(symbols), batch_size):
+        batch = symbols[start:start + batch_size]
+        closes, volumes = fetch(batch)
+        if closes is None or closes.empty:
+            yield pd.DataFrame(), start + len(batch)
+            continue
+        yield screen.evaluate(closes, volumes), start + len(batch)
@@ -0,0 +1,428 @@
+"""
+Tax lots: unrealized and realized gains, holding periods and what-if sales.
+
+LotBook holds every equity lot of an account as flat NumPy arrays (symbol
+code, acquired date, remaining quantity, cost per share). Positions whose lots
+have been fetched (Account.get_lots) contribute their real lots; the others
+count as one lot at the position's dateAcquired and costPerShare, flagged
+estimated - lots are one request per position, so they are only fetched for
+the positions being looked at.
+
+For each sale method the lots are sorted once, by symbol and then by the
+method's key, and running totals of quantity and cost are kept over that order
+(for all lots and for long-term lots alone). Selling q shares of a symbol is
+then a binary search in the symbol's run plus one partial lot, so what-if
+results can be recomputed on every keystroke whatever the size of the account.
+
+    FIFO     oldest lots first
+    LIFO     newest lots first
+    MIN_TAX  largest tax saving first: losses (short-term before long-term), then the gains taxed least
+    SPECIFIC the lots given, in the order given
+
+realized_gains() matches sells to buys in the transaction history
+(etrade_client/transactions.py) first-in first-out for every symbol at once:
+the running bought and sold quantities cut each symbol's shares into segments
+that belong to exactly one buy and one sell.
+
+usage:
+    book = LotBook.from_account(account)
+    results = book.what_if_methods('IBM', 150)      # method -> proceeds, gain, short/long split, tax
+    pairs = realized_gains(store.query(account.accountIdKey, types=['Bought', 'Sold']))
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from etrade_client.market_calendar import EXCHANGE_TZ
+from utils.metrics import timed
+
+FIFO = 'fifo'
+LIFO = 'lifo'
+MIN_TAX = 'min_tax'
+SPECIFIC = 'specific'
+METHODS = (FIFO, LIFO, MIN_TAX)
+#marginal rates used to rank lots for MIN_TAX and to estimate tax; override with TAX_RATES in config.py
+DEFAULT_TAX_RATES = {'short': 0.37, 'long': 0.20}
+#same rule as pnl.py and risk.py: an option's Product.symbol is its underlying's
+LOT_TYPES = {'EQ', 'MF', 'ETF'}
+
+
+def tax_rates_from_config():
+    try:
+        import config
+    except ImportError:
+        config = None
+    return dict(getattr(config, 'TAX_RATES', DEFAULT_TAX_RATES))
+
+
+def today():
+    return np.datetime64(datetime.now(EXCHANGE_TZ).date(), 'D')
+
+
+def anniversary(acquired):
+    """
+    returns:
+        datetime64[D] one calendar year after each acquired date; a sale after it is long-term
+    """
+    acquired = np.asarray(acquired, dtype='M8[D]')
+    if acquired.size == 0:
+        return acquired
+    return (pd.DatetimeIndex(acquired) + pd.DateOffset(years=1)).to_numpy().astype('M8[D]')
+
+
+def _ms_to_days(ms):
+    ms = pd.to_numeric(pd.Series(ms), errors='coerce').to_numpy(dtype=float)
+    days = np.full(ms.shape, np.datetime64('NaT'), dtype='M8[D]')
+    valid = np.isfinite(ms) & (ms > 0)
+    days[valid] = ms[valid].astype('int64').astype('M8[ms]').astype('M8[D]')
+    return days
+
+
+class _Run:
+    """
+    purpose: lots sorted for one sale method, with running totals; index s..e of a symbol's lots
+             in order is cum_*[s..e] (cum_* have a leading 0)
+    """
+    __slots__ = ('order', 'starts', 'cum_qty', 'cum_cost', 'cum_long_qty', 'cum_long_cost')
+
+    def __init__(self, book, order):
+        self.order = order
+        codes = book.codes[order]
+        self.starts = np.searchsorted(codes, np.arange(len(book.symbol_index) + 1))
+        qty = book.quantity[order]
+        long = book.long[order]
+        cost = qty * book.cost[order] * book.multiplier[order]
+        zero = np.zeros(1)
+        self.cum_qty = np.concatenate([zero, np.cumsum(qty)])
+        self.cum_cost = np.concatenate([zero, np.cumsum(cost)])
+        self.cum_long_qty = np.concatenate([zero, np.cumsum(np.where(long, qty, 0.0))])
+        self.cum_long_cost = np.concatenate([zero, np.cumsum(np.where(long, cost, 0.0))])
+
+
+class LotBook:
+    """
+    purpose: every lot of an account as arrays, for gains, holding periods and what-if sales
+    arguments:
+        symbols, lot_ids: per lot
+        acquired: per lot, datetime64[D] (or anything numpy turns into it)
+        quantity: remaining shares per lot
+        cost: cost basis per share
+        multiplier: shares per unit (1 for stock), default 1
+        estimated: per lot, True where the lot stands in for a position's lots that weren't fetched
+        prices: dict symbol -> last price
+        as_of: date holding periods are measured to, default today in New York
+        tax_rates: {'short': rate, 'long': rate}, default from config
+    """
+
+    def __init__(self, symbols, lot_ids, acquired, quantity, cost, multiplier=None, estimated=None,
+                 prices=None, as_of=None, tax_rates=None):
+        self.symbols = np.asarray(symbols, dtype=object)
+        self.symbol_index, self.codes = np.unique(self.symbols.astype(str), return_inverse=True)
+        self._code_of = {symbol: i for i, symbol in enumerate(self.symbol_index)}
+        n = len(self.symbols)
+        self.lot_ids = np.asarray(lot_ids)
+        self.acquired = np.asarray(acquired, dtype='M8[D]')
+        self.quantity = np.asarray(quantity, dtype=float)
+        self.cost = np.asarray(cost, dtype=float)
+        self.multiplier = np.ones(n) if multiplier is None else np.asarray(multiplier, dtype=float)
+        self.estimated = np.zeros(n, dtype=bool) if estimated is None else np.asarray(estimated, dtype=bool)
+        self.tax_rates = tax_rates if tax_rates is not None else tax_rates_from_config()
+        self.as_of = np.datetime64(as_of, 'D') if as_of is not None else today()
+        self.anniversary = anniversary(self.acquired)
+        # unknown acquisition dates count as short-term: the cautious guess for tax
+        self.long = self.as_of > self.anniversary
+        self.days_held = (self.as_of - self.acquired).astype(float)
+        self.symbol_price = np.full(len(self.symbol_index), np.nan)
+        self._runs = {}
+        self.set_prices(prices or {})
+
+    @classmethod
+    @timed('lots', 'build')
+    def from_account(cls, account, as_of=None, tax_rates=None):
+        """
+        purpose: lots of an account's long equity and fund positions - the fetched lots where
+                 Account.get_lots has cached them, one estimated lot per position otherwise
+        """
+        positions = account.positions
+        if positions is None or positions.empty:
+            return cls([], [], [], [], [], as_of=as_of, tax_rates=tax_rates)
+        positions = positions[positions['securityType'].astype(str).isin(LOT_TYPES)
+                              & (positions['positionType'] != 'SHORT')]
+        fetched = {pid: lots for pid, (quantity, lots) in account.lots.items()}
+        has_lots = positions['positionId'].isin(list(fetched)).to_numpy()
+
+        estimated = positions[~has_lots]
+        cost = pd.to_numeric(estimated['costPerShare'], errors='coerce')
+        cost = cost.where(cost > 0, pd.to_numeric(estimated['pricePaid'], errors='coerce'))
+        columns = {
+            'symbol': estimated['symbol'].to_numpy(dtype=object),
+            'lot_id': estimated['positionId'].to_numpy(),
+            'acquired': _ms_to_days(estimated['dateAcquired']),
+            'quantity': pd.to_numeric(estimated['quantity'], errors='coerce').to_numpy(dtype=float),
+            'cost': cost.to_numpy(dtype=float),
+            'estimated': np.ones(len(estimated), dtype=bool),
+        }
+
+        rows = []
+        for symbol, position_id in zip(positions['symbol'][has_lots], positions['positionId'][has_lots]):
+            for lot in fetched[position_id]:
+                price = lot.get('adjPrice') or lot.get('price') or 0.0
+                rows.append((symbol, lot.get('positionLotId', position_id), lot.get('acquiredDate'),
+                             float(lot.get('remainingQty') or 0.0),
+                             price + (lot.get('commPerShare') or 0.0) + (lot.get('feesPerShare') or 0.0)))
+        if rows:
+            symbol, lot_id, acquired, quantity, cost = zip(*rows)
+            columns = {
+                'symbol': np.concatenate([columns['symbol'], np.array(symbol, dtype=object)]),
+                'lot_id': np.concatenate([columns['lot_id'], np.array(lot_id)]),
+                'acquired': np.concatenate([columns['acquired'], _ms_to_days(acquired)]),
+                'quantity': np.concatenate([columns['quantity'], np.array(quantity)]),
+                'cost': np.concatenate([columns['cost'], np.array(cost)]),
+                'estimated': np.concatenate([columns['estimated'], np.zeros(len(rows), dtype=bool)]),
+            }
+        prices = dict(zip(positions['symbol'], pd.to_numeric(positions['lastTrade'], errors='coerce')))
+        return cls(columns['symbol'], columns['lot_id'], columns['acquired'], columns['quantity'], columns['cost'],
+                   estimated=columns['estimated'], prices=prices, as_of=as_of, tax_rates=tax_rates)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def set_prices(self, prices):
+        """
+        arguments:
+            prices: dict symbol -> last price; symbols not in the book are ignored
+        """
+        for symbol, price in prices.items():
+            code = self._code_of.get(symbol)
+            if code is not None and price is not None:
+                self.symbol_price[code] = price
+        self.price = self.symbol_price[self.codes] if len(self.codes) else np.zeros(0)
+        # MIN_TAX ranks lots by gain, which moves with the price
+        self._runs.pop(MIN_TAX, None)
+
+    def _rate(self, long):
+        return np.where(long, self.tax_rates['long'], self.tax_rates['short'])
+
+    def _run(self, method):
+        run = self._runs.get(method)
+        if run is None:
+            tie = self.lot_ids.astype(str) if self.lot_ids.dtype == object else self.lot_ids
+            if method == FIFO:
+                order = np.lexsort((tie, self.acquired, self.codes))
+            elif method == LIFO:
+                order = np.lexsort((tie, -self.acquired.astype('int64'), self.codes))
+            elif method == MIN_TAX:
+                tax_per_share = (self.price - self.cost) * self._rate(self.long)
+                # losses first, the biggest saving first; short-term losses save the most
+                order = np.lexsort((tie, np.nan_to_num(tax_per_share, nan=np.inf), self.codes))
+            else:
+                raise ValueError(f"unknown lot method {method}")
+            run = self._runs[method] = _Run(self, order)
+        return run
+
+    def what_if(self, symbol, quantity, method=FIFO, price=None, lot_ids=None):
+        """
+        purpose: what selling quantity shares of symbol would realize
+        arguments:
+            method: FIFO, LIFO, MIN_TAX or SPECIFIC
+            price: sale price, default the last price
+            lot_ids: for SPECIFIC, the lots to sell from, in order
+        returns:
+            dict: quantity (sold), unfilled (shares asked for beyond the lots), proceeds, cost, gain,
+            short_gain, long_gain, tax (estimated, negative is a saving), estimated (True if any lot
+            sold is a position-level estimate), lots (list of (lot id, shares))
+        """
+        code = self._code_of.get(symbol)
+        result = {'method': method, 'quantity': 0.0, 'unfilled': float(quantity), 'proceeds': 0.0, 'cost': 0.0,
+                  'gain': 0.0, 'short_gain': 0.0, 'long_gain': 0.0, 'tax': 0.0, 'estimated': False, 'lots': []}
+        if code is None or quantity <= 0:
+            return result
+        price = self.symbol_price[code] if price is None else price
+
+        if method == SPECIFIC:
+            wanted = {lot_id: i for i, lot_id in enumerate(lot_ids or [])}
+            members = np.flatnonzero(self.codes == code)
+            members = [i for i in members if self.lot_ids[i] in wanted]
+            run = _Run(self, np.array(sorted(members, key=lambda i: wanted[self.lot_ids[i]]), dtype=int))
+            start, end = 0, len(members)
+        else:
+            run = self._run(method)
+            start, end = run.starts[code], run.starts[code + 1]
+
+        held = run.cum_qty[start:end + 1]
+        # lots sold whole: running total at or below the base plus quantity
+        whole = int(np.searchsorted(held, held[0] + quantity, side='right')) - 1
+        sold = held[whole] - held[0]
+        cost = run.cum_cost[start + whole] - run.cum_cost[start]
+        long_qty = run.cum_long_qty[start + whole] - run.cum_long_qty[start]
+        long_cost = run.cum_long_cost[start + whole] - run.cum_long_cost[start]
+        taken = run.order[start:start + whole]
+        lots = list(zip(self.lot_ids[taken].tolist(), self.quantity[taken].tolist()))
+        estimated = bool(self.estimated[taken].any())
+        if start + whole < end and quantity > sold:
+            i = run.order[start + whole]
+            part = min(quantity - sold, self.quantity[i])
+            sold += part
+            cost += part * self.cost[i] * self.multiplier[i]
+            if self.long[i]:
+                long_qty += part
+                long_cost += part * self.cost[i] * self.multiplier[i]
+            lots.append((self.lot_ids[i:i + 1].tolist()[0], float(part)))
+            estimated = estimated or bool(self.estimated[i])
+
+        multiplier = self.multiplier[run.order[start]] if end > start else 1.0
+        proceeds = sold * price * multiplier
+        long_gain = long_qty * price * multiplier - long_cost
+        gain = proceeds - cost
+        short_gain = gain - long_gain
+        result.update({
+            'quantity': float(sold), 'unfilled': float(max(0.0, quantity - sold)), 'proceeds': float(proceeds),
+            'cost': float(cost), 'gain': float(gain), 'short_gain': float(short_gain), 'long_gain': float(long_gain),
+            'tax': float(short_gain * self.tax_rates['short'] + long_gain * self.tax_rates['long']),
+            'estimated': estimated,
+            'lots': lots,
+        })
+        return result
+
+    def what_if_methods(self, symbol, quantity, price=None):
+        """
+        returns:
+            dict method -> what_if result, for every method in METHODS
+        """
+        return {method: self.what_if(symbol, quantity, method, price) for method in METHODS}
+
+    def unrealized(self):
+        """
+        returns:
+            DataFrame, one row per lot: symbol, lot_id, acquired, days_held, term, quantity, cost,
+            price, gain, estimated
+        """
+        gain = (self.price - self.cost) * self.quantity * self.multiplier
+        return pd.DataFrame({
+            'symbol': self.symbols, 'lot_id': self.lot_ids, 'acquired': self.acquired, 'days_held': self.days_held,
+            'term': np.where(self.long, 'long', 'short'), 'quantity': self.quantity, 'cost': self.cost,
+            'price': self.price, 'gain': gain, 'estimated': self.estimated,
+        })
+
+    def summary(self):
+        """
+        returns:
+            DataFrame by symbol: quantity, cost, value, short_gain, long_gain, gain, estimated_lots -
+            what selling everything would realize
+        """
+        n = len(self.symbol_index)
+        cost = self.cost * self.quantity * self.multiplier
+        value = self.price * self.quantity * self.multiplier
+        gain = value - cost
+        frame = pd.DataFrame({
+            'quantity': np.bincount(self.codes, self.quantity, n),
+            'cost': np.bincount(self.codes, cost, n),
+            'value': np.bincount(self.codes, value, n),
+            'short_gain': np.bincount(self.codes, np.where(self.long, 0.0, gain), n),
+            'long_gain': np.bincount(self.codes, np.where(self.long, gain, 0.0), n),
+            'estimated_lots': np.bincount(self.codes, self.estimated.astype(float), n).astype(int),
+        }, index=pd.Index(self.symbol_index, name='symbol'))
+        frame['gain'] = frame['short_gain'] + frame['long_gain']
+        return frame
+
+
+@timed('lots', 'realized')
+def realized_gains(transactions):
+    """
+    purpose: realized gains from a transaction history, sells matched to buys first-in first-out
+    arguments:
+        transactions: TransactionStore.query() frame (Bought and Sold rows are used)
+    returns:
+        DataFrame, one row per (sell, buy) match: symbol, sell_id, sell_date, buy_id, buy_date, quantity,
+        proceeds, cost, gain, term ('short', 'long', or 'unknown' for shares bought before the history
+        starts - their cost is NaN)
+    note: amounts come from the transactions' amount, so fees and option multipliers are included
+    """
+    trades = transactions[transactions['transaction_type'].isin(['Bought', 'Sold'])
+                          & transactions['symbol'].notna()].sort_values(['symbol', 'transaction_date',
+                                                                         'transaction_id'])
+    columns = ['symbol', 'sell_id', 'sell_date', 'buy_id', 'buy_date', 'quantity', 'proceeds', 'cost', 'gain', 'term']
+    if trades.empty:
+        return pd.DataFrame(columns=columns)
+
+    is_buy = (trades['transaction_type'] == 'Bought').to_numpy()
+    shares = trades['quantity'].abs().to_numpy(dtype=float)
+    amount = trades['amount'].abs().to_numpy(dtype=float)
+    price = trades['price'].to_numpy(dtype=float)
+    per_share = np.where(amount > 0, amount / np.where(shares > 0, shares, 1.0), price)
+    symbols = trades['symbol'].to_numpy(dtype=object)
+    codes, names = pd.factorize(trades['symbol'])
+    dates = trades['transaction_date']
+    if getattr(dates.dt, 'tz', None) is not None:
+        dates = dates.dt.tz_convert(EXCHANGE_TZ).dt.tz_localize(None)
+    dates = dates.to_numpy(dtype='M8[ns]')
+    ids = trades['transaction_id'].to_numpy()
+
+    # shares sold before any buy in the history were bought earlier: an opening lot of unknown cost
+    # covers the largest shortfall of each symbol
+    net = pd.Series(np.where(is_buy, shares, -shares)).groupby(codes).cumsum().to_numpy()
+    opening = np.maximum(0.0, -pd.Series(net).groupby(codes).min().to_numpy())
+
+    buy_qty = np.concatenate([opening, shares[is_buy]])
+    buy_code = np.concatenate([np.arange(len(names)), codes[is_buy]])
+    buy_cost = np.concatenate([np.full(len(names), np.nan), per_share[is_buy]])
+    buy_date = np.concatenate([np.full(len(names), np.datetime64('NaT'), dtype=dates.dtype), dates[is_buy]])
+    buy_id = np.concatenate([np.full(len(names), -1), ids[is_buy]])
+    # opening lots go first within their symbol (stable sort keeps trade order after them)
+    order = np.argsort(buy_code, kind='stable')
+    buy_qty, buy_code, buy_cost, buy_date, buy_id = (a[order] for a in (buy_qty, buy_code, buy_cost, buy_date, buy_id))
+
+    sell = ~is_buy
+    sell_qty, sell_code = shares[sell], codes[sell]
+
+    # lay every symbol's shares on one line: symbol k starts where k-1's buys end
+    totals = np.bincount(buy_code, buy_qty, len(names))
+    offset = np.concatenate([[0.0], np.cumsum(totals)[:-1]])
+    buy_end = offset[buy_code] + (pd.Series(buy_qty).groupby(buy_code).cumsum().to_numpy())
+    sell_end = offset[sell_code] + (pd.Series(sell_qty).groupby(sell_code).cumsum().to_numpy())
+    sell_start = sell_end - sell_qty
+
+    cuts = np.unique(np.concatenate([buy_end, sell_end, sell_start]))
+    lo, hi = cuts[:-1], cuts[1:]
+    mid = (lo + hi) / 2.0
+    s = np.searchsorted(sell_end, mid)
+    covered = (s < len(sell_end))
+    covered[covered] &= sell_start[s[covered]] <= mid[covered]
+    lo, hi, mid, s = lo[covered], hi[covered], mid[covered], s[covered]
+    b = np.searchsorted(buy_end, mid)
+
+    quantity = hi - lo
+    sell_price = per_share[sell][s]
+    cost = quantity * buy_cost[b]
+    proceeds = quantity * sell_price
+    sell_date = dates[sell][s]
+    bought = buy_date[b]
+    held_long = pd.Series(sell_date) > (pd.Series(bought) + pd.DateOffset(years=1))
+    term = np.where(pd.isna(bought), 'unknown', np.where(held_long.to_numpy(), 'long', 'short'))
+
+    pairs = pd.DataFrame({
+        'symbol': symbols[sell][s], 'sell_id': ids[sell][s], 'sell_date': sell_date,
+        'buy_id': np.where(buy_id[b] < 0, None, buy_id[b]), 'buy_date': bought, 'quantity': quantity,
+        'proceeds': proceeds, 'cost': cost, 'gain': proceeds - cost, 'term': term,
+    })
+    # segments from the same sell and buy (split by other cuts) are one match
+    pairs = pairs.groupby(['sell_id', 'buy_id'], sort=False, dropna=False, as_index=False).agg(
+        symbol=('symbol', 'first'), sell_date=('sell_date', 'first'), buy_date=('buy_date', 'first'),
+        quantity=('quantity', 'sum'), proceeds=('proceeds', 'sum'), cost=('cost', 'sum'), gain=('gain', 'sum'),
+        term=('term', 'first'))[columns]
+    # sum() turned the unknown costs into 0
+    pairs.loc[pairs['term'] == 'unknown', ['cost', 'gain']] = np.nan
+    return pairs
+
+
+def realized_summary(pairs):
+    """
+    returns:
+        realized gain by year (of the sale) and term
+    """
+    if pairs.empty:
+        return pd.DataFrame(columns=['short', 'long', 'unknown'])
+    years = pd.to_datetime(pairs['sell_date']).dt.year.rename('year')
+    return pairs.groupby([years, 'term'])['gain'].sum(min_count=1).unstack('term')
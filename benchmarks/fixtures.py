@@ -0,0 +1,128 @@
+"""
+Deterministic synthetic inputs for the benchmark suite.
+Everything here is generated locally: no network, no credentials.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from etrade_client.standin.fixtures import SyntheticBrokerage
+
+
+def _random_walk(bars, start=100.0, seed=5):
+    rng = np.random.default_rng(seed)
+    return start * np.exp(np.cumsum(rng.normal(0.0, 0.01, bars)))
+
+
+def portfolio_payload(num_positions, seed=3):
+    """
+    returns:
+        (positionsRaw dict, Totals dict, Computed balance dict) shaped like AccountsManager's output
+    """
+    brokerage = SyntheticBrokerage(1, num_positions, churn=0.0, seed=seed)
+    key = brokerage.accounts[0].account_key
+    response = brokerage.portfolio(key, 1, max(1, num_positions))['PortfolioResponse']
+    positions = {i: p for i, p in enumerate(response['AccountPortfolio'][0]['Position'])}
+    balances = brokerage.balance(key)['BalanceResponse']['Computed']
+    return positions, response['Totals'], balances
+
+
+def brokerage(num_accounts, positions_per_account, seed=3):
+    return SyntheticBrokerage(num_accounts, positions_per_account, churn=0.0, seed=seed)
+
+
+def yf_download_frame(bars, symbol="QQQ", seed=5):
+    """
+    purpose: frame in the layout yf.download returns for one symbol (Price x Ticker column levels)
+    """
+    close = _random_walk(bars, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    spread = np.abs(rng.normal(0.0, 0.005, bars)) * close
+    index = pd.date_range(end="2025-01-03 16:00", periods=bars, freq="min", name="Datetime")
+    columns = pd.MultiIndex.from_product([['Close', 'High', 'Low', 'Open', 'Volume'], [symbol]],
+                                         names=['Price', 'Ticker'])
+    values = np.column_stack([close, close + spread, close - spread, close,
+                              rng.integers(1_000, 1_000_000, bars).astype(float)])
+    frame = pd.DataFrame(values, index=index, columns=columns)
+    # yfinance leaves the odd gap; make sure the dropna path does real work
+    if bars > 10:
+        frame.iloc[::97, 0] = np.nan
+    return frame
+
+
+def closes_frame(bars, seed=5):
+    index = pd.date_range(end="2025-01-03 16:00", periods=bars, freq="min", name="Datetime")
+    return pd.DataFrame({'Close': _random_walk(bars, seed=seed)}, index=index)
+
+
+def daily_closes(num_symbols, bars, benchmarks=('SPY', 'QQQ'), seed=11):
+    """
+    purpose: wide frame of daily closes as YFinanceDataManager.get_price_history returns it
+    """
+    rng = np.random.default_rng(seed)
+    columns = [f"SYM{i}" for i in range(num_symbols)] + list(benchmarks)
+    index = pd.bdate_range(end="2025-01-03", periods=bars)
+    values = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.015, (bars, len(columns))), axis=0))
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def daily_volumes(closes, seed=12):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(rng.integers(100_000, 5_000_000, closes.shape).astype(float),
+                        index=closes.index, columns=closes.columns)
+
+
+def fred_series(bars, seed=9):
+    index = pd.date_range(end="2025-01-01", periods=bars, freq="D")
+    return pd.Series(_random_walk(bars, start=4.0, seed=seed), index=index)
+
+
+def mini_chart_values(bars, seed=9):
+    return _random_walk(bars, start=4.0, seed=seed).tolist()
+
+
+def option_chain_pairs(contracts, symbol="NVDA", seed=3):
+    """
+    returns:
+        (spot, [(expiry date, OptionPair list)]) as OptionChain.from_option_pairs takes them,
+        about contracts contracts over weekly expirations
+    """
+    brokerage = SyntheticBrokerage(1, 1, churn=0.0, seed=seed)
+    first = date.today() + timedelta(days=7)
+    chains, total = [], 0
+    while total < contracts:
+        expiry = first + timedelta(weeks=len(chains))
+        response = brokerage.option_chain(symbol, expiry, (contracts - total) // 2)
+        chains.append((expiry, response['OptionChainResponse']['OptionPair']))
+        total += 2 * len(chains[-1][1])
+    return brokerage.quotes[symbol].last, chains
+
+
+def symbol_directory(num_symbols, seed=13):
+    """
+    returns:
+        (nasdaqlisted.txt, otherlisted.txt) texts listing about num_symbols made-up symbols
+        between them, NVDA, AAPL and BRK.B among them
+    """
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    words = ["Global", "Energy", "Holdings", "Technologies", "Bancorp", "Trust", "Fund", "Capital", "Pharma",
+             "Realty", "Systems", "Industries", "Common", "Stock", "Class", "ETF"]
+    tickers = {"".join(rng.choice(letters, rng.integers(1, 6))) for _ in range(num_symbols)}
+    tickers -= {"NVDA", "AAPL", "BRK.B"}
+    nasdaq = ["Symbol|Security Name|Market Category|Test Issue|Financial Status|Round Lot Size|ETF|NextShares",
+              "NVDA|NVIDIA Corporation - Common Stock|Q|N|N|100|N|N",
+              "AAPL|Apple Inc. - Common Stock|Q|N|N|100|N|N"]
+    other = ["ACT Symbol|Security Name|Exchange|CQS Symbol|ETF|Round Lot Size|Test Issue|NASDAQ Symbol",
+             "BRK.B|Berkshire Hathaway Inc. Class B|N|BRK.B|N|100|N|BRK.B"]
+    for i, ticker in enumerate(sorted(tickers)):
+        name = " ".join(rng.choice(words, 3))
+        etf = "Y" if i % 7 == 0 else "N"
+        if i % 2:
+            nasdaq.append(f"{ticker}|{name}|Q|N|N|100|{etf}|N")
+        else:
+            other.append(f"{ticker}|{name}|N|{ticker}|{etf}|100|N|{ticker}")
+    footer = "File Creation Time: 1019202608:00|||||||"
+    return "\n".join(nasdaq + [footer]), "\n".join(other + [footer])
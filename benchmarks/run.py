@@ -0,0 +1,625 @@
+"""
+Benchmark suite for the data-to-pixels pipeline: every hot path we hit on a
+poll or a chart refresh, across input sizes, headless and offline.
+
+Results are saved per commit under benchmarks/results/ and compared against the
+previous run so regressions show up between commits.
+
+usage (from the repo root):
+    python -m benchmarks.run
+    python -m benchmarks.run --quick
+    python -m benchmarks.run --only positions_df portfolio_table --baseline benchmarks/results/abc1234.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import types
+from datetime import date, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "ui")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+try:
+    import config
+except ImportError:
+    # nothing here talks to E*TRADE; fetch_balances only needs a consumer key for its header
+    config = types.ModuleType("config")
+    config.CONSUMER_KEY = "benchmark"
+    sys.modules["config"] = config
+
+from PyQt6.QtWidgets import QApplication
+
+from benchmarks import fixtures
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+POSITION_SIZES = [10, 100, 1000, 10000]
+BAR_SIZES = [1, 100, 1000, 10000, 50000]
+ACCOUNT_SIZES = [1, 20, 50]
+HOLDING_SIZES = [10, 100, 500, 1000]
+WATCHLIST_SIZES = [100, 1000, 3000]
+OVERLAY_SIZES = [2, 8, 32]
+CONTRACT_SIZES = [500, 5000, 20000]
+DAY_SIZES = [30, 365, 1825]
+UNIVERSE_SIZES = [1000, 12000, 50000]
+QUICK_LIMIT = {'positions': 1000, 'bars': 10000, 'accounts': 20, 'holdings': 500, 'watchlist': 1000, 'contracts': 5000,
+               'days': 365, 'universe': 12000}
+REGRESSION_RATIO = 1.25
+
+
+class FixtureParent:
+    """stands in for AccountsManager when constructing an Account directly"""
+
+    def __init__(self, positions, totals, balances):
+        self.positions, self.totals, self.balances = positions, totals, balances
+
+    def fetch_portfolio(self, accountIdKey):
+        return self.positions, self.totals
+
+    def fetch_balances(self, accountIdKey, institutionType):
+        return self.balances
+
+
+def _account(num_positions):
+    from etrade_client.accountsmanager import Account
+    positions, totals, balances = fixtures.portfolio_payload(num_positions)
+    info = {'accountIdKey': 'BENCH', 'institutionType': 'BROKERAGE'}
+    return Account(info, parent=FixtureParent(positions, totals, balances))
+
+
+_view = None
+
+
+def _etrade_view():
+    global _view
+    if _view is None:
+        from etrade_client.standin.loadtest import build_offscreen_etrade_view
+        from etrade_client.standin.session import StandInSession
+        session = StandInSession(fixtures.brokerage(1, 10))
+        _view = build_offscreen_etrade_view(session, "http://standin.local")
+    return _view[1]
+
+
+# ---- cases: setup(size) returns the zero-argument callable that gets timed ----
+
+def setup_positions_df(size):
+    return _account(size)._build_positions_df
+
+
+def setup_totals_balances_df(size):
+    account = _account(10)
+
+    def run():
+        account._build_accounttotals_df()
+        account._build_balances_df()
+    return run
+
+
+def setup_pnl_recompute(size):
+    from etrade_client.pnl import PnLEngine
+    account = _account(size)
+    engine = PnLEngine(account.positions, account.accounttotals)
+    # alternate between two price sets so every call really changes prices
+    bumps = [{s: p * 1.001 for s, p in zip(engine.quote_symbols, engine.prices)},
+             {s: p * 0.999 for s, p in zip(engine.quote_symbols, engine.prices)}]
+    calls = [0]
+
+    def run():
+        calls[0] += 1
+        engine.apply_quotes(bumps[calls[0] % 2])
+    return run
+
+
+def setup_risk_update(size):
+    from analytics.risk import RiskEngine
+    closes = fixtures.daily_closes(size, 300)
+    engine = RiskEngine(lookback=252)
+    engine.set_exposures({s: 10_000.0 for s in closes.columns[:size]})
+    engine.update(closes)
+    # the worker's steady state: today's bar revised, then a fresh report
+    revised = [closes.copy(), closes.copy()]
+    revised[1].iloc[-1] *= 1.001
+    calls = [0]
+
+    def run():
+        calls[0] += 1
+        engine.update(revised[calls[0] % 2])
+        engine.report()
+    return run
+
+
+def setup_scan_watchlist(size):
+    from analytics.scanner import Screen, PRESET_SCREENS, scan
+    closes = fixtures.daily_closes(size, 500, benchmarks=())
+    volumes = fixtures.daily_volumes(closes)
+    screen = Screen(" or ".join(f"({text})" for text in PRESET_SCREENS.values()))
+    # history comes from memory here; this measures the screen passes and batching, not yfinance
+    fetch = lambda batch: (closes[batch], volumes[batch])
+    return lambda: [result for result, _ in scan(list(closes.columns), fetch, screen, batch_size=50)]
+
+
+class FixtureHistory:
+    """stands in for YFinanceDataManager with everything already in its cache"""
+
+    def __init__(self, closes):
+        self.closes, self.volumes = closes, fixtures.daily_volumes(closes)
+
+    def get_price_history(self, symbols, period="1y", interval="1d", max_age=900.0, field="Close"):
+        return (self.closes if field == "Close" else self.volumes)[list(symbols)]
+
+    def get_eps_history(self, symbols, max_age=86400.0):
+        return {}
+
+
+def setup_compare_refine(size):
+    from analytics.compare import CompareEngine
+    closes = fixtures.daily_closes(size, 1000, benchmarks=())
+    engine = CompareEngine(FixtureHistory(closes))
+    today = closes.index[-1]
+    symbols = " ".join(closes.columns)
+    # refining the range misses the result cache but none of the data caches
+    commands = [f"CMP {symbols} PRICE RETURN -RANGE {r}" for r in ("2Y", "18M")]
+    calls = [0]
+
+    def run():
+        calls[0] += 1
+        engine._results.clear()
+        engine.run(commands[calls[0] % 2], today)
+    return run
+
+
+def setup_overlay_align(size):
+    import numpy as np
+    from analytics.alignment import align_columns, rebase
+    closes = fixtures.daily_closes(size, 5000, benchmarks=())
+    times = closes.index.as_unit('ns').asi8
+    # every third symbol skips some sessions, like a fund listed on an exchange with other holidays
+    holidays = np.arange(len(times)) % 40 != 7
+    columns = [(times[holidays], closes[s].to_numpy()[holidays]) if i % 3 == 2 else (times, closes[s].to_numpy())
+               for i, s in enumerate(closes.columns)]
+
+    def run():
+        _, values = align_columns([t for t, _ in columns], [v for _, v in columns])
+        rebase(values[-1250:])
+    return run
+
+
+def setup_option_chain(size):
+    from etrade_client.options import OptionChain
+    spot, chains = fixtures.option_chain_pairs(size)
+    # parse the api pairs into the columnar chain, then iv and greeks over all of it
+    return lambda: OptionChain.from_option_pairs("NVDA", spot, chains).compute_greeks(rate=0.04)
+
+
+def setup_order_stage(size):
+    from etrade_client.order import Order, OrderTicket
+    account = _account(size)
+    order = Order(None, "http://standin.local", account)
+    symbol = account.positions['symbol'].iloc[-1]
+    # one form edit: checks against the cached positions and balances, then the preview body
+    tickets = [OrderTicket(symbol, 'SELL', 1, 'LIMIT', limit_price=10.0),
+               OrderTicket(symbol, 'BUY', 5, 'LIMIT', limit_price=10.5)]
+    calls = [0]
+
+    def run():
+        calls[0] += 1
+        order.stage(tickets[calls[0] % 2])
+    return run
+
+
+def setup_order_preview_place(size):
+    from etrade_client.order import Order, OrderTicket
+    from etrade_client.standin.session import StandInSession
+    from etrade_client.accountsmanager import AccountsManager
+    session = StandInSession(fixtures.brokerage(1, 10))
+    account = AccountsManager(session, "").accounts_list[0]
+    order = Order(session, "", account)
+    ticket = OrderTicket(account.positions['symbol'].iloc[0], 'SELL', 1, 'LIMIT', limit_price=10.0)
+
+    def run():
+        order.stage(ticket)
+        order.preview()
+        order.place()
+    return run
+
+
+def setup_transactions_query(size):
+    from etrade_client.transactions import TransactionStore
+    brokerage = fixtures.brokerage(1, size)
+    account = brokerage.accounts[0]
+    store = TransactionStore(':memory:')
+    store.append(account.account_key, brokerage._history(account))
+    symbols = [p.symbol for p in account.positions[:25]]
+    end = date.today()
+    start = end - timedelta(days=91)
+    calls = [0]
+
+    # what an activity or realized-gain view asks: one symbol's trades, then a quarter of everything
+    def run():
+        calls[0] += 1
+        store.query(account.account_key, symbol=symbols[calls[0] % len(symbols)], types=['Bought', 'Sold'])
+        store.query(account.account_key, start=start, end=end)
+    return run
+
+
+def setup_lots_what_if(size):
+    from analytics.taxlots import LotBook
+    from etrade_client.accountsmanager import AccountsManager
+    from etrade_client.standin.session import StandInSession
+    brokerage = fixtures.SyntheticBrokerage(1, size, churn=0.0)
+    account = AccountsManager(StandInSession(brokerage), '').accounts_list[0]
+    equities = account.positions[account.positions.securityType == 'EQ']
+    account.get_lots(equities.positionId.tolist())
+    book = LotBook.from_account(account)
+    symbols = equities.symbol.tolist()
+    calls = [0]
+
+    # what the order entry form asks on every edit of a SELL ticket
+    def run():
+        calls[0] += 1
+        book.what_if_methods(symbols[calls[0] % len(symbols)], calls[0] % 50 + 1)
+    return run
+
+
+def setup_alerts_update(size):
+    import numpy as np
+    import pandas as pd
+    from analytics.alerts import AlertEngine
+    # size = positions with two rules each; every tick moves a tenth of the prices
+    symbols = [f"S{i:05d}" for i in range(size)]
+    engine = AlertEngine()
+    for i, symbol in enumerate(symbols):
+        engine.add(f"{symbol} daysGainPct < {-(i % 7) - 1}")
+        engine.add(f"{symbol} lastTrade > {100 + i % 50}")
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({'daysGainPct': rng.normal(0, 3, size), 'lastTrade': rng.normal(100, 20, size)},
+                         index=symbols)
+    engine.update(frame)
+    calls = [0]
+
+    def run():
+        calls[0] += 1
+        moved = frame.iloc[calls[0] % 10::10].copy()
+        moved['lastTrade'] += rng.normal(0, 1, len(moved))
+        engine.update(moved)
+    return run
+
+
+def setup_equity_curve_read(size):
+    import tempfile
+    import numpy as np
+    from etrade_client.equity_curve import EquityCurveStore, downsample_minmax
+    # size = days of history, recorded every minute of the session then compacted
+    path = os.path.join(tempfile.mkdtemp(), 'equity_curve.bin')
+    store = EquityCurveStore(path)
+    now = int(time.time() * 1000)
+    rng = np.random.default_rng(0)
+    for day in range(size, -1, -1):
+        opened = now - day * 86400 * 1000
+        for minute in range(390):
+            value = 100000.0 * (1.0 + rng.normal(0.0, 0.001))
+            store.record({'A': (value, 1000.0, 0.0), 'B': (value / 2, 500.0, 0.0)}, opened + minute * 60000)
+    store.compact(now)
+
+    # what the equity curve panel does for the whole range
+    def run():
+        downsample_minmax(store.read(), 'net_value', 1000)
+    return run
+
+
+def setup_symbol_complete(size):
+    from data_providers.symbol_index import SymbolIndex, parse_directory
+    # size = symbols in the universe
+    index = SymbolIndex(path=os.devnull)
+    index.set_records(parse_directory(*fixtures.symbol_directory(size)))
+    # keystrokes of a ticker, a name, a typo and a share class
+    queries = ['N', 'NV', 'NVD', 'NVDA', 'app', 'appl', 'NVDIA', 'brk.b']
+
+    def run():
+        for query in queries:
+            index.complete(query, 8)
+    return run
+
+
+def setup_portfolio_table(size):
+    view = _etrade_view()
+    account = view.accounts_manager.accounts_list[view.current_account_index]
+    positions, totals, _ = fixtures.portfolio_payload(size)
+    account.positionsRaw, account.accounttotalsRaw = positions, totals
+    account._build_positions_df()
+    account._build_accounttotals_df()
+    return view.populate_portfolio_table
+
+
+def setup_holdings_sparklines(size):
+    import numpy as np
+    from PyQt6.QtWidgets import QTableWidget, QTableWidgetItem
+    from ui.widgets.sparkline import SparklineDelegate, SYMBOL_ROLE
+    # size = held symbols, 30 closes each, in a table of the dashboard's size
+    table = QTableWidget(size, 2)
+    table.resize(1200, 800)
+    delegate = SparklineDelegate(table)
+    table.setItemDelegateForColumn(1, delegate)
+    symbols = [f"S{i}" for i in range(size)]
+    for i, symbol in enumerate(symbols):
+        item = QTableWidgetItem()
+        item.setData(SYMBOL_ROLE, symbol)
+        table.setItem(i, 1, item)
+    rng = np.random.default_rng(0)
+    closes = [{s: 100.0 + np.cumsum(rng.normal(size=30)) for s in symbols} for _ in range(2)]
+    state = {'n': 0}
+
+    # a sparkline fetch that changed every line, then the repaint
+    def run():
+        state['n'] += 1
+        delegate.set_values(closes[state['n'] % 2])
+        table.grab()
+    return run
+
+
+def setup_accounttables_footer(size):
+    view = _etrade_view()
+    manager = view.accounts_manager
+    account = manager.accounts_list[view.current_account_index]
+    manager.accounts_list = [account] * size
+    view.current_account_index = 0
+    return view.populate_accounttables_footer
+
+
+def setup_fred_process_data(size):
+    from FRED.FREDDataManager import FREDDataManager
+    manager = FREDDataManager(load=False)
+    series = fixtures.fred_series(size)
+    return lambda: manager.process_data(series, 'Benchmark')
+
+
+def setup_minichart_paint(size):
+    from ui.dashboard_view import MiniChart
+    chart = MiniChart(fixtures.mini_chart_values(size))
+    return chart.grab
+
+
+def setup_yfinance_postprocess(size):
+    from YFinance.YFinanceDataManager import YFinanceDataManager
+    from data_providers.fixture_provider import FixtureProvider
+    manager = YFinanceDataManager(provider=FixtureProvider())
+    frame = fixtures.yf_download_frame(size)
+    return lambda: manager._process_symbol_data(frame)
+
+
+def setup_history_refresh(size):
+    from datetime import datetime
+    from YFinance.YFinanceDataManager import YFinanceDataManager
+    from data_providers.fixture_provider import FixtureProvider
+    from data_providers.market_data import MarketDataProvider
+    # mid-session, so the top-up revises the last bar as a live poll does
+    fixture = FixtureProvider(now=datetime(2024, 6, 12, 14, 5))
+    symbols = [f"H{i:04d}" for i in range(size)]
+    recorded = {period: fixture.batch_history(symbols, period, "1d") for period in ("1y", "5d")}
+
+    class Recorded(MarketDataProvider):
+        # replays the fixture's bars, so this measures the manager's caching and not bar generation
+        def history(self, symbol, period, interval):
+            return recorded[period].get(symbol)
+
+    manager = YFinanceDataManager(provider=Recorded())
+    manager.get_history_columns(symbols, "1y", "1d")
+    # every symbol is past max_age: fetch its last 5 days and merge them into the cached year
+    return lambda: manager.get_history_columns(symbols, "1y", "1d", max_age=0.0)
+
+
+def setup_fixture_history(size):
+    from datetime import datetime
+    from data_providers.fixture_provider import FixtureProvider
+    provider = FixtureProvider(now=datetime(2024, 6, 12, 14, 5))
+    symbols = [f"F{i:04d}" for i in range(size)]
+
+    def run():
+        # no walk cached: every symbol is generated from ORIGIN
+        provider._walks.clear()
+        provider.batch_history(symbols, "1y", "1d")
+    return run
+
+
+def setup_indicators_full(size):
+    from analytics.indicators import IndicatorCache, DEFAULT_OVERLAYS
+    frame = fixtures.yf_download_frame(size).droplevel('Ticker', axis=1)[['Close', 'Volume']].dropna()
+    return lambda: IndicatorCache().overlays("QQQ", "1m", frame, DEFAULT_OVERLAYS)
+
+
+def setup_indicators_refresh(size):
+    from analytics.indicators import IndicatorCache, DEFAULT_OVERLAYS
+    frame = fixtures.yf_download_frame(size + 1).droplevel('Ticker', axis=1)[['Close', 'Volume']].dropna()
+    cache = IndicatorCache()
+    cache.overlays("QQQ", "1m", frame.iloc[:-1], DEFAULT_OVERLAYS)
+    # a live refresh: the window slides one bar and the new last bar is still forming
+    refreshed = [frame.iloc[1:].copy(), frame.iloc[1:].copy()]
+    refreshed[1].iloc[-1, 0] *= 1.001
+    calls = [0]
+
+    def run():
+        calls[0] += 1
+        cache.overlays("QQQ", "1m", refreshed[calls[0] % 2], DEFAULT_OVERLAYS)
+    return run
+
+
+def setup_chart_html(size):
+    from ui.dashboard_view import ChartView
+    closes = fixtures.closes_frame(size)
+    title = "QQQ |  Open:500.00  High:505.00  Low:495.00  CAP:N/A  52L:400.00  52H:540.00"
+    return lambda: ChartView.build_chart_html(closes, title)
+
+
+CASES = [
+    # name, size kind, setup
+    ('positions_df', 'positions', setup_positions_df),
+    ('totals_balances_df', None, setup_totals_balances_df),
+    ('pnl_recompute', 'positions', setup_pnl_recompute),
+    ('risk_update', 'holdings', setup_risk_update),
+    ('scan_watchlist', 'watchlist', setup_scan_watchlist),
+    ('compare_refine', 'holdings', setup_compare_refine),
+    ('overlay_align', 'overlay', setup_overlay_align),
+    ('option_chain', 'contracts', setup_option_chain),
+    ('order_stage', 'positions', setup_order_stage),
+    ('order_preview_place', None, setup_order_preview_place),
+    ('transactions_query', 'positions', setup_transactions_query),
+    ('lots_what_if', 'positions', setup_lots_what_if),
+    ('equity_curve_read', 'days', setup_equity_curve_read),
+    ('alerts_update', 'positions', setup_alerts_update),
+    ('symbol_complete', 'universe', setup_symbol_complete),
+    ('portfolio_table', 'positions', setup_portfolio_table),
+    ('holdings_sparklines', 'positions', setup_holdings_sparklines),
+    ('accounttables_footer', 'accounts', setup_accounttables_footer),
+    ('fred_process_data', 'bars', setup_fred_process_data),
+    ('minichart_paint', 'bars', setup_minichart_paint),
+    ('yfinance_postprocess', 'bars', setup_yfinance_postprocess),
+    ('history_refresh', 'holdings', setup_history_refresh),
+    ('fixture_history', 'holdings', setup_fixture_history),
+    ('indicators_full', 'bars', setup_indicators_full),
+    ('indicators_refresh', 'bars', setup_indicators_refresh),
+    ('chart_html', 'bars', setup_chart_html),
+]
+SIZES = {'positions': POSITION_SIZES, 'bars': BAR_SIZES, 'accounts': ACCOUNT_SIZES, 'holdings': HOLDING_SIZES,
+         'watchlist': WATCHLIST_SIZES, 'overlay': OVERLAY_SIZES,
+         'contracts': CONTRACT_SIZES, 'days': DAY_SIZES, 'universe': UNIVERSE_SIZES, None: [1]}
+
+
+def measure(fn, min_time=0.3, max_repeats=50):
+    """
+    returns:
+        list of per-call seconds, after one untimed warm-up call
+    """
+    started = time.perf_counter()
+    fn()
+    warmup = time.perf_counter() - started
+    min_repeats = 3 if warmup < 1.0 else 1
+
+    times = []
+    while len(times) < min_repeats or (sum(times) < min_time and len(times) < max_repeats):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(only=None, quick=False):
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = []
+    for name, kind, setup in CASES:
+        if only and name not in only:
+            continue
+        for size in SIZES[kind]:
+            if quick and kind in QUICK_LIMIT and size > QUICK_LIMIT[kind]:
+                continue
+            try:
+                times = measure(setup(size))
+            except Exception as e:
+                print(f"  {name:<22} {size:>7}  ERROR {e}")
+                results.append({'case': name, 'size': size, 'error': str(e)})
+                continue
+            row = {
+                'case': name,
+                'size': size,
+                'repeats': len(times),
+                'min_ms': min(times) * 1000.0,
+                'median_ms': statistics.median(times) * 1000.0,
+                'mean_ms': statistics.fmean(times) * 1000.0,
+            }
+            results.append(row)
+            print(f"  {name:<22} {size:>7}  median {row['median_ms']:10.3f} ms  "
+                  f"min {row['min_ms']:10.3f} ms  (n={row['repeats']})")
+            app.processEvents()
+    return results
+
+
+def latest_baseline(exclude):
+    candidates = [p for p in glob.glob(os.path.join(RESULTS_DIR, "*.json"))
+                  if os.path.abspath(p) != os.path.abspath(exclude)]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(r['case'], r['size']): r for r in baseline['results'] if 'median_ms' in r}
+    regressions = 0
+    print(f"\ncompared with {baseline['revision']} ({os.path.basename(baseline_path)}):")
+    for row in current['results']:
+        before = previous.get((row['case'], row['size']))
+        if before is None or 'median_ms' not in row or before['median_ms'] <= 0:
+            continue
+        ratio = row['median_ms'] / before['median_ms']
+        flag = ""
+        if ratio >= REGRESSION_RATIO:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio <= 1.0 / REGRESSION_RATIO:
+            flag = "  faster"
+        print(f"  {row['case']:<22} {row['size']:>7}  {before['median_ms']:10.3f} -> "
+              f"{row['median_ms']:10.3f} ms  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the data-to-pixels pipeline")
+    parser.add_argument('--only', nargs='*', help="case names to run")
+    parser.add_argument('--quick', action='store_true', help="skip the largest sizes")
+    parser.add_argument('--output', help="result file (default benchmarks/results/<commit>.json)")
+    parser.add_argument('--baseline', help="result file to compare against (default: most recent other run)")
+    parser.add_argument('--list', action='store_true', help="list cases and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, kind, _ in CASES:
+            print(f"{name:<22} sizes {SIZES[kind]}")
+        return
+
+    revision = git_revision()
+    print(f"benchmarks @ {revision}, python {platform.python_version()}, {platform.platform()}")
+    results = run_suite(args.only, args.quick)
+
+    report = {
+        'revision': revision,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'quick': args.quick,
+        'results': results,
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(RESULTS_DIR, f"{revision}.json")
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nsaved {output}")
+
+    baseline = args.baseline or latest_baseline(output)
+    if baseline:
+        regressions = compare(report, baseline)
+        if regressions:
+            print(f"\n{regressions} regression(s) over x{REGRESSION_RATIO}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
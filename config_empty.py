@@ -3,3 +3,110 @@ CONSUMER_KEY = #CONSUMER_KEY
 CONSUMER_SECRET = #CONSUMER_SECRET
 SANDBOX_BASE_URL = #SANDBOX_BASE_URL
 PROD_BASE_URL = #PROD_BASE_URK
+
+#optional: UI stall watchdog (see utils/stall_detector.py)
+STALL_DETECTOR_ENABLED = False
+STALL_THRESHOLD_MS = 200
+
+#optional: record hot-path metrics from startup (see utils/metrics.py)
+METRICS_ENABLED = False
+
+#optional: warm-start snapshot of the last dashboard state (see utils/snapshot.py)
+#note: the snapshot file holds account positions and balances unencrypted, so it is off unless turned on
+SNAPSHOT_ENABLED = False
+SNAPSHOT_PATH = "dashboard_snapshot.json.gz"
+SNAPSHOT_INTERVAL_S = 60
+SNAPSHOT_MAX_BYTES = 2 * 1024 * 1024
+
+#optional: E*TRADE polling - 'adaptive' follows market hours and tightens on movement, 'fixed' polls every 10s
+POLL_POLICY = 'adaptive'
+#seconds per market phase for the adaptive policy (pre_market, regular, after_hours, closed)
+POLL_INTERVALS = {'pre_market': 30, 'regular': 10, 'after_hours': 30, 'closed': 300}
+
+#optional: E*TRADE request rate limits per endpoint class, requests/second and burst (see etrade_client/governor.py);
+#with the data service on, it polls with DATA_SERVICE_RATE_SHARE of the accounts and market rates and the
+#gui (orders, quotes, lots, transaction sync) keeps the rest, so together they stay within these
+RATE_LIMITS = {'accounts': (2.0, 4), 'market': (4.0, 8), 'order': (2.0, 2)}
+
+#optional: recompute P&L locally from quotes between portfolio polls (see etrade_client/pnl.py);
+#the portfolio poll then only reconciles, on RECONCILE_POLL_INTERVALS
+PNL_FROM_QUOTES = True
+QUOTE_POLL_INTERVALS = {'pre_market': 10, 'regular': 3, 'after_hours': 10, 'closed': 600}
+RECONCILE_POLL_INTERVALS = {'pre_market': 120, 'regular': 60, 'after_hours': 120, 'closed': 600}
+
+#optional: risk panel (see analytics/risk.py) - daily returns in the window, VaR/CVaR confidence,
+#beta benchmarks and seconds between recomputes
+RISK_LOOKBACK = 252
+RISK_CONFIDENCE = 0.95
+RISK_BENCHMARKS = ['SPY', 'QQQ']
+RISK_REFRESH_S = 60
+
+#optional: indicator overlays offered in each chart pane's menu (see analytics/indicators.py)
+CHART_OVERLAYS = ['SMA(20)', 'SMA(50)', 'SMA(200)', 'EMA(20)', 'BB(20,2)', 'VWAP', 'RSI(14)', 'MACD(12,26,9)']
+
+#optional: research tab scanner (see analytics/scanner.py) - history period and default watchlist
+SCANNER_PERIOD = "2y"
+SCANNER_WATCHLIST = ['SPY', 'QQQ', 'AAPL', 'MSFT', 'NVDA', 'AMZN', 'GOOGL', 'META']
+
+#optional: seconds between automatic chart pane refreshes by bar interval; panes on the same
+#symbol and timeframe share one refresh (see data_providers/subscription_hub.py)
+CHART_REFRESH_S = {'1m': 60, '5m': 120, '1h': 600, '1d': 3600, '1wk': 3600}
+
+#optional: run yfinance, FRED and E*TRADE fetching and parsing in a separate process that hands
+#results back through shared memory (see data_providers/data_service.py)
+DATA_SERVICE_ENABLED = False
+#fraction of RATE_LIMITS for the service's E*TRADE polling, the gui keeps the rest
+DATA_SERVICE_RATE_SHARE = 0.5
+
+#optional: how E*TRADE poll results reach the gui - 'latest' hands a busy gui only the newest
+#payload per poller (dropped/merged counts and consumer lag under poll/ in the metrics), 'queued' every one
+POLL_DELIVERY = 'latest'
+
+#optional: risk-free rate (continuous, annual) for option implied volatility and greeks (see etrade_client/options.py)
+OPTIONS_RISK_FREE_RATE = 0.04
+
+#optional: reject any order whose estimated value is above this many dollars before it is
+#previewed (see etrade_client/order.py); None turns the check off
+ORDER_MAX_NOTIONAL = None
+
+#optional: keep a local, indexed copy of account transactions (see etrade_client/transactions.py) -
+#SQLite file, and seconds between background syncs (0 = no background sync)
+TRANSACTIONS_DB_PATH = "transactions.sqlite3"
+TRANSACTIONS_SYNC_S = 3600
+
+#optional: marginal tax rates on short- and long-term gains, for the sell what-if in the order
+#entry form and realized-gain estimates (see analytics/taxlots.py)
+TAX_RATES = {'short': 0.37, 'long': 0.20}
+
+#optional: trading days of closes drawn in the holdings table's sparkline column, 0 for no column
+HOLDINGS_SPARKLINE_DAYS = 30
+
+#optional: record every account's value to a local file for the Equity Curve panel
+#(see etrade_client/equity_curve.py) - on/off, file, and seconds between records of one account
+#note: the file holds account values unencrypted, so it is off unless turned on
+EQUITY_CURVE_ENABLED = False
+EQUITY_CURVE_PATH = "equity_curve.bin"
+EQUITY_CURVE_INTERVAL_S = 60
+
+#optional: alert rules, checked on every positions/quotes/FRED update (see analytics/alerts.py) -
+#on/off, the starting rules (the Alerts panel saves its own list to ALERT_RULES_PATH), and
+#seconds before a rule that went off may go off again
+ALERTS_ENABLED = True
+ALERT_RULES = ["SPY changePct < -2", "HYG close below sma(50)", "UNRATE change > 0.2"]
+ALERT_RULES_PATH = "alert_rules.json"
+ALERT_COOLDOWN_S = 900
+
+#optional: local symbol universe for ticker completion and for catching typos before a request
+#(see data_providers/symbol_index.py) - on/off, cache file, days before it is downloaded again,
+#and symbols to accept that the exchange listings don't have
+SYMBOL_INDEX_ENABLED = True
+SYMBOL_INDEX_PATH = "symbols.csv.gz"
+SYMBOL_INDEX_MAX_AGE_DAYS = 7
+SYMBOL_INDEX_EXTRA = []
+
+#optional: where charts and analytics get market data (see data_providers/market_data.py) -
+#'yahoo', 'fixture' (generated offline bars, the same for the same seed), or a list of them,
+#asked in order ('failover') or all at once, first answer wins ('race')
+MARKET_DATA_PROVIDER = 'yahoo'
+MARKET_DATA_MODE = 'failover'
+MARKET_DATA_FIXTURE_SEED = 0
@@ -0,0 +1,213 @@
+"""
+Columnar encoding of data service results for shared memory.
+
+encode() walks a result (DataFrames, Series, numpy arrays and the dicts,
+lists and tuples holding them) and lays every numeric column out in one
+shared memory block; what is left - labels, small dicts, strings - is a
+pickled skeleton that points into the block. Categorical columns go in as their
+integer codes, with the categories in the skeleton; other pandas extension
+arrays (nullable integers, string and period arrays) are pickled into the
+skeleton whole, so every column keeps its dtype. Only the block's name and the
+skeleton travel over the pipe; a skeleton bigger than INLINE_BYTES goes into
+the block too, so pipe messages stay small whatever the payload.
+
+decode() copies the columns back out and unlinks the block, so every block
+is read exactly once.
+"""
+
+import pickle
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+#skeletons up to this size travel over the pipe, bigger ones go through the block
+INLINE_BYTES = 16 * 1024
+#column offsets in a block are aligned to this many bytes
+ALIGN = 64
+
+
+class _Column:
+    """
+    purpose: stand-in for a numpy array stored at offset in the block
+    """
+    __slots__ = ('offset', 'dtype', 'shape')
+
+    def __init__(self, offset, dtype, shape):
+        self.offset, self.dtype, self.shape = offset, dtype, shape
+
+
+class _Index:
+    __slots__ = ('values', 'kind', 'tz', 'name')
+
+    def __init__(self, values, kind, tz, name):
+        self.values, self.kind, self.tz, self.name = values, kind, tz, name
+
+
+class _Frame:
+    __slots__ = ('index', 'columns', 'values')
+
+    def __init__(self, index, columns, values):
+        self.index, self.columns, self.values = index, columns, values
+
+
+class _Series:
+    __slots__ = ('index', 'name', 'values')
+
+    def __init__(self, index, name, values):
+        self.index, self.name, self.values = index, name, values
+
+
+class _Categorical:
+    __slots__ = ('codes', 'categories', 'ordered')
+
+    def __init__(self, codes, categories, ordered):
+        self.codes, self.categories, self.ordered = codes, categories, ordered
+
+
+class _Encoder:
+    def __init__(self):
+        self.arrays = []        # (offset, contiguous array)
+        self.size = 0
+
+    def column(self, array):
+        array = np.ascontiguousarray(array)
+        offset = -(-self.size // ALIGN) * ALIGN
+        self.arrays.append((offset, array))
+        self.size = offset + array.nbytes
+        return _Column(offset, array.dtype.str, array.shape)
+
+    def values(self, values):
+        """
+        arguments:
+            values: a column's values, as a Series or numpy array
+        """
+        dtype = values.dtype
+        if isinstance(dtype, pd.DatetimeTZDtype) or dtype.kind == 'M':
+            return self.index(pd.DatetimeIndex(values))
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biufc':
+            return self.column(np.asarray(values))
+        if isinstance(dtype, pd.CategoricalDtype):
+            values = pd.Categorical(values)
+            return _Categorical(self.column(values.codes), dtype.categories, dtype.ordered)
+        if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            # np.asarray would turn these into object columns and lose the dtype
+            return pd.array(values, dtype=dtype)
+        # strings and mixed columns stay in the skeleton
+        return np.asarray(values)
+
+    def index(self, index):
+        if isinstance(index, pd.DatetimeIndex):
+            tz = str(index.tz) if index.tz is not None else None
+            return _Index(self.column(index.as_unit('ns').asi8), 'datetime', tz, index.name)
+        if isinstance(index, pd.RangeIndex):
+            return _Index((index.start, index.stop, index.step), 'range', None, index.name)
+        if not isinstance(index, pd.MultiIndex) and index.dtype.kind in 'biuf':
+            return _Index(self.column(index.to_numpy()), 'numeric', None, index.name)
+        return _Index(index, 'object', None, None)
+
+    def walk(self, obj):
+        if isinstance(obj, pd.DataFrame):
+            values = [self.values(obj.iloc[:, i]) for i in range(obj.shape[1])]
+            return _Frame(self.index(obj.index), obj.columns, values)
+        if isinstance(obj, pd.Series):
+            return _Series(self.index(obj.index), obj.name, self.values(obj))
+        if isinstance(obj, np.ndarray):
+            return self.values(obj)
+        if isinstance(obj, dict):
+            return {key: self.walk(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            items = [self.walk(value) for value in obj]
+            return items if isinstance(obj, list) else tuple(items)
+        return obj
+
+
+def encode(obj):
+    """
+    purpose: lay obj out for decode() in another process
+    returns:
+        (message, block): message is a small picklable tuple to send over the pipe; block is the
+        SharedMemory holding the columns (None when there were none) - close it, don't unlink it,
+        once the message is sent
+    """
+    encoder = _Encoder()
+    skeleton = pickle.dumps(encoder.walk(obj), protocol=pickle.HIGHEST_PROTOCOL)
+    blob = None
+    if len(skeleton) > INLINE_BYTES:
+        blob = (-(-encoder.size // ALIGN) * ALIGN, len(skeleton))
+        encoder.size = blob[0] + blob[1]
+    if not encoder.arrays and blob is None:
+        return (None, skeleton, None), None
+
+    # size 0 happens when every column is empty; shared memory needs at least a byte
+    block = shared_memory.SharedMemory(create=True, size=max(1, encoder.size))
+    for offset, array in encoder.arrays:
+        np.ndarray(array.shape, array.dtype, buffer=block.buf, offset=offset)[...] = array
+    if blob is not None:
+        block.buf[blob[0]:blob[0] + blob[1]] = skeleton
+        skeleton = None
+    return (block.name, skeleton, blob), block
+
+
+class _Decoder:
+    def __init__(self, buf):
+        self.buf = buf
+
+    def column(self, column):
+        return np.ndarray(column.shape, np.dtype(column.dtype), buffer=self.buf, offset=column.offset).copy()
+
+    def values(self, values):
+        if isinstance(values, _Column):
+            return self.column(values)
+        if isinstance(values, _Index):
+            return self.index(values)
+        if isinstance(values, _Categorical):
+            return pd.Categorical.from_codes(self.column(values.codes), values.categories, values.ordered)
+        return values
+
+    def index(self, index):
+        if index.kind == 'datetime':
+            values = pd.DatetimeIndex(self.column(index.values).view('M8[ns]'), name=index.name)
+            return values.tz_localize('UTC').tz_convert(index.tz) if index.tz else values
+        if index.kind == 'range':
+            return pd.RangeIndex(*index.values, name=index.name)
+        if index.kind == 'numeric':
+            return pd.Index(self.column(index.values), name=index.name)
+        return index.values
+
+    def walk(self, obj):
+        if isinstance(obj, _Frame):
+            frame = pd.DataFrame({i: self.values(v) for i, v in enumerate(obj.values)}, index=self.index(obj.index))
+            frame.columns = obj.columns
+            return frame
+        if isinstance(obj, _Series):
+            return pd.Series(self.values(obj.values), index=self.index(obj.index), name=obj.name)
+        if isinstance(obj, (_Column, _Index, _Categorical)):
+            return self.values(obj)
+        if isinstance(obj, dict):
+            return {key: self.walk(value) for key, value in obj.items()}
+        if isinstance(obj, list):
+            return [self.walk(value) for value in obj]
+        if isinstance(obj, tuple):
+            return tuple(self.walk(value) for value in obj)
+        return obj
+
+
+def decode(message):
+    """
+    purpose: rebuild the object encode() laid out, and free its block
+    returns:
+        (obj, bytes read from shared memory)
+    """
+    name, skeleton, blob = message
+    if name is None:
+        return pickle.loads(skeleton), 0
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        if blob is not None:
+            skeleton = bytes(block.buf[blob[0]:blob[0] + blob[1]])
+        obj = _Decoder(block.buf).walk(pickle.loads(skeleton))
+        return obj, block.size
+    finally:
+        block.close()
+        block.unlink()
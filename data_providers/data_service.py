@@ -0,0 +1,360 @@
+"""
+Optional out-of-process data service.
+
+The service is a subprocess that owns the yfinance, FRED and E*TRADE clients
+and their caches, so downloads, JSON parsing and DataFrame builds run there
+instead of competing with rendering for the gui process's GIL. The gui talks
+to it through a DataServiceClient: a call sends (target, method, args) over a
+pipe, the service runs it on a worker thread and answers with the result laid
+out in shared memory (see data_providers/columnar.py) - only the block's name
+and a small skeleton travel back over the pipe.
+
+RemoteManager stands in for a manager: the methods in REMOTE_METHODS run in the
+service, everything else (timeframe_intervals, create_chart_title) is looked up
+on a local instance, so views take it wherever they took the manager.
+
+Turn it on with DATA_SERVICE_ENABLED in config.py. It also runs headless, with
+no dashboard, refreshing a watchlist and printing what comes back:
+
+usage (from the repo root):
+    python -m data_providers.data_service --symbols SPY QQQ NVDA --period 1d
+    python -m data_providers.data_service --symbols SPY TLT --period 1y --fred DGS10 --refresh 30 --seconds 300
+"""
+
+import argparse
+import functools
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from data_providers.columnar import encode, decode
+from etrade_client.governor import current_priority, request_priority
+from utils.metrics import metrics
+
+#what the gui may call on each service target
+REMOTE_METHODS = {
+    'yfinance': ('get_symbol_data', 'get_price_history', 'get_history_columns', 'get_eps_history'),
+    'fred': ('get_series',),
+    'etrade': ('fetch_portfolio', 'fetch_balances'),
+    'market': ('fetch_quotes',),
+    'service': ('ping', 'economic_rows', 'connect_etrade'),
+}
+#calls the service runs at once; slow downloads don't hold up quick ones
+SERVICE_WORKERS = 8
+#seconds a call waits for its answer
+CALL_TIMEOUT_S = 120.0
+
+
+def session_credentials(session):
+    """
+    purpose: what the service needs to open its own E*TRADE session like this one
+    returns:
+        ('oauth1', consumer key, consumer secret, access token, access token secret) for an
+        rauth session, ('plain',) for anything else (e.g. a requests.Session on the stand-in)
+    """
+    while hasattr(session, 'governor') and hasattr(session, 'session'):
+        session = session.session      # GovernedSession
+    if hasattr(session, 'access_token_secret'):
+        return ('oauth1', session.consumer_key, session.consumer_secret,
+                session.access_token, session.access_token_secret)
+    return ('plain',)
+
+
+def session_from_credentials(credentials):
+    if credentials[0] == 'oauth1':
+        from rauth import OAuth1Session
+        return OAuth1Session(credentials[1], credentials[2],
+                             access_token=credentials[3], access_token_secret=credentials[4])
+    import requests
+    return requests.Session()
+
+
+class DataService:
+    """
+    purpose: the managers living in the service process, by target name
+    """
+
+    def __init__(self):
+        from YFinance.YFinanceDataManager import YFinanceDataManager
+        from FRED.FREDDataManager import FREDDataManager
+        self.targets = {
+            'yfinance': YFinanceDataManager(),
+            'fred': FREDDataManager(load=False),
+            'service': self,
+        }
+
+    def ping(self):
+        return True
+
+    def economic_rows(self):
+        """
+        returns:
+            FREDDataManager.EconomicViewRowData for every indicator, freshly fetched
+        """
+        from FRED.FREDDataManager import FREDDataManager
+        return FREDDataManager().EconomicViewRowData
+
+    def connect_etrade(self, credentials, base_url, rate_share=1.0):
+        """
+        purpose: open the service's own E*TRADE session, see session_credentials
+        arguments:
+            rate_share: fraction of the configured RATE_LIMITS the service may use; the gui's
+                        governor runs on the rest, so the two processes together stay within them
+        """
+        from etrade_client.accountsmanager import AccountsManager
+        from etrade_client.governor import GovernedSession, shared_governor
+        from etrade_client.market import Market
+        shared_governor.share(rate_share)
+        session = GovernedSession(session_from_credentials(credentials), shared_governor)
+        self.targets['etrade'] = AccountsManager(session, base_url, load=False)
+        self.targets['market'] = Market(session, base_url)
+        return True
+
+    def run(self, target, method, args, kwargs, priority):
+        if method not in REMOTE_METHODS.get(target, ()):
+            raise AttributeError(f"{target}.{method} is not a data service call")
+        if target not in self.targets:
+            raise RuntimeError(f"{target} is not connected")
+        with request_priority(priority):
+            return getattr(self.targets[target], method)(*args, **kwargs)
+
+
+def _serve(conn):
+    """
+    purpose: service process main loop - requests in, results out through shared memory
+    note: a None request (or the gui's end of the pipe closing) shuts the service down
+    """
+    service = DataService()
+    send_lock = threading.Lock()
+
+    def answer(call_id, target, method, args, kwargs, priority):
+        block = None
+        try:
+            message, block = encode(service.run(target, method, args, kwargs, priority))
+            reply = (call_id, True, message)
+        except Exception as e:
+            reply = (call_id, False, f"{type(e).__name__}: {e}")
+        try:
+            with send_lock:
+                conn.send(reply)
+        finally:
+            if block is not None:
+                # the reader unlinks it once it has copied the columns out
+                block.close()
+
+    with ThreadPoolExecutor(max_workers=SERVICE_WORKERS) as pool:
+        while True:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                break
+            if request is None:
+                break
+            pool.submit(answer, *request)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+class DataServiceClient:
+    """
+    purpose: gui-side handle on the service process
+    note: call() blocks the calling thread, so make calls from PollWorker or other worker
+          threads; they wait on the pipe without holding the GIL
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._process = None
+        self._reader = None
+        self._calls = {}            # call id -> Future
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        #bytes answers brought back through shared memory, and inline over the pipe
+        self.shared_bytes = 0
+        self.inline_bytes = 0
+
+    def start(self):
+        #spawn, not fork: the gui process has Qt and worker threads running
+        context = multiprocessing.get_context('spawn')
+        self._conn, child = context.Pipe()
+        self._process = context.Process(target=_serve, args=(child,), name='varse-data-service', daemon=True)
+        self._process.start()
+        child.close()
+        self._reader = threading.Thread(target=self._read, name='data-service-reader', daemon=True)
+        self._reader.start()
+        return self
+
+    @property
+    def running(self):
+        return self._process is not None and self._process.is_alive()
+
+    def call(self, target, method, *args, timeout=CALL_TIMEOUT_S, **kwargs):
+        """
+        purpose: run target.method(*args, **kwargs) in the service
+        returns:
+            its result, rebuilt in this process
+        raises:
+            RuntimeError if the service failed the call or is not running
+        """
+        future = Future()
+        with self._lock:
+            if not self.running:
+                raise RuntimeError("data service is not running")
+            call_id = next(self._ids)
+            self._calls[call_id] = future
+            self._conn.send((call_id, target, method, args, kwargs, current_priority()))
+        try:
+            with metrics.timer('service', f"{target}.{method}"):
+                return future.result(timeout)
+        finally:
+            with self._lock:
+                self._calls.pop(call_id, None)
+
+    def proxy(self, target, local=None):
+        return RemoteManager(self, target, local)
+
+    def _read(self):
+        while True:
+            try:
+                call_id, ok, message = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = self._calls.pop(call_id, None)
+            if not ok:
+                if future is not None:
+                    future.set_exception(RuntimeError(message))
+                continue
+            # decoded even when nobody waits any more (timed out), to free the block
+            try:
+                result, shared = decode(message)
+            except Exception as e:
+                if future is not None:
+                    future.set_exception(RuntimeError(f"Error reading data service result: {e}"))
+                continue
+            self.shared_bytes += shared
+            self.inline_bytes += len(message[1]) if message[1] is not None else 0
+            if future is not None:
+                future.set_result(result)
+
+        with self._lock:
+            waiting, self._calls = list(self._calls.values()), {}
+        for future in waiting:
+            future.set_exception(RuntimeError("data service stopped"))
+
+    def stop(self, timeout=5.0):
+        if self._process is None:
+            return
+        try:
+            with self._lock:
+                self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout)
+        # the service's end of the pipe is gone now, so the reader sees EOF and exits
+        self._reader.join(timeout)
+        self._conn.close()
+        self._process = None
+
+
+class RemoteManager:
+    """
+    purpose: stand-in for a manager that lives in the data service
+    arguments:
+        client: DataServiceClient
+        target: service target, a key of REMOTE_METHODS
+        local: instance to look anything else up on (helpers and settings, no fetching)
+    """
+
+    def __init__(self, client, target, local=None):
+        self._local = local
+        for method in REMOTE_METHODS[target]:
+            setattr(self, method, functools.partial(client.call, target, method))
+
+    def __getattr__(self, name):
+        local = self.__dict__.get('_local')
+        if local is None:
+            raise AttributeError(name)
+        return getattr(local, name)
+
+
+def data_service_from_config():
+    """
+    purpose: start the data service if config.py turns DATA_SERVICE_ENABLED on
+    returns:
+        running DataServiceClient, or None (off, or it failed to start)
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    if not getattr(config, 'DATA_SERVICE_ENABLED', False):
+        return None
+    try:
+        client = DataServiceClient().start()
+        client.call('service', 'ping', timeout=30.0)
+        return client
+    except Exception as e:
+        print(f"Error starting data service, fetching in process: {e}")
+        return None
+
+
+def run_headless(client, symbols, period, fred_ids, refresh_s, seconds):
+    """
+    purpose: refresh symbols (and FRED series) through the service every refresh_s seconds and
+             print a line per result; runs for seconds, or until interrupted when seconds is 0
+    """
+    yfinance, fred = client.proxy('yfinance'), client.proxy('fred')
+    deadline = time.monotonic() + seconds if seconds else None
+    with ThreadPoolExecutor(max_workers=max(1, min(SERVICE_WORKERS, len(symbols)))) as pool:
+        while True:
+            started = time.perf_counter()
+            shared = client.shared_bytes
+            for symbol, (closes, info) in zip(symbols, pool.map(lambda s: yfinance.get_symbol_data(s, period), symbols)):
+                if closes is None:
+                    print(f"{symbol:<8} no data")
+                    continue
+                print(f"{symbol:<8} {len(closes):>6} bars  last {closes['Close'].iloc[-1]:>10.2f}  at {closes.index[-1]}")
+            if fred_ids:
+                series = fred.get_series(fred_ids, max_age=refresh_s)
+                for series_id in fred_ids:
+                    if series_id in series and not series[series_id].empty:
+                        data = series[series_id]
+                        print(f"{series_id:<8} {len(data):>6} obs   last {data.iloc[-1]:>10.2f}  at {data.index[-1].date()}")
+                    else:
+                        print(f"{series_id:<8} no data")
+            print(f"-- {(time.perf_counter() - started) * 1000.0:.0f} ms, "
+                  f"{(client.shared_bytes - shared) / 1e6:.2f} MB through shared memory")
+
+            wait = refresh_s
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return
+            time.sleep(wait)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the data service without the dashboard")
+    parser.add_argument('--symbols', nargs='+', default=['SPY', 'QQQ'])
+    parser.add_argument('--period', default='1d', help="chart timeframe, e.g. 1d 5d 1mo 1y")
+    parser.add_argument('--fred', nargs='*', default=[], help="FRED series ids to refresh as well")
+    parser.add_argument('--refresh', type=float, default=60.0, help="seconds between passes")
+    parser.add_argument('--seconds', type=float, default=0.0, help="stop after this long (0 runs until Ctrl-C)")
+    args = parser.parse_args()
+
+    client = DataServiceClient().start()
+    try:
+        run_headless(client, [s.upper() for s in args.symbols], args.period, args.fred, args.refresh, args.seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.stop()
+
+
+if __name__ == "__main__":
+    main()
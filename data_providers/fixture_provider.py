@@ -0,0 +1,331 @@
+"""
+Deterministic offline market data: realistic bars for any symbol, period and
+interval with no network, for benchmarks, tests and working offline (see
+data_providers/market_data.py).
+
+Every symbol gets its own price level, volatility, drift, volume and P/E from
+a hash of (seed, symbol), and a daily random walk from ORIGIN on the NYSE
+calendar (etrade_client/market_calendar.py): fat-tailed Student-t returns,
+overnight gaps, wicks, and volume that rises with the size of the move. The
+walk is drawn in blocks seeded by their position, so a day's bar never changes
+as time moves on and any number of symbols costs nothing up front.
+
+Intraday bars come from a minute path bridging each day's open to its close,
+seeded by (symbol, day) and stretched to touch the day's high and low, with a
+U-shaped volume profile summing to the day's volume. Daily, intraday, weekly
+and monthly bars of a symbol therefore agree. Bars run through `now`, the real
+clock unless fixed: during the session the last day is a partial bar ending
+at the current minute, as live data is.
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from data_providers.market_data import MarketDataProvider
+from etrade_client.market_calendar import MarketCalendar, REGULAR
+from utils.metrics import metrics
+
+ORIGIN = date(2000, 1, 3)
+#days of the daily walk drawn from one seed
+BLOCK = 1024
+TRADING_DAYS = 252
+#pull of the walk back to its trend line per day, so 25 years of it stay in a plausible price range
+REVERSION = 1 / 500
+MINUTES = {'1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '90m': 90, '1h': 60}
+#daily bars grouped into longer ones by the pandas period they start
+PERIODS = {'1wk': 'W', '1mo': 'M', '3mo': 'Q'}
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+#degrees of freedom of the daily returns; 4 gives equity-like tails
+TAILS = 4
+#daily walks kept, 250 KB each over 25 years
+CACHE_SIZE = 64
+
+
+class FixtureProvider(MarketDataProvider):
+    """
+    purpose: generated history, info, quotes and EPS, the same for the same seed
+    arguments:
+        seed: different seeds give different markets
+        now: datetime the data runs up to (naive is exchange time), None for the clock
+        calendar: MarketCalendar of the trading days and sessions
+    """
+    name = 'fixture'
+
+    def __init__(self, seed=0, now=None, calendar=None):
+        self.seed = seed
+        self.now = now
+        self.calendar = calendar or MarketCalendar()
+        self._lock = threading.Lock()
+        #by name, as yfinance's frames carry it; pandas localizes to a ZoneInfo several times slower
+        self._tz = getattr(self.calendar.tz, 'key', self.calendar.tz)
+        self._days = np.array([], dtype='datetime64[D]')    # trading days from ORIGIN
+        self._index = pd.DatetimeIndex([], name='Date').tz_localize(self._tz)    # the same, as daily bar stamps
+        self._days_until = ORIGIN - timedelta(days=1)
+        self._walks = OrderedDict()    # (symbol, days) -> daily arrays, most recent last
+
+    def _key(self, symbol):
+        return zlib.crc32(f"{self.seed}:{symbol}".encode())
+
+    def _local_now(self):
+        now = self.now or datetime.now(self.calendar.tz)
+        return now.replace(tzinfo=self.calendar.tz) if now.tzinfo is None else now.astimezone(self.calendar.tz)
+
+    def _trading_days(self, until):
+        """
+        returns:
+            (datetime64[D] array, DatetimeIndex of daily bars) of the trading days from ORIGIN through until
+        """
+        with self._lock:
+            if until > self._days_until:
+                start = self._days_until + timedelta(days=1)
+                added = [d.date() for d in pd.bdate_range(start, until) if self.calendar.is_trading_day(d.date())]
+                self._days = np.concatenate([self._days, np.array(added, dtype='datetime64[D]')])
+                self._index = pd.DatetimeIndex(self._days, name='Date').tz_localize(self._tz)
+                self._days_until = until
+            end = np.searchsorted(self._days, np.datetime64(until), side='right')
+            return self._days[:end], self._index[:end]
+
+    def _params(self, symbol):
+        rng = np.random.default_rng([self._key(symbol), 2])
+        sigma = rng.uniform(0.15, 0.5)
+        volume = np.exp(rng.uniform(np.log(2e5), np.log(3e7)))
+        return {
+            'start': np.exp(rng.uniform(np.log(10), np.log(200))),
+            'sigma': sigma,
+            #trend of the log price per day: 0-8% a year
+            'mu': rng.uniform(0.0, 0.08) / TRADING_DAYS,
+            'volume': volume,
+            'pe': rng.uniform(12, 35),
+            'shares': volume * rng.uniform(100, 400),
+        }
+
+    def _block(self, symbol, block):
+        rng = np.random.default_rng([self._key(symbol), 0, block])
+        return (rng.standard_t(TAILS, BLOCK) / np.sqrt(TAILS / (TAILS - 2)), rng.standard_normal(BLOCK),
+                np.abs(rng.standard_normal(BLOCK)), np.abs(rng.standard_normal(BLOCK)), rng.standard_normal(BLOCK))
+
+    def _walk(self, symbol, days):
+        """
+        returns:
+            dict of float arrays Open/High/Low/Close/Volume for the first `days` trading days
+        """
+        with self._lock:
+            if (symbol, days) in self._walks:
+                self._walks.move_to_end((symbol, days))
+                return self._walks[(symbol, days)]
+        p = self._params(symbol)
+        daily = p['sigma'] / np.sqrt(TRADING_DAYS)
+        blocks = [self._block(symbol, b) for b in range(-(-days // BLOCK))]
+        shock, gap, upper, lower, volume = (np.concatenate(parts)[:days] for parts in zip(*blocks))
+        #x[t] = (1 - REVERSION) * x[t-1] + shock[t], as an exponentially weighted mean
+        swing = pd.Series(np.concatenate([[0.0], daily * shock])).ewm(alpha=REVERSION, adjust=False).mean()
+        swing = swing.to_numpy()[1:] / REVERSION
+        close = p['start'] * np.exp(p['mu'] * np.arange(1, days + 1) + swing)
+        previous = np.concatenate([[p['start']], close[:-1]])
+        open_ = previous * np.exp(0.25 * daily * gap)
+        walk = {
+            'Open': np.round(open_, 2),
+            'High': np.round(np.maximum(open_, close) * np.exp(0.4 * daily * upper), 2),
+            'Low': np.round(np.minimum(open_, close) * np.exp(-0.4 * daily * lower), 2),
+            'Close': np.round(close, 2),
+            'Volume': np.round(p['volume'] * np.exp(0.3 * volume) * (0.6 + 0.4 * np.abs(shock))),
+        }
+        with self._lock:
+            self._walks[(symbol, days)] = walk
+            while len(self._walks) > CACHE_SIZE:
+                self._walks.popitem(last=False)
+        return walk
+
+    def _session(self, day):
+        """
+        returns:
+            (open, minutes) of the day's regular session, open a naive datetime64[m]
+        """
+        for phase, start, end in self.calendar.session(day):
+            if phase == REGULAR:
+                minutes = (end.hour - start.hour) * 60 + end.minute - start.minute
+                return np.datetime64(datetime.combine(day, start), 'm'), minutes
+        raise ValueError(f"{day} is not a trading day")
+
+    def _minutes(self, symbol, day, bar):
+        """
+        purpose: the day's minute path, from its daily bar
+        arguments:
+            bar: (open, high, low, close, volume) of the day
+        returns:
+            (prices, volumes): minutes + 1 prices at the minute marks, open to close, and each
+            minute's volume
+        """
+        o, h, l, c, v = bar
+        _, minutes = self._session(day)
+        rng = np.random.default_rng([self._key(symbol), 1, day.toordinal()])
+        walk = np.concatenate([[0.0], np.cumsum(rng.standard_normal(minutes))])
+        t = np.arange(minutes + 1) / minutes
+        bridge = walk - t * walk[-1]
+        line = o + (c - o) * t
+        top, bottom = bridge.argmax(), bridge.argmin()
+        #stretch the bridge above and below the open-close line so it peaks at the high and troughs at the low
+        up = (h - line[top]) / bridge[top] if bridge[top] > 0 else 0.0
+        down = (line[bottom] - l) / -bridge[bottom] if bridge[bottom] < 0 else 0.0
+        prices = np.round(np.clip(line + up * np.maximum(bridge, 0) + down * np.minimum(bridge, 0), l, h), 2)
+        x = (np.arange(minutes) + 0.5) / minutes
+        weights = (1 + 3 * (2 * x - 1) ** 2) * np.exp(0.4 * rng.standard_normal(minutes))
+        volumes = np.diff(np.round(v * np.cumsum(weights) / weights.sum()), prepend=0.0)
+        return prices, volumes
+
+    def _elapsed(self, day, now):
+        """
+        returns:
+            minutes of the day's session traded by now, None if the session is over
+        """
+        if day != now.date():
+            return None
+        start, minutes = self._session(day)
+        elapsed = int(np.ceil((np.datetime64(now.replace(tzinfo=None), 's') - start) / np.timedelta64(60, 's')))
+        return elapsed if elapsed < minutes else None
+
+    def _bars(self, symbol, now):
+        """
+        returns:
+            (trading days, dict of daily arrays) through now, the last day partial during its session
+        """
+        days, _ = self._trading_days(now.date())
+        if len(days) and days[-1] == np.datetime64(now.date()):
+            start, _ = self._session(now.date())
+            if np.datetime64(now.replace(tzinfo=None), 's') <= start:
+                days = days[:-1]
+        walk = self._walk(symbol, len(days))
+        if not len(days):
+            return days, walk
+        today = days[-1].astype(date)
+        elapsed = self._elapsed(today, now)
+        if elapsed is None:
+            return days, walk
+        prices, volumes = self._minutes(symbol, today, [walk[k][-1] for k in ('Open', 'High', 'Low', 'Close', 'Volume')])
+        walk = {k: v.copy() for k, v in walk.items()}
+        walk['High'][-1], walk['Low'][-1] = prices[:elapsed + 1].max(), prices[:elapsed + 1].min()
+        walk['Close'][-1], walk['Volume'][-1] = prices[elapsed], volumes[:elapsed].sum()
+        return days, walk
+
+    def _first(self, period, days, today):
+        """
+        returns:
+            index of the first of days in period, yfinance's reading of it
+        """
+        if period == 'max':
+            return 0
+        if period == 'ytd':
+            start = date(today.year, 1, 1)
+        elif period.endswith('d') and period[:-1].isdigit():
+            return max(len(days) - int(period[:-1]), 0)
+        elif period.endswith('mo') and period[:-2].isdigit():
+            start = (pd.Timestamp(today) - pd.DateOffset(months=int(period[:-2]))).date()
+        elif period.endswith('y') and period[:-1].isdigit():
+            start = (pd.Timestamp(today) - pd.DateOffset(years=int(period[:-1]))).date()
+        else:
+            raise ValueError(f"unknown period: {period}")
+        return int(np.searchsorted(days, np.datetime64(start)))
+
+    def _frame(self, columns, index):
+        columns = dict(columns, Volume=columns['Volume'].astype('int64'))
+        columns['Dividends'] = columns['Stock Splits'] = np.zeros(len(index))
+        return pd.DataFrame(columns, index=index, columns=COLUMNS)
+
+    def history(self, symbol, period, interval):
+        if not symbol:
+            return None
+        with metrics.timer('fixture', 'history'):
+            now = self._local_now()
+            days, walk = self._bars(symbol, now)
+            first = self._first(period, days, now.date())
+            if interval in MINUTES:
+                return self._intraday(symbol, days[first:], first, MINUTES[interval], now)
+            if interval != '1d' and interval not in PERIODS:
+                raise ValueError(f"unknown interval: {interval}")
+            index = self._trading_days(now.date())[1][first:len(days)]
+            frame = self._frame({k: v[first:] for k, v in walk.items()}, index)
+            if interval in PERIODS:
+                starts = frame.index.tz_localize(None).to_period(PERIODS[interval]).start_time
+                frame = frame.groupby(starts).agg({'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last',
+                                                   'Volume': 'sum', 'Dividends': 'sum', 'Stock Splits': 'sum'})
+                frame.index = frame.index.tz_localize(self._tz).rename('Date')
+            return frame
+
+    def _intraday(self, symbol, days, first, size, now):
+        """
+        returns:
+            bars of size minutes over the regular sessions of days, starting with the session
+        """
+        #the whole day's bars: the minute path of a partial day is cut at now, not fitted to it
+        walk = self._walk(symbol, first + len(days))
+        starts, columns = [], {k: [] for k in ('Open', 'High', 'Low', 'Close', 'Volume')}
+        for i, day in enumerate(days.astype(date), first):
+            prices, volumes = self._minutes(symbol, day, [walk[k][i] for k in ('Open', 'High', 'Low', 'Close', 'Volume')])
+            open_, minutes = self._session(day)
+            elapsed = self._elapsed(day, now)
+            traded = minutes if elapsed is None else elapsed
+            cuts = np.arange(0, traded, size)
+            ends = np.minimum(cuts + size, traded)
+            highs = np.maximum(prices[:-1], prices[1:])[:traded]
+            lows = np.minimum(prices[:-1], prices[1:])[:traded]
+            starts.append(open_ + cuts.astype('timedelta64[m]'))
+            columns['Open'].append(prices[cuts])
+            columns['High'].append(np.maximum.reduceat(highs, cuts))
+            columns['Low'].append(np.minimum.reduceat(lows, cuts))
+            columns['Close'].append(prices[ends])
+            columns['Volume'].append(np.add.reduceat(volumes[:traded], cuts))
+        if not starts:
+            return None
+        index = pd.DatetimeIndex(np.concatenate(starts), name='Datetime').tz_localize(self._tz)
+        return self._frame({k: np.concatenate(v) for k, v in columns.items()}, index)
+
+    def info(self, symbol):
+        days, walk = self._bars(symbol, self._local_now())
+        if not len(days):
+            return None
+        year = slice(-TRADING_DAYS, None)
+        return {
+            'open': float(walk['Open'][-1]),
+            'dayHigh': float(walk['High'][-1]),
+            'dayLow': float(walk['Low'][-1]),
+            'marketCap': float(walk['Close'][-1] * self._params(symbol)['shares']),
+            'fiftyTwoWeekLow': float(walk['Low'][year].min()),
+            'fiftyTwoWeekHigh': float(walk['High'][year].max()),
+        }
+
+    def quotes(self, symbols):
+        now = self._local_now()
+        quotes = {}
+        for symbol in dict.fromkeys(symbols):
+            days, walk = self._bars(symbol, now)
+            if len(days) < 2:
+                continue
+            last, previous = walk['Close'][-1], walk['Close'][-2]
+            quotes[symbol] = {'lastTrade': float(last), 'change': float(last - previous),
+                              'changePct': float(100 * (last - previous) / previous),
+                              'volume': int(walk['Volume'][-1]), 'time': int(now.timestamp())}
+        return quotes
+
+    def eps(self, symbol):
+        """
+        returns:
+            trailing EPS at each quarter end since ORIGIN: the close then over a P/E that wanders
+            around the symbol's own; None for indices, futures and currencies, as from Yahoo
+        """
+        if not symbol[:1].isalpha() or '=' in symbol:
+            return None
+        now = self._local_now()
+        days, walk = self._bars(symbol, now)
+        quarters = pd.period_range(ORIGIN, now.date(), freq='Q').end_time.normalize()
+        quarters = quarters[quarters < pd.Timestamp(now.date())]
+        if not len(quarters) or not len(days):
+            return None
+        closes = walk['Close'][np.searchsorted(days, quarters.values.astype('datetime64[D]'), side='right') - 1]
+        rng = np.random.default_rng([self._key(symbol), 3])
+        pe = self._params(symbol)['pe'] * np.exp(0.05 * np.cumsum(rng.standard_normal(len(quarters))))
+        return pd.Series(np.round(closes / pe, 2), index=quarters)
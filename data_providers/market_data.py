@@ -0,0 +1,212 @@
+"""
+Market data providers: where charts, the scanner, risk, alerts and the compare
+console get their bars from.
+
+A provider answers:
+
+- history(symbol, period, interval): one symbol's bars, a DataFrame of Open,
+  High, Low, Close and Volume indexed by bar start in exchange time (as
+  yfinance's Ticker.history returns them); None when it has none
+- batch_history(symbols, period, interval, max_workers): history for many
+  symbols, dict symbol -> frame; symbols without data are left out
+- info(symbol): dict of open, dayHigh, dayLow, marketCap, fiftyTwoWeekLow and
+  fiftyTwoWeekHigh; None when unknown
+- quotes(symbols): dict symbol -> {'lastTrade', 'change', 'changePct',
+  'volume', 'time'}, the shape etrade_client.market.Market.fetch_quotes returns
+- eps(symbol): trailing twelve month EPS Series by fiscal period end; None for
+  providers or symbols without statements
+
+YFinanceDataManager keeps its caches in front of whichever provider config.py
+names in MARKET_DATA_PROVIDER:
+
+- 'yahoo': yfinance (data_providers/yahoo_finance.py), the default
+- 'fixture': deterministic offline bars (data_providers/fixture_provider.py)
+- a list of them, combined by CompositeProvider: MARKET_DATA_MODE 'failover'
+  asks them in order until one answers, 'race' asks all at once and takes the
+  first answer
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from utils.metrics import metrics
+
+#concurrent requests when fetching history for many symbols
+HISTORY_WORKERS = 8
+FAILOVER = 'failover'
+RACE = 'race'
+
+
+class MarketDataProvider:
+    """
+    purpose: base class of the providers, see the module docstring
+    note: only history() must be implemented; batch_history() runs it on a thread pool
+    """
+    name = 'provider'
+
+    def history(self, symbol, period, interval):
+        raise NotImplementedError
+
+    def batch_history(self, symbols, period, interval, max_workers=HISTORY_WORKERS):
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        frames = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols))) as pool:
+            for symbol, frame in zip(symbols, pool.map(lambda s: self._history(s, period, interval), symbols)):
+                if _usable(frame):
+                    frames[symbol] = frame
+        return frames
+
+    def _history(self, symbol, period, interval):
+        #one symbol failing leaves it out of the batch rather than failing the batch
+        try:
+            return self.history(symbol, period, interval)
+        except Exception as e:
+            print(f"Error fetching history for {symbol} from {self.name}: {e}")
+            return None
+
+    def info(self, symbol):
+        return None
+
+    def quotes(self, symbols):
+        return {}
+
+    def eps(self, symbol):
+        return None
+
+
+def _usable(result):
+    if result is None:
+        return False
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return not result.empty
+    if isinstance(result, dict):
+        return bool(result)
+    return True
+
+
+class CompositeProvider(MarketDataProvider):
+    """
+    purpose: several providers behind one, for a fallback feed or a faster one
+    arguments:
+        providers: MarketDataProvider list, preferred first
+        mode: FAILOVER - ask them in order, moving on when one fails or has nothing;
+              RACE - ask all at once, the first usable answer wins
+    note: for batch_history and quotes, symbols one provider has no data for are asked of the
+          others, so a partial answer is filled in rather than discarded
+    """
+    name = 'composite'
+
+    def __init__(self, providers, mode=FAILOVER):
+        if not providers:
+            raise ValueError("CompositeProvider needs at least one provider")
+        if mode not in (FAILOVER, RACE):
+            raise ValueError(f"unknown market data mode: {mode}")
+        self.providers = list(providers)
+        self.mode = mode
+        self._pool = ThreadPoolExecutor(max_workers=4 * len(self.providers), thread_name_prefix='market-data') \
+            if mode == RACE else None
+
+    def _call(self, provider, method, *args):
+        try:
+            with metrics.timer('market_data', f'{provider.name}.{method}'):
+                return getattr(provider, method)(*args)
+        except Exception as e:
+            print(f"Error from {provider.name} {method}: {e}")
+            return None
+
+    def _answers(self, method, *args):
+        """
+        returns:
+            iterator of (provider, result): in order for FAILOVER, as they arrive for RACE
+        """
+        if self.mode == FAILOVER:
+            for provider in self.providers:
+                yield provider, self._call(provider, method, *args)
+            return
+        futures = {self._pool.submit(self._call, provider, method, *args): provider for provider in self.providers}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def _first(self, method, *args):
+        for provider, result in self._answers(method, *args):
+            if _usable(result):
+                if provider is not self.providers[0]:
+                    metrics.increment('market_data', f'answered_by_{provider.name}')
+                return result
+        return None
+
+    def _merged(self, method, symbols, *args):
+        """
+        returns:
+            dict symbol -> answer, each symbol from the first provider that had it
+        """
+        merged = {}
+        wanted = list(dict.fromkeys(symbols))
+        if self.mode == FAILOVER:
+            for provider in self.providers:
+                missing = [s for s in wanted if s not in merged]
+                if not missing:
+                    break
+                if provider is not self.providers[0]:
+                    metrics.increment('market_data', f'answered_by_{provider.name}', len(missing))
+                merged.update({s: v for s, v in (self._call(provider, method, missing, *args) or {}).items()
+                               if _usable(v)})
+            return merged
+        for provider, result in self._answers(method, wanted, *args):
+            for symbol, value in (result or {}).items():
+                if symbol not in merged and _usable(value):
+                    merged[symbol] = value
+            if len(merged) == len(wanted):
+                break
+        return merged
+
+    def history(self, symbol, period, interval):
+        return self._first('history', symbol, period, interval)
+
+    def batch_history(self, symbols, period, interval, max_workers=HISTORY_WORKERS):
+        return self._merged('batch_history', symbols, period, interval, max_workers)
+
+    def info(self, symbol):
+        return self._first('info', symbol)
+
+    def quotes(self, symbols):
+        return self._merged('quotes', symbols)
+
+    def eps(self, symbol):
+        return self._first('eps', symbol)
+
+
+def provider_from_name(name, seed=0):
+    """
+    returns:
+        the provider called name in MARKET_DATA_PROVIDER
+    note: imported here, so the fixture provider runs where yfinance isn't installed
+    """
+    if name == 'yahoo':
+        from data_providers.yahoo_finance import YahooFinanceProvider
+        return YahooFinanceProvider()
+    if name == 'fixture':
+        from data_providers.fixture_provider import FixtureProvider
+        return FixtureProvider(seed=seed)
+    raise ValueError(f"unknown market data provider: {name}")
+
+
+def market_data_provider_from_config():
+    """
+    purpose: the provider config.py names in MARKET_DATA_PROVIDER, yfinance if none
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    names = getattr(config, 'MARKET_DATA_PROVIDER', 'yahoo')
+    seed = getattr(config, 'MARKET_DATA_FIXTURE_SEED', 0)
+    if isinstance(names, str):
+        return provider_from_name(names, seed)
+    providers = [provider_from_name(name, seed) for name in names]
+    if len(providers) == 1:
+        return providers[0]
+    return CompositeProvider(providers, getattr(config, 'MARKET_DATA_MODE', FAILOVER))
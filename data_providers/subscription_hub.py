@@ -0,0 +1,204 @@
+"""
+One place views get market data from, so a symbol shown in several places is
+fetched once.
+
+A view subscribes to a key - (symbol, kind, interval), e.g. ('NVDA', 'chart',
+'1d') - with a callback. The hub runs one refresh loop (a PollWorker on its
+own thread) per key, however many views subscribe to it, and hands every
+payload to all of them on the gui thread. Subscriptions are reference counted:
+the loop starts with the first subscriber and stops when the last one leaves,
+so opening another pane on a symbol already on screen adds no requests.
+
+Kinds are registered by whoever owns the data source:
+
+    hub.register('chart', lambda symbol, interval: manager.get_symbol_data(symbol, interval),
+                 refresh_s=lambda interval: 60)
+    token = hub.subscribe('NVDA', 'chart', '1d', on_chart)
+    ...
+    hub.unsubscribe(token)
+"""
+
+import itertools
+import time
+
+from PyQt6.QtCore import QObject, QThread
+
+from etrade_client.pollworker import PollWorker
+from utils.metrics import metrics
+
+
+class _Feed(QObject):
+    """
+    purpose: the refresh loop and latest payload for one key, shared by its subscribers
+    note: lives on the gui thread, so payloads from the worker are delivered here queued
+    """
+
+    def __init__(self, key, fetch_fn, refresh_s):
+        super().__init__()
+        self.key = key
+        self.fetch_fn = fetch_fn
+        self.refresh_s = refresh_s
+        self.subscribers = {}       # token -> callback
+        self.latest = None
+        self.as_of = None
+        self.worker, self.thread = None, None
+        self.on_stopped = None
+
+    def fresh(self, max_age):
+        return self.as_of is not None and time.time() - self.as_of <= max_age
+
+    def fetch(self):
+        """
+        purpose: one refresh; returns None when the payload is still fresh (someone fetched
+                 it through SubscriptionHub.get since the last pass) or there is no data
+        """
+        symbol, kind, interval = self.key
+        if self.fresh(self.refresh_s * 0.9):
+            metrics.increment('hub', kind + '.skipped')
+            return None
+        payload = self.fetch_fn(symbol, interval)
+        if payload is not None:
+            self.as_of = time.time()
+        return payload
+
+    def thread_finished(self):
+        if self.on_stopped is not None:
+            self.on_stopped(self)
+
+    def publish(self, payload):
+        if payload is None:
+            return
+        self.latest = payload
+        for callback in list(self.subscribers.values()):
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"Error delivering {self.key}: {e}")
+
+
+class SubscriptionHub(QObject):
+    """
+    purpose: reference-counted, shared refresh loops per (symbol, kind, interval)
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._kinds = {}            # kind -> (fetch_fn, refresh_s)
+        self._feeds = {}            # key -> _Feed
+        self._tokens = {}           # token -> key
+        self._next_token = itertools.count(1)
+        self._stopping = []         # feeds whose loop is winding down
+
+    def register(self, kind, fetch_fn, refresh_s):
+        """
+        arguments:
+            kind: name subscribers use, e.g. 'chart'
+            fetch_fn: fetch_fn(symbol, interval) -> payload, or None when there is no data;
+                      called on a worker thread
+            refresh_s: seconds between refreshes, or a function of the interval
+        """
+        self._kinds[kind] = (fetch_fn, refresh_s)
+
+    def _feed(self, symbol, kind, interval):
+        key = (symbol, kind, interval)
+        feed = self._feeds.get(key)
+        if feed is None:
+            if kind not in self._kinds:
+                raise KeyError(f"no data kind registered as {kind!r}")
+            fetch_fn, refresh_s = self._kinds[kind]
+            feed = _Feed(key, fetch_fn, refresh_s(interval) if callable(refresh_s) else refresh_s)
+            self._feeds[key] = feed
+        return feed
+
+    def subscribe(self, symbol, kind, interval, callback, replay=True):
+        """
+        purpose: get every refresh of a key delivered to callback(payload) on the gui thread
+        arguments:
+            replay: hand over the latest payload right away if there is one
+        returns:
+            token for unsubscribe
+        """
+        feed = self._feed(symbol, kind, interval)
+        token = next(self._next_token)
+        feed.subscribers[token] = callback
+        self._tokens[token] = feed.key
+        if feed.worker is None:
+            self._start(feed)
+        if replay and feed.latest is not None:
+            callback(feed.latest)
+        return token
+
+    def unsubscribe(self, token):
+        key = self._tokens.pop(token, None)
+        feed = self._feeds.get(key)
+        if feed is None:
+            return
+        feed.subscribers.pop(token, None)
+        if not feed.subscribers:
+            # last one out: no more requests for this key
+            self._stop(feed)
+            del self._feeds[key]
+
+    def get(self, symbol, kind, interval, max_age=None):
+        """
+        purpose: the latest payload for a key now, fetched on the calling thread unless a
+                 fresh one is cached; subscribers are not called, they keep what they
+                 have until the loop's next refresh
+        arguments:
+            max_age: seconds a cached payload is good for (defaults to the kind's refresh)
+        returns:
+            payload, or None when there is no data
+        """
+        feed = self._feed(symbol, kind, interval)
+        if feed.latest is not None and feed.fresh(feed.refresh_s if max_age is None else max_age):
+            metrics.increment('hub', kind + '.hits')
+            return feed.latest
+        payload = feed.fetch_fn(symbol, interval)
+        if payload is not None:
+            # kept for a subscribe that usually follows, so its loop starts without refetching
+            feed.latest, feed.as_of = payload, time.time()
+        return payload
+
+    def subscriber_count(self, symbol, kind, interval):
+        feed = self._feeds.get((symbol, kind, interval))
+        return len(feed.subscribers) if feed is not None else 0
+
+    def active_keys(self):
+        return [key for key, feed in self._feeds.items() if feed.worker is not None]
+
+    def _start(self, feed):
+        symbol, kind, interval = feed.key
+        feed.worker = PollWorker(feed.fetch, feed.refresh_s, jitter=0.1, name=f"hub.{kind}")
+        feed.thread = QThread(self)
+        feed.worker.moveToThread(feed.thread)
+        feed.thread.started.connect(feed.worker.start)
+        feed.worker.dataReady.connect(feed.publish)
+        feed.worker.error.connect(lambda message, key=feed.key: print(f"Error refreshing {key}: {message}"))
+        feed.worker.finished.connect(feed.thread.quit)
+        feed.on_stopped = self._stopped
+        feed.thread.finished.connect(feed.thread_finished)
+        feed.thread.start()
+
+    def _stop(self, feed):
+        if feed.worker is None:
+            return
+        feed.worker.dataReady.disconnect()
+        feed.worker.stop()
+        self._stopping.append(feed)
+        feed.worker = None
+
+    def _stopped(self, feed):
+        if feed in self._stopping:
+            self._stopping.remove(feed)
+
+    def stop_all(self, wait=True):
+        """
+        purpose: stop every loop (window closing); waits for in-flight fetches when wait
+        """
+        for feed in list(self._feeds.values()):
+            self._stop(feed)
+        self._feeds.clear()
+        self._tokens.clear()
+        if wait:
+            for feed in list(self._stopping):
+                feed.thread.wait()
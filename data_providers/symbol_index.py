@@ -0,0 +1,410 @@
+"""
+Local symbol universe: instant ticker completion, and typos flagged before a
+request goes out.
+
+The universe - every listed US stock and ETF with its name, exchange and type -
+comes from Nasdaq Trader's symbol directory (nasdaqlisted.txt and
+otherlisted.txt) and is cached in a small local file, downloaded again on a
+background thread once it is older than max_age_days. Tickers are kept in
+Yahoo form (BRK-B, not BRK.B) since the charts, scanner and compare console
+fetch from Yahoo; lookups treat '.', '/' and '-' alike.
+
+SymbolIndex holds the universe as sorted numpy arrays, so every lookup is a few
+binary searches:
+
+- tickers, for exact and prefix matches
+- every word of every name, for 'nvid' -> NVDA
+- every ticker with one character deleted, so a query one edit away from a
+  ticker (a typo, a dropped or doubled letter: NVDIA, APPL, GOOOG) finds it by
+  deleting a character of its own
+
+Indices, futures, currencies, crypto and mutual funds (^VIX, GC=F, EURUSD=X,
+BTC-USD, VTSAX), symbols of other exchanges (SHOP.TO, VOD.L, 7203.T, DX-Y.NYB)
+and OTC foreign shares (TCEHY, NSRGF) are not in the directory; they pass
+unchecked, as do the symbols add()ed from held positions. Even so the
+directory is not every symbol Yahoo or E*TRADE know, so a miss is a warning
+with suggestions, never a refusal. Building the index takes a moment, so
+start() loads it on a background thread; until it is loaded nothing is flagged.
+
+usage (from the repo root):
+    python -m data_providers.symbol_index --refresh
+    python -m data_providers.symbol_index nvid appl brk.b
+"""
+
+import argparse
+import io
+import os
+import re
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import metrics
+
+DEFAULT_PATH = "symbols.csv.gz"
+DEFAULT_MAX_AGE_DAYS = 7
+NASDAQ_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt"
+OTHER_LISTED_URL = "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt"
+DOWNLOAD_TIMEOUT_S = 30
+COLUMNS = ['ticker', 'name', 'exchange', 'type']
+#otherlisted.txt exchange codes
+EXCHANGES = {'A': 'NYSE American', 'N': 'NYSE', 'P': 'NYSE Arca', 'Z': 'Cboe BZX', 'V': 'IEX'}
+#symbols the directory doesn't list: indices, futures, currencies, crypto, and mutual funds
+#(five letters ending in X)
+UNLISTED = re.compile(r'^\^|=[FX]$|-USD$|^[A-Z]{4}X$')
+#Yahoo's exchange suffixes (SHOP.TO, 7203.T, DX-Y.NYB), matched before normalize() makes them
+#look like share classes, and OTC foreign ordinaries and ADRs (five letters ending in F or Y)
+FOREIGN = re.compile(r'\.[A-Z]{1,3}$|^[A-Z]{4}[FY]$')
+#a few of those, so they complete too
+BUILTIN = [
+    ('^GSPC', 'S&P 500', 'Index', 'Index'),
+    ('^DJI', 'Dow Jones Industrial Average', 'Index', 'Index'),
+    ('^IXIC', 'Nasdaq Composite', 'Index', 'Index'),
+    ('^RUT', 'Russell 2000', 'Index', 'Index'),
+    ('^VIX', 'Cboe Volatility Index', 'Index', 'Index'),
+    ('^TNX', 'Treasury Yield 10 Years', 'Index', 'Index'),
+    ('GC=F', 'Gold Futures', 'COMEX', 'Future'),
+    ('CL=F', 'Crude Oil Futures', 'NYMEX', 'Future'),
+    ('BTC-USD', 'Bitcoin USD', 'CCC', 'Crypto'),
+    ('ETH-USD', 'Ethereum USD', 'CCC', 'Crypto'),
+]
+_SEPARATORS = re.compile(r'[./]')
+_WORDS = re.compile(r"[a-z0-9&']+")
+
+
+def normalize(symbol):
+    """
+    returns:
+        symbol in the index's form: upper case, Yahoo's '-' for share classes
+    """
+    return _SEPARATORS.sub('-', symbol.strip().upper())
+
+
+def _deletions(key):
+    return {key[:i] + key[i + 1:] for i in range(len(key))} if len(key) > 1 else set()
+
+
+def parse_directory(nasdaq_text, other_text):
+    """
+    purpose: turn Nasdaq Trader's two symbol directory files into the universe
+    returns:
+        DataFrame of COLUMNS, test issues left out
+    """
+    frames = []
+    for text, symbol_column in ((nasdaq_text, 'Symbol'), (other_text, 'ACT Symbol')):
+        # the last line is 'File Creation Time: ...'
+        frame = pd.read_csv(io.StringIO(text), sep='|', dtype=str, keep_default_na=False)
+        frame = frame[frame[symbol_column].str.len().gt(0) & ~frame[symbol_column].str.startswith('File Creation')]
+        frame = frame[frame.get('Test Issue', 'N') != 'Y']
+        exchange = frame['Exchange'].map(EXCHANGES).fillna(frame['Exchange']) if 'Exchange' in frame else 'Nasdaq'
+        frames.append(pd.DataFrame({
+            # preferreds are ABR$D in the file, ABR-PD on Yahoo
+            'ticker': frame[symbol_column].str.replace('$', '-P', regex=False).map(normalize),
+            'name': frame['Security Name'],
+            'exchange': exchange,
+            'type': np.where(frame['ETF'] == 'Y', 'ETF', 'Equity'),
+        }))
+    return pd.concat(frames, ignore_index=True).drop_duplicates('ticker')
+
+
+def download_directory(timeout=DOWNLOAD_TIMEOUT_S):
+    """
+    returns:
+        the universe as parse_directory returns it, freshly downloaded
+    """
+    texts = []
+    for url in (NASDAQ_LISTED_URL, OTHER_LISTED_URL):
+        with metrics.timer('symbol_index', 'download'):
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                texts.append(response.read().decode('utf-8', errors='replace'))
+    return parse_directory(*texts)
+
+
+class _Arrays:
+    """
+    purpose: one build of the index; replaced whole, so a reader never sees half a refresh
+    """
+
+    def __init__(self, records):
+        records = pd.concat([records, pd.DataFrame(BUILTIN, columns=COLUMNS)], ignore_index=True)
+        records = records.drop_duplicates('ticker').sort_values('ticker', ignore_index=True)
+        self.tickers = records['ticker'].to_numpy(dtype=str)
+        self.names = records['name'].to_numpy(dtype=object)
+        self.exchanges = records['exchange'].to_numpy(dtype=object)
+        self.types = records['type'].to_numpy(dtype=object)
+        self.lengths = np.char.str_len(self.tickers) if len(self.tickers) else np.empty(0, dtype=int)
+
+        words, word_rows = [], []
+        for row, name in enumerate(records['name'].str.lower()):
+            for word in set(_WORDS.findall(name)):
+                if len(word) > 1:
+                    words.append(word)
+                    word_rows.append(row)
+        self.words, self.word_rows = self._sorted(words, word_rows)
+
+        deleted, deleted_rows = [], []
+        for row, ticker in enumerate(self.tickers):
+            for key in _deletions(ticker):
+                deleted.append(key)
+                deleted_rows.append(row)
+        self.deleted, self.deleted_rows = self._sorted(deleted, deleted_rows)
+
+    @staticmethod
+    def _sorted(keys, rows):
+        keys = np.array(keys, dtype=str)
+        order = np.argsort(keys, kind='stable')
+        return keys[order], np.array(rows, dtype=np.int32)[order]
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def find(self, key):
+        i = np.searchsorted(self.tickers, key)
+        return i if i < len(self.tickers) and self.tickers[i] == key else None
+
+    def prefix(self, keys, key):
+        """
+        returns:
+            (lo, hi) of the keys starting with key
+        """
+        return np.searchsorted(keys, key, 'left'), np.searchsorted(keys, key + '\uffff', 'left')
+
+    def named(self, word, limit):
+        """
+        returns:
+            rows of up to limit names with a word starting with word
+        """
+        lo, hi = self.prefix(self.words, word)
+        return self.word_rows[lo:min(hi, lo + limit)]
+
+    def near(self, key):
+        """
+        returns:
+            rows of the tickers one edit away from key (a letter wrong, missing or extra)
+        """
+        if len(key) < 3:
+            # too short to tell a typo from another ticker
+            return []
+        rows = []
+        # a ticker one edit away shares a one-deletion key with the query
+        for deleted in [key, *_deletions(key)]:
+            lo, hi = np.searchsorted(self.deleted, deleted, 'left'), np.searchsorted(self.deleted, deleted, 'right')
+            rows.extend(self.deleted_rows[lo:hi])
+            # the query with a letter too many
+            row = self.find(deleted) if deleted != key else None
+            if row is not None:
+                rows.append(row)
+        return rows
+
+    def record(self, row):
+        return str(self.tickers[row]), self.names[row], self.exchanges[row], self.types[row]
+
+
+class SymbolIndex:
+    """
+    purpose: the symbol universe, loaded from its cache file and refreshed in the background
+    arguments:
+        path: cache file
+        max_age_days: days before the cache is downloaded again
+        extra: symbols accepted though the directory doesn't list them (e.g. mutual funds)
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_age_days=DEFAULT_MAX_AGE_DAYS, extra=()):
+        self.path = path
+        self.max_age_days = max_age_days
+        self.extra = {normalize(s) for s in extra}
+        self._arrays = _Arrays(pd.DataFrame(columns=COLUMNS))
+        self._loaded = False
+        self._thread = None
+
+    def __len__(self):
+        return len(self._arrays)
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self):
+        """
+        purpose: read the cache file, if there is one
+        returns:
+            True if the universe was loaded from it
+        """
+        try:
+            with metrics.timer('symbol_index', 'load'):
+                records = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+                self.set_records(records)
+        except (OSError, ValueError, KeyError) as e:
+            if os.path.exists(self.path):
+                print(f"Error reading symbol index {self.path}: {e}")
+            return False
+        return True
+
+    def set_records(self, records):
+        """
+        purpose: rebuild the index from a DataFrame of COLUMNS
+        """
+        with metrics.timer('symbol_index', 'build'):
+            arrays = _Arrays(records[COLUMNS])
+        self._arrays = arrays
+        self._loaded = True
+
+    def stale(self):
+        try:
+            return time.time() - os.path.getmtime(self.path) > self.max_age_days * 86400
+        except OSError:
+            return True
+
+    def refresh(self):
+        """
+        purpose: download the directory, rebuild the index and rewrite the cache file
+        returns:
+            True on success; on failure the index keeps what it had
+        """
+        try:
+            records = download_directory()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error downloading the symbol directory: {e}")
+            return False
+        self.set_records(records)
+        try:
+            tmp_path = self.path + ".tmp"
+            records[COLUMNS].to_csv(tmp_path, index=False, compression='gzip')
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error writing symbol index {self.path}: {e}")
+        return True
+
+    def start(self):
+        """
+        purpose: on a daemon thread, load the cache file and download the directory if it is stale
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._load_and_refresh, name='symbol-index', daemon=True)
+        self._thread.start()
+
+    def _load_and_refresh(self):
+        if not self._loaded:
+            self.load()
+        if self.stale():
+            self.refresh()
+
+    def add(self, symbols):
+        """
+        purpose: accept symbols from elsewhere (e.g. held positions) that the directory doesn't list
+        """
+        self.extra.update(normalize(s) for s in symbols if s)
+
+    # lookups - any thread
+
+    def lookup(self, symbol):
+        """
+        returns:
+            (ticker, name, exchange, type), or None if the symbol isn't in the index
+        """
+        arrays = self._arrays
+        row = arrays.find(normalize(symbol))
+        return None if row is None else arrays.record(row)
+
+    def known(self, symbol):
+        """
+        returns:
+            False only if the universe is loaded and the symbol is neither in it nor exempt
+        note: a share class with a '.' (BRK.B) is looked up; an unlisted one passes as a suffix
+        """
+        key = normalize(symbol)
+        return (not self._loaded or not key or key in self.extra or UNLISTED.search(key) is not None
+                or FOREIGN.search(symbol.strip().upper()) is not None or self._arrays.find(key) is not None)
+
+    def unknown(self, symbols, suggestions=3):
+        """
+        purpose: the symbols to warn about before a request, with what was probably meant
+        returns:
+            dict symbol -> list of suggested tickers, for each symbol that isn't known
+        """
+        return {symbol: [record[0] for record in self.complete(symbol, suggestions, typos_first=True)]
+                for symbol in symbols if not self.known(symbol)}
+
+    def complete(self, text, limit=10, typos_first=False):
+        """
+        purpose: completions for a partly typed ticker or name
+        arguments:
+            typos_first: rank tickers one edit away ahead of name matches, for a symbol
+                         already entered rather than being typed
+        returns:
+            up to limit (ticker, name, exchange, type): the exact ticker, then tickers starting
+            with text (shortest first), names with a word starting with it and tickers one
+            edit away
+        """
+        with metrics.timer('symbol_index', 'complete'):
+            arrays = self._arrays
+            key = normalize(text)
+            if not key or not len(arrays):
+                return []
+            rows = []
+            exact = arrays.find(key)
+            if exact is not None:
+                rows.append(exact)
+            lo, hi = arrays.prefix(arrays.tickers, key)
+            if hi > lo:
+                rows.extend(lo + np.argsort(arrays.lengths[lo:hi], kind='stable')[:limit + 1])
+            searches = [lambda: arrays.named(text.strip().lower(), 4 * limit), lambda: arrays.near(key)]
+            for search in (searches[::-1] if typos_first else searches):
+                if len(rows) < limit and len(key) > 1:
+                    rows.extend(search())
+            return [arrays.record(row) for row in dict.fromkeys(int(r) for r in rows)][:limit]
+
+
+def unknown_message(unknown):
+    """
+    arguments:
+        unknown: SymbolIndex.unknown output
+    returns:
+        one line naming the symbols the index doesn't have and what was probably meant
+    """
+    parts = [f"{symbol} (did you mean {', '.join(suggested)}?)" if suggested else symbol
+             for symbol, suggested in unknown.items()]
+    return f"Not in the symbol index: {'; '.join(parts)}"
+
+
+def symbol_index_from_config():
+    """
+    purpose: the SymbolIndex described by config.py, not yet loaded (see SymbolIndex.start);
+             None if SYMBOL_INDEX_ENABLED is off
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    if not getattr(config, 'SYMBOL_INDEX_ENABLED', True):
+        return None
+    return SymbolIndex(getattr(config, 'SYMBOL_INDEX_PATH', DEFAULT_PATH),
+                       getattr(config, 'SYMBOL_INDEX_MAX_AGE_DAYS', DEFAULT_MAX_AGE_DAYS),
+                       getattr(config, 'SYMBOL_INDEX_EXTRA', ()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh or query the local symbol index")
+    parser.add_argument('queries', nargs='*', help="partial tickers or names to complete")
+    parser.add_argument('--path', default=DEFAULT_PATH)
+    parser.add_argument('--refresh', action='store_true', help="download the symbol directory now")
+    args = parser.parse_args()
+
+    index = SymbolIndex(args.path)
+    if args.refresh or not index.load():
+        index.refresh()
+    print(f"{len(index)} symbols")
+    for query in args.queries:
+        started = time.perf_counter()
+        results = index.complete(query)
+        print(f"{query!r}: {(time.perf_counter() - started) * 1000.0:.3f} ms")
+        for ticker, name, exchange, kind in results:
+            print(f"  {ticker:<8} {name[:50]:<50} {exchange:<14} {kind}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Yahoo Finance market data through yfinance, the default provider (see
+data_providers/market_data.py).
+
+Every request goes through Ticker rather than yf.download: panes refresh on
+their own threads (see data_providers/subscription_hub.py) and yf.download
+keeps per-call state in module globals.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+import pandas as pd
+import yfinance as yf
+
+from data_providers.market_data import MarketDataProvider, HISTORY_WORKERS
+from utils.metrics import metrics
+
+INFO_KEYS = ('open', 'dayHigh', 'dayLow', 'marketCap', 'fiftyTwoWeekLow', 'fiftyTwoWeekHigh')
+
+
+class YahooFinanceProvider(MarketDataProvider):
+    """
+    purpose: history, info, quotes and EPS from Yahoo Finance
+    note: errors are printed and answered with None (or left out), so a CompositeProvider moves on
+    """
+    name = 'yahoo'
+
+    def history(self, symbol, period, interval):
+        try:
+            with metrics.timer('yfinance', 'history') as t:
+                data = yf.Ticker(symbol).history(period=period, interval=interval, auto_adjust=True)
+                if data is None or data.empty:
+                    t.fail()
+        except Exception as e:
+            print(f"Error fetching history for {symbol}: {e}")
+            return None
+        if data is None or data.empty or 'Close' not in data.columns:
+            return None
+        return data
+
+    def info(self, symbol):
+        """
+        returns:
+            dict of INFO_KEYS, 0 for those Yahoo doesn't have; None if the request failed
+        """
+        try:
+            with metrics.timer('yfinance', 'info'):
+                info = yf.Ticker(symbol).info
+        except Exception as e:
+            print(f"Error getting ticker info for {symbol}: {e}")
+            return None
+        return {key: self._safe_get_info(info, key, 0) for key in INFO_KEYS}
+
+    def _safe_get_info(self, ticker_info: Dict, key: str, default: Any = "N/A") -> Any:
+        """
+        purpose: prevent key errors when getting info from ticker_info dict
+        arguments:
+            ticker_info: dict containing ticker information
+            key: keyto retrieve
+            default: default value if key not found or None
+        returns:
+            value from ticker_info or default
+        """
+        try:
+            value = ticker_info.get(key, default)
+            return value if value is not None else default
+        except:
+            return default
+
+    def quotes(self, symbols):
+        """
+        returns:
+            dict symbol -> quote from Ticker.fast_info, for the symbols Yahoo has a price for
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(HISTORY_WORKERS, len(symbols))) as pool:
+            return {s: q for s, q in zip(symbols, pool.map(self._quote, symbols)) if q is not None}
+
+    def _quote(self, symbol):
+        try:
+            with metrics.timer('yfinance', 'quote'):
+                fast = yf.Ticker(symbol).fast_info
+                last, previous, volume = fast['lastPrice'], fast['previousClose'], fast['lastVolume']
+        except Exception as e:
+            print(f"Error fetching quote for {symbol}: {e}")
+            return None
+        if not last:
+            return None
+        change = last - previous if previous else 0.0
+        return {'lastTrade': float(last), 'change': float(change),
+                'changePct': 100.0 * change / previous if previous else 0.0,
+                'volume': int(volume or 0), 'time': int(time.time())}
+
+    def eps(self, symbol):
+        """
+        returns:
+            trailing twelve month diluted EPS by fiscal period end, or None for symbols without
+            income statements (ETFs, funds)
+        note: quarterly statements give the recent quarters as a rolling 4-quarter sum, annual
+              statements fill in the years before that
+        """
+        try:
+            ticker = yf.Ticker(symbol)
+            with metrics.timer('yfinance', 'statements'):
+                statements = [(ticker.quarterly_income_stmt, 4), (ticker.income_stmt, 1)]
+        except Exception as e:
+            print(f"Error fetching statements for {symbol}: {e}")
+            return None
+        eps = None
+        for statement, periods in statements:
+            if statement is None or statement.empty or 'Diluted EPS' not in statement.index:
+                continue
+            values = pd.to_numeric(statement.loc['Diluted EPS'], errors='coerce')
+            values.index = pd.to_datetime(values.index)
+            values = values.sort_index().rolling(periods).sum().dropna()
+            #quarterly figures are the more recent, so they win where both exist
+            eps = values if eps is None else eps.combine_first(values)
+        return eps if eps is not None and not eps.empty else None
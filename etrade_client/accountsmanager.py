@@ -1,9 +1,12 @@
 import logging
 from logging.handlers import RotatingFileHandler
 import json
+import time
 import pandas as pd
 from pygments.lexers import q
 import config
+from etrade_client.transactions import PAGE_SIZE, api_date, transaction_store_from_config
+from utils.metrics import metrics, timed
 
 logger = logging.getLogger('my_logger')
 logger.setLevel(logging.ERROR)
@@ -15,13 +18,31 @@ logger.addHandler(handler)
 
 
 class AccountsManager:
-    def __init__(self, session, base_url):
+    def __init__(self, session, base_url, load=True):
         self.session = session
         self.base_url = base_url
         self.accounts_list = []
         # self.account = None
+        #local transaction history, opened on the first sync_transactions (see transactions.py)
+        self.transactions = None
 
-        self._load_accounts()
+        #load=False gives an empty manager to fill from a snapshot without any API calls
+        if load:
+            self._load_accounts()
+        self.num_of_accounts = len(self.accounts_list)
+
+    def snapshot(self):
+        """
+        returns:
+            list of per-account raw api data, see Account.snapshot
+        """
+        return [account.snapshot() for account in self.accounts_list]
+
+    def restore(self, accounts_state):
+        """
+        purpose: rebuild accounts_list from snapshot() output without calling the api
+        """
+        self.accounts_list[:] = [Account.from_snapshot(state, parent=self) for state in accounts_state]
         self.num_of_accounts = len(self.accounts_list)
 
 
@@ -29,7 +50,10 @@ class AccountsManager:
         url = self.base_url + "/v1/accounts/list.json"
 
         #call api
-        response = self.session.get(url)
+        with metrics.timer('etrade', 'accounts/list') as t:
+            response = self.session.get(url)
+            if response is None or response.status_code != 200:
+                t.fail()
         logger.debug("Request Header (_load_accounts): %s", response.request.headers)
 
         #if no error
@@ -83,23 +107,36 @@ class AccountsManager:
             accountId:
             totalPages:
 
+        returns:
+            (positions, totals) over every page, or ({}, {}) if any page failed
         """
         url = f"{self.base_url}/v1/accounts/{accountIdKey}/portfolio.json"
-        params = {"totalsRequired": True}
         # headers = {"consumerkey": config["DEFAULT"]["CONSUMER_KEY"]}
-
-        response = self.session.get(url, params=params)
-        logger.debug("Request Header (_fetch_portfolio): %s", response.request.headers)
         positions = {}
         accountTotals = {}
 
-
-        #need to add more thorough error checking
-        if response is not None and response.status_code == 200:
-            parsed = json.loads(response.text)
-            logger.debug("Response Body: %s", json.dumps(parsed, indent=4, sort_keys=True))
+        #large accounts come back in pages; AccountPortfolio.totalPages says how many
+        page_number = 1
+        total_pages = 1
+        while page_number <= total_pages:
+            params = {"totalsRequired": True, "pageNumber": page_number}
+            with metrics.timer('etrade', 'portfolio') as t:
+                response = self.session.get(url, params=params)
+                if response is None or response.status_code != 200:
+                    t.fail()
+            #need to add more thorough error checking
+            if response is None or response.status_code != 200:
+                logger.error("Portfolio API error (page %s): %s %s", page_number,
+                             response.status_code if response is not None else None,
+                             response.text if response is not None else None)
+                #never a partial portfolio: the missing pages would read as sold positions
+                return {}, {}
+            logger.debug("Request Header (_fetch_portfolio): %s", response.request.headers)
 
             data = response.json()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Response Body: %s", json.dumps(data, indent=4, sort_keys=True))
+
             if data is not None and "PortfolioResponse" in data:
                 try:
                     if "Totals" in data["PortfolioResponse"]:
@@ -107,14 +144,18 @@ class AccountsManager:
 
                     if "AccountPortfolio" in data["PortfolioResponse"]:
                         for acctPortfolio in data["PortfolioResponse"]["AccountPortfolio"]:
+                            if acctPortfolio is not None:
+                                total_pages = max(total_pages, int(acctPortfolio.get("totalPages") or 1))
                             if acctPortfolio is not None and "Position" in acctPortfolio:
-                                for index, position in enumerate(acctPortfolio["Position"]):
-                                    positions[index] = position
+                                for position in acctPortfolio["Position"]:
+                                    positions[len(positions)] = position
                 except Exception as e:
                     logger.error("failed to parse response: %s",e)
+                    return {}, {}
             else:
-                logger.error("Portfolio API error: %s %s", response.status_code if response else None,
-                             response.text if response else None)
+                logger.error("Portfolio API error: %s %s", response.status_code, response.text)
+                return {}, {}
+            page_number += 1
         return positions, accountTotals
 
     def fetch_balances(self, accountIdKey:str, institutionType:str):
@@ -122,7 +163,10 @@ class AccountsManager:
         params = {'instType': institutionType, 'realTimeNAV': 'true'}
         headers = {"consumerkey": config.CONSUMER_KEY}
 
-        response = self.session.get(url, params=params, headers=headers)
+        with metrics.timer('etrade', 'balance') as t:
+            response = self.session.get(url, params=params, headers=headers)
+            if response is None or response.status_code != 200:
+                t.fail()
         logger.debug("Request url: %s", url)
         logger.debug("Request headers: %s", response.request.headers)
         
@@ -157,42 +201,191 @@ class AccountsManager:
         
         return balances
 
-    def calculate_total_assets_across_accounts(self):
-        total_assets = 0.0
+    def fetch_position_lots(self, lotsDetails:str):
+        """
+        purpose: the tax lots behind one position
+        arguments:
+            lotsDetails: the position's lotsDetails url from the portfolio response
+        returns:
+            list of PositionLot dicts (positionLotId, price, remainingQty, acquiredDate, ...); None on error
+        """
+        url = lotsDetails if lotsDetails.endswith('.json') else lotsDetails + '.json'
+        with metrics.timer('etrade', 'position_lots') as t:
+            response = self.session.get(url)
+            if response is None or response.status_code != 200:
+                t.fail()
+
+        if response is None or response.status_code != 200:
+            logger.error("Position lots API error: %s %s", response.status_code if response is not None else None,
+                         response.text if response is not None else None)
+            return None
+        try:
+            return response.json()["PositionLotsResponse"].get("PositionLot", [])
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            logger.error("failed to parse position lots response: %s", e)
+            return None
+
+    def fetch_transactions_page(self, accountIdKey:str, start_date, end_date, marker=None):
+        """
+        purpose: one page of an account's transactions, oldest first
+        arguments:
+            start_date, end_date: datetime.date range, inclusive
+            marker: the previous page's marker, None for the first page
+        returns:
+            (list of Transaction dicts, marker of the next page or None after the last one);
+            None for the list on error
+        """
+        url = f"{self.base_url}/v1/accounts/{accountIdKey}/transactions.json"
+        params = {'startDate': api_date(start_date), 'endDate': api_date(end_date),
+                  'sortOrder': 'ASC', 'count': PAGE_SIZE}
+        if marker is not None:
+            params['marker'] = marker
+        with metrics.timer('etrade', 'transactions') as t:
+            response = self.session.get(url, params=params)
+            if response is None or response.status_code not in (200, 204):
+                t.fail()
+
+        # 204: nothing in the range
+        if response is not None and response.status_code == 204:
+            return [], None
+        if response is None or response.status_code != 200:
+            logger.error("Transactions API error: %s %s", response.status_code if response is not None else None,
+                         response.text if response is not None else None)
+            return None, None
+        try:
+            data = response.json()["TransactionListResponse"]
+            transactions = data.get("Transaction", [])
+            more = data.get("moreTransactions") in (True, 'true')
+            return transactions, (data.get("marker") if more else None)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            logger.error("failed to parse transactions response: %s", e)
+            return None, None
+
+    def sync_transactions(self, accountIdKeys=None, store=None, stop=None):
+        """
+        purpose: bring the local transaction store up to date - the whole history on an account's first
+                 sync, only what is new since its cursor afterwards
+        arguments:
+            accountIdKeys: accounts to sync, default all
+            store: TransactionStore, default self.transactions (opened from config on first use)
+            stop: threading.Event; once set, the sync ends after the page being fetched
+        returns:
+            dict accountIdKey -> number of new transactions; accounts whose sync failed are left out
+        note: the cursor moves page by page, so an interrupted first sync picks up where it stopped
+        """
+        if store is None:
+            if self.transactions is None:
+                self.transactions = transaction_store_from_config()
+            store = self.transactions
+        if accountIdKeys is None:
+            accountIdKeys = [account.accountIdKey for account in self.accounts_list]
+
+        added = {}
+        for key in accountIdKeys:
+            if stop is not None and stop.is_set():
+                break
+            start_date, end_date = store.sync_window(key)
+            cursor, new, marker = store.cursor(key), 0, None
+            with metrics.timer('transactions', 'sync') as t:
+                while True:
+                    transactions, marker = self.fetch_transactions_page(key, start_date, end_date, marker)
+                    if transactions is None:
+                        t.fail()
+                        break
+                    new += store.append(key, transactions)
+                    dates = [int(tr['transactionDate']) for tr in transactions if 'transactionDate' in tr]
+                    if dates:
+                        cursor = max(dates) if cursor is None else max(cursor, max(dates))
+                    # an empty history still counts as synced, so the next sync is incremental too
+                    store.set_cursor(key, cursor if cursor is not None else int(time.time() * 1000),
+                                     int(time.time() * 1000))
+                    if marker is None:
+                        added[key] = new
+                        break
+                    if stop is not None and stop.is_set():
+                        break
+            metrics.increment('transactions', 'new', new)
+        return added
+
+    def account_values(self):
+        """
+        returns:
+            dict accountIdKey -> (market value, cash, day's gain) for every account with totals,
+            what the footer shows and the equity curve records (see equity_curve.py)
+        """
+        values = {}
         for account in self.accounts_list:
             try:
                 if hasattr(account, 'accounttotals') and account.accounttotals is not None:
                     total_market_value = account.accounttotals.get('totalMarketValue', 0.0) or 0.0
                     cash_balance = account.accounttotals.get('cashBalance', 0.0) or 0.0
-                    account_net_value = total_market_value + cash_balance
-                    total_assets += account_net_value
+                    todays_gain_loss = account.accounttotals.get('todaysGainLoss', 0.0) or 0.0
+                    values[account.accountIdKey] = (float(total_market_value), float(cash_balance),
+                                                    float(todays_gain_loss))
             except Exception as e:
                 logger.error(f"Error calculating assets for account {account.accountIdKey}: {e}")
                 continue
-        return total_assets
+        return values
+
+    @timed('etrade', 'total_assets')
+    def calculate_total_assets_across_accounts(self, values=None):
+        """
+        arguments:
+            values: account_values() output when the caller already has it
+        """
+        if values is None:
+            values = self.account_values()
+        return sum(market_value + cash for market_value, cash, _ in values.values())
 
 
 
 
 class Account:
-    def __init__(self, account, parent=None):
+    def __init__(self, account, parent=None, load=True):
         self.parent = parent
         self.account_info = account
         self.accountIdKey = account.get('accountIdKey')
         self.institutionType = account.get('institutionType')
 
-
-        self.positionsRaw, self.accounttotalsRaw = parent.fetch_portfolio(self.accountIdKey)
+        self.positionsRaw, self.accounttotalsRaw, self.balancesRaw = None, None, None
+        #positionId -> (quantity the lots were fetched at, list of PositionLot); see get_lots
+        self.lots = {}
         self.positions = None
         self.accounttotals = None
+        self.balances = None
+        if not load:
+            return
+
+        self.positionsRaw, self.accounttotalsRaw = parent.fetch_portfolio(self.accountIdKey)
         self._build_positions_df()
         self._build_accounttotals_df()
 
 
         self.balancesRaw = parent.fetch_balances(self.accountIdKey, self.account_info.get('institutionType'))
-        self.balances = None
         self._build_balances_df()
 
+    @staticmethod
+    def from_snapshot(state, parent=None):
+        """
+        purpose: build an Account from Account.snapshot() output, no api calls
+        """
+        account = Account(state['account_info'], parent=parent, load=False)
+        # json turns the integer position keys into strings
+        account.positionsRaw = {int(k): v for k, v in (state.get('positionsRaw') or {}).items()}
+        account.accounttotalsRaw = state.get('accounttotalsRaw') or {}
+        account.balancesRaw = state.get('balancesRaw') or {}
+        account._build_positions_df()
+        account._build_accounttotals_df()
+        account._build_balances_df()
+        return account
+
+    def snapshot(self):
+        return {
+            'account_info': self.account_info,
+            'positionsRaw': self.positionsRaw or {},
+            'accounttotalsRaw': self.accounttotalsRaw or {},
+            'balancesRaw': self.balancesRaw or {},
+        }
 
 
     def get_positions_raw(self):
@@ -209,6 +402,7 @@ class Account:
         else:
             return self.positions
 
+    @timed('dataframe', 'positions')
     def _build_positions_df(self):
         if self.positionsRaw is not None:
             data = []
@@ -254,6 +448,8 @@ class Account:
                     'totalGain': pos['totalGain'],
                     'totalGainPct': pos['totalGainPct']
                 })
+            #build the frame once after collecting rows (building it per row was O(n^2))
+            if data:
                 positions = pd.DataFrame(data)
                 positions.index.name = "#"
                 self.positions = positions
@@ -261,6 +457,30 @@ class Account:
             self.positions = None
             print(f"Account {self.accountIdKey} has no positions")
 
+    def get_lots(self, position_ids):
+        """
+        purpose: lot details for some positions, fetched on first use and cached per position
+        arguments:
+            position_ids: positionId values from the positions frame
+        returns:
+            dict positionId -> list of PositionLot; positions whose lots could not be fetched are left out
+        note: a position's lots are fetched again once its quantity differs from when they were cached;
+              one request per position, so ask for the positions you are looking at, not the account
+        """
+        lots = {}
+        if self.positions is None or self.positions.empty:
+            return lots
+        wanted = self.positions[self.positions['positionId'].isin(list(position_ids))]
+        for position_id, quantity, url in zip(wanted['positionId'], wanted['quantity'], wanted['lotsDetails']):
+            cached = self.lots.get(position_id)
+            if cached is None or cached[0] != quantity:
+                fetched = self.parent.fetch_position_lots(url) if self.parent is not None and url else None
+                if fetched is None:
+                    continue
+                cached = self.lots[position_id] = (quantity, fetched)
+            lots[position_id] = cached[1]
+        return lots
+
     def get_accounttotals_raw(self):
         if self.accounttotalsRaw is not None:
             return self.accounttotalsRaw
@@ -275,6 +495,7 @@ class Account:
         else:
             return self.accounttotals
 
+    @timed('dataframe', 'accounttotals')
     def _build_accounttotals_df(self):
         if self.accounttotalsRaw:
             if isinstance(self.accounttotalsRaw, dict):
@@ -300,6 +521,7 @@ class Account:
         else:
             return self.balances
 
+    @timed('dataframe', 'balances')
     def _build_balances_df(self):
         if self.balancesRaw:
             if isinstance(self.balancesRaw, dict):
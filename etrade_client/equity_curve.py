@@ -0,0 +1,256 @@
+"""
+Equity curve: the history of our own account values.
+
+The footer works out every account's market value, cash and day's gain on each
+poll (AccountsManager.account_values); EquityCurveStore.record() appends them,
+and their total across accounts, to a file of fixed-width RECORD_DTYPE records -
+64 bytes each, oldest first. Appending is one small write; reading is one
+np.fromfile and a searchsorted on the time column, so years of history chart
+without a database.
+
+An account is written only when its values changed, at most every
+min_interval_s. compact() thins old records to the last one per COMPACTION
+bucket (15 minutes after a week, a day after 90 days); it runs when the store
+opens and once a day after that.
+
+note: the file holds account values unencrypted, like the dashboard snapshot
+"""
+
+import logging
+import os
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+import numpy as np
+import pandas as pd
+
+from etrade_client.market_calendar import EXCHANGE_TZ
+from etrade_client.transactions import to_epoch_ms
+from utils.metrics import metrics
+
+logger = logging.getLogger('equity_curve')
+logger.setLevel(logging.WARNING)
+handler = RotatingFileHandler("python_client.log", maxBytes=5*1024*1024, backupCount=3)
+FORMAT = "%(asctime)-15s %(message)s"
+fmt = logging.Formatter(FORMAT, datefmt='%m/%d/%Y %I:%M:%S %p')
+handler.setFormatter(fmt)
+logger.addHandler(handler)
+
+DEFAULT_PATH = "equity_curve.bin"
+#seconds between two records of one account
+DEFAULT_MIN_INTERVAL_S = 60
+#key of the records summing every account
+TOTAL_KEY = 'TOTAL'
+#(age in seconds, bucket in seconds): records older than the age keep only the last one per bucket
+COMPACTION = ((7 * 86400, 15 * 60), (90 * 86400, 86400))
+DAY_MS = 86400 * 1000
+
+#epoch ms, accountIdKey (or TOTAL_KEY), market value, cash, day's gain - 64 bytes
+RECORD_DTYPE = np.dtype([('t', '<i8'), ('key', 'S32'), ('market_value', '<f8'), ('cash', '<f8'),
+                         ('day_gain', '<f8')])
+
+
+def downsample_minmax(frame, column, max_points):
+    """
+    purpose: thin a time-ordered frame for a chart, keeping the lowest and highest point of
+             every bucket so drawdowns and peaks survive (utils.snapshot.downsample would step
+             over them)
+    returns:
+        frame itself if it has at most max_points rows, else at most max_points of its rows in order
+    """
+    n = len(frame)
+    if max_points < 4 or n <= max_points:
+        return frame
+    values = frame[column].to_numpy(dtype=float)
+    edges = np.linspace(0, n, max_points // 2 + 1).astype(int)
+    bucket = np.repeat(np.arange(len(edges) - 1), np.diff(edges))
+    keep = [np.array([0, n - 1])]
+    for extreme in (np.fmin.reduceat(values, edges[:-1]), np.fmax.reduceat(values, edges[:-1])):
+        # first row of each bucket holding its extreme; all-nan buckets have none
+        hits = np.flatnonzero(values == extreme[bucket])
+        _, first = np.unique(bucket[hits], return_index=True)
+        keep.append(hits[first])
+    return frame.iloc[np.unique(np.concatenate(keep))]
+
+
+class EquityCurveStore:
+    """
+    purpose: append-only file of account value records
+    arguments:
+        path: record file
+        min_interval_s: seconds between two records of one account
+    note: record() runs on the gui thread from the footer, read() from the chart pane; a lock
+          keeps a compaction from swapping the file under either
+    """
+
+    def __init__(self, path=DEFAULT_PATH, min_interval_s=DEFAULT_MIN_INTERVAL_S):
+        self.path = path
+        self.min_interval_ms = int(min_interval_s * 1000)
+        self._lock = threading.Lock()
+        self._file = None
+        self._last = {}             # key -> (t, rounded values) of its newest record
+        self._last_t = 0
+        self._compacted_at = None
+        self.compact()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _read_all(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return np.empty(0, RECORD_DTYPE), 0
+        # a record cut short by a crash is dropped
+        return np.fromfile(self.path, dtype=RECORD_DTYPE, count=size // RECORD_DTYPE.itemsize), size
+
+    def record(self, values, now_ms=None):
+        """
+        purpose: append the accounts whose values changed since their last record
+        arguments:
+            values: dict accountIdKey -> (market value, cash, day's gain), see AccountsManager.account_values
+        returns:
+            number of records written
+        """
+        if not values:
+            return 0
+        now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+        totals = tuple(sum(column) for column in zip(*values.values()))
+        with self._lock:
+            if self._file is None:
+                return 0
+            # the time column stays sorted even if the clock steps back
+            now_ms = max(now_ms, self._last_t)
+            rows = []
+            for key, row in [*values.items(), (TOTAL_KEY, totals)]:
+                rounded = tuple(round(v, 2) for v in row)
+                last = self._last.get(key)
+                if last is not None and (last[1] == rounded or now_ms - last[0] < self.min_interval_ms):
+                    continue
+                self._last[key] = (now_ms, rounded)
+                rows.append((now_ms, key.encode()[:32], *row))
+            if rows:
+                with metrics.timer('equity_curve', 'record') as t:
+                    try:
+                        self._file.write(np.array(rows, dtype=RECORD_DTYPE).tobytes())
+                        self._file.flush()
+                    except OSError as e:
+                        logger.warning("failed to append to equity curve %s: %s", self.path, e)
+                        t.fail()
+                        return 0
+                self._last_t = now_ms
+        if now_ms - self._compacted_at >= DAY_MS:
+            self.compact(now_ms)
+        return len(rows)
+
+    def compact(self, now_ms=None):
+        """
+        purpose: thin records older than the COMPACTION ages and reopen the file for appending
+        returns:
+            number of records dropped
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+        with self._lock, metrics.timer('equity_curve', 'compact') as t:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            data, size = self._read_all()
+            kept = data
+            if len(data):
+                bucket_ms = np.zeros(len(data), dtype=np.int64)
+                for age_s, bucket_s in COMPACTION:
+                    bucket_ms[now_ms - data['t'] >= age_s * 1000] = bucket_s * 1000
+                old = bucket_ms > 0
+                if old.any():
+                    # buckets in New York wall time, so a daily bucket is a New York day
+                    local_ms = pd.to_datetime(data['t'][old], unit='ms', utc=True).tz_convert(EXCHANGE_TZ) \
+                        .tz_localize(None).as_unit('ms').asi8
+                    buckets = pd.DataFrame({'key': data['key'][old], 'size': bucket_ms[old],
+                                            'slot': local_ms // bucket_ms[old]})
+                    keep = np.ones(len(data), dtype=bool)
+                    keep[np.flatnonzero(old)] = ~buckets.duplicated(['key', 'size', 'slot'], keep='last').to_numpy()
+                    kept = data[keep]
+            try:
+                if len(kept) != len(data) or size != data.nbytes:
+                    tmp_path = self.path + ".tmp"
+                    kept.tofile(tmp_path)
+                    os.replace(tmp_path, self.path)
+                self._file = open(self.path, 'ab')
+            except OSError as e:
+                logger.warning("failed to compact equity curve %s: %s", self.path, e)
+                t.fail()
+            for row in kept[::-1]:
+                key = row['key'].decode()
+                if key not in self._last:
+                    self._last[key] = (int(row['t']), tuple(round(float(row[c]), 2)
+                                                            for c in ('market_value', 'cash', 'day_gain')))
+            if len(kept):
+                self._last_t = max(self._last_t, int(kept['t'][-1]))
+            self._compacted_at = now_ms
+        dropped = len(data) - len(kept)
+        if dropped:
+            metrics.increment('equity_curve', 'compacted', dropped)
+        return dropped
+
+    def keys(self):
+        """
+        returns:
+            keys with records, TOTAL_KEY included
+        """
+        with self._lock:
+            return list(self._last)
+
+    def last_time(self, key=TOTAL_KEY):
+        """
+        returns:
+            epoch ms of the key's newest record, None if it has none
+        """
+        with self._lock:
+            last = self._last.get(key)
+        return last[0] if last else None
+
+    def read(self, key=TOTAL_KEY, start=None, end=None):
+        """
+        purpose: one account's (or the total's) curve
+        arguments:
+            key: accountIdKey or TOTAL_KEY
+            start, end: inclusive bounds, see transactions.to_epoch_ms
+        returns:
+            DataFrame indexed by New York time with market_value, cash, net_value and day_gain
+        """
+        with metrics.timer('equity_curve', 'read'):
+            with self._lock:
+                data, _ = self._read_all()
+            times = data['t']
+            lo = 0 if start is None else np.searchsorted(times, to_epoch_ms(start), side='left')
+            hi = len(data) if end is None else np.searchsorted(times, to_epoch_ms(end), side='right')
+            data = data[lo:hi]
+            data = data[data['key'] == key.encode()[:32]]
+            frame = pd.DataFrame({'market_value': data['market_value'], 'cash': data['cash']},
+                                 index=pd.to_datetime(data['t'], unit='ms', utc=True).tz_convert(EXCHANGE_TZ))
+            frame['net_value'] = frame['market_value'] + frame['cash']
+            frame['day_gain'] = data['day_gain']
+        return frame
+
+
+def equity_curve_from_config():
+    """
+    purpose: open the EquityCurveStore described by config.py, or None unless EQUITY_CURVE_ENABLED is on
+    note: off by default - the file holds account values unencrypted, so it is opted into
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    if not getattr(config, 'EQUITY_CURVE_ENABLED', False):
+        return None
+    try:
+        return EquityCurveStore(getattr(config, 'EQUITY_CURVE_PATH', DEFAULT_PATH),
+                                getattr(config, 'EQUITY_CURVE_INTERVAL_S', DEFAULT_MIN_INTERVAL_S))
+    except OSError as e:
+        logger.warning("equity curve disabled: %s", e)
+        return None
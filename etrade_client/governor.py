@@ -0,0 +1,291 @@
+"""
+Process-wide rate control for E*TRADE API calls.
+
+Every request takes a token from the bucket for its endpoint class (accounts,
+market, order) before it goes out. Waiters on a bucket are served by priority:
+order traffic, then the account on screen, then background accounts. A throttle
+response (HTTP 429) pauses all classes until Retry-After has passed and lowers
+that class's rate, which then creeps back up as requests succeed. This turns
+pollers racing into throttling into a steady request rate.
+
+usage:
+    session = GovernedSession(oauth_session)            # uses shared_governor
+    with request_priority(SELECTED):
+        session.get(url)
+"""
+
+import email.utils
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from urllib.parse import urlparse
+
+from utils.metrics import metrics
+
+logger = logging.getLogger('governor')
+logger.setLevel(logging.WARNING)
+handler = RotatingFileHandler("python_client.log", maxBytes=5*1024*1024, backupCount=3)
+FORMAT = "%(asctime)-15s %(message)s"
+fmt = logging.Formatter(FORMAT, datefmt='%m/%d/%Y %I:%M:%S %p')
+handler.setFormatter(fmt)
+logger.addHandler(handler)
+
+# lower value is served first
+ORDER = 0
+SELECTED = 1
+BACKGROUND = 2
+
+ACCOUNTS = 'accounts'
+MARKET = 'market'
+ORDERS = 'order'
+
+# requests/second and burst per endpoint class; override with RATE_LIMITS in config.py
+DEFAULT_LIMITS = {
+    ACCOUNTS: (2.0, 4),
+    MARKET: (4.0, 8),
+    ORDERS: (2.0, 2),
+}
+
+THROTTLE_STATUS = 429
+DEFAULT_RETRY_AFTER = 1.0
+MAX_RETRY_AFTER = 60.0
+
+_local = threading.local()
+
+
+def current_priority():
+    return getattr(_local, 'priority', BACKGROUND)
+
+
+@contextmanager
+def request_priority(priority):
+    """
+    purpose: set the priority of requests made by this thread inside the block
+    """
+    previous = current_priority()
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def endpoint_class(url):
+    path = urlparse(url).path
+    if path.startswith('/v1/market'):
+        return MARKET
+    if '/orders' in path:
+        return ORDERS
+    return ACCOUNTS
+
+
+def parse_retry_after(value):
+    """
+    returns:
+        seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    def __init__(self, rate, burst, now):
+        self.limit = (float(rate), float(burst))
+        self.configured_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until_token(self):
+        return max(0.0, (1.0 - self.tokens) / self.rate)
+
+    def slow_down(self):
+        self.rate = max(self.configured_rate * 0.1, self.rate * 0.7)
+        self.tokens = min(self.tokens, 0.0)
+
+    def speed_up(self):
+        self.rate = min(self.configured_rate, self.rate + self.configured_rate * 0.02)
+
+    def share(self, fraction):
+        rate, burst = self.limit
+        self.configured_rate = rate * fraction
+        self.rate = min(self.rate, self.configured_rate)
+        self.burst = max(1.0, burst * fraction)
+        self.tokens = min(self.tokens, self.burst)
+
+
+class RequestGovernor:
+    """
+    purpose: token bucket per endpoint class with priority queues and a shared throttle pause
+    arguments:
+        limits: endpoint class -> (requests per second, burst)
+        clock: monotonic clock in seconds (inject for tests)
+    """
+
+    def __init__(self, limits=None, clock=time.monotonic):
+        self.clock = clock
+        now = clock()
+        limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self._buckets = {name: TokenBucket(rate, burst, now) for name, (rate, burst) in limits.items()}
+        self._waiting = {name: [] for name in limits}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self.stats = {'granted': 0, 'throttled': 0, 'waited_ms': 0.0}
+
+    def _bucket(self, name):
+        return name if name in self._buckets else ACCOUNTS
+
+    def acquire(self, name, priority=BACKGROUND):
+        """
+        purpose: block until a request of this class and priority may be sent
+        returns:
+            milliseconds spent waiting
+        """
+        name = self._bucket(name)
+        bucket, queue = self._buckets[name], self._waiting[name]
+        entry = (priority, next(self._seq))
+        started = self.clock()
+        with self._cond:
+            heapq.heappush(queue, entry)
+            try:
+                while True:
+                    now = self.clock()
+                    timeout = self._paused_until - now
+                    if timeout <= 0:
+                        if queue[0] != entry:
+                            # someone more urgent is first in line; they notify when served
+                            timeout = bucket.seconds_until_token() or 0.05
+                        else:
+                            bucket.refill(now)
+                            if bucket.tokens >= 1.0:
+                                bucket.tokens -= 1.0
+                                break
+                            timeout = bucket.seconds_until_token()
+                    self._cond.wait(timeout)
+            finally:
+                if queue and queue[0] == entry:
+                    heapq.heappop(queue)
+                elif entry in queue:
+                    queue.remove(entry)
+                    heapq.heapify(queue)
+                self._cond.notify_all()
+
+            waited_ms = (self.clock() - started) * 1000.0
+            self.stats['granted'] += 1
+            self.stats['waited_ms'] += waited_ms
+        metrics.observe('governor', name + '.wait', waited_ms)
+        return waited_ms
+
+    def throttled(self, name, retry_after=None):
+        """
+        purpose: record a throttle response; pauses every class and slows this one down
+        """
+        name = self._bucket(name)
+        delay = min(MAX_RETRY_AFTER, retry_after if retry_after is not None else DEFAULT_RETRY_AFTER)
+        with self._cond:
+            self._paused_until = max(self._paused_until, self.clock() + delay)
+            self._buckets[name].slow_down()
+            self.stats['throttled'] += 1
+            self._cond.notify_all()
+        metrics.increment('governor', name + '.throttled')
+        logger.warning("%s throttled, pausing all requests for %.1f s (rate now %.2f/s)",
+                       name, delay, self._buckets[name].rate)
+
+    def succeeded(self, name):
+        name = self._bucket(name)
+        with self._cond:
+            self._buckets[name].speed_up()
+
+    def share(self, fraction):
+        """
+        purpose: run at fraction of the configured rates, for a process sharing the account's
+                 limits with another (the data service, see data_providers/data_service.py)
+        note: only the gui places orders, so the order class keeps its full rate
+        """
+        with self._cond:
+            for name, bucket in self._buckets.items():
+                if name != ORDERS:
+                    bucket.share(fraction)
+            self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                **self.stats,
+                'paused_s': max(0.0, self._paused_until - self.clock()),
+                'rates': {name: bucket.rate for name, bucket in self._buckets.items()},
+                'waiting': {name: len(queue) for name, queue in self._waiting.items()},
+            }
+
+
+def governor_from_config():
+    try:
+        import config
+    except ImportError:
+        config = None
+    return RequestGovernor(getattr(config, 'RATE_LIMITS', None))
+
+
+shared_governor = governor_from_config()
+
+
+class GovernedSession:
+    """
+    purpose: wrap an OAuth (or plain requests) session so every call goes through the governor
+    arguments:
+        session: object with get/post/put/delete like rauth's OAuth1Session
+        governor: RequestGovernor, defaults to shared_governor
+        max_retries: times a throttled request is retried after the pause
+    note: other attributes are passed through to the wrapped session
+    """
+
+    def __init__(self, session, governor=None, max_retries=3):
+        self.session = session
+        self.governor = governor if governor is not None else shared_governor
+        self.max_retries = max_retries
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def request(self, method, url, **kwargs):
+        name = endpoint_class(url)
+        priority = ORDER if name == ORDERS else current_priority()
+        for attempt in range(self.max_retries + 1):
+            self.governor.acquire(name, priority)
+            response = getattr(self.session, method)(url, **kwargs)
+            if response is None or response.status_code != THROTTLE_STATUS:
+                self.governor.succeeded(name)
+                return response
+            self.governor.throttled(name, parse_retry_after(response.headers.get('Retry-After')))
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('get', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('post', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('put', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('delete', url, **kwargs)
@@ -1,5 +1,147 @@
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from logging.handlers import RotatingFileHandler
+from etrade_client.governor import current_priority, request_priority
+from etrade_client.options import OptionChain
+from utils.metrics import metrics
+
+logger = logging.getLogger('market')
+logger.setLevel(logging.ERROR)
+handler = RotatingFileHandler("python_client.log", maxBytes=5*1024*1024, backupCount=3)
+FORMAT = "%(asctime)-15s %(message)s"
+fmt = logging.Formatter(FORMAT, datefmt='%m/%d/%Y %I:%M:%S %p')
+handler.setFormatter(fmt)
+logger.addHandler(handler)
+
+#the quote endpoint takes up to 25 comma separated symbols per call
+QUOTE_BATCH_SIZE = 25
+#expirations of one option chain fetched at once; the governor still paces the requests
+OPTION_CHAIN_WORKERS = 6
+
+
 class Market:
     def __init__(self, session, base_url):
         self.session = session
         self.base_url = base_url
 
+    def fetch_quotes(self, symbols, detail_flag="INTRADAY"):
+        """
+        purpose: last price for many symbols, batched QUOTE_BATCH_SIZE per request
+        arguments:
+            symbols: iterable of ticker symbols
+            detail_flag: E*TRADE detailFlag; INTRADAY is the lightest one with lastTrade
+        returns:
+            dict symbol -> {'lastTrade', 'change', 'changePct', 'volume', 'time'}; symbols the api
+            rejected or that failed to fetch are left out
+        """
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        quotes = {}
+        for start in range(0, len(symbols), QUOTE_BATCH_SIZE):
+            batch = symbols[start:start + QUOTE_BATCH_SIZE]
+            url = f"{self.base_url}/v1/market/quote/{','.join(batch)}.json"
+            with metrics.timer('etrade', 'quote') as t:
+                response = self.session.get(url, params={'detailFlag': detail_flag})
+                if response is None or response.status_code != 200:
+                    t.fail()
+
+            if response is None or response.status_code != 200:
+                logger.error("Quote API error: %s %s", response.status_code if response is not None else None,
+                             response.text if response is not None else None)
+                continue
+
+            data = response.json()
+            try:
+                for quote in data["QuoteResponse"].get("QuoteData", []):
+                    detail = quote.get("Intraday") or quote.get("All") or {}
+                    if detail.get("lastTrade") is None:
+                        continue
+                    quotes[quote["Product"]["symbol"]] = {
+                        'lastTrade': detail["lastTrade"],
+                        'change': detail.get("changeClose"),
+                        'changePct': detail.get("changeClosePercentage"),
+                        'volume': detail.get("totalVolume"),
+                        'time': quote.get("dateTimeUTC"),
+                    }
+            except (KeyError, TypeError, AttributeError) as e:
+                logger.error("failed to parse quote response: %s", e)
+        return quotes
+
+    def fetch_option_expirations(self, symbol):
+        """
+        returns:
+            sorted list of datetime.date option expirations for symbol; empty on error
+        """
+        url = f"{self.base_url}/v1/market/optionexpiredate.json"
+        with metrics.timer('etrade', 'option_expirations') as t:
+            response = self.session.get(url, params={'symbol': symbol, 'expiryType': 'ALL'})
+            if response is None or response.status_code != 200:
+                t.fail()
+
+        if response is None or response.status_code != 200:
+            logger.error("Option expiration API error: %s %s", response.status_code if response is not None else None,
+                         response.text if response is not None else None)
+            return []
+        try:
+            dates = response.json()["OptionExpireDateResponse"].get("ExpirationDate", [])
+            return sorted(date(d["year"], d["month"], d["day"]) for d in dates)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            logger.error("failed to parse option expiration response: %s", e)
+            return []
+
+    def fetch_option_pairs(self, symbol, expiry, strikes=None):
+        """
+        purpose: one expiration of a chain, as the api returns it
+        arguments:
+            expiry: datetime.date
+            strikes: number of strikes around the money (None for all)
+        returns:
+            list of OptionPair dicts ({'Call': {...}, 'Put': {...}}); empty on error
+        """
+        url = f"{self.base_url}/v1/market/optionchains.json"
+        params = {'symbol': symbol, 'expiryYear': expiry.year, 'expiryMonth': expiry.month, 'expiryDay': expiry.day,
+                  'chainType': 'CALLPUT', 'includeWeekly': 'true', 'skipAdjusted': 'true'}
+        if strikes:
+            params['noOfStrikes'] = strikes
+        with metrics.timer('etrade', 'option_chain') as t:
+            response = self.session.get(url, params=params)
+            if response is None or response.status_code != 200:
+                t.fail()
+
+        if response is None or response.status_code != 200:
+            logger.error("Option chain API error: %s %s", response.status_code if response is not None else None,
+                         response.text if response is not None else None)
+            return []
+        try:
+            return response.json()["OptionChainResponse"].get("OptionPair", [])
+        except (KeyError, TypeError, AttributeError) as e:
+            logger.error("failed to parse option chain response: %s", e)
+            return []
+
+    def fetch_option_chain(self, symbol, expirations=None, strikes=None, max_workers=OPTION_CHAIN_WORKERS):
+        """
+        purpose: a symbol's chain across expirations, fetched concurrently
+        arguments:
+            expirations: datetime.dates to fetch, defaults to every listed expiration
+            strikes: number of strikes around the money per expiration (None for all)
+        returns:
+            OptionChain (see options.py) with the underlying's last price as spot;
+            call compute_greeks() on it for iv and greeks
+        """
+        if expirations is None:
+            expirations = self.fetch_option_expirations(symbol)
+        # pool threads don't inherit the caller's governor priority
+        priority = current_priority()
+
+        def with_priority(fn, *args):
+            with request_priority(priority):
+                return fn(*args)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(expirations) + 1))) as pool:
+            spot = pool.submit(with_priority, self.fetch_quotes, [symbol])
+            pairs = list(pool.map(lambda expiry: with_priority(self.fetch_option_pairs, symbol, expiry, strikes),
+                                  expirations))
+        quote = spot.result().get(symbol)
+        return OptionChain.from_option_pairs(symbol, quote['lastTrade'] if quote else math.nan,
+                                             list(zip(expirations, pairs)))
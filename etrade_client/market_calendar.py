@@ -0,0 +1,164 @@
+"""
+US equity session calendar (NYSE/Nasdaq): which trading phase a moment falls in,
+and when the next phase change happens.
+
+Holidays and early closes follow the NYSE rules and are computed per year, so
+there is no table to keep current. Ad-hoc closures (national days of mourning
+etc.) can be passed in as extra_holidays.
+"""
+
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+EXCHANGE_TZ = ZoneInfo("America/New_York")
+
+PRE_MARKET = "pre_market"
+REGULAR = "regular"
+AFTER_HOURS = "after_hours"
+CLOSED = "closed"
+
+PRE_MARKET_OPEN = time(4, 0)
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+AFTER_HOURS_CLOSE = time(20, 0)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th (1-based) weekday of the month; n=-1 for the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    # anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day):
+    # saturday holidays move to friday, sunday holidays to monday
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def nyse_holidays(year):
+    """
+    returns:
+        set of dates the exchange is closed in year (weekends excluded)
+    """
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),              # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),              # Washington's Birthday
+        _easter(year) - timedelta(days=2),        # Good Friday
+        _nth_weekday(year, 5, 0, -1),             # Memorial Day
+        _observed(date(year, 7, 4)),              # Independence Day
+        _nth_weekday(year, 9, 0, 1),              # Labor Day
+        _nth_weekday(year, 11, 3, 4),             # Thanksgiving
+        _observed(date(year, 12, 25)),            # Christmas
+    }
+    # a saturday New Year's Day is not observed on the friday before (NYSE rule 7.2)
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return holidays
+
+
+def nyse_early_closes(year):
+    """
+    returns:
+        set of dates the regular session ends at 13:00
+    """
+    candidates = [
+        date(year, 7, 3),                                      # day before Independence Day
+        _nth_weekday(year, 11, 3, 4) + timedelta(days=1),      # day after Thanksgiving
+        date(year, 12, 24),                                    # Christmas Eve
+    ]
+    holidays = nyse_holidays(year)
+    return {d for d in candidates if d.weekday() < 5 and d not in holidays}
+
+
+class MarketCalendar:
+    """
+    purpose: map a moment to a trading phase (PRE_MARKET, REGULAR, AFTER_HOURS, CLOSED)
+    arguments:
+        extra_holidays: additional full-day closures (dates)
+        tz: exchange time zone; naive datetimes passed in are taken to be in it
+    """
+
+    def __init__(self, extra_holidays=(), tz=EXCHANGE_TZ):
+        self.tz = tz
+        self.extra_holidays = set(extra_holidays)
+        self._years = {}
+
+    def _year(self, year):
+        if year not in self._years:
+            self._years[year] = (nyse_holidays(year) | {d for d in self.extra_holidays if d.year == year},
+                                 nyse_early_closes(year))
+        return self._years[year]
+
+    def _local(self, now):
+        if now.tzinfo is None:
+            return now.replace(tzinfo=self.tz)
+        return now.astimezone(self.tz)
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in self._year(day.year)[0]
+
+    def session(self, day):
+        """
+        returns:
+            list of (phase, start time, end time) for the day, empty on weekends/holidays
+        """
+        if not self.is_trading_day(day):
+            return []
+        if day in self._year(day.year)[1]:
+            # early close days have no after-hours session worth polling for
+            return [(PRE_MARKET, PRE_MARKET_OPEN, REGULAR_OPEN), (REGULAR, REGULAR_OPEN, EARLY_CLOSE)]
+        return [(PRE_MARKET, PRE_MARKET_OPEN, REGULAR_OPEN),
+                (REGULAR, REGULAR_OPEN, REGULAR_CLOSE),
+                (AFTER_HOURS, REGULAR_CLOSE, AFTER_HOURS_CLOSE)]
+
+    def phase(self, now):
+        local = self._local(now)
+        clock = local.time()
+        for phase, start, end in self.session(local.date()):
+            if start <= clock < end:
+                return phase
+        return CLOSED
+
+    def next_transition(self, now):
+        """
+        returns:
+            aware datetime of the next phase change after now (looks ahead up to two weeks)
+        """
+        local = self._local(now)
+        day = local.date()
+        for offset in range(15):
+            current = day + timedelta(days=offset)
+            for _, start, end in self.session(current):
+                for boundary in (start, end):
+                    moment = datetime.combine(current, boundary, tzinfo=self.tz)
+                    if moment > local:
+                        return moment
+        return local + timedelta(days=1)
+
+    def seconds_to_transition(self, now):
+        return (self.next_transition(now) - self._local(now)).total_seconds()
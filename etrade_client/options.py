@@ -0,0 +1,290 @@
+"""
+Option chains: a compact array-backed store and vectorized Black-Scholes.
+
+OptionChain keeps one row per contract in numpy columns - strike, bid/ask/last,
+volume, open interest - with expiry and side stored as small integer codes
+(into OptionChain.expiries and SIDES), so a chain of thousands of contracts is
+a handful of arrays instead of thousands of dicts. compute_greeks() solves
+implied volatility from each contract's mid price and evaluates the greeks for
+the whole chain at once.
+
+The model is Black-Scholes with a continuous dividend yield, i.e. European
+exercise; for listed equity options that is the usual screen approximation.
+Theta is per calendar day, vega and rho per 1 percentage point, like E*TRADE's
+OptionGreeks.
+"""
+
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from etrade_client.market_calendar import EXCHANGE_TZ, REGULAR_CLOSE
+
+CALL, PUT = 0, 1
+SIDES = ('CALL', 'PUT')
+YEAR_SECONDS = 365.0 * 86400.0
+#contracts expiring within the hour are priced as if an hour were left
+MIN_YEARS = 3600.0 / YEAR_SECONDS
+#implied volatility search range and stopping rule (price units)
+IV_LOW, IV_HIGH = 1e-4, 5.0
+IV_TOLERANCE = 1e-6
+IV_MAX_ITERATIONS = 60
+DEFAULT_RATE = 0.04
+
+_SQRT_2PI = math.sqrt(2.0 * math.pi)
+_SQRT_2 = math.sqrt(2.0)
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+
+def norm_cdf(x):
+    """
+    note: numpy has no erf; this is the Numerical Recipes erfc, relative error below 1.2e-7
+          even far in the tails, where the cheap out-of-the-money contracts are priced
+    """
+    z = np.abs(x) / _SQRT_2
+    t = 1.0 / (1.0 + 0.5 * z)
+    tail = 0.5 * t * np.exp(-z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (-0.82215223 + t * 0.17087277)))))))))
+    return np.where(x >= 0.0, 1.0 - tail, tail)
+
+
+def years_to_expiry(expiries, now=None):
+    """
+    purpose: time left until each expiry's 16:00 New York close, in years
+    arguments:
+        expiries: datetime64[D] array (or dates)
+        now: unix seconds, defaults to the current time
+    returns:
+        float array, at least MIN_YEARS
+    """
+    now = datetime.now().timestamp() if now is None else now
+    closes = [datetime.combine(pd.Timestamp(day).date(), REGULAR_CLOSE, EXCHANGE_TZ).timestamp()
+              for day in np.asarray(expiries, dtype='datetime64[D]')]
+    return np.maximum((np.asarray(closes, dtype=float) - now) / YEAR_SECONDS, MIN_YEARS)
+
+
+def _d1(spot, strike, years, vol, rate, dividend):
+    vol_sqrt_t = vol * np.sqrt(years)
+    d1 = (np.log(spot / strike) + (rate - dividend + 0.5 * vol * vol) * years) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def black_scholes(is_call, spot, strike, years, vol, rate=0.0, dividend=0.0):
+    """
+    returns:
+        option prices; every argument broadcasts (is_call is a bool array)
+    """
+    d1, d2 = _d1(spot, strike, years, vol, rate, dividend)
+    spot_df = spot * np.exp(-dividend * years)
+    strike_df = strike * np.exp(-rate * years)
+    call = spot_df * norm_cdf(d1) - strike_df * norm_cdf(d2)
+    put = strike_df * norm_cdf(-d2) - spot_df * norm_cdf(-d1)
+    return np.where(is_call, call, put)
+
+
+def greeks(is_call, spot, strike, years, vol, rate=0.0, dividend=0.0):
+    """
+    returns:
+        dict of arrays: price, delta, gamma, theta (per day), vega and rho (per 1 point)
+    """
+    d1, d2 = _d1(spot, strike, years, vol, rate, dividend)
+    sqrt_t = np.sqrt(years)
+    q_df, r_df = np.exp(-dividend * years), np.exp(-rate * years)
+    pdf_d1 = norm_pdf(d1)
+    # N(d1), N(d2) for calls and N(-d1), N(-d2) for puts; sign flips the put terms
+    sign = np.where(is_call, 1.0, -1.0)
+    n1 = np.where(is_call, norm_cdf(d1), norm_cdf(-d1))
+    n2 = np.where(is_call, norm_cdf(d2), norm_cdf(-d2))
+
+    price = sign * (spot * q_df * n1 - strike * r_df * n2)
+    theta = (-spot * q_df * pdf_d1 * vol / (2.0 * sqrt_t)
+             - sign * rate * strike * r_df * n2
+             + sign * dividend * spot * q_df * n1)
+    return {
+        'price': price,
+        'delta': sign * q_df * n1,
+        'gamma': q_df * pdf_d1 / (spot * vol * sqrt_t),
+        'theta': theta / 365.0,
+        'vega': spot * q_df * pdf_d1 * sqrt_t / 100.0,
+        'rho': sign * strike * years * r_df * n2 / 100.0,
+    }
+
+
+def implied_volatility(price, is_call, spot, strike, years, rate=0.0, dividend=0.0):
+    """
+    purpose: volatility at which black_scholes gives price, for every contract at once
+    returns:
+        float array; NaN where the price is outside what any volatility can produce
+        (below intrinsic value, above the no-arbitrage bound) or missing
+    note: Newton steps on vega, kept inside a per-contract bracket that shrinks every pass;
+          a step that leaves the bracket (or a vanishing vega) falls back to bisection.
+          Converged contracts drop out of the working set.
+    """
+    price, is_call = np.asarray(price, dtype=float), np.asarray(is_call, dtype=bool)
+    spot, strike, years = np.broadcast_arrays(np.asarray(spot, dtype=float),
+                                              np.asarray(strike, dtype=float), np.asarray(years, dtype=float))
+    spot_df, strike_df = spot * np.exp(-dividend * years), strike * np.exp(-rate * years)
+    intrinsic = np.maximum(np.where(is_call, spot_df - strike_df, strike_df - spot_df), 0.0)
+    bound = np.where(is_call, spot_df, strike_df)
+    result = np.full(price.shape, np.nan)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        active = np.flatnonzero(np.isfinite(price) & (price > intrinsic) & (price < bound) & (strike > 0))
+        target = price[active]
+        call, s, k, t = is_call[active], spot[active], strike[active], years[active]
+        lo, hi = np.full(active.size, IV_LOW), np.full(active.size, IV_HIGH)
+        # Brenner-Subrahmanyam starting point
+        vol = np.clip(np.sqrt(2.0 * math.pi / t) * target / s, 0.05, 2.0)
+
+        for _ in range(IV_MAX_ITERATIONS):
+            if not active.size:
+                break
+            d1, d2 = _d1(s, k, t, vol, rate, dividend)
+            q_df, r_df = np.exp(-dividend * t), np.exp(-rate * t)
+            model = np.where(call, s * q_df * norm_cdf(d1) - k * r_df * norm_cdf(d2),
+                             k * r_df * norm_cdf(-d2) - s * q_df * norm_cdf(-d1))
+            diff = model - target
+            done = (np.abs(diff) < IV_TOLERANCE) | (hi - lo < 1e-10)
+            result[active[done]] = vol[done]
+
+            keep = ~done
+            active, target, call, s, k, t = active[keep], target[keep], call[keep], s[keep], k[keep], t[keep]
+            vol, diff, d1 = vol[keep], diff[keep], d1[keep]
+            # price rises with volatility: too high means the answer is below vol
+            hi = np.where(diff > 0.0, vol, hi[keep])
+            lo = np.where(diff < 0.0, vol, lo[keep])
+            vega = s * np.exp(-dividend * t) * norm_pdf(d1) * np.sqrt(t)
+            step = vol - diff / vega
+            vol = np.where((step > lo) & (step < hi), step, 0.5 * (lo + hi))
+    return result
+
+
+class OptionChain:
+    """
+    purpose: every contract of one underlying, one row per contract in numpy columns
+    attributes:
+        symbol, spot (underlying last price), as_of (unix seconds)
+        expiries: sorted datetime64[D] array; expiry_code (int16) indexes it
+        side: int8, CALL or PUT
+        strike, bid, ask, last: float64
+        volume, open_interest: int64
+        osi_key: object array of OSI contract keys
+        iv, delta, gamma, theta, vega, rho: float64, NaN until compute_greeks()
+    """
+    GREEKS = ('iv', 'delta', 'gamma', 'theta', 'vega', 'rho')
+
+    def __init__(self, symbol, spot, expiries, expiry_code, side, strike, bid, ask, last, volume,
+                 open_interest, osi_key, as_of=None):
+        self.symbol = symbol
+        self.spot = float(spot) if spot is not None else math.nan
+        self.as_of = datetime.now().timestamp() if as_of is None else as_of
+        self.expiries = np.asarray(expiries, dtype='datetime64[D]')
+        self.expiry_code = np.asarray(expiry_code, dtype=np.int16)
+        self.side = np.asarray(side, dtype=np.int8)
+        self.strike = np.asarray(strike, dtype=float)
+        self.bid = np.asarray(bid, dtype=float)
+        self.ask = np.asarray(ask, dtype=float)
+        self.last = np.asarray(last, dtype=float)
+        self.volume = np.asarray(volume, dtype=np.int64)
+        self.open_interest = np.asarray(open_interest, dtype=np.int64)
+        self.osi_key = np.asarray(osi_key, dtype=object)
+        for name in self.GREEKS:
+            setattr(self, name, np.full(len(self.strike), np.nan))
+
+    def __len__(self):
+        return len(self.strike)
+
+    @classmethod
+    def from_option_pairs(cls, symbol, spot, chains, as_of=None):
+        """
+        purpose: build a chain from optionchains.json responses in one pass
+        arguments:
+            chains: list of (expiry date, OptionPair list) - one entry per expiration
+        """
+        expiries = sorted({expiry for expiry, _ in chains})
+        code_of = {expiry: i for i, expiry in enumerate(expiries)}
+        codes, sides, keys, numbers = [], [], [], []
+        for expiry, pairs in chains:
+            code = code_of[expiry]
+            for pair in pairs or ():
+                for side, name in ((CALL, 'Call'), (PUT, 'Put')):
+                    contract = pair.get(name)
+                    if not contract:
+                        continue
+                    codes.append(code)
+                    sides.append(side)
+                    keys.append(contract.get('osiKey', ''))
+                    numbers.append((contract.get('strikePrice'), contract.get('bid'), contract.get('ask'),
+                                    contract.get('lastPrice'), contract.get('volume') or 0,
+                                    contract.get('openInterest') or 0))
+        # None (missing quote) becomes NaN in the float columns
+        values = np.array(numbers, dtype=float).reshape(len(numbers), 6)
+        return cls(symbol, spot, np.array(expiries, dtype='datetime64[D]'), codes, sides,
+                   values[:, 0], values[:, 1], values[:, 2], values[:, 3],
+                   np.nan_to_num(values[:, 4]), np.nan_to_num(values[:, 5]), keys, as_of)
+
+    @property
+    def mid(self):
+        """
+        returns:
+            (bid + ask) / 2 where both sides are quoted, else the last trade
+        """
+        quoted = (self.bid > 0.0) & (self.ask >= self.bid)
+        return np.where(quoted, 0.5 * (self.bid + self.ask), self.last)
+
+    def years(self, now=None):
+        return years_to_expiry(self.expiries, self.as_of if now is None else now)[self.expiry_code]
+
+    def compute_greeks(self, rate=None, dividend=0.0, now=None):
+        """
+        purpose: implied volatility from the mid price, then greeks at that volatility
+        arguments:
+            rate: continuously compounded risk-free rate; OPTIONS_RISK_FREE_RATE from config.py by default
+            dividend: continuous dividend yield of the underlying
+            now: unix seconds to measure time to expiry from, defaults to as_of
+        returns:
+            self, with iv/delta/gamma/theta/vega/rho filled (NaN where there is no iv)
+        """
+        if rate is None:
+            rate = rate_from_config()
+        is_call = self.side == CALL
+        years = self.years(now)
+        self.iv = implied_volatility(self.mid, is_call, self.spot, self.strike, years, rate, dividend)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = greeks(is_call, self.spot, self.strike, years, self.iv, rate, dividend)
+        for name in self.GREEKS[1:]:
+            setattr(self, name, values[name])
+        return self
+
+    def to_frame(self):
+        """
+        returns:
+            DataFrame, one row per contract, with categorical expiry and side columns
+        """
+        frame = pd.DataFrame({
+            'expiry': pd.Categorical.from_codes(self.expiry_code, categories=pd.DatetimeIndex(self.expiries)),
+            'side': pd.Categorical.from_codes(self.side, categories=list(SIDES)),
+            'strike': self.strike,
+            'bid': self.bid,
+            'ask': self.ask,
+            'last': self.last,
+            'volume': self.volume,
+            'openInterest': self.open_interest,
+            'osiKey': self.osi_key,
+        })
+        for name in self.GREEKS:
+            frame[name] = getattr(self, name)
+        return frame
+
+
+def rate_from_config():
+    try:
+        import config
+    except ImportError:
+        config = None
+    return getattr(config, 'OPTIONS_RISK_FREE_RATE', DEFAULT_RATE)
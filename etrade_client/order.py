@@ -1,6 +1,504 @@
+"""
+Equity order preview -> place pipeline for one account.
+
+Latency from click to acknowledgment is spent in three places: building the
+request, the round trip, and anything checked in between. Order keeps the
+first and last off the click:
+
+- stage() runs on every edit of the ticket: the pre-trade checks (buying
+  power from the cached balances, held quantity from the cached positions,
+  the symbol against the local symbol index - no api calls) and the
+  PreviewOrderRequest body, serialized, ready to send.
+- preview() sends the staged body as is, and builds the PlaceOrderRequest
+  body from the answer straight away, so place() only sends bytes.
+- warm() is a light quote request on the ticket's symbol, made while the form
+  is open so the session's keep-alive connection is still up at click time
+  (and the last price used by the checks stays fresh).
+
+For a SELL, what_if() prices the sale lot by lot under each lot method from
+the account's cached lots (analytics/taxlots.py), cheap enough for every edit.
+
+Every stage is timestamped in an OrderTimeline and recorded under order/ in
+the metrics, so the milliseconds between click and ack can be read off.
+
+usage:
+    order = Order(session, base_url, account, market)
+    checks = order.stage(OrderTicket('IBM', 'BUY', 10, 'LIMIT', limit_price=180.0))
+    preview = order.preview()
+    if preview['ok']:
+        placed = order.place()
+"""
+
+import json
+import logging
+import secrets
+import time
+from logging.handlers import RotatingFileHandler
+
+from utils.metrics import metrics
+
+logger = logging.getLogger('order')
+logger.setLevel(logging.ERROR)
+handler = RotatingFileHandler("python_client.log", maxBytes=5*1024*1024, backupCount=3)
+FORMAT = "%(asctime)-15s %(message)s"
+fmt = logging.Formatter(FORMAT, datefmt='%m/%d/%Y %I:%M:%S %p')
+handler.setFormatter(fmt)
+logger.addHandler(handler)
+
+ORDER_ACTIONS = ('BUY', 'SELL', 'BUY_TO_COVER', 'SELL_SHORT')
+PRICE_TYPES = ('MARKET', 'LIMIT', 'STOP', 'STOP_LIMIT')
+ORDER_TERMS = ('GOOD_FOR_DAY', 'GOOD_UNTIL_CANCEL', 'IMMEDIATE_OR_CANCEL', 'FILL_OR_KILL')
+MARKET_SESSIONS = ('REGULAR', 'EXTENDED')
+
+#pre-trade check levels: an ERROR blocks preview, a WARNING is only shown
+ERROR = 'error'
+WARNING = 'warning'
+
+#seconds between warm() requests while an order form is open; well under typical keep-alive timeouts
+WARM_INTERVAL_S = 20
+#timeline stages, in pipeline order
+STAGES = ('edited', 'staged', 'preview_clicked', 'preview_sent', 'preview_acked', 'place_staged',
+          'place_clicked', 'place_sent', 'place_acked')
+
+
+class OrderTicket:
+    """
+    purpose: what the order form holds - one equity order, before it becomes a request
+    arguments:
+        symbol: ticker
+        action: one of ORDER_ACTIONS
+        quantity: shares
+        price_type: one of PRICE_TYPES
+        limit_price, stop_price: needed by the LIMIT/STOP price types, ignored otherwise
+        term: one of ORDER_TERMS
+        market_session: one of MARKET_SESSIONS
+    """
+
+    def __init__(self, symbol, action='BUY', quantity=0, price_type='MARKET', limit_price=None, stop_price=None,
+                 term='GOOD_FOR_DAY', market_session='REGULAR', all_or_none=False):
+        self.symbol = (symbol or '').strip().upper()
+        self.action = action
+        self.quantity = quantity
+        self.price_type = price_type
+        self.limit_price = limit_price if 'LIMIT' in price_type else None
+        self.stop_price = stop_price if 'STOP' in price_type else None
+        self.term = term
+        self.market_session = market_session
+        self.all_or_none = all_or_none
+
+    def key(self):
+        return (self.symbol, self.action, self.quantity, self.price_type, self.limit_price, self.stop_price,
+                self.term, self.market_session, self.all_or_none)
+
+    def order_detail(self):
+        """
+        returns:
+            the Order element shared by PreviewOrderRequest and PlaceOrderRequest
+        """
+        return {
+            'allOrNone': 'true' if self.all_or_none else 'false',
+            'priceType': self.price_type,
+            'orderTerm': self.term,
+            'marketSession': self.market_session,
+            'limitPrice': f"{self.limit_price:.2f}" if self.limit_price is not None else '',
+            'stopPrice': f"{self.stop_price:.2f}" if self.stop_price is not None else '',
+            'Instrument': [{
+                'Product': {'securityType': 'EQ', 'symbol': self.symbol},
+                'orderAction': self.action,
+                'quantityType': 'QUANTITY',
+                'quantity': str(self.quantity),
+            }],
+        }
+
+
+class OrderTimeline:
+    """
+    purpose: perf_counter timestamps of one order's stages (see STAGES)
+    note: a stage marked twice keeps the latest time, so re-staging after an edit moves 'staged' forward
+    """
+
+    def __init__(self):
+        self.marks = {}
+
+    def mark(self, stage):
+        self.marks[stage] = time.perf_counter()
+        return self.marks[stage]
+
+    def ms(self, start, end):
+        """
+        returns:
+            milliseconds from stage start to stage end, None if either is missing
+        """
+        if start not in self.marks or end not in self.marks:
+            return None
+        return (self.marks[end] - self.marks[start]) * 1000.0
+
+    def steps(self):
+        """
+        returns:
+            list of (stage, ms since the previous marked stage) in pipeline order
+        """
+        steps, previous = [], None
+        for stage in STAGES:
+            if stage not in self.marks:
+                continue
+            steps.append((stage, (self.marks[stage] - previous) * 1000.0 if previous is not None else 0.0))
+            previous = self.marks[stage]
+        return steps
+
+    def record(self, pairs, error=False):
+        for start, end, name in pairs:
+            ms = self.ms(start, end)
+            if ms is not None:
+                metrics.observe('order', name, ms, error)
+
+
+def _is_oauth(session):
+    while hasattr(session, 'governor') and hasattr(session, 'session'):
+        session = session.session      # GovernedSession
+    return hasattr(session, 'access_token_secret')
+
+
+def _messages(order):
+    try:
+        return [m.get('description', '') for m in order.get('messages', {}).get('Message', [])]
+    except AttributeError:
+        return []
+
+
+def _error_message(response):
+    if response is None:
+        return "no response"
+    try:
+        return response.json()["Error"]["message"]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return f"HTTP {response.status_code}"
+
+
 class Order:
-    def __init__(self, session, base_url, account):
+    """
+    purpose: preview and place equity orders for one account, see the module docstring
+    arguments:
+        session: E*TRADE session (GovernedSession sends order requests ahead of everything else)
+        base_url: api base url
+        account: accountsmanager.Account whose cached positions and balances the checks read
+        market: Market used by warm(); None skips warming
+        symbols: data_providers.symbol_index.SymbolIndex; a ticket symbol missing from it gets a
+                 warning with suggestions; None skips the check
+    """
+
+    def __init__(self, session, base_url, account, market=None, symbols=None):
         self.session = session
         self.base_url = base_url
         self.account = account
+        self.market = market
+        self.symbols = symbols
+        self.headers = {'Content-Type': 'application/json'}
+        try:
+            import config
+        except ImportError:
+            config = None
+        if getattr(config, 'CONSUMER_KEY', None):
+            self.headers['consumerKey'] = config.CONSUMER_KEY
+        #optional fat-finger limit on one order's estimated value
+        self.max_notional = getattr(config, 'ORDER_MAX_NOTIONAL', None)
+        #rauth signs POST bodies only as forms; a json body needs the oauth header instead
+        self.post_kwargs = {'header_auth': True} if _is_oauth(session) else {}
+        self.orders_url = f"{base_url}/v1/accounts/{account.accountIdKey}/orders"
+
+        self.last_prices = {}           # symbol -> last price seen by warm()
+        self._positions = None          # the positions frame _held was built from
+        self._held = {}
+        self._lot_book, self._lot_book_key = None, None
+        self.ticket = None
+        self.checks = []
+        self.timeline = OrderTimeline()
+        self._preview_body = None
+        self._place_body = None
+        self._client_order_id = None
+        self.preview_result = None
+
+    #---- pre-trade checks, from cached account data only ----
+
+    def held_quantity(self, symbol):
+        """
+        returns:
+            shares of symbol held in the account, negative when short; 0 when not held
+        note: rebuilt only when the account's positions frame has been replaced by a poll
+        """
+        positions = self.account.positions
+        if positions is not self._positions:
+            self._positions = positions
+            self._held = {}
+            if positions is not None and not positions.empty:
+                stocks = positions[positions['securityType'] != 'OPTN']
+                quantity = stocks['quantity'].where(stocks['positionType'] != 'SHORT', -stocks['quantity'].abs())
+                self._held = quantity.groupby(stocks['symbol']).sum().to_dict()
+        return self._held.get(symbol, 0)
+
+    def reference_price(self, ticket):
+        """
+        returns:
+            price to estimate the order's value at: its limit, its stop, else the last price
+            seen for the symbol (warm() quote or the account's position); None if unknown
+        """
+        if ticket.limit_price:
+            return ticket.limit_price
+        if ticket.stop_price:
+            return ticket.stop_price
+        if ticket.symbol in self.last_prices:
+            return self.last_prices[ticket.symbol]
+        positions = self.account.positions
+        if positions is not None and not positions.empty:
+            rows = positions.loc[positions['symbol'] == ticket.symbol, 'lastTrade']
+            if not rows.empty:
+                return float(rows.iloc[0])
+        return None
+
+    def buying_power(self):
+        balances = self.account.balancesRaw or {}
+        if self.account.account_info.get('accountMode') == 'MARGIN' and balances.get('marginBuyingPower') is not None:
+            return float(balances['marginBuyingPower'])
+        for key in ('cashBuyingPower', 'cashAvailableForInvestment'):
+            if balances.get(key) is not None:
+                return float(balances[key])
+        return None
+
+    def pre_trade_checks(self, ticket):
+        """
+        returns:
+            list of (ERROR or WARNING, message); no errors means the ticket may be previewed
+        """
+        checks = []
+        if not ticket.symbol:
+            checks.append((ERROR, "Enter a symbol"))
+        if not ticket.quantity or ticket.quantity <= 0:
+            checks.append((ERROR, "Quantity must be positive"))
+        if 'LIMIT' in ticket.price_type and not ticket.limit_price:
+            checks.append((ERROR, "Limit price required"))
+        if 'STOP' in ticket.price_type and not ticket.stop_price:
+            checks.append((ERROR, "Stop price required"))
+        if checks:
+            return checks
+
+        held = self.held_quantity(ticket.symbol)
+        if self.symbols is not None and not held:
+            #a warning, not an error: E*TRADE trades symbols the listing directory doesn't have (OTC)
+            unknown = self.symbols.unknown([ticket.symbol])
+            if unknown:
+                suggested = unknown[ticket.symbol]
+                checks.append((WARNING, f"{ticket.symbol} is not in the symbol index"
+                                        + (f", did you mean {', '.join(suggested)}?" if suggested else "")))
+        if ticket.action == 'SELL' and ticket.quantity > max(held, 0):
+            checks.append((ERROR, f"Selling {ticket.quantity:g}, holding {max(held, 0):g}"))
+        elif ticket.action == 'BUY_TO_COVER' and ticket.quantity > max(-held, 0):
+            checks.append((ERROR, f"Covering {ticket.quantity:g}, short {max(-held, 0):g}"))
+        elif ticket.action == 'SELL_SHORT' and held > 0:
+            checks.append((WARNING, f"Shorting while holding {held:g} long"))
+
+        price = self.reference_price(ticket)
+        if price is None:
+            checks.append((WARNING, f"No price for {ticket.symbol}, value not checked"))
+            return checks
+        notional = price * ticket.quantity
+        if ticket.action in ('BUY', 'BUY_TO_COVER'):
+            power = self.buying_power()
+            if power is None:
+                checks.append((WARNING, "No balance data, buying power not checked"))
+            elif notional > power:
+                checks.append((ERROR, f"Est. ${notional:,.2f} exceeds buying power ${power:,.2f}"))
+        if self.max_notional and notional > self.max_notional:
+            checks.append((ERROR, f"Est. ${notional:,.2f} exceeds the ${self.max_notional:,.2f} order limit"))
+        return checks
+
+    #---- lots, for what-if sales (see analytics/taxlots.py) ----
+
+    def lots_missing(self, symbol):
+        """
+        returns:
+            positionIds holding symbol whose lots aren't cached yet (fetch them with fetch_lots)
+        """
+        positions = self.account.positions
+        if positions is None or positions.empty:
+            return []
+        ids = positions.loc[positions['symbol'] == symbol, 'positionId']
+        return [pid for pid in ids if pid not in self.account.lots]
+
+    def fetch_lots(self, symbol):
+        """
+        purpose: fetch and cache the lots behind symbol's positions - one request per position
+        """
+        return self.account.get_lots(self.lots_missing(symbol))
+
+    def lot_book(self):
+        """
+        returns:
+            LotBook over the account's cached positions and lots, rebuilt only when either changed
+        """
+        from analytics.taxlots import LotBook
+        key = (self.account.positions, len(self.account.lots))
+        if self._lot_book is None or key[0] is not self._lot_book_key[0] or key[1] != self._lot_book_key[1]:
+            self._lot_book, self._lot_book_key = LotBook.from_account(self.account), key
+        return self._lot_book
+
+    def what_if(self, ticket):
+        """
+        returns:
+            LotBook.what_if_methods for a SELL ticket of a held symbol, at the ticket's reference
+            price; None for anything else
+        """
+        if ticket.action != 'SELL' or not ticket.symbol or not ticket.quantity or ticket.quantity <= 0 \
+                or self.held_quantity(ticket.symbol) <= 0:
+            return None
+        return self.lot_book().what_if_methods(ticket.symbol, ticket.quantity, self.reference_price(ticket))
+
+    #---- pipeline ----
+
+    def stage(self, ticket):
+        """
+        purpose: called on every form edit - check the ticket and pre-build its preview request
+        returns:
+            the pre-trade checks, see pre_trade_checks
+        """
+        self.timeline = OrderTimeline()
+        self.timeline.mark('edited')
+        self.ticket = ticket
+        self.checks = self.pre_trade_checks(ticket)
+        self.preview_result = None
+        self._place_body = None
+        self._preview_body = None
+        if not any(level == ERROR for level, _ in self.checks):
+            # the same client order id goes with the preview and the place of this ticket
+            self._client_order_id = secrets.token_hex(10)
+            self._preview_body = json.dumps({'PreviewOrderRequest': {
+                'orderType': 'EQ',
+                'clientOrderId': self._client_order_id,
+                'Order': [ticket.order_detail()],
+            }})
+        self.timeline.mark('staged')
+        self.timeline.record([('edited', 'staged', 'stage')])
+        return self.checks
+
+    @property
+    def can_preview(self):
+        return self._preview_body is not None
+
+    @property
+    def can_place(self):
+        return self._place_body is not None
+
+    def preview(self, clicked_at=None):
+        """
+        purpose: send the staged PreviewOrderRequest
+        arguments:
+            clicked_at: perf_counter time of the click, when taken on another thread
+        returns:
+            {'ok', 'message', 'preview_id', 'estimated_total', 'commission', 'messages'}
+        """
+        self._mark_click('preview_clicked', clicked_at)
+        if self._preview_body is None:
+            return {'ok': False, 'message': "Order has failed pre-trade checks"}
+        self.timeline.mark('preview_sent')
+        with metrics.timer('etrade', 'orders/preview') as t:
+            response = self.session.post(f"{self.orders_url}/preview.json", data=self._preview_body,
+                                         headers=self.headers, **self.post_kwargs)
+            if response is None or response.status_code != 200:
+                t.fail()
+        self.timeline.mark('preview_acked')
+
+        result = {'ok': False}
+        if response is None or response.status_code != 200:
+            logger.error("Preview order API error: %s %s", response.status_code if response is not None else None,
+                         response.text if response is not None else None)
+            result['message'] = _error_message(response)
+        else:
+            try:
+                data = response.json()["PreviewOrderResponse"]
+                order = data["Order"][0]
+                result.update({
+                    'ok': True,
+                    'preview_id': data["PreviewIds"][0]["previewId"],
+                    'estimated_total': order.get("estimatedTotalAmount"),
+                    'commission': order.get("estimatedCommission"),
+                    'messages': _messages(order),
+                    'message': "Preview accepted",
+                })
+                # place is built now, not on the click
+                self._place_body = json.dumps({'PlaceOrderRequest': {
+                    'orderType': 'EQ',
+                    'clientOrderId': self._client_order_id,
+                    'PreviewIds': [{'previewId': result['preview_id']}],
+                    'Order': [self.ticket.order_detail()],
+                }})
+                self.timeline.mark('place_staged')
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logger.error("failed to parse preview order response: %s", e)
+                result['message'] = f"Unreadable preview response: {e}"
+        self.timeline.record([('preview_clicked', 'preview_sent', 'preview_click_to_send'),
+                              ('preview_sent', 'preview_acked', 'preview_round_trip'),
+                              ('preview_clicked', 'preview_acked', 'preview_click_to_ack')], error=not result['ok'])
+        self.preview_result = result
+        return result
+
+    def place(self, clicked_at=None):
+        """
+        purpose: send the PlaceOrderRequest built from the last successful preview
+        returns:
+            {'ok', 'message', 'order_id', 'messages'}
+        note: the order is spent afterwards - stage() a ticket again for another one
+        """
+        self._mark_click('place_clicked', clicked_at)
+        if self._place_body is None:
+            return {'ok': False, 'message': "Preview the order first"}
+        body, self._place_body = self._place_body, None
+        self.timeline.mark('place_sent')
+        with metrics.timer('etrade', 'orders/place') as t:
+            response = self.session.post(f"{self.orders_url}/place.json", data=body,
+                                         headers=self.headers, **self.post_kwargs)
+            if response is None or response.status_code != 200:
+                t.fail()
+        self.timeline.mark('place_acked')
+
+        result = {'ok': False}
+        if response is None or response.status_code != 200:
+            logger.error("Place order API error: %s %s", response.status_code if response is not None else None,
+                         response.text if response is not None else None)
+            result['message'] = _error_message(response)
+        else:
+            try:
+                data = response.json()["PlaceOrderResponse"]
+                result.update({
+                    'ok': True,
+                    'order_id': data["OrderIds"][0]["orderId"],
+                    'messages': _messages(data.get("Order", [{}])[0]),
+                    'message': "Order placed",
+                })
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                logger.error("failed to parse place order response: %s", e)
+                result['message'] = f"Unreadable place response: {e}"
+        self._preview_body = None
+        self.timeline.record([('place_clicked', 'place_sent', 'place_click_to_send'),
+                              ('place_sent', 'place_acked', 'place_round_trip'),
+                              ('place_clicked', 'place_acked', 'place_click_to_ack')], error=not result['ok'])
+        return result
+
+    def warm(self, symbol=None):
+        """
+        purpose: keep the connection to the api open and the symbol's last price fresh
+        returns:
+            the last price, None if it could not be fetched
+        """
+        symbol = symbol or (self.ticket.symbol if self.ticket is not None else None)
+        if self.market is None or not symbol:
+            return None
+        quote = self.market.fetch_quotes([symbol]).get(symbol)
+        if quote is None:
+            return None
+        self.last_prices[symbol] = quote['lastTrade']
+        return quote['lastTrade']
 
+    def _mark_click(self, stage, clicked_at):
+        if clicked_at is None:
+            self.timeline.mark(stage)
+        else:
+            self.timeline.marks[stage] = clicked_at
@@ -0,0 +1,127 @@
+"""
+Local P&L between portfolio polls.
+
+The quote-driven columns of a positions frame (lastTrade, change, changePct,
+marketValue, daysGain, daysGainPct, totalGain, totalGainPct, pctOfPortfolio) are
+functions of quantity, cost, the previous close and the last price. PnLEngine
+keeps the inputs as NumPy arrays and recomputes every row at once when quotes
+arrive. The next portfolio poll replaces the frame and the engine is rebuilt
+from it, so any drift is corrected.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import timed
+
+# only these trade under their own symbol on the quote endpoint; options need an OSI key
+QUOTABLE_TYPES = {'EQ', 'MF', 'ETF'}
+OPTION_MULTIPLIER = 100.0
+
+
+def _column(positions, name, default=0.0):
+    if name in positions.columns:
+        return pd.to_numeric(positions[name], errors='coerce').fillna(default).to_numpy(dtype=float)
+    return np.full(len(positions), default, dtype=float)
+
+
+class PnLEngine:
+    """
+    purpose: recompute a positions frame's quote-driven columns from last prices
+    arguments:
+        positions: Account.positions DataFrame; updated in place by apply_quotes
+        accounttotals: Account.accounttotals Series; updated in place by apply_quotes (optional)
+    """
+
+    def __init__(self, positions, accounttotals=None):
+        self.positions = positions
+        self.accounttotals = accounttotals
+
+        security_type = positions['securityType'].astype(str).to_numpy() if 'securityType' in positions else \
+            np.full(len(positions), 'EQ')
+        self.multiplier = np.where(security_type == 'OPTN', OPTION_MULTIPLIER, 1.0)
+        self.quantity = _column(positions, 'quantity')
+        self.today_quantity = _column(positions, 'todayQuantity')
+        self.today_price_paid = _column(positions, 'todayPricePaid')
+        self.total_cost = _column(positions, 'totalCost')
+        self.prev_close = _column(positions, 'adjPrevClose')
+        self.last = _column(positions, 'lastTrade')
+
+        # an option's Product.symbol is its underlying, so quotability is decided per row
+        self.quotable = np.isin(security_type, list(QUOTABLE_TYPES))
+
+        # one price slot per distinct symbol; rows index into it
+        self.codes, uniques = pd.factorize(positions['symbol'].astype(str))
+        self.prices = np.zeros(len(uniques), dtype=float)
+        np.maximum.at(self.prices, self.codes[self.quotable], self.last[self.quotable])
+        self.slot = {symbol: i for i, symbol in enumerate(uniques)}
+        self.quote_symbols = sorted(set(uniques[self.codes[self.quotable]]))
+
+    def apply_quotes(self, quotes):
+        """
+        purpose: take new last prices and recompute every row
+        arguments:
+            quotes: dict symbol -> last price, or -> dict with 'lastTrade' (Market.fetch_quotes output)
+        returns:
+            number of symbols whose price changed
+        """
+        changed = 0
+        for symbol, quote in quotes.items():
+            i = self.slot.get(symbol)
+            if i is None:
+                continue
+            price = quote['lastTrade'] if isinstance(quote, dict) else quote
+            if price is None or price <= 0 or price == self.prices[i]:
+                continue
+            self.prices[i] = price
+            changed += 1
+        if changed:
+            self.recompute()
+        return changed
+
+    @timed('pnl', 'recompute')
+    def recompute(self):
+        # rows we cannot quote (options) keep the price from the last poll
+        last = np.where(self.quotable, self.prices[self.codes], self.last)
+
+        mult = self.multiplier
+        market_value = last * self.quantity * mult
+        # shares bought today gain from today's fill price, the rest from the previous close
+        carried = self.quantity - self.today_quantity
+        today_basis = np.where(self.today_price_paid > 0, self.today_price_paid, self.prev_close)
+        days_gain = ((last - self.prev_close) * carried + (last - today_basis) * self.today_quantity) * mult
+        prev_value = market_value - days_gain
+        total_gain = market_value - self.total_cost
+        change = last - self.prev_close
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_pct = np.where(self.prev_close != 0, change / self.prev_close * 100.0, 0.0)
+            days_gain_pct = np.where(prev_value != 0, days_gain / np.abs(prev_value) * 100.0, 0.0)
+            total_gain_pct = np.where(self.total_cost != 0, total_gain / np.abs(self.total_cost) * 100.0, 0.0)
+            portfolio_value = market_value.sum()
+            pct_of_portfolio = market_value / portfolio_value * 100.0 if portfolio_value else \
+                np.zeros_like(market_value)
+
+        positions = self.positions
+        # same precision the api reports: money to cents, percentages to 4 places
+        positions['lastTrade'] = last
+        positions['change'] = np.round(change, 2)
+        positions['changePct'] = np.round(change_pct, 4)
+        positions['marketValue'] = np.round(market_value, 2)
+        positions['daysGain'] = np.round(days_gain, 2)
+        positions['daysGainPct'] = np.round(days_gain_pct, 4)
+        positions['totalGain'] = np.round(total_gain, 2)
+        positions['totalGainPct'] = np.round(total_gain_pct, 4)
+        positions['pctOfPortfolio'] = np.round(pct_of_portfolio, 4)
+
+        if self.accounttotals is not None:
+            totals = self.accounttotals
+            total_days_gain = days_gain.sum()
+            total_cost = self.total_cost.sum()
+            previous = portfolio_value - total_days_gain
+            totals['totalMarketValue'] = round(portfolio_value, 2)
+            totals['todaysGainLoss'] = round(total_days_gain, 2)
+            totals['todaysGainLossPct'] = round(total_days_gain / previous * 100.0, 4) if previous else 0.0
+            totals['totalGainLoss'] = round(portfolio_value - total_cost, 2)
+            totals['totalGainLossPct'] = round((portfolio_value - total_cost) / total_cost * 100.0, 4) \
+                if total_cost else 0.0
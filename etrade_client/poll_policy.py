@@ -0,0 +1,138 @@
+"""
+Polling policies for PollWorker: how long to wait before the next fetch.
+
+FixedPolicy keeps the old behaviour (one interval around the clock).
+AdaptivePolicy picks an interval per market phase from a MarketCalendar and
+shortens it while recent payloads show the account moving.
+"""
+
+import math
+from datetime import datetime
+
+from etrade_client.market_calendar import MarketCalendar, PRE_MARKET, REGULAR, AFTER_HOURS, CLOSED
+
+DEFAULT_PHASE_INTERVALS = {
+    PRE_MARKET: 30.0,
+    REGULAR: 10.0,
+    AFTER_HOURS: 30.0,
+    CLOSED: 300.0,
+}
+
+# quote ticks drive local P&L (see pnl.py); the portfolio poll then only reconciles
+QUOTE_PHASE_INTERVALS = {
+    PRE_MARKET: 10.0,
+    REGULAR: 3.0,
+    AFTER_HOURS: 10.0,
+    CLOSED: 600.0,
+}
+RECONCILE_PHASE_INTERVALS = {
+    PRE_MARKET: 120.0,
+    REGULAR: 60.0,
+    AFTER_HOURS: 120.0,
+    CLOSED: 600.0,
+}
+
+
+def portfolio_value(payload):
+    """value extractor for fetch_portfolio payloads: (positions, totals)"""
+    _, totals = payload
+    return (totals or {}).get('totalMarketValue')
+
+
+def balance_value(payload):
+    """value extractor for fetch_balances payloads (the Computed block)"""
+    payload = payload or {}
+    return (payload.get('RealTimeValues') or {}).get('totalAccountValue', payload.get('netCash'))
+
+
+class FixedPolicy:
+    def __init__(self, interval):
+        self.interval = float(interval)
+
+    def observe(self, payload):
+        pass
+
+    def next_interval(self):
+        return self.interval
+
+    def describe(self):
+        return f"fixed {self.interval:.0f}s"
+
+
+class AdaptivePolicy:
+    """
+    purpose: market-phase-aware polling interval that tightens on movement
+    arguments:
+        calendar: MarketCalendar
+        intervals: phase -> base interval in seconds (missing phases use DEFAULT_PHASE_INTERVALS)
+        value_fn: payload -> number to watch for movement (None disables tightening)
+        tighten_at: relative change per poll at which the interval starts shrinking (5bp)
+        max_speedup: most the interval is divided by under movement
+        min_interval: floor in seconds
+        clock: zero-argument callable returning the current datetime (inject for tests)
+    """
+
+    def __init__(self, calendar=None, intervals=None, value_fn=None, tighten_at=0.0005, max_speedup=4.0,
+                 min_interval=2.0, clock=None):
+        self.calendar = calendar or MarketCalendar()
+        self.intervals = {**DEFAULT_PHASE_INTERVALS, **(intervals or {})}
+        self.value_fn = value_fn
+        self.tighten_at = tighten_at
+        self.max_speedup = max_speedup
+        self.min_interval = min_interval
+        self.clock = clock or (lambda: datetime.now(tz=self.calendar.tz))
+        self.movement = 0.0    # smoothed relative change between consecutive payloads
+        self._last_value = None
+
+    def observe(self, payload):
+        if self.value_fn is None:
+            return
+        try:
+            value = self.value_fn(payload)
+            value = float(value) if value is not None else None
+        except (TypeError, ValueError):
+            return
+        if value is None or math.isnan(value):
+            return
+        if self._last_value:
+            change = abs(value - self._last_value) / abs(self._last_value)
+            # half-life of one poll: a burst tightens at once and relaxes within a few polls
+            self.movement = 0.5 * self.movement + 0.5 * change
+        self._last_value = value
+
+    def phase(self):
+        return self.calendar.phase(self.clock())
+
+    def next_interval(self):
+        now = self.clock()
+        phase = self.calendar.phase(now)
+        interval = self.intervals[phase]
+        if phase != CLOSED and self.movement > self.tighten_at:
+            speedup = min(self.max_speedup, self.movement / self.tighten_at)
+            interval = max(self.min_interval, interval / speedup)
+        # wake up for the open instead of sleeping through it
+        until_change = self.calendar.seconds_to_transition(now)
+        return max(self.min_interval, min(interval, until_change + 1.0))
+
+    def describe(self):
+        return f"adaptive {self.phase()} {self.next_interval():.0f}s"
+
+
+def poll_policy_from_config(value_fn=None, fixed_interval=10.0, intervals_key='POLL_INTERVALS',
+                            default_intervals=None):
+    """
+    purpose: policy for an E*TRADE poller as configured by POLL_POLICY and the intervals_key
+             dict (e.g. POLL_INTERVALS) in config.py
+    arguments:
+        value_fn: movement extractor for the adaptive policy
+        fixed_interval: interval when POLL_POLICY is 'fixed'
+        default_intervals: phase intervals used where config has none
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    if getattr(config, 'POLL_POLICY', 'adaptive') == 'fixed':
+        return FixedPolicy(fixed_interval)
+    intervals = {**(default_intervals or DEFAULT_PHASE_INTERVALS), **(getattr(config, intervals_key, None) or {})}
+    return AdaptivePolicy(intervals=intervals, value_fn=value_fn)
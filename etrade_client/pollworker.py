@@ -1,38 +1,137 @@
 # poll_worker.py
-from PyQt6.QtCore import QObject, pyqtSignal
-import time, random
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+import time, random, threading
+from utils.metrics import metrics
 
 class PollWorker(QObject):
     dataReady: pyqtSignal = pyqtSignal(object)   # emits parsed payload from fetch_fn
     error: pyqtSignal = pyqtSignal(str)
     finished:pyqtSignal = pyqtSignal()
 
-    def __init__(self, fetch_fn, interval=5.0, jitter=0.3):
+    def __init__(self, fetch_fn, interval=5.0, jitter=0.3, name="poll", policy=None):
         super().__init__()
         self.fetch_fn = fetch_fn
         self.interval = float(interval)
         self.jitter = float(jitter)
+        self.name = name
+        # policy (see poll_policy.py) decides each sleep; without one the fixed interval is used
+        self.policy = policy
         self._running = False
+        self._wake = threading.Event()
 
     def start(self):
+        if self._wake.is_set():
+            # stop() arrived before the thread got going
+            self.finished.emit()
+            return
         self._running = True
         self._run()
 
     def stop(self):
         self._running = False
+        self._wake.set()    # cut short any sleep so the thread can finish promptly
 
     def _run(self):
         backoff = 1.0
+        last_payload_at = None
         while self._running:
             try:
-                payload = self.fetch_fn()      # API call
+                with metrics.timer('poll', self.name):
+                    payload = self.fetch_fn()      # API call
                 self.dataReady.emit(payload)   # hand results back to the GUI thread
                 backoff = 1.0
+                now = time.perf_counter()
+                if last_payload_at is not None:
+                    # how far behind the planned interval fresh data is arriving
+                    metrics.observe('poll', self.name + '.lag',
+                                    max(0.0, (now - last_payload_at - self.interval) * 1000.0))
+                last_payload_at = now
+                if self.policy is not None:
+                    self.policy.observe(payload)
             except Exception as e:
+                metrics.increment('poll', self.name + '.errors')
                 self.error.emit(str(e))
-                time.sleep(min(60.0, backoff))
+                self._wake.wait(min(60.0, backoff))
                 backoff *= 2.0
             base = self.interval
-            time.sleep(max(0.05, base + random.uniform(-base*0.3, base*0.3)))
+            if self.policy is not None:
+                # the policy's interval may end at a phase change (e.g. the open), so it is a
+                # deadline: jitter only brings the poll forward, never past it
+                self.interval = base = self.policy.next_interval()
+                delay = base - random.uniform(0.0, base*self.jitter)
+            else:
+                delay = base + random.uniform(-base*self.jitter, base*self.jitter)
+            self._wake.wait(max(0.05, delay))
         self.finished.emit()
 
+
+class LatestValueChannel(QObject):
+    """
+    purpose: deliver a poller's payloads to the gui newest-first - while the gui is still busy
+             with the last one, a newer payload replaces the one waiting instead of queueing
+             behind it, so a slow slot never works through a backlog of stale snapshots
+    arguments:
+        name: metrics name; records poll/<name>.dropped, .merged and .consumer_lag
+        merge: merge(waiting, newer) -> payload, to fold a newer payload into the waiting one
+               (e.g. partial quote dicts) instead of dropping the waiting one
+    note: lives on the gui thread; put() may be called from any thread, dataReady is
+          emitted on the gui thread once the event loop gets to it (see connect_latest)
+    """
+    dataReady: pyqtSignal = pyqtSignal(object)
+    _wake: pyqtSignal = pyqtSignal()
+
+    def __init__(self, name="poll", merge=None, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.merge = merge
+        self._lock = threading.Lock()
+        self._payload = None
+        self._pending = False
+        self._waiting_since = 0.0   # when the oldest payload not yet delivered arrived
+        self.delivered = 0
+        self.dropped = 0
+        self.merged = 0
+        self.lag_ms = 0.0           # how long the last delivered payload waited for the gui
+        self.max_lag_ms = 0.0
+        self._wake.connect(self._deliver, Qt.ConnectionType.QueuedConnection)
+
+    def put(self, payload):
+        with self._lock:
+            if self._pending:
+                if self.merge is not None:
+                    self._payload = self.merge(self._payload, payload)
+                    self.merged += 1
+                    metrics.increment('poll', self.name + '.merged')
+                else:
+                    self._payload = payload
+                    self.dropped += 1
+                    metrics.increment('poll', self.name + '.dropped')
+                return
+            self._payload = payload
+            self._pending = True
+            self._waiting_since = time.perf_counter()
+        # one wake-up per batch; later payloads ride on it
+        self._wake.emit()
+
+    def _deliver(self):
+        with self._lock:
+            payload, self._payload, self._pending = self._payload, None, False
+            waited = time.perf_counter() - self._waiting_since
+        self.lag_ms = waited * 1000.0
+        self.max_lag_ms = max(self.max_lag_ms, self.lag_ms)
+        self.delivered += 1
+        metrics.observe('poll', self.name + '.consumer_lag', self.lag_ms)
+        self.dataReady.emit(payload)
+
+
+def connect_latest(worker, slot, name="poll", merge=None, parent=None):
+    """
+    purpose: connect worker.dataReady to slot through a LatestValueChannel
+    returns:
+        the channel; keep it referenced (or give it a parent) for as long as the worker runs
+    """
+    channel = LatestValueChannel(name, merge, parent)
+    #direct: put() runs on the worker thread and only takes the lock
+    worker.dataReady.connect(channel.put, Qt.ConnectionType.DirectConnection)
+    channel.dataReady.connect(slot)
+    return channel
@@ -0,0 +1,609 @@
+"""
+Synthetic E*TRADE accounts for offline runs.
+
+SyntheticBrokerage produces payloads in the same shape as the live
+/v1/accounts/list.json, portfolio.json, balance.json, /v1/market/quote,
+optionexpiredate.json, optionchains.json and transactions.json responses,
+answers equity order previews and placements, and lets prices and holdings drift over time so repeated polls see
+changing data. Stocks and funds share one price per symbol across accounts, so
+quotes and portfolios agree.
+"""
+
+import math
+import random
+import string
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from etrade_client.options import black_scholes, years_to_expiry
+
+SECURITY_TYPES = ['EQ', 'EQ', 'EQ', 'EQ', 'MF', 'OPTN']
+#weeks out to each listed expiration (Fridays)
+OPTION_EXPIRY_WEEKS = [1, 2, 3, 4, 6, 8, 13, 17, 26, 39, 52, 78]
+#strikes listed on each side of the money when the request doesn't ask for fewer
+OPTION_STRIKES_PER_SIDE = 40
+#closed round trips (bought, later sold) in each account's history, per 100 holdings
+CLOSED_TRADES_PER_100 = 20
+DAY_MS = 86_400_000
+
+
+def synthetic_symbol(index):
+    """
+    purpose: stable 3-5 letter ticker for an integer index (0 -> AAA, 1 -> AAB, ...)
+    """
+    letters = string.ascii_uppercase
+    chars = []
+    n = index
+    while True:
+        chars.append(letters[n % 26])
+        n //= 26
+        if n == 0 and len(chars) >= 3:
+            break
+    return ''.join(reversed(chars))
+
+
+class SyntheticQuote:
+    def __init__(self, rng, now):
+        self.prev_close = round(rng.uniform(2.0, 600.0), 2)
+        self.last = self.prev_close
+        self.volume = rng.randint(1_000, 50_000_000)
+        self.last_step = now
+
+    def step(self, rng, now):
+        # geometric random walk, ~2% daily vol compressed into wall-clock seconds
+        dt = now - self.last_step
+        if dt <= 0:
+            return
+        self.last_step = now
+        sigma = 0.02 * min(1.0, dt / 60.0) ** 0.5
+        self.last = max(0.01, round(self.last * (1.0 + rng.gauss(0.0, sigma)), 2))
+        self.volume += rng.randint(0, 10_000)
+
+
+class SyntheticPosition:
+    def __init__(self, rng, position_id, symbol, now, quotes=None):
+        self.position_id = position_id
+        self.symbol = symbol
+        self.security_type = rng.choice(SECURITY_TYPES)
+        self.multiplier = 100 if self.security_type == 'OPTN' else 1
+        self.quantity = float(rng.randint(1, 20) if self.multiplier == 100 else rng.randint(1, 500))
+        if quotes is not None and self.multiplier == 1:
+            # shared per-symbol price; options keep their own
+            if symbol not in quotes:
+                quotes[symbol] = SyntheticQuote(rng, now)
+            self.quote = quotes[symbol]
+        else:
+            self.quote = SyntheticQuote(rng, now)
+        self.price_paid = round(self.prev_close / rng.uniform(0.6, 1.6), 2)
+        self.date_acquired = int((now - rng.randint(1, 3000) * 86400) * 1000)
+        self.strike = round(self.prev_close * rng.uniform(0.8, 1.2), 0) if self.multiplier == 100 else 0
+        self.call_put = rng.choice(['CALL', 'PUT'])
+        expiry = time.gmtime(now + rng.randint(7, 400) * 86400)
+        self.expiry = (expiry.tm_mday, expiry.tm_mon, expiry.tm_year) if self.multiplier == 100 else (0, 0, 0)
+
+    @property
+    def last(self):
+        return self.quote.last
+
+    @property
+    def prev_close(self):
+        return self.quote.prev_close
+
+    @property
+    def volume(self):
+        return self.quote.volume
+
+    def step(self, rng, now):
+        self.quote.step(rng, now)
+
+    def lots(self, now_ms):
+        """
+        returns:
+            list of (acquired ms, quantity, price) adding up to the holding: one to three lots,
+            the same on every call (seeded by the position id)
+        """
+        rng = random.Random(self.position_id)
+        quantity = int(self.quantity)
+        if quantity < 3 or now_ms - self.date_acquired < 2 * DAY_MS:
+            return [(self.date_acquired, float(quantity), self.price_paid)]
+        cuts = sorted(rng.sample(range(1, quantity), rng.randint(1, 3) - 1))
+        sizes = [b - a for a, b in zip([0] + cuts, cuts + [quantity])]
+        lots, when = [], self.date_acquired
+        for size in sizes:
+            lots.append((when, float(size), round(self.price_paid * rng.uniform(0.9, 1.1), 2)))
+            when = min(now_ms - DAY_MS, when + rng.randint(5, 200) * DAY_MS)
+        return lots
+
+    def to_json(self, portfolio_value, base_url, account_key, now):
+        market_value = self.last * self.quantity * self.multiplier
+        total_cost = self.price_paid * self.quantity * self.multiplier
+        days_gain = (self.last - self.prev_close) * self.quantity * self.multiplier
+        change = self.last - self.prev_close
+        product = {
+            'symbol': self.symbol,
+            'securityType': self.security_type,
+            'expiryDay': self.expiry[0],
+            'expiryMonth': self.expiry[1],
+            'expiryYear': self.expiry[2],
+            'strikePrice': self.strike,
+            'productId': {'symbol': self.symbol, 'typeCode': self.security_type},
+        }
+        if self.multiplier == 100:
+            product['callPut'] = self.call_put
+        return {
+            'positionId': self.position_id,
+            'accountId': account_key,
+            'Product': product,
+            'osiKey': '',
+            'symbolDescription': f"{self.symbol} SYNTHETIC",
+            'dateAcquired': self.date_acquired,
+            'pricePaid': self.price_paid,
+            'commissions': 0.0,
+            'otherFees': 0.0,
+            'quantity': self.quantity,
+            'positionIndicator': 'TYPE2',
+            'positionType': 'LONG',
+            'daysGain': round(days_gain, 2),
+            'daysGainPct': round(change / self.prev_close * 100.0, 4),
+            'marketValue': round(market_value, 2),
+            'totalCost': round(total_cost, 2),
+            'totalGain': round(market_value - total_cost, 2),
+            'totalGainPct': round((market_value - total_cost) / total_cost * 100.0, 4),
+            'pctOfPortfolio': round(market_value / portfolio_value * 100.0, 4) if portfolio_value else 0.0,
+            'costPerShare': self.price_paid,
+            'todayCommissions': 0.0,
+            'todayFees': 0.0,
+            'todayPricePaid': 0.0,
+            'todayQuantity': 0.0,
+            'adjPrevClose': self.prev_close,
+            'lotsDetails': f"{base_url}/v1/accounts/{account_key}/portfolio/{self.position_id}",
+            'quoteDetails': f"{base_url}/v1/market/quote/{self.symbol}",
+            'Quick': {
+                'lastTrade': self.last,
+                'lastTradeTime': int(now),
+                'change': round(change, 2),
+                'changePct': round(change / self.prev_close * 100.0, 4),
+                'volume': self.volume,
+                'quoteStatus': 'REALTIME',
+            },
+        }
+
+
+class SyntheticAccount:
+    def __init__(self, rng, index, num_positions, now, quotes=None):
+        self.index = index
+        self.account_id = str(80_000_000 + index)
+        self.account_key = f"SYNKEY{index:04d}"
+        self.cash = round(rng.uniform(100.0, 250_000.0), 2)
+        self.positions = [SyntheticPosition(rng, index * 1_000_000 + i, synthetic_symbol(i), now, quotes)
+                          for i in range(num_positions)]
+        self.next_position = num_positions
+        self.last_step = now
+        self.transactions = None    # built on first request, see SyntheticBrokerage.transactions
+
+    def info(self):
+        return {
+            'accountId': self.account_id,
+            'accountIdKey': self.account_key,
+            'accountMode': 'MARGIN',
+            'accountDesc': f"Synthetic {self.index}",
+            'accountName': '',
+            'accountType': 'INDIVIDUAL',
+            'institutionType': 'BROKERAGE',
+            'accountStatus': 'ACTIVE',
+            'closedDate': 0,
+        }
+
+    def market_value(self):
+        return sum(p.last * p.quantity * p.multiplier for p in self.positions)
+
+
+class SyntheticBrokerage:
+    """
+    purpose: thread-safe pool of synthetic accounts that evolves as it is read
+    arguments:
+        num_accounts: how many open accounts to serve
+        positions_per_account: starting holdings per account
+        churn: probability per second, per account, that a holding is opened or closed
+        seed: makes runs reproducible
+    """
+
+    def __init__(self, num_accounts=20, positions_per_account=2000, churn=0.05, seed=7, base_url=""):
+        self.rng = random.Random(seed)
+        self.churn = churn
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        now = time.time()
+        self.quotes = {}    # symbol -> SyntheticQuote shared by every stock/fund holding of it
+        self.accounts = [SyntheticAccount(self.rng, i, positions_per_account, now, self.quotes)
+                         for i in range(num_accounts)]
+        self._by_key = {a.account_key: a for a in self.accounts}
+        self._previews = {}     # previewId -> (account key, clientOrderId)
+        self._next_id = 1
+
+    def _advance(self, account):
+        now = time.time()
+        dt = now - account.last_step
+        if dt <= 0:
+            return now
+        account.last_step = now
+        for position in account.positions:
+            position.step(self.rng, now)
+        if self.rng.random() < self.churn * dt:
+            if account.positions and self.rng.random() < 0.5:
+                position = account.positions.pop(self.rng.randrange(len(account.positions)))
+                self._record_trade(account, position, 'Sold', -position.quantity, position.last, now)
+            else:
+                position = SyntheticPosition(
+                    self.rng, account.index * 1_000_000 + account.next_position,
+                    synthetic_symbol(account.next_position), now, self.quotes)
+                position.price_paid, position.date_acquired = position.last, int(now * 1000)
+                account.positions.append(position)
+                account.next_position += 1
+                self._record_trade(account, position, 'Bought', position.quantity, position.last, now)
+        return now
+
+    def _record_trade(self, account, position, kind, quantity, price, now):
+        # only once the history exists; before that it is built from the holdings as they are then
+        if account.transactions is not None:
+            account.transactions.append(self._transaction(
+                account, int(now * 1000), kind, position.symbol, position.security_type, quantity, price,
+                position.multiplier))
+
+    def account_list(self):
+        with self._lock:
+            return {'AccountListResponse': {'Accounts': {'Account': [a.info() for a in self.accounts]}}}
+
+    def portfolio(self, account_key, page_number=1, count=50):
+        """
+        returns:
+            PortfolioResponse payload for one page, or None for an unknown account
+        """
+        with self._lock:
+            account = self._by_key.get(account_key)
+            if account is None:
+                return None
+            # prices only move between polls, so every page of one poll sees the same snapshot
+            now = self._advance(account) if page_number == 1 else account.last_step
+            count = max(1, count)
+            total_pages = max(1, -(-len(account.positions) // count))
+            page = account.positions[(page_number - 1) * count:page_number * count]
+            market_value = account.market_value()
+            positions = [p.to_json(market_value, self.base_url, account_key, now) for p in page]
+
+            total_cost = sum(p.price_paid * p.quantity * p.multiplier for p in account.positions)
+            days_gain = sum((p.last - p.prev_close) * p.quantity * p.multiplier for p in account.positions)
+            prev_value = market_value - days_gain
+            totals = {
+                'todaysGainLoss': round(days_gain, 2),
+                'todaysGainLossPct': round(days_gain / prev_value * 100.0, 4) if prev_value else 0.0,
+                'totalMarketValue': round(market_value, 2),
+                'totalGainLoss': round(market_value - total_cost, 2),
+                'totalGainLossPct': round((market_value - total_cost) / total_cost * 100.0, 4) if total_cost else 0.0,
+                'totalPricePaid': round(total_cost, 2),
+                'cashBalance': account.cash,
+            }
+            return {'PortfolioResponse': {
+                'Totals': totals,
+                'AccountPortfolio': [{
+                    'accountId': account.account_id,
+                    'totalPages': total_pages,
+                    'Position': positions,
+                }],
+            }}
+
+    def balance(self, account_key):
+        with self._lock:
+            account = self._by_key.get(account_key)
+            if account is None:
+                return None
+            market_value = account.market_value()
+            return {'BalanceResponse': {
+                'accountId': account.account_id,
+                'accountType': 'MARGIN',
+                'Computed': {
+                    'cashAvailableForInvestment': account.cash,
+                    'cashAvailableForWithdrawal': account.cash,
+                    'netCash': account.cash,
+                    'cashBalance': account.cash,
+                    'cashBuyingPower': account.cash,
+                    'marginBuyingPower': round(account.cash * 2.0, 2),
+                    'marginBalance': 0.0,
+                    'RealTimeValues': {
+                        'totalAccountValue': round(market_value + account.cash, 2),
+                        'netMv': round(market_value, 2),
+                    },
+                },
+            }}
+
+    def quote(self, symbols):
+        """
+        returns:
+            QuoteResponse payload (detailFlag=INTRADAY layout) for the known symbols
+        """
+        with self._lock:
+            now = time.time()
+            data, unknown = [], []
+            for symbol in symbols:
+                quote = self.quotes.get(symbol)
+                if quote is None:
+                    unknown.append(symbol)
+                    continue
+                quote.step(self.rng, now)
+                change = quote.last - quote.prev_close
+                data.append({
+                    'dateTimeUTC': int(now),
+                    'quoteStatus': 'REALTIME',
+                    'ahFlag': 'false',
+                    'Intraday': {
+                        'lastTrade': quote.last,
+                        'changeClose': round(change, 2),
+                        'changeClosePercentage': round(change / quote.prev_close * 100.0, 2),
+                        'totalVolume': quote.volume,
+                        'bid': round(quote.last - 0.01, 2),
+                        'ask': round(quote.last + 0.01, 2),
+                        'companyName': f"{symbol} SYNTHETIC",
+                    },
+                    'Product': {'symbol': symbol, 'securityType': 'EQ'},
+                })
+            response = {'QuoteData': data}
+            if unknown:
+                response['Messages'] = {'Message': [
+                    {'description': f"{symbol} is not a valid symbol", 'code': 10033, 'type': 'WARNING'}
+                    for symbol in unknown]}
+            return {'QuoteResponse': response}
+
+    def _underlying(self, symbol):
+        # any symbol can have options here; unknown ones get a quote on first use
+        if symbol not in self.quotes:
+            self.quotes[symbol] = SyntheticQuote(self.rng, time.time())
+        return self.quotes[symbol]
+
+    def option_expirations(self, symbol):
+        """
+        returns:
+            OptionExpireDateResponse payload: Fridays OPTION_EXPIRY_WEEKS out
+        """
+        with self._lock:
+            self._underlying(symbol)
+        today = date.today()
+        friday = today + timedelta(days=(4 - today.weekday()) % 7)
+        dates = [friday + timedelta(weeks=weeks) for weeks in OPTION_EXPIRY_WEEKS]
+        return {'OptionExpireDateResponse': {'ExpirationDate': [
+            {'year': d.year, 'month': d.month, 'day': d.day,
+             'expiryType': 'MONTHLY' if 15 <= d.day <= 21 else 'WEEKLY'} for d in dates]}}
+
+    def option_chain(self, symbol, expiry, strikes=None):
+        """
+        returns:
+            OptionChainResponse payload for one expiration, priced with Black-Scholes on a
+            volatility smile so implied volatility can be recovered from the mids
+        """
+        with self._lock:
+            spot = self._underlying(symbol).last
+        per_side = min(OPTION_STRIKES_PER_SIDE, max(1, (strikes or 2 * OPTION_STRIKES_PER_SIDE) // 2))
+        step = 1.0 if spot < 50 else 2.5 if spot < 200 else 5.0
+        center = round(spot / step) * step
+        strike = np.array([center + i * step for i in range(-per_side, per_side + 1)])
+        strike = strike[strike > 0]
+        years = float(years_to_expiry([np.datetime64(expiry, 'D')])[0])
+        vol = 0.22 + 0.04 / math.sqrt(1.0 + 12.0 * years) + 0.8 * np.log(strike / spot) ** 2
+        prices = {side: black_scholes(side == 'CALL', spot, strike, years, vol, 0.04)
+                  for side in ('CALL', 'PUT')}
+
+        pairs = []
+        for i, k in enumerate(strike):
+            pair = {}
+            for side, name in (('CALL', 'Call'), ('PUT', 'Put')):
+                price = float(prices[side][i])
+                half_spread = max(0.01, round(price * 0.02, 2))
+                pair[name] = {
+                    'optionType': side,
+                    'symbol': symbol,
+                    'strikePrice': float(k),
+                    'bid': round(max(0.0, price - half_spread), 2) if price > 0.01 else 0.0,
+                    'ask': round(price + half_spread, 2),
+                    'lastPrice': round(price, 2),
+                    'volume': int(1000 * math.exp(-abs(k / spot - 1.0) * 10.0)),
+                    'openInterest': int(5000 * math.exp(-abs(k / spot - 1.0) * 5.0)),
+                    'inTheMoney': 'y' if (k < spot) == (side == 'CALL') else 'n',
+                    'osiKey': f"{symbol}--{expiry:%y%m%d}{side[0]}{int(round(k * 1000)):08d}",
+                    'displaySymbol': f"{symbol} {expiry:%b %d '%y} ${k:g} {side.title()}",
+                }
+            pairs.append(pair)
+        return {'OptionChainResponse': {
+            'OptionPair': pairs,
+            'nearPrice': float(center),
+            'quoteType': 'REALTIME',
+            'SelectedED': {'year': expiry.year, 'month': expiry.month, 'day': expiry.day},
+        }}
+
+    def _order_response(self, account, request, order_id_key, order_id):
+        order = request['Order'][0]
+        instrument = order['Instrument'][0]
+        symbol = instrument['Product']['symbol']
+        quantity = float(instrument['quantity'])
+        price = float(order.get('limitPrice') or order.get('stopPrice') or self._underlying(symbol).last)
+        total = round(price * quantity, 2)
+        detail = dict(order, estimatedCommission=0.0, estimatedTotalAmount=total,
+                      messages={'Message': [{'description': f"{instrument['orderAction']} {quantity:g} {symbol} "
+                                                            f"(stand-in, not routed)", 'code': 1026, 'type': 'WARNING'}]})
+        return {'orderType': request.get('orderType', 'EQ'), 'accountId': account.account_id,
+                'totalOrderValue': total, 'Order': [detail], order_id_key: [order_id]}
+
+    def preview_order(self, account_key, request):
+        """
+        returns:
+            PreviewOrderResponse payload, None for an unknown account
+        raises:
+            KeyError/IndexError/ValueError for a malformed PreviewOrderRequest
+        """
+        with self._lock:
+            account = self._by_key.get(account_key)
+            if account is None:
+                return None
+            preview_id = self._next_id
+            self._next_id += 1
+            response = self._order_response(account, request, 'PreviewIds', {'previewId': preview_id})
+            self._previews[preview_id] = (account_key, request.get('clientOrderId'))
+            response['previewTime'] = int(time.time() * 1000)
+            return {'PreviewOrderResponse': response}
+
+    def place_order(self, account_key, request):
+        """
+        returns:
+            PlaceOrderResponse payload; None for an unknown account or a previewId this account
+            didn't get; orders are acknowledged but never filled
+        """
+        with self._lock:
+            account = self._by_key.get(account_key)
+            preview_id = request['PreviewIds'][0]['previewId']
+            if account is None or self._previews.pop(preview_id, (None,))[0] != account_key:
+                return None
+            order_id = self._next_id
+            self._next_id += 1
+            response = self._order_response(account, request, 'OrderIds', {'orderId': order_id})
+            response['placedTime'] = int(time.time() * 1000)
+            return {'PlaceOrderResponse': response}
+
+    def _transaction(self, account, when_ms, kind, symbol=None, security_type='EQ', quantity=0.0, price=0.0,
+                     multiplier=1, amount=None):
+        if amount is None:
+            amount = -quantity * price * multiplier
+        transaction_id = account.index * 10_000_000 + len(account.transactions or ()) + 1
+        transaction = {
+            'transactionId': transaction_id,
+            'accountId': account.account_id,
+            'transactionDate': when_ms,
+            'postDate': when_ms,
+            'amount': round(amount, 2),
+            'description': f"{kind.upper()} {abs(quantity):g} {symbol}" if symbol else kind.upper(),
+            'transactionType': kind,
+            'memo': '',
+            'imageFlag': False,
+            'instType': 'BROKERAGE',
+            'brokerage': {
+                'product': {'symbol': symbol, 'securityType': security_type} if symbol else {},
+                'quantity': quantity,
+                'price': round(price, 4),
+                'settlementCurrency': 'USD',
+                'paymentCurrency': 'USD',
+                'fee': 0.0,
+                'displaySymbol': symbol or '',
+                'settlementDate': when_ms + 2 * DAY_MS,
+            },
+            'detailsURI': f"{self.base_url}/v1/accounts/{account.account_key}/transactions/{transaction_id}",
+        }
+        return transaction
+
+    def _history(self, account):
+        """
+        purpose: an account's transaction history, consistent with its holdings: a deposit, a buy
+                 for each of a holding's lots (see SyntheticPosition.lots), dividends, and closed round trips
+        """
+        rng = random.Random(account.index * 7919 + 1)
+        now_ms = int(account.last_step * 1000)
+        events = []
+        first = min([p.date_acquired for p in account.positions] + [now_ms]) - 30 * DAY_MS
+        events.append((first, 'Transfer', None, 'EQ', 0.0, 0.0, 1,
+                       round(account.cash + sum(p.price_paid * p.quantity * p.multiplier
+                                                for p in account.positions), 2)))
+        for position in account.positions:
+            for when, size, price in position.lots(now_ms):
+                events.append((when, 'Bought', position.symbol, position.security_type, size, price,
+                               position.multiplier, None))
+            if position.security_type != 'OPTN' and rng.random() < 0.3:
+                events.append((rng.randint(position.date_acquired, now_ms), 'Dividend', position.symbol, 'EQ',
+                               0.0, 0.0, 1, round(position.quantity * position.price_paid * 0.005, 2)))
+        for i in range(len(account.positions) * CLOSED_TRADES_PER_100 // 100):
+            symbol = synthetic_symbol(20_000 + account.index * 1_000 + i)
+            bought = rng.randint(first, now_ms - 2 * DAY_MS)
+            sold = rng.randint(bought + DAY_MS, now_ms)
+            quantity = float(rng.randint(1, 300))
+            price = round(rng.uniform(5.0, 400.0), 2)
+            events.append((bought, 'Bought', symbol, 'EQ', quantity, price, 1, None))
+            events.append((sold, 'Sold', symbol, 'EQ', -quantity, round(price * rng.uniform(0.6, 1.6), 2), 1, None))
+
+        events.sort(key=lambda e: e[0])
+        account.transactions = []
+        for when, kind, symbol, security_type, quantity, price, multiplier, amount in events:
+            account.transactions.append(self._transaction(account, when, kind, symbol, security_type, quantity,
+                                                          price, multiplier, amount))
+        return account.transactions
+
+    def transactions(self, account_key, start_ms, end_ms, ascending=False, marker=None, count=50):
+        """
+        returns:
+            TransactionListResponse payload for one page of [start_ms, end_ms], None for an unknown
+            account; the marker is the offset of the next page
+        """
+        with self._lock:
+            account = self._by_key.get(account_key)
+            if account is None:
+                return None
+            self._advance(account)
+            history = account.transactions if account.transactions is not None else self._history(account)
+            selected = [t for t in history if start_ms <= t['transactionDate'] <= end_ms]
+            if not ascending:
+                selected.reverse()
+            offset = int(marker or 0)
+            count = max(1, min(50, count))
+            page = selected[offset:offset + count]
+            more = offset + count < len(selected)
+            response = {
+                'Transaction': page,
+                'transactionCount': len(page),
+                'totalCount': len(selected),
+                'moreTransactions': more,
+            }
+            if more:
+                response['marker'] = str(offset + count)
+            return {'TransactionListResponse': response}
+
+    def position_lots(self, account_key, position_id):
+        """
+        returns:
+            PositionLotsResponse payload for one holding, None for an unknown account or position
+        """
+        with self._lock:
+            account = self._by_key.get(account_key)
+            position = next((p for p in account.positions if p.position_id == position_id), None) \
+                if account is not None else None
+            if position is None:
+                return None
+            now_ms = int(account.last_step * 1000)
+            lots = []
+            for i, (acquired, quantity, price) in enumerate(position.lots(now_ms)):
+                value = position.last * quantity * position.multiplier
+                cost = price * quantity * position.multiplier
+                lots.append({
+                    'positionId': position_id,
+                    'positionLotId': position_id * 10 + i + 1,
+                    'price': price,
+                    'termCode': 1 if now_ms - acquired > 365 * DAY_MS else 0,
+                    'daysGain': round((position.last - position.prev_close) * quantity * position.multiplier, 2),
+                    'marketValue': round(value, 2),
+                    'totalCost': round(cost, 2),
+                    'totalCostForGainPct': round(cost, 2),
+                    'totalGain': round(value - cost, 2),
+                    'lotSourceCode': 0,
+                    'originalQty': quantity,
+                    'remainingQty': quantity,
+                    'availableQty': quantity,
+                    'orderNo': 0,
+                    'legNo': 0,
+                    'acquiredDate': acquired,
+                    'locationCode': 0,
+                    'exchangeRate': 1.0,
+                    'settlementCurrency': 'USD',
+                    'paymentCurrency': 'USD',
+                    'adjPrice': price,
+                    'commPerShare': 0.0,
+                    'feesPerShare': 0.0,
+                    'premium': 0.0,
+                    'shortType': 0,
+                })
+            return {'PositionLotsResponse': {'PositionLot': lots}}
@@ -0,0 +1,275 @@
+"""
+Load-test harness: drives the real AccountsManager, PollWorker and EtradeView
+against the offline stand-in server and reports throughput, latency and memory.
+
+usage (from the repo root):
+    python -m etrade_client.standin.loadtest --accounts 20 --positions 2000 --poll-seconds 30
+    python -m etrade_client.standin.loadtest --url http://127.0.0.1:8089 --json loadtest.json
+    python -m etrade_client.standin.loadtest --rate-limit 20 --burst 20 --governed
+    python -m etrade_client.standin.loadtest --poll-interval 0.2 --consumer-ms 300 --coalesce
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import types
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for path in (ROOT, os.path.join(ROOT, "ui")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+try:
+    import config
+except ImportError:
+    # the stand-in ignores OAuth; fetch_balances only needs a consumer key for its header
+    config = types.ModuleType("config")
+    config.CONSUMER_KEY = "standin"
+    sys.modules["config"] = config
+
+import requests
+from PyQt6.QtCore import QThread, QTimer
+from PyQt6.QtGui import QAction
+from PyQt6.QtWidgets import QApplication, QMainWindow, QTableWidget, QLabel, QMenu
+
+from etrade_client.accountsmanager import AccountsManager
+from etrade_client.governor import GovernedSession, RequestGovernor, ACCOUNTS
+from etrade_client.pollworker import PollWorker, connect_latest
+from etrade_client.standin.server import add_server_arguments, server_from_arguments
+from utils.metrics import metrics
+
+
+def _rss_mb():
+    try:
+        import resource
+    except ImportError:         # windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024.0 if sys.platform != "darwin" else peak / (1024.0 * 1024.0)
+
+
+def run_load_phase(session, base_url):
+    started = time.perf_counter()
+    manager = AccountsManager(session, base_url)
+    elapsed = time.perf_counter() - started
+    positions = sum(len(a.positionsRaw or {}) for a in manager.accounts_list)
+    return manager, {
+        'accounts': manager.num_of_accounts,
+        'positions': positions,
+        'seconds': elapsed,
+        'positions_per_s': positions / elapsed if elapsed else 0.0,
+    }
+
+
+def run_poll_phase(app, manager, seconds, interval, consumer_ms=0.0, coalesce=False):
+    """
+    purpose: one PollWorker per account fetching portfolio.json, delivered to the GUI thread
+    arguments:
+        consumer_ms: GUI time spent per payload, standing in for a slow table render
+        coalesce: deliver through LatestValueChannels instead of queueing every payload
+    """
+    received = {'payloads': 0, 'positions': 0}
+
+    def on_data(payload):
+        positions, _ = payload
+        received['payloads'] += 1
+        received['positions'] += len(positions)
+        if consumer_ms:
+            time.sleep(consumer_ms / 1000.0)
+
+    threads, workers, channels = [], [], []
+    for account in manager.accounts_list:
+        worker = PollWorker(lambda key=account.accountIdKey: manager.fetch_portfolio(key), interval,
+                            name='portfolio')
+        thread = QThread()
+        worker.moveToThread(thread)
+        thread.started.connect(worker.start)
+        if coalesce:
+            channels.append(connect_latest(worker, on_data, 'portfolio'))
+        else:
+            worker.dataReady.connect(on_data)
+        worker.finished.connect(thread.quit)
+        threads.append(thread)
+        workers.append(worker)
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    QTimer.singleShot(int(seconds * 1000), app.quit)
+    app.exec()
+    for worker in workers:
+        worker.stop()
+    for thread in threads:
+        # nothing delivers worker.finished -> thread.quit without a running event loop,
+        # and quit() only sticks once the thread's own loop has started
+        while not thread.wait(50):
+            thread.quit()
+    # drain payloads that were queued while the workers wound down
+    drained = time.perf_counter()
+    app.processEvents()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'workers': len(workers),
+        'seconds': elapsed,
+        'payloads': received['payloads'],
+        'payloads_per_s': received['payloads'] / elapsed if elapsed else 0.0,
+        'positions_per_s': received['positions'] / elapsed if elapsed else 0.0,
+        #time spent working through payloads still queued after the workers stopped
+        'backlog_s': elapsed - (drained - started),
+        'dropped': sum(channel.dropped for channel in channels),
+        'max_lag_ms': max((channel.max_lag_ms for channel in channels), default=None),
+    }
+
+
+def build_offscreen_etrade_view(session, base_url):
+    """
+    purpose: EtradeView wired to bare offscreen widgets instead of the dashboard .ui, pollers stopped
+    returns:
+        (host window, view); keep the window referenced for as long as the view is used
+    """
+    from ui.dashboard_view import EtradeView
+
+    window = QMainWindow()
+    window.menuSelectAccount = QMenu("Select Account", window)
+    components = {'holdingsTable': QTableWidget()}
+    for name in ('actionSimple', 'actionDynamic', 'actionFull', 'actionCustom'):
+        action = QAction(name, window)
+        action.setObjectName(name)
+        action.setCheckable(True)
+        components[name] = action
+    for name in ('todaysGainLossLabel', 'todaysGainLossPctLabel', 'totalGainLossLabel', 'totalGainLossPctLabel',
+                 'totalMarketValueLabel', 'cashBalanceLabel', 'totalAssetsLabel', 'netAccountValueLabel',
+                 'cashInvestableLabel', 'nonMarginableSecuritiesPPLabel', 'marginableSecuritiesPPLabel',
+                 'marginLabel'):
+        components[name] = QLabel()
+    view = EtradeView(components, window, session=session, base_url=base_url)
+    view.stopPolling(wait=True)
+    view.stopTransactionsSync(wait=True)
+    return window, view
+
+
+def run_view_phase(session, base_url):
+    """
+    purpose: render every account's holdings table and footer offscreen
+    """
+    started = time.perf_counter()
+    window, view = build_offscreen_etrade_view(session, base_url)
+    startup = time.perf_counter() - started
+
+    renders = []
+    for index in range(len(view.accounts_manager.accounts_list)):
+        view.current_account_index = index
+        t0 = time.perf_counter()
+        view.populate_portfolio_table()
+        view.populate_accounttables_footer()
+        renders.append((time.perf_counter() - t0) * 1000.0)
+    renders.sort()
+    return {
+        'startup_s': startup,
+        'accounts_rendered': len(renders),
+        'render_ms_p50': renders[len(renders) // 2] if renders else 0.0,
+        'render_ms_max': renders[-1] if renders else 0.0,
+    }
+
+
+def print_report(report):
+    load, poll, views = report['load'], report['poll'], report['views']
+    print("== load ==")
+    print(f"  {load['accounts']} accounts, {load['positions']} positions in {load['seconds']:.2f} s "
+          f"({load['positions_per_s']:.0f} positions/s)")
+    print("== poll ==")
+    print(f"  {poll['workers']} workers, {poll['payloads']} payloads in {poll['seconds']:.1f} s "
+          f"({poll['payloads_per_s']:.2f} payloads/s, {poll['positions_per_s']:.0f} positions/s)")
+    print(f"  {poll['backlog_s']:.1f} s draining the backlog after stop"
+          + (f", {poll['dropped']} stale payloads dropped, max consumer lag {poll['max_lag_ms']:.0f} ms"
+             if poll['max_lag_ms'] is not None else ""))
+    if views:
+        print("== views ==")
+        print(f"  EtradeView startup {views['startup_s']:.2f} s, table+footer render "
+              f"p50 {views['render_ms_p50']:.1f} ms, max {views['render_ms_max']:.1f} ms")
+    if report.get('governor'):
+        governor = report['governor']
+        print("== governor ==")
+        print(f"  {governor['granted']} requests granted, {governor['throttled']} throttle responses, "
+              f"{governor['waited_ms'] / 1000.0:.1f} s total queueing, rates {governor['rates']}")
+    if report.get('server'):
+        server = report['server']
+        print("== server ==")
+        print(f"  {server['requests']} requests ({server['requests_per_s']:.1f}/s), "
+              f"{server['bytes_sent'] / 1e6:.1f} MB, status {server['by_status']}")
+    print("== latency (ms) ==")
+    for row in report['metrics']['histograms']:
+        print(f"  {row['subsystem'] + '/' + row['endpoint']:<28} n={row['count']:<6} "
+              f"p50={row['p50_ms']:8.1f} p95={row['p95_ms']:8.1f} p99={row['p99_ms']:8.1f} "
+              f"err={row['error_rate'] * 100.0:5.1f}%")
+    memory = report['memory']
+    print("== memory ==")
+    print(f"  python heap peak {memory['tracemalloc_peak_mb']:.1f} MB"
+          + (f", process peak RSS {memory['peak_rss_mb']:.1f} MB" if memory['peak_rss_mb'] else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test etrade_client against the offline stand-in")
+    add_server_arguments(parser)
+    parser.add_argument('--url', help="use an already running stand-in instead of starting one")
+    parser.add_argument('--poll-seconds', type=float, default=20.0)
+    parser.add_argument('--poll-interval', type=float, default=2.0)
+    parser.add_argument('--consumer-ms', type=float, default=0.0, help="simulated GUI time per payload")
+    parser.add_argument('--coalesce', action='store_true', help="deliver only the newest payload per poller")
+    parser.add_argument('--skip-views', action='store_true')
+    parser.add_argument('--governed', action='store_true', help="send every request through a RequestGovernor")
+    parser.add_argument('--governor-rate', type=float, default=None,
+                        help="accounts requests/second for --governed (default: the app's limit)")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        server = server_from_arguments(args).start()
+        base_url = server.base_url
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    metrics.enable()
+    tracemalloc.start()
+    session = requests.Session()
+    governor = None
+    if args.governed:
+        limits = {ACCOUNTS: (args.governor_rate, max(1, int(args.governor_rate)))} if args.governor_rate else None
+        governor = RequestGovernor(limits)
+        session = GovernedSession(session, governor)
+    try:
+        manager, load = run_load_phase(session, base_url)
+        poll = run_poll_phase(app, manager, args.poll_seconds, args.poll_interval, args.consumer_ms, args.coalesce)
+        views = None if args.skip_views else run_view_phase(session, base_url)
+    finally:
+        _, heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if server is not None:
+            server.stop()
+
+    report = {
+        'base_url': base_url,
+        'load': load,
+        'poll': poll,
+        'views': views,
+        'server': server.stats.snapshot() if server is not None else None,
+        'governor': governor.snapshot() if governor is not None else None,
+        'metrics': metrics.snapshot(),
+        'memory': {'tracemalloc_peak_mb': heap_peak / 1e6, 'peak_rss_mb': _rss_mb()},
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
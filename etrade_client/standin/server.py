@@ -0,0 +1,343 @@
+"""
+Local stand-in for the E*TRADE accounts API.
+
+Serves /v1/accounts/list.json, /v1/accounts/{key}/portfolio.json (paged with
+count/pageNumber), the positions' lotsDetails urls, /v1/accounts/{key}/balance.json, /v1/market/quote/{symbols}.json,
+/v1/accounts/{key}/transactions.json (paged with count/marker),
+/v1/market/optionexpiredate.json and /v1/market/optionchains.json from a SyntheticBrokerage,
+and takes POSTs to /v1/accounts/{key}/orders/preview.json and place.json,
+with optional latency, throttling and error injection. No OAuth: any client
+that can GET a URL can talk to it, including a plain requests.Session.
+
+usage:
+    python -m etrade_client.standin.server --accounts 20 --positions 2000 --latency-ms 80
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from etrade_client.market_calendar import EXCHANGE_TZ
+from etrade_client.standin.fixtures import SyntheticBrokerage
+
+PORTFOLIO_RE = re.compile(r"^/v1/accounts/([^/]+)/portfolio\.json$")
+LOTS_RE = re.compile(r"^/v1/accounts/([^/]+)/portfolio/(\d+)(?:\.json)?$")
+BALANCE_RE = re.compile(r"^/v1/accounts/([^/]+)/balance\.json$")
+QUOTE_RE = re.compile(r"^/v1/market/quote/([^/]+)\.json$")
+TRANSACTIONS_RE = re.compile(r"^/v1/accounts/([^/]+)/transactions\.json$")
+ORDER_RE = re.compile(r"^/v1/accounts/([^/]+)/orders/(preview|place)\.json$")
+
+
+class FaultInjector:
+    """
+    purpose: decide per request whether to delay, throttle or fail it
+    arguments:
+        latency_ms: base latency added to every request
+        jitter_ms: uniform +/- jitter on top of latency_ms
+        error_rate: fraction of requests answered with HTTP 500
+        rate_limit: sustained requests/second before answering 429 (0 disables)
+        burst: token bucket size for rate_limit
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, rate_limit=0.0, burst=10, seed=11):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+
+    def delay(self):
+        if self.latency_ms or self.jitter_ms:
+            with self._lock:
+                jitter = self.rng.uniform(-self.jitter_ms, self.jitter_ms)
+            time.sleep(max(0.0, self.latency_ms + jitter) / 1000.0)
+
+    def throttled(self):
+        """
+        returns:
+            seconds the client should wait (Retry-After) if throttled, else None
+        """
+        if not self.rate_limit:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_limit)
+            self._refilled_at = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return None
+            return (1.0 - self._tokens) / self.rate_limit
+
+    def failed(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self.rng.random() < self.error_rate
+
+
+class ServerStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.by_status = {}
+        self.bytes_sent = 0
+        self.started_at = time.perf_counter()
+
+    def record(self, status, size):
+        with self._lock:
+            self.requests += 1
+            self.by_status[status] = self.by_status.get(status, 0) + 1
+            self.bytes_sent += size
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started_at
+            return {
+                'requests': self.requests,
+                'by_status': dict(self.by_status),
+                'bytes_sent': self.bytes_sent,
+                'elapsed_s': elapsed,
+                'requests_per_s': self.requests / elapsed if elapsed else 0.0,
+            }
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"     # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, extra_headers=None):
+        # None: no body (204)
+        body = json.dumps(payload).encode() if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.stats.record(status, len(body))
+
+    def _error(self, status, code, message, extra_headers=None):
+        self._send(status, error_payload(code, message), extra_headers)
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle(self.rfile.read(int(self.headers.get('Content-Length') or 0)))
+
+    def _handle(self, body=None):
+        faults = self.server.faults
+        brokerage = self.server.brokerage
+        faults.delay()
+
+        retry_after = faults.throttled()
+        if retry_after is not None:
+            self._error(429, 'RATE_LIMIT', 'Request throttled',
+                        {'Retry-After': str(max(1, int(retry_after + 0.999)))})
+            return
+        if faults.failed():
+            self._error(500, 'INTERNAL', 'Injected stand-in failure')
+            return
+
+        url = urlparse(self.path)
+        status, payload = dispatch(brokerage, url.path, parse_qs(url.query), self.server.page_size, body)
+        self._send(status, payload)
+
+
+def error_payload(code, message):
+    return {'Error': {'code': code, 'message': message}}
+
+
+def dispatch(brokerage, path, query, page_size=50, body=None):
+    """
+    purpose: route one request to the synthetic brokerage
+    arguments:
+        brokerage: SyntheticBrokerage
+        path: url path, e.g. /v1/accounts/list.json
+        query: parse_qs-style dict of lists
+        page_size: default portfolio page size when the request has no count
+        body: POST body (bytes or str), None for a GET
+    returns:
+        (http status, json payload)
+    """
+    if path == "/v1/accounts/list.json":
+        return 200, brokerage.account_list()
+
+    match = PORTFOLIO_RE.match(path)
+    if match:
+        page_number = int(query.get('pageNumber', ['1'])[0])
+        count = int(query.get('count', [str(page_size)])[0])
+        payload = brokerage.portfolio(match.group(1), page_number, count)
+        if payload is None:
+            return 404, error_payload('ACCOUNT', 'Invalid account key')
+        return 200, payload
+
+    match = LOTS_RE.match(path)
+    if match:
+        payload = brokerage.position_lots(match.group(1), int(match.group(2)))
+        if payload is None:
+            return 404, error_payload('POSITION', 'Invalid account key or position id')
+        return 200, payload
+
+    match = BALANCE_RE.match(path)
+    if match:
+        payload = brokerage.balance(match.group(1))
+        if payload is None:
+            return 404, error_payload('ACCOUNT', 'Invalid account key')
+        return 200, payload
+
+    match = TRANSACTIONS_RE.match(path)
+    if match:
+        try:
+            # the api's dates are New York days
+            today = datetime.now(EXCHANGE_TZ).strftime('%m%d%Y')
+            start = datetime.strptime(query.get('startDate', [today])[0], '%m%d%Y').replace(tzinfo=EXCHANGE_TZ)
+            end = datetime.strptime(query.get('endDate', [today])[0], '%m%d%Y').replace(tzinfo=EXCHANGE_TZ) \
+                + timedelta(days=1)
+        except ValueError:
+            return 400, error_payload('TRANSACTIONS', 'Dates are MMDDYYYY')
+        payload = brokerage.transactions(match.group(1), int(start.timestamp() * 1000),
+                                         int(end.timestamp() * 1000) - 1,
+                                         query.get('sortOrder', ['DESC'])[0] == 'ASC',
+                                         query.get('marker', [None])[0], int(query.get('count', ['50'])[0]))
+        if payload is None:
+            return 404, error_payload('ACCOUNT', 'Invalid account key')
+        if not payload['TransactionListResponse']['Transaction']:
+            return 204, None
+        return 200, payload
+
+    match = QUOTE_RE.match(path)
+    if match:
+        symbols = [s for s in match.group(1).split(',') if s]
+        if len(symbols) > 25 and query.get('overrideSymbolCount', ['false'])[0] != 'true':
+            return 400, error_payload('QUOTE', 'Too many symbols')
+        return 200, brokerage.quote(symbols)
+
+    if path in ("/v1/market/optionexpiredate.json", "/v1/market/optionchains.json"):
+        symbol = query.get('symbol', [''])[0].upper()
+        if not symbol:
+            return 400, error_payload('OPTIONS', 'Missing symbol')
+        if path.endswith("optionexpiredate.json"):
+            return 200, brokerage.option_expirations(symbol)
+        try:
+            expiry = date(int(query['expiryYear'][0]), int(query['expiryMonth'][0]), int(query['expiryDay'][0]))
+        except (KeyError, ValueError):
+            return 400, error_payload('OPTIONS', 'Invalid expiry date')
+        strikes = int(query['noOfStrikes'][0]) if 'noOfStrikes' in query else None
+        return 200, brokerage.option_chain(symbol, expiry, strikes)
+
+    match = ORDER_RE.match(path)
+    if match:
+        if body is None:
+            return 405, error_payload('ORDER', 'Orders are POSTed')
+        try:
+            request = json.loads(body)
+            if match.group(2) == 'preview':
+                payload = brokerage.preview_order(match.group(1), request['PreviewOrderRequest'])
+            else:
+                payload = brokerage.place_order(match.group(1), request['PlaceOrderRequest'])
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            return 400, error_payload('ORDER', f"Malformed order request: {e}")
+        if payload is None:
+            return 404, error_payload('ORDER', 'Invalid account key or preview id')
+        return 200, payload
+
+    return 404, error_payload('NOT_FOUND', f"Stand-in does not serve {path}")
+
+
+class StandInServer:
+    """
+    purpose: run the stand-in API on a background thread
+    usage:
+        server = StandInServer(SyntheticBrokerage(20, 2000), FaultInjector(latency_ms=50)).start()
+        manager = AccountsManager(requests.Session(), server.base_url)
+        ...
+        server.stop()
+    """
+
+    def __init__(self, brokerage=None, faults=None, host="127.0.0.1", port=0, page_size=50):
+        self.httpd = ThreadingHTTPServer((host, port), StandInHandler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.httpd.brokerage = brokerage or SyntheticBrokerage(base_url=self.base_url)
+        self.httpd.brokerage.base_url = self.base_url
+        self.httpd.faults = faults or FaultInjector()
+        self.httpd.stats = ServerStats()
+        self.httpd.page_size = page_size
+        self._thread = None
+
+    @property
+    def brokerage(self):
+        return self.httpd.brokerage
+
+    @property
+    def faults(self):
+        return self.httpd.faults
+
+    @property
+    def stats(self):
+        return self.httpd.stats
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="etrade-standin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+
+def add_server_arguments(parser):
+    parser.add_argument('--accounts', type=int, default=20)
+    parser.add_argument('--positions', type=int, default=2000, help="positions per account")
+    parser.add_argument('--churn', type=float, default=0.05, help="holding changes per account per second")
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="requests/second before 429s, 0 = off")
+    parser.add_argument('--burst', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+
+
+def server_from_arguments(args, port=0):
+    brokerage = SyntheticBrokerage(args.accounts, args.positions, churn=args.churn, seed=args.seed)
+    faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, args.burst)
+    return StandInServer(brokerage, faults, port=port, page_size=args.page_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline E*TRADE accounts API stand-in")
+    add_server_arguments(parser)
+    parser.add_argument('--port', type=int, default=8089)
+    args = parser.parse_args()
+
+    server = server_from_arguments(args, port=args.port)
+    print(f"E*TRADE stand-in serving {args.accounts} accounts x {args.positions} positions at {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats.snapshot(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
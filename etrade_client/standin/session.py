@@ -0,0 +1,49 @@
+"""
+In-process transport for the stand-in: a session object with the subset of the
+requests/rauth session API that AccountsManager, Market and Order use, answering straight from a
+SyntheticBrokerage without sockets. Used where only client-side cost matters
+(benchmarks); the HTTP server is for anything that should see real I/O.
+"""
+
+import json as _json
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs
+
+from etrade_client.standin.server import dispatch
+
+
+class StandInResponse:
+    def __init__(self, status_code, payload, url):
+        self.status_code = status_code
+        self._payload = payload
+        self.url = url
+        self.headers = {'Content-Type': 'application/json'}
+        self.request = SimpleNamespace(headers={}, url=url)
+
+    @property
+    def text(self):
+        return _json.dumps(self._payload)
+
+    def json(self):
+        return self._payload
+
+
+class StandInSession:
+    def __init__(self, brokerage, page_size=50):
+        self.brokerage = brokerage
+        self.page_size = page_size
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        return self._dispatch(url, params)
+
+    def post(self, url, data=None, json=None, params=None, headers=None, **kwargs):
+        body = data if data is not None else _json.dumps(json)
+        return self._dispatch(url, params, body)
+
+    def _dispatch(self, url, params, body=None):
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+        for key, value in (params or {}).items():
+            query[key] = [str(value)]
+        status, payload = dispatch(self.brokerage, parsed.path, query, self.page_size, body)
+        return StandInResponse(status, payload, url)
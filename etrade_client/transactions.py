@@ -0,0 +1,262 @@
+"""
+Local store of E*TRADE account transactions.
+
+The transactions API pages 50 at a time over at most two years, so anything
+that looks at activity or realized gains would otherwise re-download the
+whole history. AccountsManager.sync_transactions() pages through it once into
+a TransactionStore - an append-only SQLite table keyed by transactionId - and
+afterwards only asks for transactions since each account's sync cursor (the
+newest transaction date stored, less SYNC_OVERLAP_DAYS for
+late postings; rows already stored are skipped, never rewritten).
+
+Queries by account, symbol, date range and type run against the table's
+indexes and come back as a DataFrame.
+
+note: the database holds account activity unencrypted, like the dashboard snapshot
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from logging.handlers import RotatingFileHandler
+
+import pandas as pd
+
+from etrade_client.market_calendar import EXCHANGE_TZ
+from utils.metrics import metrics
+
+logger = logging.getLogger('transactions')
+logger.setLevel(logging.WARNING)
+handler = RotatingFileHandler("python_client.log", maxBytes=5*1024*1024, backupCount=3)
+FORMAT = "%(asctime)-15s %(message)s"
+fmt = logging.Formatter(FORMAT, datefmt='%m/%d/%Y %I:%M:%S %p')
+handler.setFormatter(fmt)
+logger.addHandler(handler)
+
+DEFAULT_PATH = "transactions.sqlite3"
+#how far back the first sync of an account goes; the api keeps two years
+HISTORY_DAYS = 730
+#days before the cursor each sync asks for again, for transactions posted late
+SYNC_OVERLAP_DAYS = 5
+#the api's largest page
+PAGE_SIZE = 50
+
+COLUMNS = ['transaction_id', 'account_key', 'transaction_date', 'post_date', 'transaction_type', 'symbol',
+           'security_type', 'quantity', 'price', 'amount', 'fee', 'description']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id INTEGER PRIMARY KEY,
+    account_key TEXT NOT NULL,
+    transaction_date INTEGER NOT NULL,
+    post_date INTEGER,
+    transaction_type TEXT,
+    symbol TEXT,
+    security_type TEXT,
+    quantity REAL,
+    price REAL,
+    amount REAL,
+    fee REAL,
+    description TEXT,
+    raw TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_by_date ON transactions (account_key, transaction_date);
+CREATE INDEX IF NOT EXISTS transactions_by_symbol ON transactions (account_key, symbol, transaction_date);
+CREATE INDEX IF NOT EXISTS transactions_by_type ON transactions (account_key, transaction_type, transaction_date);
+CREATE INDEX IF NOT EXISTS transactions_symbol_any_account ON transactions (symbol, transaction_date);
+CREATE TABLE IF NOT EXISTS sync_state (
+    account_key TEXT PRIMARY KEY,
+    cursor INTEGER,
+    synced_at INTEGER
+);
+"""
+
+
+def to_epoch_ms(value):
+    """
+    purpose: a query bound as epoch milliseconds
+    arguments:
+        value: epoch ms, date (midnight New York), datetime (naive = New York), pandas Timestamp or
+               an ISO date string
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = pd.Timestamp(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=EXCHANGE_TZ)
+    return int(value.timestamp() * 1000)
+
+
+def api_date(value):
+    """
+    returns:
+        MMDDYYYY, the api's startDate/endDate format
+    """
+    return value.strftime('%m%d%Y')
+
+
+def transaction_row(transaction, account_key):
+    """
+    purpose: flatten one Transaction from the api into a store row (COLUMNS order, then raw json)
+    """
+    brokerage = transaction.get('brokerage') or {}
+    product = brokerage.get('product') or brokerage.get('Product') or {}
+    return (
+        int(transaction['transactionId']),
+        account_key,
+        int(transaction['transactionDate']),
+        transaction.get('postDate'),
+        transaction.get('transactionType'),
+        product.get('symbol') or None,
+        product.get('securityType'),
+        brokerage.get('quantity'),
+        brokerage.get('price'),
+        transaction.get('amount'),
+        brokerage.get('fee'),
+        transaction.get('description'),
+        json.dumps(transaction, separators=(',', ':')),
+    )
+
+
+class TransactionStore:
+    """
+    purpose: append-only transaction table with a sync cursor per account
+    arguments:
+        path: SQLite file, ':memory:' for a throwaway store
+    note: one connection shared by every thread, serialized by a lock; sync runs on poll threads
+          while views query from the gui
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            if path != ':memory:':
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def append(self, account_key, transactions):
+        """
+        purpose: store api Transaction dicts; ones already stored are left as they are
+        returns:
+            number of new rows
+        """
+        rows = []
+        for transaction in transactions:
+            try:
+                rows.append(transaction_row(transaction, account_key))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning("skipping unreadable transaction: %s", e)
+        if not rows:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(f"INSERT OR IGNORE INTO transactions ({', '.join(COLUMNS)}, raw) "
+                                   f"VALUES ({', '.join('?' * (len(COLUMNS) + 1))})", rows)
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def cursor(self, account_key):
+        """
+        returns:
+            epoch ms of the newest transaction synced for the account, None before its first sync
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT cursor FROM sync_state WHERE account_key = ?", (account_key,)).fetchone()
+        return row[0] if row else None
+
+    def set_cursor(self, account_key, cursor_ms, synced_at_ms):
+        with self._lock:
+            self._conn.execute("INSERT INTO sync_state (account_key, cursor, synced_at) VALUES (?, ?, ?) "
+                               "ON CONFLICT(account_key) DO UPDATE SET cursor = excluded.cursor, "
+                               "synced_at = excluded.synced_at", (account_key, cursor_ms, synced_at_ms))
+            self._conn.commit()
+
+    def sync_window(self, account_key, today=None):
+        """
+        returns:
+            (start date, end date) the next sync of the account should ask the api for
+        """
+        today = today or datetime.now(EXCHANGE_TZ).date()
+        cursor = self.cursor(account_key)
+        if cursor is None:
+            return today - timedelta(days=HISTORY_DAYS), today
+        start = datetime.fromtimestamp(cursor / 1000.0, EXCHANGE_TZ).date() - timedelta(days=SYNC_OVERLAP_DAYS)
+        return max(start, today - timedelta(days=HISTORY_DAYS)), today
+
+    def query(self, account_key=None, symbol=None, start=None, end=None, types=None, raw=False):
+        """
+        purpose: stored transactions, oldest first
+        arguments:
+            account_key: one account, None for all
+            symbol: one symbol or a list of them
+            start, end: inclusive transaction date bounds, see to_epoch_ms
+            types: transactionType values, e.g. ['Bought', 'Sold']
+            raw: add the api's json for each row as a 'raw' column
+        returns:
+            DataFrame with COLUMNS; transaction_date and post_date as New York datetimes
+        """
+        where, params = [], []
+        if account_key is not None:
+            where.append("account_key = ?")
+            params.append(account_key)
+        if symbol is not None:
+            symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+            where.append(f"symbol IN ({', '.join('?' * len(symbols))})")
+            params.extend(symbols)
+        if start is not None:
+            where.append("transaction_date >= ?")
+            params.append(to_epoch_ms(start))
+        if end is not None:
+            # a date as the end bound means the whole day
+            bound = to_epoch_ms(end)
+            if isinstance(end, date) and not isinstance(end, datetime):
+                bound = to_epoch_ms(end + timedelta(days=1)) - 1
+            where.append("transaction_date <= ?")
+            params.append(bound)
+        if types is not None:
+            types = [types] if isinstance(types, str) else list(types)
+            where.append(f"transaction_type IN ({', '.join('?' * len(types))})")
+            params.extend(types)
+
+        columns = COLUMNS + (['raw'] if raw else [])
+        sql = f"SELECT {', '.join(columns)} FROM transactions"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY transaction_date, transaction_id"
+        with metrics.timer('transactions', 'query'):
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+            frame = pd.DataFrame.from_records(rows, columns=columns)
+            for column in ('transaction_date', 'post_date'):
+                frame[column] = pd.to_datetime(frame[column], unit='ms', utc=True).dt.tz_convert(EXCHANGE_TZ)
+        return frame
+
+    def count(self, account_key=None):
+        with self._lock:
+            if account_key is None:
+                return self._conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM transactions WHERE account_key = ?",
+                                      (account_key,)).fetchone()[0]
+
+
+def transaction_store_from_config():
+    """
+    purpose: open the TransactionStore at TRANSACTIONS_DB_PATH from config.py (default transactions.sqlite3)
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    return TransactionStore(getattr(config, 'TRANSACTIONS_DB_PATH', DEFAULT_PATH))
@@ -1,6 +1,237 @@
-#main idea:
-    #create console with commands like
-    #CMP IONQ PRICE PE -RANGE 2 YEARS
-    #or something along those lines
-    #will pull up matplotlib of the request.
+from collections import deque
 
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+from PyQt6.QtCore import Qt, QEvent, QObject, QThread, pyqtSignal
+from PyQt6.QtWebEngineWidgets import QWebEngineView
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLineEdit, QPlainTextEdit, QSplitter
+
+from analytics.compare import Command, CompareEngine, FIELDS
+from data_providers.symbol_index import unknown_message
+from ui.ui_constants import StandardFonts, Colors, Layout, ChartStyle
+from ui.widgets.symbol_completer import SymbolCompleter
+from YFinance.YFinanceDataManager import YFinanceDataManager
+
+HELP = """CMP <symbols> [fields] [FRED:<series>] [-RANGE <n> <days|weeks|months|years> | YTD | MAX]
+  fields: PRICE (default), RETURN (% from range start), VOLUME, PE, EPS (trailing 12 months)
+  e.g. CMP IONQ PRICE PE -RANGE 2 YEARS
+       CMP SPY TLT IBIT RETURN -RANGE 6M
+       CMP NVDA RETURN FRED:DGS10 -RANGE YTD
+HELP shows this, CLEAR clears the log, up/down walks the command history"""
+
+ROW_TITLES = {'PRICE': 'Price', 'RETURN': 'Return %', 'VOLUME': 'Volume', 'PE': 'P/E (ttm)',
+              'EPS': 'EPS (ttm)', 'FRED': 'FRED'}
+
+
+class CompareWorker(QObject):
+    resultReady: pyqtSignal = pyqtSignal(object)
+    error: pyqtSignal = pyqtSignal(str)
+    finished: pyqtSignal = pyqtSignal()
+
+    def __init__(self, engine, command):
+        super().__init__()
+        self.engine = engine
+        self.command = command
+
+    def run(self):
+        try:
+            self.resultReady.emit(self.engine.run(self.command))
+        except Exception as e:
+            self.error.emit(str(e))
+        self.finished.emit()
+
+
+def build_compare_html(result, gridcolor=ChartStyle.GRID_COLOR):
+    """
+    purpose: one chart for a compare result: a row per field, every row on the same dates
+    arguments:
+        result: CompareEngine.run output
+    returns:
+        html string for QWebEngineView.setHtml
+    """
+    frames = result['frames']
+    rows = list(frames)
+    fig = make_subplots(rows=len(rows), cols=1, shared_xaxes=True, vertical_spacing=0.04,
+                        subplot_titles=[ROW_TITLES.get(r, r) for r in rows])
+    colors = {}
+    for row, field in enumerate(rows, start=1):
+        frame = frames[field]
+        for column in frame.columns:
+            # a symbol keeps its color (and one legend entry) across rows
+            name = f"FRED:{column}" if field == 'FRED' else column
+            first = name not in colors
+            color = colors.setdefault(name, ChartStyle.OVERLAY_COLORS[len(colors) % len(ChartStyle.OVERLAY_COLORS)])
+            fig.add_trace(go.Scatter(x=frame.index, y=frame[column], mode='lines', name=name, legendgroup=name,
+                                     showlegend=first, connectgaps=True,
+                                     line=dict(color=color, width=ChartStyle.OVERLAY_LINE_WIDTH)),
+                          row=row, col=1)
+
+    fig.update_layout(
+        title=dict(text=result['command'].text, font=dict(size=ChartStyle.TITLE_FONT_SIZE)),
+        margin=ChartStyle.BODY_MARGIN,
+        plot_bgcolor=ChartStyle.PLOT_BACKGROUND,
+        paper_bgcolor=ChartStyle.PAPER_BACKGROUND,
+        font=dict(color=Colors.PRIMARY_TEXT),
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, x=1, xanchor='right'),
+    )
+    fig.update_xaxes(showgrid=True, gridcolor=gridcolor)
+    fig.update_yaxes(showgrid=True, gridcolor=gridcolor)
+    html = f"""
+    <html>
+    <head>
+        <style>
+            body {{
+                margin: 2px;
+                padding: 0;
+                background-color: {ChartStyle.PLOT_BACKGROUND};
+            }}
+        </style>
+    </head>
+    <body>
+        {fig.to_html(include_plotlyjs='cdn', full_html=True)}
+    </body>
+    </html>
+    """
+    return html
+
+
+class CompareConsole(QWidget):
+    """
+    command console for comparisons: CMP IONQ PRICE PE -RANGE 2 YEARS plots IONQ's price and
+    P/E over two years in one chart. commands are planned into a few batched, cached requests
+    (see analytics/compare.py) and run off the gui thread; repeats come back from cache.
+    """
+
+    def __init__(self, history=None, symbols=None):
+        super().__init__()
+        self.setWindowTitle("Compare")
+        self.setGeometry(120, 120, 1000, 700)
+        # share the dashboard's history cache when given one
+        self.engine = CompareEngine(history or YFinanceDataManager())
+        #SymbolIndex: completes the command's tickers and flags likely typos
+        self.symbols = symbols
+        self.commands = []          # entered commands, for up/down recall
+        self._recall = 0
+        self._queue = deque()
+        self._thread, self._worker = None, None
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN,
+                                  Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN)
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        self.chart = QWebEngineView()
+        self.output = QPlainTextEdit()
+        self.output.setReadOnly(True)
+        self.output.setFont(StandardFonts.SMALL)
+        self.output.setStyleSheet(f"color: {Colors.PRIMARY_TEXT}; background-color: {Colors.DARK_BACKGROUND};")
+        self.output.setPlainText(HELP)
+        splitter.addWidget(self.chart)
+        splitter.addWidget(self.output)
+        splitter.setStretchFactor(0, 4)
+        splitter.setStretchFactor(1, 1)
+        layout.addWidget(splitter)
+
+        self.commandInput = QLineEdit()
+        self.commandInput.setFont(StandardFonts.MEDIUM)
+        self.commandInput.setPlaceholderText("CMP IONQ PRICE PE -RANGE 2 YEARS")
+        self.commandInput.returnPressed.connect(self._on_command)
+        self.commandInput.installEventFilter(self)
+        if symbols is not None:
+            SymbolCompleter(symbols, self.commandInput, words=True, skip=self._not_a_symbol)
+        layout.addWidget(self.commandInput)
+        self.setLayout(layout)
+
+    @staticmethod
+    def _not_a_symbol(before, word):
+        word = word.upper()
+        return (not before or word in FIELDS or word.startswith(('-', 'FRED:')) or word.isdigit()
+                or before[-1].upper() == '-RANGE' or (len(before) > 1 and before[-2].upper() == '-RANGE'))
+
+    def eventFilter(self, obj, event):
+        if obj is self.commandInput and event.type() == QEvent.Type.KeyPress and self.commands:
+            if event.key() in (Qt.Key.Key_Up, Qt.Key.Key_Down):
+                step = -1 if event.key() == Qt.Key.Key_Up else 1
+                self._recall = max(0, min(len(self.commands), self._recall + step))
+                text = self.commands[self._recall] if self._recall < len(self.commands) else ""
+                self.commandInput.setText(text)
+                return True
+        return super().eventFilter(obj, event)
+
+    def _log(self, text):
+        self.output.appendPlainText(text)
+
+    def _on_command(self):
+        text = self.commandInput.text().strip()
+        self.commandInput.clear()
+        if not text:
+            return
+        self.commands.append(text)
+        self._recall = len(self.commands)
+        self.run_command(text)
+
+    def run_command(self, text):
+        word = text.split()[0].upper()
+        if word == 'HELP':
+            self._log(HELP)
+            return
+        if word == 'CLEAR':
+            self.output.clear()
+            return
+        self._log(f"> {text}")
+        try:
+            command = Command(text)
+        except ValueError as e:
+            self._log(f"  {e}")
+            return
+        unknown = self.symbols.unknown(command.symbols) if self.symbols is not None else None
+        if unknown:
+            #a warning only: the history download is the final word on a symbol
+            self._log(f"  {unknown_message(unknown)}")
+        self._queue.append(command)
+        if self._worker is None:
+            self._start_next()
+
+    def _start_next(self):
+        if not self._queue:
+            return
+        self._worker = CompareWorker(self.engine, self._queue.popleft())
+        self._thread = QThread(self)
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.run)
+        self._worker.resultReady.connect(self._on_result)
+        self._worker.error.connect(lambda message: self._log(f"  error: {message}"))
+        self._worker.finished.connect(self._thread.quit)
+        self._worker.finished.connect(self._on_finished)
+        # a thread and worker per command, freed once the thread is done
+        self._thread.finished.connect(self._worker.deleteLater)
+        self._thread.finished.connect(self._thread.deleteLater)
+        self._thread.finished.connect(self._on_thread_finished)
+        self._thread.start()
+
+    def _on_finished(self):
+        self._worker = None
+        self._start_next()
+
+    def _on_thread_finished(self):
+        if self.sender() is self._thread:
+            self._thread = None
+
+    def _on_result(self, result):
+        requests = ", ".join(f"{kind} x{len(names)}" for kind, names, _ in result['requests'])
+        source = "cached" if result['cached'] else requests or "no requests"
+        self._log(f"  {result['command'].text}: {result['elapsed_ms']:.1f} ms ({source})")
+        if result['missing']:
+            self._log(f"  no data: {', '.join(result['missing'])}")
+        if not result['frames']:
+            self._log("  nothing to plot")
+            return
+        self.chart.setHtml(build_compare_html(result))
+
+    def closeEvent(self, event):
+        self._queue.clear()
+        if self._thread is not None:
+            # a running command finishes its requests; nothing is cancelled mid-download. the
+            # worker's quit is queued to this (blocked) thread, so it is repeated here
+            while not self._thread.wait(50):
+                self._thread.quit()
+        super().closeEvent(event)
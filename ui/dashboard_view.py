@@ -1,27 +1,58 @@
 import sys
 from PIL.SpiderImagePlugin import isInt
-from PyQt6.QtCore import QDate, QObject, Qt, QThread
-from PyQt6.QtGui import QBrush, QColor, QAction, QActionGroup
+from PyQt6.QtCore import QDate, QObject, Qt, QThread, QTimer, QRectF
+from PyQt6.QtGui import QBrush, QAction, QActionGroup
 from PyQt6.QtWidgets import QWidget, QLineEdit, QPushButton, QApplication, QMainWindow, QLabel, QComboBox, QSplitter, \
     QTableWidgetItem, QTableWidget, QFrame, QMenu, QWidgetAction, QHBoxLayout, QVBoxLayout, QTabWidget
 from PyQt6 import uic
-from PyQt6.QtGui import QPainter, QPen, QColor, QFont
+from PyQt6.QtGui import QPainter, QFont
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from PyQt6.QtWebEngineWidgets import QWebEngineView
 from PyQt6.uic.Compiler.qtproxies import strict_getattr
 import re
+import threading
+import time
+from collections import deque
 # from matplotlib.pyplot import xlabel
 from etrade_client.auth.etrade_auth import oauth
 from etrade_client.accountsmanager import AccountsManager
-from etrade_client.pollworker import PollWorker
+from etrade_client.pollworker import PollWorker, connect_latest
+from etrade_client.poll_policy import poll_policy_from_config, portfolio_value, balance_value, \
+    QUOTE_PHASE_INTERVALS, RECONCILE_PHASE_INTERVALS
+from etrade_client.market import Market
+from etrade_client.order import Order
+from etrade_client.equity_curve import equity_curve_from_config
+from etrade_client.pnl import PnLEngine
+from etrade_client.governor import GovernedSession, request_priority, SELECTED, BACKGROUND
 from datetime import datetime, timedelta
 from ui.ui_constants import (
     StandardFonts, Colors, ColorStrings, StyleSheets, Layout, ChartStyle,
     apply_gain_loss_color, get_gain_loss_brush
 )
 from researchtab import ResearchTab
+from compareconsole import CompareConsole
 from YFinance.YFinanceDataManager import YFinanceDataManager
+from utils.stall_detector import install_stall_detector
+from utils.metrics import timed, enable_metrics_from_config
+from utils.snapshot import snapshot_store_from_config, frame_to_series, series_to_frame, format_age
+from ui.widgets.performance_panel import PerformancePanel
+from ui.widgets.risk_panel import RiskPanel
+from ui.widgets.order_entry_form import OrderEntryForm
+from ui.widgets.equity_curve_panel import EquityCurvePanel
+from ui.widgets.alerts_panel import AlertsPanel
+from ui.widgets.sparkline import SparklineDelegate, SYMBOL_ROLE, sparkline_points, paint_sparkline
+from ui.widgets.symbol_completer import SymbolCompleter
+from analytics.alerts import alert_engine_from_config
+from analytics.risk import exposures_from_accounts, history_period
+from analytics.indicators import IndicatorCache, DEFAULT_OVERLAYS
+from analytics.alignment import align_columns, rebase
+from data_providers.subscription_hub import SubscriptionHub
+from data_providers.data_service import data_service_from_config, session_credentials
+from data_providers.symbol_index import symbol_index_from_config, unknown_message
 
 class MiniChart(QWidget):
     def __init__(self, values, width=Layout.MINI_CHART_WIDTH, height=Layout.MINI_CHART_HEIGHT):
@@ -32,30 +63,13 @@ class MiniChart(QWidget):
     def paintEvent(self, event):
         if not self.values or len(self.values) < 2:
             return
-            
+        points = sparkline_points(self.values)
+        if points is None:
+            return
+
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-        
         margin = ChartStyle.MINI_CHART_MARGIN
-        chart_width = self.width() - 2 * margin
-        chart_height = self.height() - 2 * margin
-        
-        min_val = min(self.values)
-        max_val = max(self.values)
-        val_range = max_val - min_val if max_val != min_val else 1
-        
-        points = []
-        for i, value in enumerate(self.values):
-            x = margin + (i / (len(self.values) - 1)) * chart_width
-            y = margin + chart_height - ((value - min_val) / val_range) * chart_height
-            points.append((x, y))
-        
-        pen = QPen(QColor(Colors.CHART_LINE_PRIMARY), 1)
-        painter.setPen(pen)
-        
-        for i in range(len(points) - 1):
-            painter.drawLine(int(points[i][0]), int(points[i][1]), 
-                           int(points[i+1][0]), int(points[i+1][1]))
+        paint_sparkline(painter, QRectF(margin, margin, self.width() - 2 * margin, self.height() - 2 * margin), points)
 
 class EconomicRow(QFrame):
     def __init__(self, name, data):
@@ -139,7 +153,7 @@ class EconomicRow(QFrame):
         self.setLayout(layout)
 
 class EconomicDataView(QObject):
-    def __init__(self, components, dashboard):
+    def __init__(self, components, dashboard, load=True):
         super().__init__()
         self.dashboard = dashboard
         self.economicDataContainer = components['economicDataContainer']
@@ -151,6 +165,33 @@ class EconomicDataView(QObject):
         #     }
         # """)
 
+        self.FREDManager = None
+        self.row_data = {}
+        self.as_of = None
+        self.rows = []
+        if load:
+            self.load()
+
+    def load(self):
+        """
+        purpose: fetch every indicator from FRED and show it
+        returns:
+            True if live rows were shown
+        """
+        service = getattr(self.dashboard, 'dataService', None)
+        if service is not None:
+            try:
+                rows = service.call('service', 'economic_rows')
+            except RuntimeError as e:
+                print(f"Error: {e}")
+                rows = None
+            if not rows:
+                return False
+            self.as_of = time.time()
+            self.populate_economic_data(rows)
+            self._feed_alerts()
+            return True
+
         try:
             from FRED.FREDDataManager import FREDDataManager
             self.FREDManager = FREDDataManager()
@@ -161,10 +202,33 @@ class EconomicDataView(QObject):
             print(f"Error: {e}")
             self.FREDManager = None
 
-        self.rows = []
+        if self.FREDManager is None or not self.FREDManager.EconomicViewRowData:
+            return False
+        self.as_of = time.time()
         self.populate_economic_data()
-        
-    def populate_economic_data(self):
+        self._feed_alerts()
+        return True
+
+    def _feed_alerts(self):
+        #live rows only; a restored snapshot's would alert on old data
+        alerts = getattr(self.dashboard, 'alertsPanel', None)
+        if alerts is not None:
+            alerts.on_economic(self.row_data)
+
+    def restore_snapshot(self, state):
+        if not state.get('rows'):
+            return False
+        self.as_of = state.get('as_of')
+        self.populate_economic_data(state['rows'], footer=f"Snapshot {format_age(self.as_of)} (stale)")
+        return True
+
+    def snapshot(self):
+        if not self.row_data:
+            return None
+        return {'as_of': self.as_of, 'rows': self.row_data}
+
+    @timed('ui', 'economic_rows')
+    def populate_economic_data(self, row_data=None, footer=None):
         # clear existing rows
         layout = self.economicDataContainer.layout()
         for i in reversed(range(layout.count())):
@@ -173,15 +237,16 @@ class EconomicDataView(QObject):
                 item.widget().setParent(None)
 
         # create rows
+        self.row_data = row_data if row_data is not None else self.FREDManager.EconomicViewRowData
         self.rows = []
-        for name, data in self.FREDManager.EconomicViewRowData.items():
+        for name, data in self.row_data.items():
             row = EconomicRow(name, data)
             self.rows.append(row)
             # Insert before the spacer
             layout.insertWidget(layout.count() - 1, row)
         
         # update footer
-        self.economicDataFooter.setText(f"Updated: {datetime.now().strftime('%H:%M:%S')}")
+        self.economicDataFooter.setText(footer or f"Updated: {datetime.now().strftime('%H:%M:%S')}")
 
 class DashboardView(QMainWindow):
     #declaring type for ide
@@ -288,6 +353,7 @@ class DashboardView(QMainWindow):
             'BR_BL_ChartWidget': self.BR_BL_ChartWidget,
             'BR_BR_ChartWidget': self.BR_BR_ChartWidget
         }
+        enable_metrics_from_config()
         etrade_components = {
             'holdingsTable': self.holdingsTable,
             'actionSimple': self.actionSimple,
@@ -318,31 +384,265 @@ class DashboardView(QMainWindow):
             'economicDataFooter': self.economicDataFooter
         }
 
-        self.ChartView = ChartView(chart_components, self)
-        self.EtradeView = EtradeView(etrade_components, self)
-        self.EconomicDataView = EconomicDataView(economic_components, self)
+        #optional subprocess that does the fetching and parsing (see data_providers/data_service.py)
+        self.dataService = data_service_from_config()
+        #every view's market data goes through one hub, so symbols shown twice are fetched once
+        self.subscriptionHub = SubscriptionHub(self)
+        #local symbol universe for ticker completion; typed symbols are checked against it before
+        #any request (see data_providers/symbol_index.py). loads on its own thread
+        self.symbolIndex = symbol_index_from_config()
+        if self.symbolIndex is not None:
+            self.symbolIndex.start()
+
+        #views start empty; the last snapshot (if any) is shown first, live data is loaded
+        #once the window is up - see _init_snapshot
+        self.ChartView = ChartView(chart_components, self, load=False)
+        self.EtradeView = EtradeView(etrade_components, self, load=False)
+        self.EconomicDataView = EconomicDataView(economic_components, self, load=False)
         self.date = str(QDate.currentDate().toPyDate())
         self._init_research_menu()
+        self._init_performance_panel()
+        self._init_risk_panel()
+        self._init_order_entry()
+        self._init_equity_curve_panel()
+        self._init_alerts()
+        self._init_snapshot()
 
     def _init_research_menu(self):
         self.menuNewResearchTab = QAction('New Research Tab',self)
         self.menuNewResearchTab.triggered.connect(self._new_research_window)
         self.menuResearch.addAction(self.menuNewResearchTab)
+        self.menuNewCompareConsole = QAction('New Compare Console', self)
+        self.menuNewCompareConsole.triggered.connect(self._new_compare_console)
+        self.menuResearch.addAction(self.menuNewCompareConsole)
+
+
+    def _init_performance_panel(self):
+        self.performancePanel = PerformancePanel(self)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.performancePanel)
+        self.performancePanel.hide()
+
+        toggle = self.performancePanel.toggleViewAction()
+        toggle.setText('Performance Panel')
+        self.menuView.addSeparator()
+        self.menuView.addAction(toggle)
+
+    def _init_risk_panel(self):
+        self.riskPanel = RiskPanel(self._risk_exposures, self.ChartView.yfinance_manager, self)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.riskPanel)
+        self.riskPanel.hide()
+
+        toggle = self.riskPanel.toggleViewAction()
+        toggle.setText('Risk Panel')
+        self.menuView.addAction(toggle)
+
+    def _init_order_entry(self):
+        self._orders = {}   # accountIdKey -> Order, so its cached lookups survive account switches
+        self.orderEntryForm = OrderEntryForm(self._selected_order, self, symbols=self.symbolIndex)
+        self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.orderEntryForm)
+        self.orderEntryForm.hide()
+
+        toggle = self.orderEntryForm.toggleViewAction()
+        toggle.setText('Order Entry')
+        self.menuView.addAction(toggle)
+
+    def _init_equity_curve_panel(self):
+        self.equityCurvePanel = None
+        if self.EtradeView.equity_curve is None:
+            return
+        self.equityCurvePanel = EquityCurvePanel(self.EtradeView.equity_curve, self._equity_curve_accounts, self)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.equityCurvePanel)
+        self.equityCurvePanel.hide()
+
+        toggle = self.equityCurvePanel.toggleViewAction()
+        toggle.setText('Equity Curve')
+        self.menuView.addAction(toggle)
+
+    def _init_alerts(self):
+        self.alertsPanel = None
+        engine, rules_path, errors = alert_engine_from_config()
+        if engine is None:
+            return
+        try:
+            from FRED.FREDDataManager import FREDDataManager
+            fred_indicators = FREDDataManager(load=False).indicators
+        except ImportError:
+            fred_indicators = {}
+        self.alertsPanel = AlertsPanel(engine, rules_path, self.ChartView.yfinance_manager, fred_indicators, self)
+        self.addDockWidget(Qt.DockWidgetArea.BottomDockWidgetArea, self.alertsPanel)
+        self.alertsPanel.hide()
+        #rules are checked whether or not the panel is open
+        self.alertsPanel.start()
+
+        toggle = self.alertsPanel.toggleViewAction()
+        toggle.setText('Alerts')
+        self.menuView.addAction(toggle)
+        for text, error in errors:
+            print(f"Skipping alert rule '{text}': {error}")
+
+    def _equity_curve_accounts(self):
+        manager = self.EtradeView.accounts_manager
+        if manager is None:
+            return []
+        return [(account.accountIdKey,
+                 f"{account.account_info.get('accountDesc')} - {account.account_info.get('accountId')}")
+                for account in manager.accounts_list]
+
+    def _selected_order(self):
+        #orders always go out on the gui process's own session, never through the data service
+        view = self.EtradeView
+        if view.accounts_manager is None or view.session is None or view.current_account_index is None \
+                or view.current_account_index >= len(view.accounts_manager.accounts_list):
+            return None
+        account = view.accounts_manager.accounts_list[view.current_account_index]
+        order = self._orders.get(account.accountIdKey)
+        if order is None or order.account is not account or order.session is not view.session:
+            order = self._orders[account.accountIdKey] = Order(view.session, view.base_url, account, view.market,
+                                                               symbols=self.symbolIndex)
+        return order
+
+    def _risk_exposures(self):
+        manager = self.EtradeView.accounts_manager
+        if manager is None:
+            return {}, 0.0
+        return exposures_from_accounts(manager.accounts_list)
+
+    def _snapshot_sections(self):
+        return (('etrade', self.EtradeView), ('economic', self.EconomicDataView), ('charts', self.ChartView))
+
+    def _init_snapshot(self):
+        self.snapshot_store = snapshot_store_from_config()
+        self.stale_sections = {}    # section -> as_of of the snapshot data still on screen
+        self.snapshot_restore_info = None
+        self._startup_steps = deque()
+
+        if self.snapshot_store is not None:
+            self._restore_snapshot()
+            try:
+                import config
+                interval_s = getattr(config, 'SNAPSHOT_INTERVAL_S', 60)
+            except ImportError:
+                interval_s = 60
+            self.snapshotTimer = QTimer(self)
+            self.snapshotTimer.setInterval(int(interval_s * 1000))
+            self.snapshotTimer.timeout.connect(self.save_snapshot)
+            self.snapshotTimer.start()
+
+        #live loads run one per event-loop turn so the window paints in between
+        self._startup_steps.append(lambda: self._load_section('charts', self.ChartView))
+        self._startup_steps.append(lambda: self._load_section('etrade', self.EtradeView))
+        self._startup_steps.append(lambda: self._load_section('economic', self.EconomicDataView))
+        QTimer.singleShot(0, self._run_next_startup_step)
+
+    def _run_next_startup_step(self):
+        if not self._startup_steps:
+            return
+        step = self._startup_steps.popleft()
+        step()
+        QTimer.singleShot(0, self._run_next_startup_step)
+
+    def _restore_snapshot(self):
+        state = self.snapshot_store.load()
+        if state is None:
+            return
 
+        for section, view in self._snapshot_sections():
+            section_state = state.get(section)
+            if not section_state:
+                continue
+            try:
+                restored = view.restore_snapshot(section_state)
+            except Exception as e:
+                print(f"Error restoring {section} snapshot: {e}")
+                restored = False
+            if restored:
+                self.stale_sections[section] = section_state.get('as_of') or state['saved_at']
+
+        #plotly charts are the slow part of a restore; render them pane by pane after show()
+        for pane in self.ChartView.restored_panes:
+            self._startup_steps.append(lambda pane=pane: self.ChartView.restore_pane(pane))
+
+        self.snapshot_restore_info = (f"{self.snapshot_store.last_size / 1024:.0f} KB "
+                                      f"in {self.snapshot_store.last_load_ms:.0f} ms")
+        self._show_snapshot_status()
+
+    def _load_section(self, section, view):
+        try:
+            live = view.load()
+        except Exception as e:
+            print(f"Error loading {section}: {e}")
+            live = False
+        if live and section in self.stale_sections:
+            del self.stale_sections[section]
+            self._show_snapshot_status()
+
+    def _show_snapshot_status(self):
+        if self.stale_sections:
+            labels = {'etrade': 'accounts', 'economic': 'economic', 'charts': 'charts'}
+            ages = ", ".join(f"{labels[section]} {format_age(as_of)}" for section, as_of in self.stale_sections.items())
+            self.statusBar().showMessage(f"Snapshot data (stale): {ages}  |  restored {self.snapshot_restore_info}")
+        elif self.snapshot_restore_info:
+            self.statusBar().showMessage("Live data", 5000)
+
+    def save_snapshot(self):
+        """
+        purpose: write the current dashboard state for the next launch's warm start
+        """
+        if self.snapshot_store is None:
+            return
+        state = {}
+        for section, view in self._snapshot_sections():
+            try:
+                section_state = view.snapshot()
+            except Exception as e:
+                print(f"Error taking {section} snapshot: {e}")
+                continue
+            if section_state:
+                state[section] = section_state
+        if state:
+            self.snapshot_store.save(state)
+
+    def closeEvent(self, event):
+        self.riskPanel.stop()
+        self.orderEntryForm.stop()
+        if self.alertsPanel is not None:
+            self.alertsPanel.stop()
+        if self.equityCurvePanel is not None:
+            self.equityCurvePanel.stop()
+        if self.EtradeView.equity_curve is not None:
+            self.EtradeView.equity_curve.close()
+        self.EtradeView.stopTransactionsSync()
+        self.subscriptionHub.stop_all()
+        if self.dataService is not None:
+            self.dataService.stop()
+        self.save_snapshot()
+        super().closeEvent(event)
 
     def _new_research_window(self, title="Research Tab"):
         self.researchWindowCount+=1
-        researchWindow = ResearchTab()
+        researchWindow = ResearchTab(self.ChartView.yfinance_manager, self.symbolIndex)
         researchWindow.show()
         self.researchWindows.append(researchWindow)
 
+    def _new_compare_console(self):
+        console = CompareConsole(self.ChartView.yfinance_manager, self.symbolIndex)
+        console.show()
+        self.researchWindows.append(console)
+
 
 
         #Configure
         # self.dateLabel.setText(QDate.currentDate().toString())
 
 class ChartView:
-    def __init__(self, components, dashboard):
+    #intraday overlay panes mix exchanges (and 24h crypto); their axis shows US market time
+    MARKET_TZ = 'America/New_York'
+    #seconds between automatic pane refreshes, by bar interval
+    CHART_REFRESH_S = {'1m': 60, '5m': 120, '1h': 600, '1d': 3600, '1wk': 3600}
+    #a refresh press fetches again unless the same symbol was fetched this recently (another pane)
+    REFRESH_SHARE_S = 5.0
+
+    def __init__(self, components, dashboard, load=True):
         super().__init__()
         self.dashboard = dashboard
         # Top-right quad controls
@@ -364,8 +664,27 @@ class ChartView:
         self.BR_TR_ChartWidget = components['BR_TR_ChartWidget']
         self.BR_BL_ChartWidget = components['BR_BL_ChartWidget']
         self.BR_BR_ChartWidget = components['BR_BR_ChartWidget']
-        # Initialize YFinance data manager
+        # Initialize YFinance data manager; with the data service on, its fetches run there
         self.yfinance_manager = YFinanceDataManager()
+        service = getattr(dashboard, 'dataService', None)
+        if service is not None:
+            self.yfinance_manager = service.proxy('yfinance', local=self.yfinance_manager)
+        #indicator state is shared by panes on the same symbol/interval (see analytics/indicators.py)
+        self.indicator_cache = IndicatorCache()
+        try:
+            import config
+        except ImportError:
+            config = None
+        self.overlay_choices = list(getattr(config, 'CHART_OVERLAYS', DEFAULT_OVERLAYS))
+        self.symbol_index = getattr(dashboard, 'symbolIndex', None)
+        self.refresh_s = dict(self.CHART_REFRESH_S, **getattr(config, 'CHART_REFRESH_S', {}))
+        #panes showing the same symbol and timeframe share one refresh loop
+        self.hub = getattr(dashboard, 'subscriptionHub', None) or SubscriptionHub()
+        self.hub.register('chart', self._fetch_chart, self._chart_refresh_s)
+        self.pane_subscriptions = {}    # pane widget name -> (symbol, timeframe, hub token)
+        #pane widget name -> overlay specs picked in that pane's menu
+        self.pane_overlays = {}
+        self.overlay_actions = {}
         
         self.gridcolor = ChartStyle.GRID_COLOR
 
@@ -386,97 +705,428 @@ class ChartView:
 
         self._init_graph_menu()
 
+        #pane widget name -> (widget, ticker input, timeframe combo)
+        self.panes = {
+            'TR_TL_ChartWidget': (self.TR_TL_ChartWidget, self.topTL_input, self.timeframeCombo),
+            'TR_TR_ChartWidget': (self.TR_TR_ChartWidget, self.topTR_input, self.timeframeCombo),
+            'TR_BL_ChartWidget': (self.TR_BL_ChartWidget, self.topBL_input, self.timeframeCombo),
+            'TR_BR_ChartWidget': (self.TR_BR_ChartWidget, self.topBR_input, self.timeframeCombo),
+            'BR_TL_ChartWidget': (self.BR_TL_ChartWidget, self.bottomTL_input, self.timeframeCombo2),
+            'BR_TR_ChartWidget': (self.BR_TR_ChartWidget, self.bottomTR_input, self.timeframeCombo2),
+            'BR_BL_ChartWidget': (self.BR_BL_ChartWidget, self.bottomBL_input, self.timeframeCombo2),
+            'BR_BR_ChartWidget': (self.BR_BR_ChartWidget, self.bottomBR_input, self.timeframeCombo2),
+        }
+        #last charted data per pane, kept for the warm-start snapshot
+        self.pane_series = {}
+        self.restored_panes = []
+
         #wiring
         self.refreshButton.clicked.connect(self.press_refresh_button_top)
         self.refreshButton2.clicked.connect(self.press_refresh_button_bottom)
 
         #load charts on instantiation
+        if load:
+            self.load()
+
+    def load(self):
+        """
+        returns:
+            True if at least one pane was charted from live data
+        """
+        started = time.time()
         self.press_refresh_button_top()
         self.press_refresh_button_bottom()
+        return any(pane['as_of'] >= started for pane in self.pane_series.values())
+
+    def restore_snapshot(self, state):
+        """
+        purpose: put the snapshot's symbols and timeframes back into the inputs and queue
+                 its series for restore_pane; nothing is drawn here
+        """
+        self.restored_panes = []
+        for name, pane in state.get('panes', {}).items():
+            if name not in self.panes:
+                continue
+            widget, ticker_input, timeframe_combo = self.panes[name]
+            ticker_input.setText(pane['symbol'])
+            timeframe_combo.setCurrentText(pane['timeframe'])
+            for spec, action in self.overlay_actions[name].items():
+                #pane_series is filled below, so toggling here draws nothing
+                action.setChecked(spec in pane.get('overlays', []))
+            self.pane_series[name] = {
+                'symbol': pane['symbol'],
+                'timeframe': pane['timeframe'],
+                'title': pane['title'],
+                'as_of': pane['as_of'],
+                'closes': series_to_frame(pane['series']),
+            }
+            if 'overlay_series' in pane:
+                self.pane_series[name]['overlay'] = pd.DataFrame(
+                    {s: series_to_frame(series)['Close'] for s, series in pane['overlay_series'].items()})
+            self.restored_panes.append(name)
+        return bool(self.restored_panes)
+
+    def restore_pane(self, name):
+        if name not in self.restored_panes:
+            # live data got there first
+            return
+        pane = self.pane_series[name]
+        title = f"{pane['title']}  [snapshot {format_age(pane['as_of'])}]"
+        try:
+            if 'overlay' in pane:
+                self.panes[name][0].setHtml(self.build_overlay_html(pane['overlay'], title, self.gridcolor))
+                return
+            self._render_pane(name, pane['symbol'], pane['timeframe'], pane['closes'], title)
+        except Exception as e:
+            print(f"Error restoring chart {name}: {e}")
+
+    def snapshot(self):
+        if not self.pane_series:
+            return None
+        panes = {}
+        for name, pane in self.pane_series.items():
+            panes[name] = {
+                'symbol': pane['symbol'],
+                'timeframe': pane['timeframe'],
+                'title': pane['title'],
+                'as_of': pane['as_of'],
+                'series': frame_to_series(pane['closes']),
+                'overlays': list(self.pane_overlays.get(name, [])),
+            }
+            if 'overlay' in pane:
+                overlay = pane['overlay']
+                panes[name]['overlay_series'] = {s: frame_to_series(overlay[[s]].set_axis(['Close'], axis=1))
+                                                 for s in overlay.columns}
+        return {'as_of': max(pane['as_of'] for pane in panes.values()), 'panes': panes}
 
     def _init_graph_menu(self):
         inputs_config = [
-            (self.dashboard.menuTopTL, "QQQ", "topTL_input"),
-            (self.dashboard.menuTopTR, "SPY", "topTR_input"),
-            (self.dashboard.menuTopBL, "NVDA", "topBL_input"), 
-            (self.dashboard.menuTopBR, "AMZN", "topBR_input"),
-            (self.dashboard.menuBottomTL, "HYG", "bottomTL_input"),
-            (self.dashboard.menuBottomTR, "TLT", "bottomTR_input"),
-            (self.dashboard.menuBottomBL, "IBIT", "bottomBL_input"),
-            (self.dashboard.menuBottomBR, "GLD", "bottomBR_input")
+            (self.dashboard.menuTopTL, "QQQ", "topTL_input", 'TR_TL_ChartWidget'),
+            (self.dashboard.menuTopTR, "SPY", "topTR_input", 'TR_TR_ChartWidget'),
+            (self.dashboard.menuTopBL, "NVDA", "topBL_input", 'TR_BL_ChartWidget'),
+            (self.dashboard.menuTopBR, "AMZN", "topBR_input", 'TR_BR_ChartWidget'),
+            (self.dashboard.menuBottomTL, "HYG", "bottomTL_input", 'BR_TL_ChartWidget'),
+            (self.dashboard.menuBottomTR, "TLT", "bottomTR_input", 'BR_TR_ChartWidget'),
+            (self.dashboard.menuBottomBL, "IBIT", "bottomBL_input", 'BR_BL_ChartWidget'),
+            (self.dashboard.menuBottomBR, "GLD", "bottomBR_input", 'BR_BR_ChartWidget')
         ]
         
-        for menu, default_text, attr_name in inputs_config:
+        for menu, default_text, attr_name, pane in inputs_config:
             line_edit = QLineEdit()
             line_edit.setText(default_text)
-            line_edit.setPlaceholderText("Enter ticker...")
+            line_edit.setPlaceholderText("Ticker(s)...")
             line_edit.setMaximumWidth(Layout.TICKER_INPUT_WIDTH)
+            if self.symbol_index is not None:
+                SymbolCompleter(self.symbol_index, line_edit, words=True)
             
             widget_action = QWidgetAction(self.dashboard)
             widget_action.setDefaultWidget(line_edit)
             menu.addAction(widget_action)
             
             setattr(self, attr_name, line_edit)
-
+            self._init_overlay_menu(menu, pane)
+
+    def _init_overlay_menu(self, menu, pane):
+        overlay_menu = menu.addMenu("Overlays")
+        self.pane_overlays[pane] = []
+        self.overlay_actions[pane] = {}
+        for spec in self.overlay_choices:
+            action = QAction(spec, self.dashboard)
+            action.setCheckable(True)
+            action.toggled.connect(lambda checked, pane=pane, spec=spec: self._on_overlay_toggled(pane, spec, checked))
+            overlay_menu.addAction(action)
+            self.overlay_actions[pane][spec] = action
+
+    def _on_overlay_toggled(self, pane, spec, checked):
+        overlays = self.pane_overlays[pane]
+        if checked and spec not in overlays:
+            overlays.append(spec)
+        elif not checked and spec in overlays:
+            overlays.remove(spec)
+        else:
+            return
+        #redraw from the data already on screen; no refetch. rebased multi-symbol panes
+        #don't draw indicators, the choice applies again once the pane shows one symbol
+        if pane in self.pane_series and pane not in self.restored_panes and 'overlay' not in self.pane_series[pane]:
+            data = self.pane_series[pane]
+            self._render_pane(pane, data['symbol'], data['timeframe'], data['closes'], data['title'])
+
+    def _render_pane(self, pane, symbol, timeframe, symbol_closes, title):
+        interval = self.yfinance_manager.timeframe_intervals.get(timeframe, "1d")
+        overlays = self.indicator_cache.overlays(symbol, interval, symbol_closes, self.pane_overlays.get(pane))
+        self.panes[pane][0].setHtml(self.build_chart_html(symbol_closes, title, self.gridcolor, overlays))
+
+    def _fetch_chart(self, symbol, timeframe):
+        # hub fetch for the 'chart' kind; runs on the hub's worker thread for refreshes
+        symbol_closes, ticker_info = self.yfinance_manager.get_symbol_data(symbol, timeframe)
+        if symbol_closes is None or ticker_info is None:
+            return None
+        return symbol_closes, ticker_info
+
+    def _chart_refresh_s(self, timeframe):
+        return self.refresh_s.get(self.yfinance_manager.timeframe_intervals.get(timeframe, "1d"), 900)
+
+    @timed('ui', 'chart')
     def chart_symbol(self, symbol, widget, timeframe_input):
+        pane = widget.objectName()
+        symbols = [s for s in re.split(r'[,\s]+', symbol) if s]
+        #a likely typo gets its suggestions up front; the chart is still asked for, since the
+        #index doesn't have every symbol Yahoo does
+        unknown = self.symbol_index.unknown(symbols) if self.symbol_index is not None else None
+        if unknown:
+            print(unknown_message(unknown))
+            self.dashboard.statusBar().showMessage(unknown_message(unknown), 10000)
+        if len(symbols) > 1:
+            self._unsubscribe_pane(pane)
+            return self.chart_overlay(symbols, widget, timeframe_input)
         try:
-            # use YFinanceDataManager for data management
-            symbol_closes, ticker_info = self.yfinance_manager.get_symbol_data(symbol, timeframe_input)
-            
-            if symbol_closes is None or ticker_info is None:
+            payload = self.hub.get(symbol, 'chart', timeframe_input, max_age=self.REFRESH_SHARE_S)
+            if payload is None:
                 print(f"No data available for {symbol}")
                 return
-            
-            # creates chart title using the data manager
-            modified_title = self.yfinance_manager.create_chart_title(symbol, ticker_info)
-            
-            # creates the plotly chart
-            fig = px.line(symbol_closes, y='Close', x=symbol_closes.index, title=modified_title)
-
-            fig.update_layout(
-                xaxis_title=None,
-                yaxis_title=None,
-                margin=ChartStyle.BODY_MARGIN,
-                showlegend=False,
-                plot_bgcolor=ChartStyle.PLOT_BACKGROUND,
-                paper_bgcolor=ChartStyle.PAPER_BACKGROUND,
-                title=dict(
-                    font=dict(size=ChartStyle.TITLE_FONT_SIZE)
-                ),
-                yaxis=dict(
-                    showgrid=True,
-                    gridcolor=self.gridcolor,
-                ),
-                xaxis=dict(
-                    showgrid=True,
-                    gridcolor=self.gridcolor,
-                    title=None
-                )
-            )
-
-            fig.update_traces(line=dict(color=ChartStyle.LINE_COLOR, width=ChartStyle.LINE_WIDTH))
-            html = f"""
-            <html>
-            <head>
-                <style>
-                    body {{
-                        margin: 2px;
-                        padding: 0;
-                        background-color: {ChartStyle.PLOT_BACKGROUND};
-                    }}
-                </style>
-            </head>
-            <body>
-                {fig.to_html(include_plotlyjs='cdn', full_html=True)}
-            </body>
-            </html>
-            """
-
-            widget.setHtml(html)
+            self._show_chart(pane, symbol, timeframe_input, payload)
+            #after the fetch, so the pane's loop starts from fresh data instead of refetching
+            self._subscribe_pane(pane, symbol, timeframe_input)
 
         except Exception as e:
             print(f"Error charting symbol {symbol}: {e}")
 
+    def _show_chart(self, pane, symbol, timeframe, payload):
+        symbol_closes, ticker_info = payload
+        # creates chart title using the data manager
+        modified_title = self.yfinance_manager.create_chart_title(symbol, ticker_info)
+
+        self._render_pane(pane, symbol, timeframe, symbol_closes, modified_title)
+        self.pane_series[pane] = {
+            'symbol': symbol,
+            'timeframe': timeframe,
+            'title': modified_title,
+            'as_of': time.time(),
+            'closes': symbol_closes,
+        }
+        if pane in self.restored_panes:
+            self.restored_panes.remove(pane)
+
+    def _subscribe_pane(self, pane, symbol, timeframe):
+        current = self.pane_subscriptions.get(pane)
+        if current is not None and current[:2] == (symbol, timeframe):
+            return
+        self._unsubscribe_pane(pane)
+        token = self.hub.subscribe(symbol, 'chart', timeframe, replay=False,
+                                   callback=lambda payload: self._on_pane_update(pane, symbol, timeframe, payload))
+        self.pane_subscriptions[pane] = (symbol, timeframe, token)
+
+    def _unsubscribe_pane(self, pane):
+        current = self.pane_subscriptions.pop(pane, None)
+        if current is not None:
+            self.hub.unsubscribe(current[2])
+
+    def _on_pane_update(self, pane, symbol, timeframe, payload):
+        try:
+            self._show_chart(pane, symbol, timeframe, payload)
+        except Exception as e:
+            print(f"Error refreshing chart {symbol}: {e}")
+
+    def chart_overlay(self, symbols, widget, timeframe_input):
+        """
+        purpose: plot several symbols in one pane as % change from the start of the window
+        arguments:
+            symbols: tickers typed into the pane's input, separated by spaces or commas
+            widget: the pane's chart widget
+            timeframe_input: timeframe combo text (a yfinance period)
+        note: one batched, cached history request for all symbols and one alignment pass over
+              their arrays (analytics/alignment.py); every symbol shows the value in force at each
+              bar, so calendars that differ (IBIT vs TLT holidays, crypto weekends) stay comparable
+        """
+        try:
+            interval = self.yfinance_manager.timeframe_intervals.get(timeframe_input, "1d")
+            intraday = interval[-1] in "mh"
+            #intraday bars are topped up on every refresh, daily history every 15 minutes
+            columns = self.yfinance_manager.get_history_columns(symbols, timeframe_input, interval,
+                                                                 max_age=0.0 if intraday else 900.0)
+            present = [s for s in symbols if s in columns]
+            if not present:
+                print(f"No data available for {' '.join(symbols)}")
+                return
+            times, values = align_columns([columns[s][0] for s in present], [columns[s][1] for s in present])
+            index = pd.DatetimeIndex(times)
+            if intraday:
+                index = index.tz_localize('UTC').tz_convert(self.MARKET_TZ).tz_localize(None)
+            #the cache keeps older bars after top-ups; show the timeframe's window only
+            keep = self._window_mask(index, timeframe_input)
+            rebased = pd.DataFrame(rebase(values[keep]), index=index[keep], columns=present)
+
+            last = rebased.ffill().iloc[-1]
+            #symbols in the title take their line's color, in place of a legend
+            colors = ChartStyle.OVERLAY_COLORS
+            title = f"{timeframe_input} % change  " + "  ".join(
+                f"<span style='color:{colors[i % len(colors)]}'>{s} {last[s]:+.2f}%</span>" for i, s in enumerate(present))
+            missing = [s for s in symbols if s not in columns]
+            if missing:
+                title += f"  (no data: {' '.join(missing)})"
+            widget.setHtml(self.build_overlay_html(rebased, title, self.gridcolor))
+            self.pane_series[widget.objectName()] = {
+                'symbol': " ".join(symbols),
+                'timeframe': timeframe_input,
+                'title': title,
+                'as_of': time.time(),
+                #the snapshot's single-series slot holds the first symbol; the overlay has them all
+                'closes': rebased[[present[0]]].set_axis(['Close'], axis=1),
+                'overlay': rebased,
+            }
+            if widget.objectName() in self.restored_panes:
+                self.restored_panes.remove(widget.objectName())
+
+        except Exception as e:
+            print(f"Error charting symbols {' '.join(symbols)}: {e}")
+
+    @staticmethod
+    def _window_mask(index, timeframe):
+        """
+        returns:
+            bool array of the bars inside a timeframe ('1d', '5d', '3mo', '1y', 'max') counted back
+            from the last bar; 'Nd' timeframes are N sessions, as yfinance counts them
+        """
+        if not len(index) or timeframe == 'max':
+            return np.ones(len(index), dtype=bool)
+        match = re.fullmatch(r'(\d+)(d|mo|y)', timeframe)
+        if match is None:
+            return np.ones(len(index), dtype=bool)
+        count, unit = int(match.group(1)), match.group(2)
+        if unit == 'd':
+            days = index.normalize().unique()
+            start = days[-min(count, len(days))]
+        else:
+            start = index[-1] - pd.DateOffset(**{'months' if unit == 'mo' else 'years': count})
+        return np.asarray(index >= start)
+
+    @staticmethod
+    def build_overlay_html(rebased, title, gridcolor=ChartStyle.GRID_COLOR):
+        """
+        purpose: render rebased symbols (% change) into the html page shown in a chart pane
+        arguments:
+            rebased: DataFrame time x symbols of % change, all on one index
+            title: chart title
+        returns:
+            html string for QWebEngineView.setHtml
+        """
+        #epoch milliseconds on a date axis: plotly ships numeric arrays as packed binary,
+        #so html size and render time grow with the data, not with per-point date strings
+        x = rebased.index.as_unit('ns').asi8 / 1e6
+        fig = go.Figure([
+            go.Scatter(x=x, y=rebased[symbol].to_numpy(), mode='lines', name=symbol, connectgaps=True,
+                       line=dict(color=ChartStyle.OVERLAY_COLORS[i % len(ChartStyle.OVERLAY_COLORS)],
+                                 width=ChartStyle.OVERLAY_LINE_WIDTH))
+            for i, symbol in enumerate(rebased.columns)
+        ])
+        fig.update_layout(
+            title=dict(text=title, font=dict(size=ChartStyle.TITLE_FONT_SIZE)),
+            margin=ChartStyle.BODY_MARGIN,
+            showlegend=False,
+            plot_bgcolor=ChartStyle.PLOT_BACKGROUND,
+            paper_bgcolor=ChartStyle.PAPER_BACKGROUND,
+            xaxis=dict(type='date', showgrid=True, gridcolor=gridcolor),
+            yaxis=dict(ticksuffix='%', showgrid=True, gridcolor=gridcolor, zeroline=True,
+                       zerolinecolor=ChartStyle.LINE_COLOR),
+        )
+        html = f"""
+        <html>
+        <head>
+            <style>
+                body {{
+                    margin: 2px;
+                    padding: 0;
+                    background-color: {ChartStyle.PLOT_BACKGROUND};
+                }}
+            </style>
+        </head>
+        <body>
+            {fig.to_html(include_plotlyjs='cdn', full_html=True)}
+        </body>
+        </html>
+        """
+        return html
+
+    @staticmethod
+    def build_chart_html(symbol_closes, title, gridcolor=ChartStyle.GRID_COLOR, overlays=None):
+        """
+        purpose: render a Close-price frame into the html page shown in a chart pane
+        arguments:
+            symbol_closes: DataFrame with a 'Close' column indexed by timestamp
+            title: chart title
+            gridcolor: grid line color
+            overlays: IndicatorCache.overlays output; price overlays share the price axis,
+                      oscillators (RSI, MACD) get a pane underneath
+        returns:
+            html string for QWebEngineView.setHtml
+        """
+        # creates the plotly chart
+        oscillators = [spec for spec, (indicator, _) in (overlays or {}).items() if not indicator.price_overlay]
+        if oscillators:
+            fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.03, row_heights=[0.72, 0.28])
+            fig.add_trace(go.Scatter(x=symbol_closes.index, y=symbol_closes['Close'], mode='lines', name='Close'),
+                          row=1, col=1)
+            fig.update_layout(title=title)
+        else:
+            fig = px.line(symbol_closes, y='Close', x=symbol_closes.index, title=title)
+        fig.update_traces(line=dict(color=ChartStyle.LINE_COLOR, width=ChartStyle.LINE_WIDTH))
+
+        for i, (spec, (indicator, lines)) in enumerate((overlays or {}).items()):
+            color = ChartStyle.OVERLAY_COLORS[i % len(ChartStyle.OVERLAY_COLORS)]
+            row = 1 if indicator.price_overlay else 2
+            for line, values in lines.items():
+                if line.endswith(' hist'):
+                    trace = go.Bar(x=symbol_closes.index, y=values, name=line, marker_color=color, opacity=0.5)
+                else:
+                    dash = 'dot' if line.endswith((' upper', ' lower', ' signal')) else None
+                    trace = go.Scatter(x=symbol_closes.index, y=values, mode='lines', name=line,
+                                       line=dict(color=color, width=ChartStyle.OVERLAY_LINE_WIDTH, dash=dash))
+                if oscillators:
+                    fig.add_trace(trace, row=row, col=1)
+                else:
+                    fig.add_trace(trace)
+
+        fig.update_layout(
+            xaxis_title=None,
+            yaxis_title=None,
+            margin=ChartStyle.BODY_MARGIN,
+            showlegend=False,
+            plot_bgcolor=ChartStyle.PLOT_BACKGROUND,
+            paper_bgcolor=ChartStyle.PAPER_BACKGROUND,
+            title=dict(
+                font=dict(size=ChartStyle.TITLE_FONT_SIZE)
+            ),
+            yaxis=dict(
+                showgrid=True,
+                gridcolor=gridcolor,
+            ),
+            xaxis=dict(
+                showgrid=True,
+                gridcolor=gridcolor,
+                title=None
+            )
+        )
+        if oscillators:
+            fig.update_xaxes(showgrid=True, gridcolor=gridcolor)
+            fig.update_yaxes(showgrid=True, gridcolor=gridcolor)
+        html = f"""
+        <html>
+        <head>
+            <style>
+                body {{
+                    margin: 2px;
+                    padding: 0;
+                    background-color: {ChartStyle.PLOT_BACKGROUND};
+                }}
+            </style>
+        </head>
+        <body>
+            {fig.to_html(include_plotlyjs='cdn', full_html=True)}
+        </body>
+        </html>
+        """
+        return html
+
     def press_refresh_button_top(self):
         """Handle refresh for top-right quad charts"""
         # Get symbol inputs from menu QLineEdits
@@ -539,8 +1189,12 @@ class EtradeView(QObject):
     viewModeGroup: QActionGroup
     accountSelectMenu: QMenu
     accountActionGroup: QActionGroup
-    def __init__(self, components, dashboard):
+    def __init__(self, components, dashboard, session=None, base_url=None, load=True):
         super().__init__()
+        try:
+            import config
+        except ImportError:
+            config = None
         #upper accounttotal footer
         self.todaysGainLossLabel = components['todaysGainLossLabel']
         self.todaysGainLossPctLabel = components['todaysGainLossPctLabel']
@@ -570,47 +1224,282 @@ class EtradeView(QObject):
         self.holdingsTable.verticalHeader().setVisible(False)
 
         self.pollingrate = 10
-        self.session, self.base_url = oauth()
-        self.accounts_manager = AccountsManager(self.session, self.base_url)
+        #between portfolio polls, P&L is recomputed locally from quotes (see etrade_client/pnl.py)
+        self.pnl_from_quotes = getattr(config, 'PNL_FROM_QUOTES', True)
+        #'latest': a slow table render gets the newest payload only, not a backlog (see pollworker.py)
+        self.poll_delivery = getattr(config, 'POLL_DELIVERY', 'latest')
+        #seconds between background transaction syncs into the local store, 0 = off (see transactions.py)
+        self.transactions_sync_s = getattr(config, 'TRANSACTIONS_SYNC_S', 0)
+        #fraction of RATE_LIMITS the data service's E*TRADE session gets when it is running
+        self.service_rate_share = getattr(config, 'DATA_SERVICE_RATE_SHARE', 0.5)
+        #every footer refresh appends the accounts' values to the equity curve (see equity_curve.py)
+        self.equity_curve = equity_curve_from_config()
+        #trading days of closes in the holdings table's sparkline column, 0 = no column
+        self.sparkline_days = getattr(config, 'HOLDINGS_SPARKLINE_DAYS', 30)
+        self.sparklines = SparklineDelegate(self.holdingsTable) if self.sparkline_days else None
+        #the chart quad's manager, so the closes come from the same cache (and data service) as the charts
+        self.sparkline_history = getattr(getattr(dashboard, 'ChartView', None), 'yfinance_manager', None)
+        self._sparkline_symbols = ()
+        self.pnl = None
+        self._quote_symbols = []
+        self.market = None
+        #data service stand-ins for accounts_manager/market that the pollers fetch through
+        self.remote_accounts, self.remote_market = None, None
+        #session/base_url can be injected (e.g. the offline stand-in server); otherwise load() logs in
+        self.session, self.base_url = session, base_url
+        self.accounts_manager = None
+        self.accountActionGroup = None
         self.current_account_index = None
+        self.as_of = None
         self._threads, self._workers = [], []
-        self._init_accounts_menu()
+        #the transaction sync's (thread, worker): one for the view's lifetime, not per account
+        self._sync = None
         self._init_action_group()
+        if load:
+            self.load()
+
+    def load(self):
+        """
+        purpose: log in if needed, fetch every account, show the selected one and start polling
+        returns:
+            True if any accounts were loaded
+        """
+        self.stopPolling(wait=True)
+        #syncing through the manager about to be replaced would race the new one for the store
+        self.stopTransactionsSync(wait=True)
+        if self.session is None:
+            self.session, self.base_url = oauth()
+        if not isinstance(self.session, GovernedSession):
+            #every E*TRADE call from here on shares one rate limit
+            self.session = GovernedSession(self.session)
+        self.market = Market(self.session, self.base_url)
+        self._connect_data_service()
+        selected_key = self._selected_account_key()
+        self.accounts_manager = AccountsManager(self.session, self.base_url)
+        self.as_of = time.time()
+        self._init_accounts_menu(selected_key)
         self.populate_portfolio_table()
         self.populate_accounttables_footer()
         self.startPolling()
+        self.startTransactionsSync()
+        return bool(self.accounts_manager.accounts_list)
+
+    def _connect_data_service(self):
+        """
+        purpose: have the data service open its own session, so polling and parsing run there
+        """
+        self.remote_accounts, self.remote_market = None, None
+        #both processes send E*TRADE requests, so they split RATE_LIMITS between them
+        self.session.governor.share(1.0)
+        service = getattr(self.dashboard, 'dataService', None)
+        if service is None:
+            return
+        try:
+            service.call('service', 'connect_etrade', session_credentials(self.session), self.base_url,
+                         self.service_rate_share)
+        except RuntimeError as e:
+            print(f"Error connecting the data service to E*TRADE, polling in process: {e}")
+            return
+        self.session.governor.share(1.0 - self.service_rate_share)
+        self.remote_accounts, self.remote_market = service.proxy('etrade'), service.proxy('market')
+
+    def restore_snapshot(self, state):
+        manager = AccountsManager(None, None, load=False)
+        manager.restore(state.get('accounts', []))
+        if not manager.accounts_list:
+            return False
+        self.accounts_manager = manager
+        self.as_of = state.get('as_of')
+        self._init_accounts_menu(state.get('selected_account'))
+        self.populate_portfolio_table()
+        self.populate_accounttables_footer()
+        return True
+
+    def snapshot(self):
+        if self.accounts_manager is None or not self.accounts_manager.accounts_list:
+            return None
+        return {
+            'as_of': self.as_of,
+            'selected_account': self._selected_account_key(),
+            'current_account_index': self.current_account_index,
+            'accounts': self.accounts_manager.snapshot(),
+        }
+
+    def _selected_account_key(self):
+        if self.accounts_manager is None or self.current_account_index is None \
+                or self.current_account_index >= len(self.accounts_manager.accounts_list):
+            return None
+        return self.accounts_manager.accounts_list[self.current_account_index].accountIdKey
 
     def startPolling(self):
+        self._reset_pnl()
+        accounts = self.remote_accounts or self.accounts_manager
+        market = self.remote_market or self.market
         self._start_one(
-            lambda: self.accounts_manager.fetch_balances(
+            lambda: accounts.fetch_balances(
             self.accounts_manager.accounts_list[self.current_account_index].accountIdKey, 
             self.accounts_manager.accounts_list[self.current_account_index].institutionType
-            ), lambda data: self.populate_accounttables_footer(data), self.pollingrate)
+            ), lambda data: self.populate_accounttables_footer(data), self.pollingrate, name='balance',
+            policy=poll_policy_from_config(balance_value, self.pollingrate), priority=SELECTED)
         
         self._start_one(
-            lambda: self.accounts_manager.fetch_portfolio(
+            lambda: accounts.fetch_portfolio(
             self.accounts_manager.accounts_list[self.current_account_index].accountIdKey
-            ), lambda data: self.populate_portfolio_table(data), self.pollingrate)
-
+            ), lambda data: self.populate_portfolio_table(data), self.pollingrate, name='portfolio',
+            policy=self._portfolio_policy(), priority=SELECTED)
+
+        if self.pnl_from_quotes and self.market is not None:
+            self._start_one(
+                lambda: self._fetch_quotes(market),
+                self._on_quotes, 3, name='quotes',
+                policy=poll_policy_from_config(None, 3, 'QUOTE_POLL_INTERVALS', QUOTE_PHASE_INTERVALS),
+                priority=SELECTED, merge=lambda waiting, newer: {**waiting, **newer})
+
+        if self.sparklines is not None and self.sparkline_history is not None:
+            #cheap once the symbols are cached: only symbols new to the table are downloaded in full,
+            #the rest are topped up with their latest bars when the cache goes stale
+            self._start_one(self._fetch_sparklines, self._on_sparklines, 60, name='sparklines', priority=BACKGROUND)
+
+    def _portfolio_policy(self):
+        if self.pnl_from_quotes and self.market is not None:
+            #quotes keep the table current; the full portfolio poll only reconciles
+            return poll_policy_from_config(portfolio_value, 60, 'RECONCILE_POLL_INTERVALS', RECONCILE_PHASE_INTERVALS)
+        return poll_policy_from_config(portfolio_value, self.pollingrate)
+
+    def _reset_pnl(self):
+        """
+        purpose: rebuild the P&L engine over the selected account's current positions frame
+        """
+        self.pnl = None
+        self._quote_symbols = []
+        if self.accounts_manager is None or self.current_account_index is None:
+            return
+        account = self.accounts_manager.accounts_list[self.current_account_index]
+        if account.positions is None or account.positions.empty:
+            return
+        self.pnl = PnLEngine(account.positions, account.accounttotals)
+        self._quote_symbols = self.pnl.quote_symbols
+        #held symbols are valid wherever they're typed, listed or not (e.g. funds)
+        symbol_index = getattr(self.dashboard, 'symbolIndex', None)
+        if symbol_index is not None:
+            symbol_index.add(account.positions['symbol'].astype(str))
+
+    def _alerts(self):
+        """
+        returns:
+            the dashboard's AlertsPanel while showing live data, else None
+        """
+        alerts = getattr(self.dashboard, 'alertsPanel', None)
+        if alerts is None or self.accounts_manager is None or self.accounts_manager.session is None:
+            return None
+        return alerts
+
+    def _fetch_quotes(self, market):
+        #poll thread: held symbols for the P&L, plus the ones alert rules watch
+        alerts = getattr(self.dashboard, 'alertsPanel', None)
+        symbols = list(self._quote_symbols)
+        if alerts is not None:
+            symbols = list(dict.fromkeys(symbols + list(alerts.quote_symbols)))
+        return market.fetch_quotes(symbols) if symbols else {}
+
+    def _on_quotes(self, quotes):
+        alerts = self._alerts()
+        if alerts is not None:
+            alerts.on_quotes(quotes)
+        account = self.accounts_manager.accounts_list[self.current_account_index]
+        if self.pnl is None or self.pnl.positions is not account.positions:
+            self._reset_pnl()
+        if self.pnl is not None and self.pnl.apply_quotes(quotes):
+            self.as_of = time.time()
+            self.populate_portfolio_table()
+            self.populate_accounttables_footer()
+
+    def _fetch_sparklines(self):
+        #poll thread: one batched request for every held symbol, period shared with the risk/alerts cache
+        symbols = self._sparkline_symbols
+        if not symbols:
+            return {}
+        columns = self.sparkline_history.get_history_columns(symbols, history_period(self.sparkline_days), "1d")
+        return {symbol: values[-self.sparkline_days:] for symbol, (_, values) in columns.items()}
+
+    def _on_sparklines(self, closes):
+        if self.sparklines.set_values(closes):
+            #only the column is repainted; the table isn't rebuilt
+            self.holdingsTable.viewport().update()
+
+
+    def startTransactionsSync(self):
+        """
+        purpose: sync every account's transactions into the local store every transactions_sync_s
+        note: syncs all accounts, so unlike the pollers it runs whatever account is selected; one
+              worker runs the syncs back to back, so a tick never starts while a sync is writing
+        """
+        if not self.transactions_sync_s or self._sync is not None or self.accounts_manager is None:
+            return
+        #always the local manager: the store is a file in this process; after the first pass
+        #each sync only asks for transactions since the account's cursor
+        manager, stop = self.accounts_manager, threading.Event()
+        self._sync = (*self._poller(lambda: manager.sync_transactions(stop=stop), lambda added: None,
+                                    self.transactions_sync_s, name='transactions', priority=BACKGROUND), stop)
+
+    def stopTransactionsSync(self, wait=False):
+        if self._sync is None:
+            return
+        thread, worker, stop = self._sync
+        self._sync = None
+        stop.set()
+        worker.stop()
+        thread.quit()
+        if wait:
+            #a sync in flight stops after the page it is fetching; the cursor makes that safe
+            while not thread.wait(50):
+                thread.quit()
+
+    def _start_one(self,fetch_fn,slot,interval,name="poll",policy=None,priority=BACKGROUND,merge=None):
+        thread, worker = self._poller(fetch_fn, slot, interval, name, policy, priority, merge)
+        self._threads.append(thread); self._workers.append(worker)
 
-    def _start_one(self,fetch_fn,slot,interval):
-        worker = PollWorker(fetch_fn, interval)
+    def _poller(self,fetch_fn,slot,interval,name="poll",policy=None,priority=BACKGROUND,merge=None):
+        """
+        returns:
+            (QThread, PollWorker) polling fetch_fn into slot, started
+        """
+        def fetch():
+            #governor priority for this poller's requests (see etrade_client/governor.py)
+            with request_priority(priority):
+                return fetch_fn()
+        worker = PollWorker(fetch, interval, name=name, policy=policy)
         thread = QThread(self)
         worker.moveToThread(thread)
         thread.started.connect(worker.start)
-        worker.dataReady.connect(slot)
+        if self.poll_delivery == 'latest':
+            #parented to the thread, so it outlives any payload the worker is still delivering
+            connect_latest(worker, slot, name, merge, parent=thread)
+        else:
+            worker.dataReady.connect(slot)
         worker.finished.connect(thread.quit)
-        self._threads.append(thread); self._workers.append(worker)
         thread.start()
+        return thread, worker
 
-    def stopPolling(self):
+    def stopPolling(self, wait=False):
         for thread, worker in zip(self._threads, self._workers):
             worker.stop()
             thread.quit()
+        if wait:
+            for thread in self._threads:
+                # quit() is a no-op until the thread's event loop is running, which only
+                # happens once the worker loop has returned - so keep asking
+                while not thread.wait(50):
+                    thread.quit()
         self._threads.clear(); self._workers.clear()
 
-    def _init_accounts_menu(self):
+    def _init_accounts_menu(self, selected_key=None):
         self.accountSelectMenu = self.dashboard.menuSelectAccount
+        if self.accountActionGroup is not None:
+            #rebuilding after a snapshot restore
+            for action in self.accountActionGroup.actions():
+                self.accountSelectMenu.removeAction(action)
+            self.accountActionGroup.deleteLater()
         self.accountActionGroup = QActionGroup(self)
         self.accountActionGroup.setExclusive(True)
         
@@ -623,6 +1512,12 @@ class EtradeView(QObject):
             self.accountSelectMenu.addAction(action)
         
         start_index = self.accounts_manager.num_of_accounts - 1
+        for account_index, account in enumerate(self.accounts_manager.accounts_list):
+            if selected_key is not None and account.accountIdKey == selected_key:
+                start_index = account_index
+        if start_index < 0:
+            self.current_account_index = None
+            return
         self.current_account_index = start_index
         self.accountActionGroup.actions()[start_index].setChecked(True)
         self.accountActionGroup.triggered.connect(self._on_account_select_changed)
@@ -641,20 +1536,27 @@ class EtradeView(QObject):
         self.current_account_index = action.data()
         self.populate_portfolio_table()
         self.populate_accounttables_footer()
-        self.startPolling()
+        if self.accounts_manager.session is not None:
+            #not while showing a snapshot; load() starts polling once logged in
+            self.startPolling()
 
     def _on_action_group_viewmode_change(self):
         self.populate_portfolio_table()
 
 #NOTE NEED TO FINISH FORMATTING
+    @timed('ui', 'portfolio_table')
     def populate_portfolio_table(self, fresh_data=None):
         try:
-            if (self.current_account_index is None or 
+            if (self.accounts_manager is None or self.current_account_index is None or
                 self.current_account_index >= len(self.accounts_manager.accounts_list)):
                 return
 
             account = self.accounts_manager.accounts_list[self.current_account_index]
             
+            # a failed fetch comes back empty (a good one always has totals); keep the last portfolio
+            if fresh_data is not None and not any(fresh_data):
+                return
+
             # Use fresh data from polling worker if available, otherwise fall back to account data
             if fresh_data is not None:
                 positions_raw, accounttotals_raw = fresh_data
@@ -663,6 +1565,8 @@ class EtradeView(QObject):
                 account.accounttotalsRaw = accounttotals_raw
                 account._build_positions_df()
                 account._build_accounttotals_df()
+                self.as_of = time.time()
+                self._reset_pnl()
             
             if not hasattr(account, 'positions') or account.positions is None or account.positions.empty:
                 self.holdingsTable.clear()
@@ -748,15 +1652,35 @@ class EtradeView(QObject):
                     col_name = final_data.columns[j]
                     _check_if_colored(item, col_name, value)
                     self.holdingsTable.setItem(i, j, item)
+            if self.sparklines is not None and 'symbol' in positions_original.columns and len(final_data.columns):
+                self._add_sparkline_column(positions_original['symbol'].astype(str).tolist())
 
             self.holdingsTable.resizeColumnsToContents()
 
+            alerts = self._alerts()
+            if alerts is not None:
+                alerts.on_positions(account.positions)
+
         except Exception as e:
             print(f"Error populating portfolio table: {e}")
             self.holdingsTable.clear()
             self.holdingsTable.setRowCount(0)
             self.holdingsTable.setColumnCount(0)
 
+    def _add_sparkline_column(self, symbols):
+        #a text-less column after the first, painted by the delegate from each row's symbol
+        column = 1
+        self.holdingsTable.insertColumn(column)
+        self.holdingsTable.setHorizontalHeaderItem(column, QTableWidgetItem(f"{self.sparkline_days}d"))
+        self.holdingsTable.setItemDelegateForColumn(column, self.sparklines)
+        for i, symbol in enumerate(symbols):
+            item = QTableWidgetItem()
+            item.setData(SYMBOL_ROLE, symbol)
+            self.holdingsTable.setItem(i, column, item)
+        #read by the sparkline poll thread, so swapped whole
+        self._sparkline_symbols = tuple(dict.fromkeys(symbols))
+
+    @timed('ui', 'account_footer')
     def populate_accounttables_footer(self, fresh_data=None):
 
         def _format_gain_loss_label(label, value):
@@ -768,6 +1692,8 @@ class EtradeView(QObject):
             except (KeyError, IndexError):
                 return default
 
+        if self.accounts_manager is None or self.current_account_index is None:
+            return
         account = self.accounts_manager.accounts_list[self.current_account_index]
         
         # Use fresh data from polling worker if available, otherwise fall back to account data
@@ -814,12 +1740,17 @@ class EtradeView(QObject):
         self.marginLabel.setText(f"${_safe_get_value(balances, 'marginBalance'):.2f}")
         self.cashInvestableLabel.setText(f"${_safe_get_value(balances, 'cashAvailableForInvestment'):.2f}")
         
-        total_assets = self.accounts_manager.calculate_total_assets_across_accounts()
+        values = self.accounts_manager.account_values()
+        total_assets = self.accounts_manager.calculate_total_assets_across_accounts(values)
         self.totalAssetsLabel.setText(f"${total_assets:.2f}")
+        if self.equity_curve is not None and self.accounts_manager.session is not None:
+            #live values only, not a restored snapshot's
+            self.equity_curve.record(values)
 
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    stall_detector = install_stall_detector(app)
     window = DashboardView()
     window.show()
     sys.exit(app.exec())
@@ -1,13 +1,268 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel
+import math
+import re
+
+from PyQt6.QtCore import Qt, QObject, QThread, pyqtSignal
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QLineEdit, QPlainTextEdit, \
+    QPushButton, QCheckBox, QTableWidget, QTableWidgetItem, QFileDialog, QSplitter
+
+from analytics.scanner import Screen, PRESET_SCREENS, scan
+from data_providers.symbol_index import unknown_message
+from ui.ui_constants import StandardFonts, Colors, Layout
+from YFinance.YFinanceDataManager import YFinanceDataManager
+
+
+class ScanWorker(QObject):
+    batchReady: pyqtSignal = pyqtSignal(object)       # result DataFrame for one batch
+    progress: pyqtSignal = pyqtSignal(int, int)       # symbols done, total
+    error: pyqtSignal = pyqtSignal(str)
+    finished: pyqtSignal = pyqtSignal()
+
+    def __init__(self, symbols, screen, history, period="2y", batch_size=50):
+        super().__init__()
+        self.symbols = symbols
+        self.screen = screen
+        self.history = history
+        self.period = period
+        self.batch_size = batch_size
+        self._running = True
+
+    def stop(self):
+        # takes effect between batches
+        self._running = False
+
+    def _fetch(self, batch):
+        closes = self.history.get_price_history(batch, self.period, "1d")
+        volumes = self.history.get_price_history(batch, self.period, "1d", field='Volume')
+        return closes, volumes
+
+    def run(self):
+        try:
+            for result, done in scan(self.symbols, self._fetch, self.screen, self.batch_size):
+                if not self._running:
+                    break
+                if not result.empty:
+                    self.batchReady.emit(result)
+                self.progress.emit(done, len(self.symbols))
+        except Exception as e:
+            self.error.emit(str(e))
+        self.finished.emit()
 
 
 class ResearchTab(QWidget):
-    def __init__(self):
+    """
+    watchlist scanner: runs a screen (see analytics/scanner.py) over hundreds to thousands
+    of tickers and streams matches into a sortable table as each batch of history arrives.
+    """
+
+    def __init__(self, history=None, symbols=None):
         super().__init__()
         self.setWindowTitle("Research")
-        self.setGeometry(100, 100, 400, 300)
+        self.setGeometry(100, 100, 900, 600)
+        # share the dashboard's history cache when given one
+        self.history = history or YFinanceDataManager()
+        #SymbolIndex; watchlist symbols it doesn't have are flagged with suggestions, and still scanned
+        self.symbols = symbols
+        self._unindexed = {}
+        try:
+            import config
+        except ImportError:
+            config = None
+        self.period = getattr(config, 'SCANNER_PERIOD', "2y")
+        self.columns = []
+        self._thread, self._worker = None, None
+        self._stopping = []     # superseded (thread, worker) pairs finishing their last batch
 
         layout = QVBoxLayout()
-        label = QLabel("Hello! This is the research tab.")
-        layout.addWidget(label)
+        layout.setContentsMargins(Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN,
+                                  Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN)
+
+        screen_row = QHBoxLayout()
+        self.presetCombo = QComboBox()
+        self.presetCombo.addItem("Custom")
+        self.presetCombo.addItems(PRESET_SCREENS.keys())
+        self.screenInput = QLineEdit()
+        self.screenInput.setPlaceholderText("e.g. close > sma(200) and rsi(14) < 30")
+        self.scanButton = QPushButton("Scan")
+        self.stopButton = QPushButton("Stop")
+        self.stopButton.setEnabled(False)
+        screen_row.addWidget(QLabel("Screen"))
+        screen_row.addWidget(self.presetCombo)
+        screen_row.addWidget(self.screenInput, 1)
+        screen_row.addWidget(self.scanButton)
+        screen_row.addWidget(self.stopButton)
+        layout.addLayout(screen_row)
+
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        watchlist = QWidget()
+        watchlist_layout = QVBoxLayout(watchlist)
+        watchlist_layout.setContentsMargins(0, 0, 0, 0)
+        self.watchlistInput = QPlainTextEdit()
+        self.watchlistInput.setPlaceholderText("tickers, separated by spaces, commas or new lines")
+        self.watchlistInput.setPlainText(" ".join(getattr(config, 'SCANNER_WATCHLIST', [])))
+        self.loadButton = QPushButton("Load...")
+        watchlist_layout.addWidget(QLabel("Watchlist"))
+        watchlist_layout.addWidget(self.watchlistInput)
+        watchlist_layout.addWidget(self.loadButton)
+        splitter.addWidget(watchlist)
+
+        results = QWidget()
+        results_layout = QVBoxLayout(results)
+        results_layout.setContentsMargins(0, 0, 0, 0)
+        self.resultsTable = QTableWidget(0, 0)
+        self.resultsTable.verticalHeader().setVisible(False)
+        self.resultsTable.setFont(StandardFonts.SMALL)
+        self.resultsTable.setSortingEnabled(True)
+        status_row = QHBoxLayout()
+        self.matchesOnly = QCheckBox("Matches only")
+        self.matchesOnly.setChecked(True)
+        self.statusLabel = QLabel()
+        self.statusLabel.setFont(StandardFonts.SMALL)
+        self.statusLabel.setStyleSheet(f"color: {Colors.SECONDARY_TEXT};")
+        status_row.addWidget(self.matchesOnly)
+        status_row.addStretch()
+        status_row.addWidget(self.statusLabel)
+        results_layout.addWidget(self.resultsTable)
+        results_layout.addLayout(status_row)
+        splitter.addWidget(results)
+        splitter.setStretchFactor(1, 3)
+        layout.addWidget(splitter)
         self.setLayout(layout)
+
+        self.presetCombo.currentTextChanged.connect(self._on_preset_changed)
+        self.screenInput.textEdited.connect(lambda _: self.presetCombo.setCurrentIndex(0))
+        self.scanButton.clicked.connect(self.start_scan)
+        self.stopButton.clicked.connect(self.stop_scan)
+        self.loadButton.clicked.connect(self._on_load)
+        self.matchesOnly.toggled.connect(self._apply_match_filter)
+        self.presetCombo.setCurrentIndex(1)
+
+    def _on_preset_changed(self, name):
+        if name in PRESET_SCREENS:
+            self.screenInput.setText(PRESET_SCREENS[name])
+
+    def _on_load(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Load watchlist", "", "Text/CSV (*.txt *.csv);;All files (*)")
+        if not path:
+            return
+        try:
+            with open(path) as f:
+                # first field of each line, so exported csvs with extra columns work too
+                symbols = [re.split(r'[,\s]+', line.strip())[0] for line in f if line.strip()]
+        except OSError as e:
+            print(f"Error loading watchlist: {e}")
+            return
+        self.watchlistInput.setPlainText(" ".join(symbols))
+
+    def watchlist(self):
+        return [s for s in re.split(r'[,\s]+', self.watchlistInput.toPlainText().upper()) if s]
+
+    def start_scan(self):
+        try:
+            screen = Screen(self.screenInput.text())
+        except ValueError as e:
+            self.statusLabel.setText(str(e))
+            return
+        symbols = self.watchlist()
+        #the download decides: a symbol with no history simply doesn't match
+        self._unindexed = self.symbols.unknown(symbols) if self.symbols is not None else {}
+        self.statusLabel.setToolTip(unknown_message(self._unindexed) if self._unindexed else "")
+        if not symbols:
+            self.statusLabel.setText("watchlist is empty")
+            return
+        if self._worker is not None:
+            # a new scan replaces the running one; its last batch must not land in the new table
+            for signal in (self._worker.batchReady, self._worker.progress, self._worker.error):
+                signal.disconnect()
+            self._worker.finished.disconnect(self._on_finished)
+            self._worker.stop()
+            self._stopping.append((self._thread, self._worker))
+
+        self.columns = ['symbol', 'close', 'change %', *screen.terms, 'match']
+        self.resultsTable.setSortingEnabled(False)
+        self.resultsTable.clear()
+        self.resultsTable.setRowCount(0)
+        self.resultsTable.setColumnCount(len(self.columns))
+        self.resultsTable.setHorizontalHeaderLabels(self.columns)
+        self.resultsTable.setSortingEnabled(True)
+
+        self._worker = ScanWorker(symbols, screen, self.history, self.period)
+        self._thread = QThread(self)
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.run)
+        self._worker.batchReady.connect(self._on_batch)
+        self._worker.progress.connect(self._on_progress)
+        self._worker.error.connect(lambda message: self.statusLabel.setText(f"error: {message}"))
+        self._worker.finished.connect(self._on_finished)
+        self._worker.finished.connect(self._thread.quit)
+        # a thread and worker per scan, freed once the thread is done
+        self._thread.finished.connect(self._worker.deleteLater)
+        self._thread.finished.connect(self._thread.deleteLater)
+        self._thread.finished.connect(self._on_thread_finished)
+        self.scanButton.setEnabled(False)
+        self.stopButton.setEnabled(True)
+        self.statusLabel.setText(f"scanning {len(symbols)} symbols...")
+        self._thread.start()
+
+    def stop_scan(self):
+        if self._worker is not None:
+            self._worker.stop()
+
+    def _on_batch(self, result):
+        table = self.resultsTable
+        table.setSortingEnabled(False)
+        table.setUpdatesEnabled(False)
+        first = table.rowCount()
+        table.setRowCount(first + len(result))
+        for j, column in enumerate(self.columns):
+            for i, value in enumerate(result[column].tolist()):
+                if column == 'symbol':
+                    item = QTableWidgetItem(value)
+                elif column == 'match':
+                    item = QTableWidgetItem("yes" if value else "")
+                else:
+                    # numeric sort instead of text sort
+                    item = QTableWidgetItem()
+                    if not math.isnan(value):
+                        item.setData(Qt.ItemDataRole.DisplayRole, round(float(value), 2))
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                    if column == 'change %' and not math.isnan(value):
+                        item.setForeground(Colors.GAIN_COLOR if value > 0 else Colors.LOSS_COLOR)
+                table.setItem(first + i, j, item)
+        table.setSortingEnabled(True)
+        self._apply_match_filter()
+        table.setUpdatesEnabled(True)
+
+    def _apply_match_filter(self):
+        match_column = len(self.columns) - 1
+        only = self.matchesOnly.isChecked()
+        for row in range(self.resultsTable.rowCount()):
+            item = self.resultsTable.item(row, match_column)
+            self.resultsTable.setRowHidden(row, only and (item is None or not item.text()))
+
+    def _on_progress(self, done, total):
+        matches = sum(1 for row in range(self.resultsTable.rowCount())
+                      if self.resultsTable.item(row, len(self.columns) - 1).text())
+        unindexed = f" | {len(self._unindexed)} not in the symbol index" if self._unindexed else ""
+        self.statusLabel.setText(f"{done}/{total} symbols | {matches} matches{unindexed}")
+
+    def _on_finished(self):
+        self.scanButton.setEnabled(True)
+        self.stopButton.setEnabled(False)
+        self._worker = None
+
+    def _on_thread_finished(self):
+        thread = self.sender()
+        if thread is self._thread:
+            self._thread = None
+        self._stopping = [(t, w) for t, w in self._stopping if t is not thread]
+
+    def closeEvent(self, event):
+        self.stop_scan()
+        for thread, _ in [(self._thread, self._worker), *self._stopping]:
+            # the worker checks for stop between batches, so this waits for at most one batch; its
+            # quit is queued to this (blocked) thread, so it is repeated here
+            if thread is not None:
+                while not thread.wait(50):
+                    thread.quit()
+        self._stopping.clear()
+        super().closeEvent(event)
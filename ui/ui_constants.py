@@ -129,6 +129,8 @@ class ChartStyle:
     GRID_COLOR = 'rgba(255, 255, 255, 0.1)'
     LINE_COLOR = 'blue'
     LINE_WIDTH = 3
+    OVERLAY_LINE_WIDTH = 1.5
+    OVERLAY_COLORS = ['orange', 'magenta', 'cyan', 'yellow', 'lime', 'white', 'violet', 'salmon']
     TITLE_FONT_SIZE = 14
     BODY_MARGIN = dict(l=0, r=0, b=0, t=35, pad=0)
     MINI_CHART_MARGIN = 1
@@ -0,0 +1,227 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from PyQt6.QtCore import QThread
+from PyQt6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QListWidget, \
+    QTableWidget, QTableWidgetItem, QLabel, QSystemTrayIcon, QStyle
+
+from analytics.alerts import save_rules
+from analytics.risk import history_period
+from etrade_client.pollworker import PollWorker
+from ui.ui_constants import StandardFonts, Colors, Layout
+
+#quote fields the rules can read; close is the last trade
+QUOTE_FIELDS = ['lastTrade', 'change', 'changePct', 'volume']
+
+
+class AlertsPanel(QDockWidget):
+    """
+    dockable alert rules and the alerts they raised (analytics/alerts.py).
+    the dashboard feeds positions, quotes and FRED rows in as they arrive and every rule reading a
+    changed value is re-checked at once; daily history for sma(), rsi() and the like is refreshed
+    on a worker thread. alerts pop up as desktop notifications through the system tray (the status
+    bar when there is no tray), whether or not the panel is open.
+    """
+    ALERT_COLUMNS = ['time', 'rule', 'values']
+    HISTORY_REFRESH_S = 300
+    #alerts shown in one notification; more are summarized
+    NOTIFY_LINES = 5
+
+    def __init__(self, engine, rules_path, history, fred_indicators, parent=None):
+        """
+        arguments:
+            engine: analytics.alerts.AlertEngine with the saved rules
+            rules_path: file the rule list is saved to when it is edited here
+            history: YFinanceDataManager used for daily closes
+            fred_indicators: FRED row name -> series id, as in FREDDataManager.indicators
+        """
+        super().__init__("Alerts", parent)
+        self.setObjectName("alertsPanel")
+        self.engine = engine
+        self.rules_path = rules_path
+        self.history = history
+        self.fred_indicators = dict(fred_indicators)
+        self.fred_ids = set(self.fred_indicators.values())
+        self._thread, self._worker = None, None
+        self._history_key = None     # what the history worker fetches: (symbols, bars, volume)
+
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN,
+                                  Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN)
+
+        entry = QHBoxLayout()
+        self.ruleEdit = QLineEdit()
+        self.ruleEdit.setPlaceholderText("e.g. NVDA daysGainPct < -3,  HYG close below sma(50),  UNRATE change > 0.2")
+        self.ruleEdit.setFont(StandardFonts.SMALL)
+        self.addButton = QPushButton("Add")
+        self.removeButton = QPushButton("Remove")
+        entry.addWidget(self.ruleEdit)
+        entry.addWidget(self.addButton)
+        entry.addWidget(self.removeButton)
+        layout.addLayout(entry)
+
+        self.rulesList = QListWidget()
+        self.rulesList.setFont(StandardFonts.SMALL)
+        self.rulesList.setMaximumHeight(120)
+        layout.addWidget(self.rulesList)
+
+        self.alertsTable = QTableWidget(0, len(self.ALERT_COLUMNS))
+        self.alertsTable.setHorizontalHeaderLabels(self.ALERT_COLUMNS)
+        self.alertsTable.horizontalHeader().setStretchLastSection(True)
+        self.alertsTable.verticalHeader().setVisible(False)
+        self.alertsTable.setFont(StandardFonts.SMALL)
+        layout.addWidget(self.alertsTable)
+
+        self.statusLabel = QLabel("")
+        self.statusLabel.setFont(StandardFonts.SMALL)
+        self.statusLabel.setStyleSheet(f"color: {Colors.SECONDARY_TEXT};")
+        layout.addWidget(self.statusLabel)
+        self.setWidget(container)
+
+        self.tray = None
+        if QSystemTrayIcon.isSystemTrayAvailable():
+            icon = parent.windowIcon() if parent is not None and not parent.windowIcon().isNull() \
+                else self.style().standardIcon(QStyle.StandardPixmap.SP_MessageBoxWarning)
+            self.tray = QSystemTrayIcon(icon, self)
+            self.tray.setToolTip("Alerts")
+            self.tray.show()
+
+        self.addButton.clicked.connect(self.add_rule)
+        self.ruleEdit.returnPressed.connect(self.add_rule)
+        self.removeButton.clicked.connect(self.remove_rule)
+        self._show_rules()
+
+    def _show_rules(self):
+        #read by the quote poll thread, so swapped whole rather than changed in place
+        self.quote_symbols = tuple(s for s in self.engine.subjects() if s not in self.fred_ids)
+        self.rulesList.clear()
+        self.rulesList.addItems(list(self.engine.rules))
+        self.statusLabel.setText(f"{len(self.engine)} rules, {len(self.engine.subjects())} subjects")
+
+    def add_rule(self):
+        text = self.ruleEdit.text().strip()
+        if not text:
+            return
+        try:
+            self.engine.add(text)
+        except ValueError as e:
+            self.statusLabel.setText(str(e))
+            return
+        self.ruleEdit.clear()
+        self._rules_changed()
+
+    def remove_rule(self):
+        for item in self.rulesList.selectedItems():
+            self.engine.remove(item.text())
+        self._rules_changed()
+
+    def _rules_changed(self):
+        save_rules(list(self.engine.rules), self.rules_path)
+        self._show_rules()
+        if self._wanted_history() != self._history_key:
+            self.stop()
+            self.start()
+
+    # feeds - all on the gui thread
+
+    def on_positions(self, positions):
+        if positions is None or positions.empty or not len(self.engine):
+            return
+        # an option's symbol is its underlying; the stock's row speaks for the symbol
+        frame = positions
+        if 'securityType' in frame:
+            frame = frame[frame['securityType'].astype(str) != 'OPTN']
+        frame = frame.drop_duplicates('symbol').set_index('symbol')
+        frame = frame.select_dtypes(include='number')
+        if 'lastTrade' in frame:
+            frame = frame.assign(close=frame['lastTrade'])
+        self.notify(self.engine.update(frame))
+
+    def on_quotes(self, quotes):
+        if not quotes or not len(self.engine):
+            return
+        frame = pd.DataFrame.from_dict(quotes, orient='index').reindex(columns=QUOTE_FIELDS)
+        self.notify(self.engine.update(frame.assign(close=frame['lastTrade'])))
+
+    def on_economic(self, rows):
+        """
+        arguments:
+            rows: FRED row name -> {'values': latest first, ...} (FREDDataManager.EconomicViewRowData)
+        """
+        values = {}
+        for name, data in (rows or {}).items():
+            series_id = self.fred_indicators.get(name)
+            latest = [v for v in data.get('values', [])[:2] if isinstance(v, (int, float))]
+            if series_id is None or not latest:
+                continue
+            previous = latest[1] if len(latest) > 1 else latest[0]
+            values[series_id] = {'value': latest[0], 'change': latest[0] - previous,
+                                 'change_pct': (latest[0] - previous) / previous * 100.0 if previous else np.nan}
+        if values:
+            self.notify(self.engine.update(values))
+
+    # daily history
+
+    def _wanted_history(self):
+        symbols = [s for s in self.engine.history_symbols() if s not in self.fred_ids]
+        return symbols, self.engine.history_bars(), self.engine.needs_volume()
+
+    def start(self):
+        if self._worker is not None:
+            return
+        self._history_key = self._wanted_history()
+        symbols, bars, volume = self._history_key
+        if not symbols:
+            return
+        period = history_period(bars)
+        self._worker = PollWorker(lambda: self._fetch_history(symbols, period, volume), self.HISTORY_REFRESH_S,
+                                  jitter=0.0, name='alerts')
+        self._thread = QThread(self)
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.start)
+        self._worker.dataReady.connect(self._on_history)
+        self._worker.error.connect(lambda message: self.statusLabel.setText(f"history error: {message}"))
+        self._worker.finished.connect(self._thread.quit)
+        self._thread.start()
+
+    def _fetch_history(self, symbols, period, volume):
+        # worker thread: only the (thread safe) history cache is touched here
+        closes = self.history.get_price_history(symbols, period, "1d")
+        volumes = self.history.get_price_history(symbols, period, "1d", field="Volume") if volume else None
+        return closes, volumes
+
+    def _on_history(self, payload):
+        closes, volumes = payload
+        if closes is not None and not closes.empty:
+            self.notify(self.engine.update_history(closes, volumes))
+
+    def stop(self):
+        if self._worker is None:
+            return
+        self._worker.stop()
+        self._thread.quit()
+        self._worker, self._thread = None, None
+
+    def notify(self, alerts):
+        if not alerts:
+            return
+        for alert in alerts:
+            self.alertsTable.insertRow(0)
+            shown = ", ".join(f"{field} {value:,.2f}" for field, value in alert['values'].items())
+            for j, text in enumerate((datetime.fromtimestamp(alert['time']).strftime('%H:%M:%S'), alert['rule'], shown)):
+                self.alertsTable.setItem(0, j, QTableWidgetItem(text))
+        while self.alertsTable.rowCount() > self.engine.history.maxlen:
+            self.alertsTable.removeRow(self.alertsTable.rowCount() - 1)
+        self.alertsTable.resizeColumnsToContents()
+
+        # one notification per update, however many rules went off
+        title = alerts[0]['rule'] if len(alerts) == 1 else f"{len(alerts)} alerts"
+        lines = [alert['message'] for alert in alerts[:self.NOTIFY_LINES]]
+        if len(alerts) > self.NOTIFY_LINES:
+            lines.append(f"... and {len(alerts) - self.NOTIFY_LINES} more")
+        if self.tray is not None:
+            self.tray.showMessage(title, "\n".join(lines), QSystemTrayIcon.MessageIcon.Warning, 10000)
+        elif self.parent() is not None and hasattr(self.parent(), 'statusBar'):
+            self.parent().statusBar().showMessage(f"Alert: {'; '.join(lines)}", 30000)
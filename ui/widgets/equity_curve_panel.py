@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+
+import plotly.graph_objects as go
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWebEngineWidgets import QWebEngineView
+from PyQt6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QLabel
+
+from etrade_client.equity_curve import TOTAL_KEY, downsample_minmax
+from etrade_client.market_calendar import EXCHANGE_TZ
+from ui.ui_constants import StandardFonts, Colors, Layout, ChartStyle
+
+
+class EquityCurvePanel(QDockWidget):
+    """
+    dockable chart of our own account value over time, read straight from the equity curve file
+    (etrade_client/equity_curve.py): intraday at full resolution, years from the compacted records.
+    a range is thinned to MAX_POINTS keeping each bucket's high and low before it is drawn.
+    """
+    #title -> days back from the newest record; 0 for the newest record's day, None for everything
+    RANGES = {'1D': 0, '5D': 5, '1M': 31, '6M': 183, '1Y': 366, '5Y': 5 * 366, 'All': None}
+    MAX_POINTS = 1000
+    REFRESH_MS = 60 * 1000
+
+    def __init__(self, store, accounts_fn, parent=None):
+        """
+        arguments:
+            store: EquityCurveStore
+            accounts_fn: called on the gui thread, returns [(accountIdKey, title)] for the account combo
+        """
+        super().__init__("Equity Curve", parent)
+        self.setObjectName("equityCurvePanel")
+        self.store = store
+        self.accounts_fn = accounts_fn
+
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN,
+                                  Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN)
+
+        controls = QHBoxLayout()
+        self.accountCombo = QComboBox()
+        self.accountCombo.setFont(StandardFonts.SMALL)
+        self.rangeCombo = QComboBox()
+        self.rangeCombo.setFont(StandardFonts.SMALL)
+        self.rangeCombo.addItems(list(self.RANGES))
+        self.statusLabel = QLabel("")
+        self.statusLabel.setFont(StandardFonts.SMALL)
+        self.statusLabel.setStyleSheet(f"color: {Colors.SECONDARY_TEXT};")
+        controls.addWidget(self.accountCombo)
+        controls.addWidget(self.rangeCombo)
+        controls.addStretch()
+        controls.addWidget(self.statusLabel)
+        layout.addLayout(controls)
+
+        self.chartView = QWebEngineView()
+        layout.addWidget(self.chartView)
+        self.setWidget(container)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+        self.accountCombo.activated.connect(lambda _: self.refresh())
+        self.rangeCombo.currentIndexChanged.connect(lambda _: self.refresh())
+        self.visibilityChanged.connect(self._on_visibility_changed)
+
+    def _on_visibility_changed(self, visible):
+        if visible:
+            self._fill_accounts()
+            self.refresh()
+            self._timer.start()
+        else:
+            self._timer.stop()
+
+    def _fill_accounts(self):
+        selected = self.accountCombo.currentData()
+        self.accountCombo.blockSignals(True)
+        self.accountCombo.clear()
+        self.accountCombo.addItem("All accounts", TOTAL_KEY)
+        for key, title in self.accounts_fn():
+            self.accountCombo.addItem(title, key)
+        index = self.accountCombo.findData(selected)
+        self.accountCombo.setCurrentIndex(max(index, 0))
+        self.accountCombo.blockSignals(False)
+
+    def refresh(self):
+        key = self.accountCombo.currentData() or TOTAL_KEY
+        days = self.RANGES[self.rangeCombo.currentText()]
+        newest = self.store.last_time(key)
+        if newest is None:
+            self.statusLabel.setText("no history recorded yet")
+            self.chartView.setHtml("")
+            return
+        start = None
+        if days is not None:
+            start = datetime.fromtimestamp(newest / 1000.0, EXCHANGE_TZ).date() - timedelta(days=days)
+        curve = self.store.read(key, start=start)
+        shown = downsample_minmax(curve, 'net_value', self.MAX_POINTS)
+        self.statusLabel.setText(f"{len(curve):,} records, {len(shown):,} drawn")
+        self.chartView.setHtml(self.build_html(shown, self.accountCombo.currentText()))
+
+    @staticmethod
+    def build_html(curve, title, gridcolor=ChartStyle.GRID_COLOR):
+        """
+        purpose: render an equity curve into the html page shown in the pane
+        arguments:
+            curve: EquityCurveStore.read output (already thinned)
+            title: chart title; the range's change is appended
+        returns:
+            html string for QWebEngineView.setHtml
+        """
+        values = curve['net_value'].to_numpy()
+        if len(values):
+            change = values[-1] - values[0]
+            pct = change / values[0] * 100.0 if values[0] else 0.0
+            title = f"{title}  ${values[-1]:,.0f}  {change:+,.0f} ({pct:+.2f}%)"
+        #epoch milliseconds in wall-clock New York time, packed as binary like the overlay panes
+        x = curve.index.tz_localize(None).as_unit('ns').asi8 / 1e6
+        fig = go.Figure([go.Scatter(x=x, y=values, mode='lines', name='net value',
+                                    customdata=curve[['market_value', 'cash']].to_numpy(),
+                                    hovertemplate="$%{y:,.2f}<br>market $%{customdata[0]:,.2f}"
+                                                  "<br>cash $%{customdata[1]:,.2f}<extra></extra>",
+                                    line=dict(color=ChartStyle.LINE_COLOR, width=ChartStyle.OVERLAY_LINE_WIDTH))])
+        fig.update_layout(
+            title=dict(text=title, font=dict(size=ChartStyle.TITLE_FONT_SIZE)),
+            margin=ChartStyle.BODY_MARGIN,
+            showlegend=False,
+            plot_bgcolor=ChartStyle.PLOT_BACKGROUND,
+            paper_bgcolor=ChartStyle.PAPER_BACKGROUND,
+            xaxis=dict(type='date', showgrid=True, gridcolor=gridcolor),
+            yaxis=dict(tickprefix='$', showgrid=True, gridcolor=gridcolor),
+        )
+        html = f"""
+        <html>
+        <head>
+            <style>
+                body {{
+                    margin: 2px;
+                    padding: 0;
+                    background-color: {ChartStyle.PLOT_BACKGROUND};
+                }}
+            </style>
+        </head>
+        <body>
+            {fig.to_html(include_plotlyjs='cdn', full_html=True)}
+        </body>
+        </html>
+        """
+        return html
+
+    def stop(self):
+        self._timer.stop()
@@ -0,0 +1,242 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from PyQt6.QtCore import QTimer, pyqtSignal
+from PyQt6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QLineEdit, QComboBox, \
+    QSpinBox, QDoubleSpinBox, QPushButton, QLabel
+
+from etrade_client.order import OrderTicket, ORDER_ACTIONS, PRICE_TYPES, ORDER_TERMS, MARKET_SESSIONS, ERROR, \
+    WARM_INTERVAL_S
+from analytics.taxlots import FIFO, LIFO, MIN_TAX
+from ui.widgets.symbol_completer import SymbolCompleter
+from ui.ui_constants import StandardFonts, Colors, Layout
+
+
+class OrderEntryForm(QDockWidget):
+    """
+    dockable equity order ticket for the selected account.
+    every edit re-runs the pre-trade checks and rebuilds the preview request (etrade_client/order.py),
+    so Preview and Place only send; requests go out on one worker thread and the answers come back
+    through signals. while the form is open the connection is kept warm with a quote on its symbol.
+    a SELL also shows what the sale would realize under each lot method (analytics/taxlots.py); the
+    symbol's lots are fetched in the background the first time it is sold here.
+    """
+    _answered = pyqtSignal(str, object)     # 'preview' / 'place' / 'warm' / 'lots', result
+    METHOD_TITLES = {FIFO: 'FIFO', LIFO: 'LIFO', MIN_TAX: 'Min tax'}
+
+    def __init__(self, order_fn, parent=None, symbols=None):
+        """
+        arguments:
+            order_fn: called on the gui thread, returns the etrade_client.order.Order for the
+                      selected account, or None when not logged in
+            symbols: SymbolIndex completing the symbol field; None for none
+        """
+        super().__init__("Order Entry", parent)
+        self.setObjectName("orderEntryForm")
+        self.order_fn = order_fn
+        self.order = None
+        self._busy = False
+        self._lots_requested = set()    # (accountIdKey, symbol) whose lots were fetched or are being fetched
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='order')
+        self._answered.connect(self._on_answer)
+
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN,
+                                  Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN)
+
+        form = QFormLayout()
+        self.symbolEdit = QLineEdit()
+        self.symbolEdit.setPlaceholderText("symbol")
+        if symbols is not None:
+            SymbolCompleter(symbols, self.symbolEdit)
+        self.actionCombo = QComboBox()
+        self.actionCombo.addItems(ORDER_ACTIONS)
+        self.quantitySpin = QSpinBox()
+        self.quantitySpin.setRange(0, 10_000_000)
+        self.priceTypeCombo = QComboBox()
+        self.priceTypeCombo.addItems(PRICE_TYPES)
+        self.limitSpin = QDoubleSpinBox()
+        self.stopSpin = QDoubleSpinBox()
+        for spin in (self.limitSpin, self.stopSpin):
+            spin.setRange(0.0, 1_000_000.0)
+            spin.setDecimals(2)
+        self.termCombo = QComboBox()
+        self.termCombo.addItems(ORDER_TERMS)
+        self.sessionCombo = QComboBox()
+        self.sessionCombo.addItems(MARKET_SESSIONS)
+        self.inputs = [self.symbolEdit, self.actionCombo, self.quantitySpin, self.priceTypeCombo,
+                       self.limitSpin, self.stopSpin, self.termCombo, self.sessionCombo]
+        for title, widget in zip(("Symbol", "Action", "Quantity", "Price type", "Limit", "Stop", "Term", "Session"),
+                                 self.inputs):
+            widget.setFont(StandardFonts.SMALL)
+            form.addRow(title, widget)
+        layout.addLayout(form)
+
+        self.checksLabel = QLabel("")
+        self.checksLabel.setFont(StandardFonts.SMALL)
+        self.checksLabel.setWordWrap(True)
+        layout.addWidget(self.checksLabel)
+
+        self.whatIfLabel = QLabel("")
+        self.whatIfLabel.setFont(StandardFonts.SMALL)
+        self.whatIfLabel.setWordWrap(True)
+        layout.addWidget(self.whatIfLabel)
+
+        buttons = QHBoxLayout()
+        self.previewButton = QPushButton("Preview")
+        self.placeButton = QPushButton("Place")
+        buttons.addWidget(self.previewButton)
+        buttons.addWidget(self.placeButton)
+        layout.addLayout(buttons)
+
+        self.resultLabel = QLabel("")
+        self.resultLabel.setFont(StandardFonts.SMALL_BOLD)
+        self.resultLabel.setWordWrap(True)
+        layout.addWidget(self.resultLabel)
+        self.timingLabel = QLabel("")
+        self.timingLabel.setFont(StandardFonts.SMALL)
+        self.timingLabel.setStyleSheet(f"color: {Colors.SECONDARY_TEXT};")
+        self.timingLabel.setWordWrap(True)
+        layout.addWidget(self.timingLabel)
+        layout.addStretch()
+        self.setWidget(container)
+
+        self.symbolEdit.textEdited.connect(lambda _: self.stage())
+        self.symbolEdit.editingFinished.connect(self.warm)
+        for combo in (self.actionCombo, self.priceTypeCombo, self.termCombo, self.sessionCombo):
+            combo.currentIndexChanged.connect(lambda _: self.stage())
+        for spin in (self.quantitySpin, self.limitSpin, self.stopSpin):
+            spin.valueChanged.connect(lambda _: self.stage())
+        self.previewButton.clicked.connect(self.preview)
+        self.placeButton.clicked.connect(self.place)
+
+        self.warmTimer = QTimer(self)
+        self.warmTimer.setInterval(int(WARM_INTERVAL_S * 1000))
+        self.warmTimer.timeout.connect(self.warm)
+        self.visibilityChanged.connect(self._on_visibility_changed)
+        self.stage()
+
+    def _on_visibility_changed(self, visible):
+        if visible:
+            self.warm()
+            self.warmTimer.start()
+        else:
+            self.warmTimer.stop()
+
+    def ticket(self):
+        return OrderTicket(self.symbolEdit.text(), self.actionCombo.currentText(), self.quantitySpin.value(),
+                           self.priceTypeCombo.currentText(), self.limitSpin.value() or None,
+                           self.stopSpin.value() or None, self.termCombo.currentText(),
+                           self.sessionCombo.currentText())
+
+    def stage(self):
+        price_type = self.priceTypeCombo.currentText()
+        self.limitSpin.setEnabled(not self._busy and 'LIMIT' in price_type)
+        self.stopSpin.setEnabled(not self._busy and 'STOP' in price_type)
+        if self._busy:
+            return
+        self.order = self.order_fn()
+        if self.order is None:
+            self.checksLabel.setText("Not logged in")
+            self._update_buttons()
+            return
+        ticket = self.ticket()
+        checks = self.order.stage(ticket)
+        self.checksLabel.setText("\n".join(message for _, message in checks))
+        color = Colors.LOSS_COLOR.name() if any(level == ERROR for level, _ in checks) else Colors.SECONDARY_TEXT
+        self.checksLabel.setStyleSheet(f"color: {color};")
+        self.resultLabel.setText("")
+        self.show_what_if(ticket)
+        self._update_buttons()
+
+    def show_what_if(self, ticket):
+        results = self.order.what_if(ticket)
+        if results is None:
+            self.whatIfLabel.setText("")
+            return
+        request = (self.order.account.accountIdKey, ticket.symbol)
+        if request not in self._lots_requested and self.order.lots_missing(ticket.symbol):
+            self._lots_requested.add(request)
+            future = self._pool.submit(self.order.fetch_lots, ticket.symbol)
+            future.add_done_callback(lambda f: self._answered.emit('lots', None))
+        lines = []
+        for method, result in results.items():
+            line = (f"{self.METHOD_TITLES[method]:<8} gain ${result['gain']:>12,.2f}  (short ${result['short_gain']:,.2f}, "
+                    f"long ${result['long_gain']:,.2f})  est. tax ${result['tax']:,.2f}")
+            if result['estimated']:
+                line += " *"
+            lines.append(line)
+        if any(result['estimated'] for result in results.values()):
+            lines.append("* position-level cost basis, lots still loading" if request in self._lots_requested
+                         else "* position-level cost basis")
+        self.whatIfLabel.setText("\n".join(lines))
+
+    def _update_buttons(self):
+        self.previewButton.setEnabled(not self._busy and self.order is not None and self.order.can_preview)
+        self.placeButton.setEnabled(not self._busy and self.order is not None and self.order.can_place)
+
+    def _submit(self, kind, fn, *args):
+        self._set_busy(True)
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self._answered.emit(
+            kind, f.result() if f.exception() is None else {'ok': False, 'message': str(f.exception())}))
+
+    def _set_busy(self, busy):
+        # the ticket can't change under a request in flight
+        self._busy = busy
+        for widget in self.inputs:
+            widget.setEnabled(not busy)
+        price_type = self.priceTypeCombo.currentText()
+        self.limitSpin.setEnabled(not busy and 'LIMIT' in price_type)
+        self.stopSpin.setEnabled(not busy and 'STOP' in price_type)
+        self._update_buttons()
+
+    def preview(self):
+        clicked = time.perf_counter()
+        if self.order is not None and self.order.can_preview:
+            self._submit('preview', self.order.preview, clicked)
+
+    def place(self):
+        clicked = time.perf_counter()
+        if self.order is not None and self.order.can_place:
+            self._submit('place', self.order.place, clicked)
+
+    def warm(self):
+        order = self.order
+        symbol = self.symbolEdit.text().strip().upper()
+        if order is not None and symbol and not self._busy:
+            # not _submit: warming doesn't lock the form, it only queues behind an order request
+            future = self._pool.submit(order.warm, symbol)
+            future.add_done_callback(lambda f: self._answered.emit('warm', f.result() if f.exception() is None else None))
+
+    def _on_answer(self, kind, result):
+        if kind in ('warm', 'lots'):
+            # a fresher price for the notional checks, or the real lots for the what-if
+            if not self._busy and (self.order is None or not self.order.can_place):
+                self.stage()
+            return
+        color = Colors.GAIN_COLOR.name() if result.get('ok') else Colors.LOSS_COLOR.name()
+        self.resultLabel.setStyleSheet(f"color: {color};")
+        text = result.get('message', '')
+        if kind == 'preview' and result.get('ok'):
+            text += f" - est. ${result['estimated_total'] or 0:,.2f}, commission ${result['commission'] or 0:,.2f}"
+        elif kind == 'place' and result.get('ok'):
+            text += f" - order {result['order_id']}"
+        if result.get('messages'):
+            text += "\n" + "\n".join(result['messages'])
+        self.resultLabel.setText(text)
+
+        timeline = self.order.timeline if self.order is not None else None
+        if timeline is not None:
+            parts = [(f"{kind} click->sent", timeline.ms(f'{kind}_clicked', f'{kind}_sent')),
+                     ("round trip", timeline.ms(f'{kind}_sent', f'{kind}_acked')),
+                     ("click->ack", timeline.ms(f'{kind}_clicked', f'{kind}_acked')),
+                     ("shown", (time.perf_counter() - timeline.marks[f'{kind}_clicked']) * 1000.0
+                      if f'{kind}_clicked' in timeline.marks else None)]
+            self.timingLabel.setText(" | ".join(f"{name} {ms:.1f} ms" for name, ms in parts if ms is not None))
+        self._set_busy(False)
+
+    def stop(self):
+        self.warmTimer.stop()
+        self._pool.shutdown(wait=False, cancel_futures=True)
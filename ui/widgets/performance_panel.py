@@ -0,0 +1,112 @@
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, \
+    QPushButton, QLabel, QFileDialog
+
+from ui.ui_constants import StandardFonts, Colors, Layout
+from utils.metrics import metrics
+
+
+class PerformancePanel(QDockWidget):
+    """
+    dockable live view of utils.metrics: latency percentiles, error rates and poll lag
+    per subsystem/endpoint, plus the raw counters.
+    """
+    HISTOGRAM_COLUMNS = ['subsystem', 'endpoint', 'count', 'err %', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms']
+    REFRESH_MS = 1000
+
+    def __init__(self, parent=None):
+        super().__init__("Performance", parent)
+        self.setObjectName("performancePanel")
+
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN,
+                                  Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN)
+
+        controls = QHBoxLayout()
+        self.statusLabel = QLabel()
+        self.statusLabel.setFont(StandardFonts.SMALL)
+        self.statusLabel.setStyleSheet(f"color: {Colors.SECONDARY_TEXT};")
+        self.resetButton = QPushButton("Reset")
+        self.exportButton = QPushButton("Export...")
+        controls.addWidget(self.statusLabel)
+        controls.addStretch()
+        controls.addWidget(self.resetButton)
+        controls.addWidget(self.exportButton)
+        layout.addLayout(controls)
+
+        self.histogramTable = QTableWidget(0, len(self.HISTOGRAM_COLUMNS))
+        self.histogramTable.setHorizontalHeaderLabels(self.HISTOGRAM_COLUMNS)
+        self.histogramTable.verticalHeader().setVisible(False)
+        self.histogramTable.setFont(StandardFonts.SMALL)
+        layout.addWidget(self.histogramTable)
+
+        self.counterTable = QTableWidget(0, 3)
+        self.counterTable.setHorizontalHeaderLabels(['subsystem', 'counter', 'value'])
+        self.counterTable.verticalHeader().setVisible(False)
+        self.counterTable.setFont(StandardFonts.SMALL)
+        self.counterTable.setMaximumHeight(120)
+        layout.addWidget(self.counterTable)
+
+        self.setWidget(container)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.REFRESH_MS)
+        self._timer.timeout.connect(self.refresh)
+
+        self.resetButton.clicked.connect(self._on_reset)
+        self.exportButton.clicked.connect(self._on_export)
+        self.visibilityChanged.connect(self._on_visibility_changed)
+
+    def _on_visibility_changed(self, visible):
+        if visible:
+            # opening the panel is an explicit request to start recording
+            metrics.enable()
+            self.refresh()
+            self._timer.start()
+        else:
+            self._timer.stop()
+
+    def _on_reset(self):
+        metrics.reset()
+        self.refresh()
+
+    def _on_export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export metrics", "metrics.json",
+                                              "JSON (*.json);;CSV (*.csv)")
+        if path:
+            try:
+                metrics.export(path)
+            except OSError as e:
+                print(f"Error exporting metrics: {e}")
+
+    def refresh(self):
+        snapshot = metrics.snapshot()
+        histograms = snapshot['histograms']
+        counters = snapshot['counters']
+
+        self.histogramTable.setSortingEnabled(False)
+        self.histogramTable.setRowCount(len(histograms))
+        for i, row in enumerate(histograms):
+            values = [row['subsystem'], row['endpoint'], row['count'], row['error_rate'] * 100.0,
+                      row['p50_ms'], row['p95_ms'], row['p99_ms'], row['max_ms']]
+            for j, value in enumerate(values):
+                text = f"{value:.1f}" if isinstance(value, float) else str(value)
+                item = QTableWidgetItem(text)
+                if j >= 2:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                if j == 3 and row['errors']:
+                    item.setForeground(Colors.LOSS_COLOR)
+                self.histogramTable.setItem(i, j, item)
+        self.histogramTable.setSortingEnabled(True)
+        self.histogramTable.resizeColumnsToContents()
+
+        self.counterTable.setRowCount(len(counters))
+        for i, row in enumerate(counters):
+            self.counterTable.setItem(i, 0, QTableWidgetItem(row['subsystem']))
+            self.counterTable.setItem(i, 1, QTableWidgetItem(row['name']))
+            self.counterTable.setItem(i, 2, QTableWidgetItem(str(row['value'])))
+        self.counterTable.resizeColumnsToContents()
+
+        state = "recording" if metrics.enabled else "disabled"
+        self.statusLabel.setText(f"{state} | {sum(r['count'] for r in histograms)} samples")
@@ -0,0 +1,184 @@
+from PyQt6.QtCore import Qt, QThread
+from PyQt6.QtWidgets import QDockWidget, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QTableWidget, \
+    QTableWidgetItem, QLabel, QSplitter
+
+from analytics.risk import RiskEngine, DEFAULT_BENCHMARKS, TRADING_DAYS, history_period
+from etrade_client.pollworker import PollWorker
+from ui.ui_constants import StandardFonts, Colors, Layout
+
+
+class RiskPanel(QDockWidget):
+    """
+    dockable portfolio risk view across all accounts: volatility, betas, VaR/CVaR,
+    risk contribution per holding and the most correlated pairs.
+    the model runs on a worker thread (see analytics/risk.py) so 500+ holdings don't block the ui.
+    """
+    SUMMARY = [('value', 'Modelled value'), ('vol_annual', 'Volatility (ann.)'),
+               ('var_hist', 'VaR hist'), ('cvar_hist', 'CVaR hist'),
+               ('var_param', 'VaR param'), ('cvar_param', 'CVaR param')]
+    PAIR_COLUMNS = ['symbol', 'symbol', 'corr']
+
+    def __init__(self, exposures_fn, history, parent=None):
+        """
+        arguments:
+            exposures_fn: called on the gui thread, returns (symbol -> market value, unmodelled value),
+                          see analytics.risk.exposures_from_accounts
+            history: YFinanceDataManager used for daily closes
+        """
+        super().__init__("Risk", parent)
+        self.setObjectName("riskPanel")
+        self.exposures_fn = exposures_fn
+        self.history = history
+        try:
+            import config
+        except ImportError:
+            config = None
+        self.lookback = getattr(config, 'RISK_LOOKBACK', TRADING_DAYS)
+        self.confidence = getattr(config, 'RISK_CONFIDENCE', 0.95)
+        self.benchmarks = list(getattr(config, 'RISK_BENCHMARKS', DEFAULT_BENCHMARKS))
+        self.refresh_s = getattr(config, 'RISK_REFRESH_S', 60)
+        self._exposures = ({}, 0.0)
+        self._thread, self._worker = None, None
+
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        layout.setContentsMargins(Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN,
+                                  Layout.STANDARD_MARGIN, Layout.STANDARD_MARGIN)
+
+        summary = QGridLayout()
+        self.summaryLabels = {}
+        fields = self.SUMMARY + [(f'beta {b}', f'Beta {b}') for b in self.benchmarks]
+        for i, (key, title) in enumerate(fields):
+            name = QLabel(title)
+            name.setFont(StandardFonts.SMALL)
+            name.setStyleSheet(f"color: {Colors.SECONDARY_TEXT};")
+            value = QLabel("-")
+            value.setFont(StandardFonts.SMALL_BOLD)
+            summary.addWidget(name, i // 4, (i % 4) * 2)
+            summary.addWidget(value, i // 4, (i % 4) * 2 + 1)
+            self.summaryLabels[key] = value
+        layout.addLayout(summary)
+
+        self.holdingColumns = ['symbol', 'exposure', 'weight', 'vol'] + \
+                              [f'beta {b}' for b in self.benchmarks] + ['risk %']
+        self.holdingsTable = QTableWidget(0, len(self.holdingColumns))
+        self.holdingsTable.setHorizontalHeaderLabels(self.holdingColumns)
+        self.holdingsTable.verticalHeader().setVisible(False)
+        self.holdingsTable.setFont(StandardFonts.SMALL)
+
+        self.pairsTable = QTableWidget(0, len(self.PAIR_COLUMNS))
+        self.pairsTable.setHorizontalHeaderLabels(self.PAIR_COLUMNS)
+        self.pairsTable.verticalHeader().setVisible(False)
+        self.pairsTable.setFont(StandardFonts.SMALL)
+
+        tables = QSplitter(Qt.Orientation.Horizontal)
+        tables.addWidget(self.holdingsTable)
+        tables.addWidget(self.pairsTable)
+        tables.setStretchFactor(0, 3)
+        tables.setStretchFactor(1, 1)
+        layout.addWidget(tables)
+
+        status = QHBoxLayout()
+        self.statusLabel = QLabel("not started")
+        self.statusLabel.setFont(StandardFonts.SMALL)
+        self.statusLabel.setStyleSheet(f"color: {Colors.SECONDARY_TEXT};")
+        status.addWidget(self.statusLabel)
+        status.addStretch()
+        layout.addLayout(status)
+
+        self.setWidget(container)
+        self.visibilityChanged.connect(self._on_visibility_changed)
+
+    def _on_visibility_changed(self, visible):
+        if visible:
+            self.start()
+        else:
+            self.stop()
+
+    def start(self):
+        if self._worker is not None:
+            return
+        self._exposures = self.exposures_fn()
+        # one engine per worker: a stopped worker may still be finishing a pass over the old one
+        engine = RiskEngine(self.lookback, self.benchmarks, self.confidence)
+        self._worker = PollWorker(lambda: self._compute(engine), self.refresh_s, jitter=0.0, name='risk')
+        self._thread = QThread(self)
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.start)
+        self._worker.dataReady.connect(self._on_report)
+        self._worker.error.connect(lambda message: self.statusLabel.setText(f"error: {message}"))
+        self._worker.finished.connect(self._thread.quit)
+        self._thread.start()
+        self.statusLabel.setText("loading price history...")
+
+    def stop(self):
+        if self._worker is None:
+            return
+        self._worker.stop()
+        self._thread.quit()
+        self._worker, self._thread = None, None
+
+    def _compute(self, engine):
+        # worker thread: only the engine and the (thread safe) history cache are touched here
+        exposures, unmodelled = self._exposures
+        engine.set_exposures(exposures, unmodelled)
+        closes = self.history.get_price_history(engine.needed_symbols(), history_period(self.lookback), "1d")
+        engine.update(closes)
+        return engine.report()
+
+    def _on_report(self, report):
+        # positions may have changed since the last pass; the next one picks them up
+        self._exposures = self.exposures_fn()
+        if report is None:
+            self.statusLabel.setText("no modelled holdings")
+            return
+        self.refresh(report)
+
+    def refresh(self, report):
+        value = report['value']
+        pct = lambda x: f"{x * 100.0:.2f}%  (${x * value:,.0f})"
+        self.summaryLabels['value'].setText(f"${value:,.0f}")
+        self.summaryLabels['vol_annual'].setText(f"{report['vol_annual'] * 100.0:.2f}%")
+        for key in ('var_hist', 'cvar_hist', 'var_param', 'cvar_param'):
+            self.summaryLabels[key].setText(pct(report[key]))
+        for bench in self.benchmarks:
+            beta = report['betas'].get(bench)
+            self.summaryLabels[f'beta {bench}'].setText(f"{beta:.2f}" if beta is not None else "-")
+
+        holdings = report['holdings']
+        self.holdingsTable.setUpdatesEnabled(False)
+        self.holdingsTable.setSortingEnabled(False)
+        self.holdingsTable.setRowCount(len(holdings))
+        for j, column in enumerate(self.holdingColumns):
+            values = holdings[column].tolist() if column in holdings else [None] * len(holdings)
+            for i, v in enumerate(values):
+                if column == 'symbol':
+                    item = QTableWidgetItem(v)
+                else:
+                    # numeric sort instead of text sort
+                    item = QTableWidgetItem()
+                    item.setData(Qt.ItemDataRole.DisplayRole, round(float(v), 2) if v is not None else None)
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.holdingsTable.setItem(i, j, item)
+        self.holdingsTable.setSortingEnabled(True)
+        self.holdingsTable.setUpdatesEnabled(True)
+
+        pairs = report['top_pairs']
+        self.pairsTable.setRowCount(len(pairs))
+        for i, (a, b, corr) in enumerate(pairs):
+            self.pairsTable.setItem(i, 0, QTableWidgetItem(a))
+            self.pairsTable.setItem(i, 1, QTableWidgetItem(b))
+            item = QTableWidgetItem(f"{corr:.2f}")
+            item.setForeground(Colors.LOSS_COLOR if corr < 0 else Colors.GAIN_COLOR)
+            self.pairsTable.setItem(i, 2, item)
+        self.pairsTable.resizeColumnsToContents()
+
+        as_of = report['as_of'].strftime('%Y-%m-%d') if hasattr(report['as_of'], 'strftime') else report['as_of']
+        status = (f"1-day, {report['confidence'] * 100:.0f}% | {report['observations']} days to {as_of} | "
+                  f"{len(holdings)} holdings")
+        if report['missing']:
+            status += f" | no history: {', '.join(report['missing'][:5])}" + \
+                      ("..." if len(report['missing']) > 5 else "")
+        if report['unmodelled_value']:
+            status += f" | options not modelled: ${report['unmodelled_value']:,.0f}"
+        self.statusLabel.setText(status)
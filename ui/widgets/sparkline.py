@@ -0,0 +1,89 @@
+import numpy as np
+from PyQt6.QtCore import Qt, QPointF, QRectF, QSize
+from PyQt6.QtGui import QPainter, QPen, QColor, QPolygonF
+from PyQt6.QtWidgets import QStyledItemDelegate
+
+from ui.ui_constants import Colors, Layout, ChartStyle
+
+#item data role holding the symbol whose trend a sparkline cell shows
+SYMBOL_ROLE = Qt.ItemDataRole.UserRole
+
+
+def sparkline_points(values):
+    """
+    purpose: scale a series for paint_sparkline
+    arguments:
+        values: numbers oldest first; nan is skipped
+    returns:
+        float array of each point's height in 0..1 (1 the highest), or None with fewer than 2 points
+    """
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) < 2:
+        return None
+    low, high = values.min(), values.max()
+    return (values - low) / (high - low if high != low else 1.0)
+
+
+def paint_sparkline(painter, rect, points, color=Colors.CHART_LINE_PRIMARY):
+    """
+    purpose: draw sparkline_points as a line filling rect, the MiniChart look
+    arguments:
+        painter: active QPainter
+        rect: QRectF to draw in
+        points: sparkline_points output
+    """
+    step = rect.width() / (len(points) - 1)
+    bottom = rect.bottom()
+    polygon = QPolygonF([QPointF(rect.left() + i * step, bottom - y * rect.height()) for i, y in enumerate(points)])
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setPen(QPen(QColor(color), 1))
+    painter.drawPolyline(polygon)
+
+
+class SparklineDelegate(QStyledItemDelegate):
+    """
+    paints a trend line in every cell of a table column, for the symbol stored in the cell under
+    SYMBOL_ROLE. one delegate draws the whole column from the lines set_values() scaled once per
+    fetch, so a table rebuild only sets the symbol on each row and only visible rows are painted.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lines = {}    # symbol -> sparkline_points
+
+    def set_values(self, closes):
+        """
+        purpose: replace the lines of the given symbols; others are kept
+        arguments:
+            closes: dict symbol -> closes oldest first
+        returns:
+            True if any line changed
+        """
+        changed = False
+        for symbol, values in closes.items():
+            points = sparkline_points(values)
+            old = self._lines.get(symbol)
+            if points is None:
+                changed |= self._lines.pop(symbol, None) is not None
+            elif old is None or len(old) != len(points) or not np.array_equal(old, points):
+                self._lines[symbol] = points
+                changed = True
+        return changed
+
+    def paint(self, painter, option, index):
+        #background and selection as for any cell; the cell has no text
+        super().paint(painter, option, index)
+        points = self._lines.get(index.data(SYMBOL_ROLE))
+        if points is None:
+            return
+        margin = ChartStyle.MINI_CHART_MARGIN
+        cell = QRectF(option.rect)
+        height = min(cell.height() - 2 * margin, Layout.MINI_CHART_HEIGHT)
+        rect = QRectF(cell.left() + margin, cell.center().y() - height / 2, cell.width() - 2 * margin, height)
+        painter.save()
+        paint_sparkline(painter, rect, points)
+        painter.restore()
+
+    def sizeHint(self, option, index):
+        return QSize(Layout.MINI_CHART_WIDTH, Layout.MINI_CHART_HEIGHT)
@@ -0,0 +1,70 @@
+import re
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QStandardItem, QStandardItemModel
+from PyQt6.QtWidgets import QCompleter
+
+#item data role holding the ticker a completion inserts
+TICKER_ROLE = Qt.ItemDataRole.UserRole
+_LAST_WORD = re.compile(r'[^,\s]*$')
+
+
+class SymbolCompleter(QCompleter):
+    """
+    ticker completion for a QLineEdit from the local symbol index (data_providers/symbol_index.py).
+    the index answers every keystroke itself, so the completer's model only ever holds the rows
+    shown and Qt does no filtering. with words=True the word under the end of the line is
+    completed and the rest kept (several tickers in a pane, a console command).
+    """
+    LIMIT = 8
+
+    def __init__(self, index, line_edit, words=False, skip=None):
+        """
+        arguments:
+            index: SymbolIndex
+            line_edit: QLineEdit to complete
+            words: complete the last word only
+            skip: called with (words before, word); True leaves that word alone (e.g. command keywords)
+        """
+        super().__init__(line_edit)
+        self.index = index
+        self.line_edit = line_edit
+        self.words = words
+        self.skip = skip
+        self._model = QStandardItemModel(self)
+        self.setModel(self._model)
+        self.setCompletionRole(TICKER_ROLE)
+        self.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.setMaxVisibleItems(self.LIMIT)
+        self.setWidget(line_edit)
+        line_edit.textEdited.connect(self._on_edited)
+        self.activated.connect(self._insert)
+
+    def _split(self, text):
+        if not self.words:
+            return "", text
+        start = _LAST_WORD.search(text).start()
+        return text[:start], text[start:]
+
+    def _on_edited(self, text):
+        before, word = self._split(text)
+        if not word or (self.skip is not None and self.skip(before.split(), word)):
+            self.popup().hide()
+            return
+        self._model.clear()
+        for ticker, name, exchange, kind in self.index.complete(word, self.LIMIT):
+            item = QStandardItem(f"{ticker:<7} {name}")
+            item.setData(ticker, TICKER_ROLE)
+            item.setToolTip(f"{exchange}, {kind}")
+            self._model.appendRow(item)
+        if self._model.rowCount():
+            self.complete()
+        else:
+            self.popup().hide()
+
+    def _insert(self, ticker):
+        before, _ = self._split(self.line_edit.text())
+        self.line_edit.setText(before + ticker)
+        #an edit the way typing is, so forms re-check the ticket
+        self.line_edit.textEdited.emit(self.line_edit.text())
+        self.popup().hide()
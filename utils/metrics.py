@@ -0,0 +1,207 @@
+"""
+In-process metrics for the hot paths: counters and latency histograms tagged by
+subsystem and endpoint.
+
+Recording is disabled by default. While disabled, metrics.timer() hands back a
+shared no-op object so instrumented code pays one attribute check per call.
+"""
+
+import csv
+import json
+import threading
+import time
+from functools import wraps
+
+RESERVOIR_SIZE = 1024
+
+
+class LatencyStats:
+    """
+    purpose: latency histogram for one (subsystem, endpoint) pair
+    note: keeps the last RESERVOIR_SIZE samples in a ring buffer for percentiles,
+          plus running count/error/total/max over the whole lifetime
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._samples = [0.0] * RESERVOIR_SIZE
+        self._next = 0
+
+    def add(self, ms, error=False):
+        self.count += 1
+        if error:
+            self.errors += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self._samples[self._next] = ms
+        self._next = (self._next + 1) % RESERVOIR_SIZE
+
+    def percentiles(self, *pcts):
+        n = min(self.count, RESERVOIR_SIZE)
+        if n == 0:
+            return [0.0 for _ in pcts]
+        ordered = sorted(self._samples[:n])
+        return [ordered[min(n - 1, int(round(p / 100.0 * (n - 1))))] for p in pcts]
+
+
+class _Timer:
+    __slots__ = ('registry', 'key', 'start', 'failed')
+
+    def __init__(self, registry, key):
+        self.registry = registry
+        self.key = key
+        self.failed = False
+
+    def fail(self):
+        self.failed = True
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.start) * 1000.0
+        self.registry._record(self.key, ms, self.failed or exc_type is not None)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def fail(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.started_at = time.time()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started_at = time.time()
+
+    def timer(self, subsystem, endpoint):
+        """
+        purpose: time a block of code
+        usage:
+            with metrics.timer('etrade', 'portfolio') as t:
+                ...
+                if failed: t.fail()
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, (subsystem, endpoint))
+
+    def observe(self, subsystem, endpoint, ms, error=False):
+        if self.enabled:
+            self._record((subsystem, endpoint), ms, error)
+
+    def increment(self, subsystem, name, amount=1):
+        if not self.enabled:
+            return
+        key = (subsystem, name)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def _record(self, key, ms, error):
+        with self._lock:
+            stats = self.histograms.get(key)
+            if stats is None:
+                stats = self.histograms[key] = LatencyStats()
+            stats.add(ms, error)
+
+    def snapshot(self):
+        """
+        purpose: consistent copy of everything recorded so far
+        returns:
+            dict with 'histograms' rows (p50/p95/p99 etc.) and 'counters' rows
+        """
+        with self._lock:
+            rows = []
+            for (subsystem, endpoint), stats in sorted(self.histograms.items()):
+                p50, p95, p99 = stats.percentiles(50, 95, 99)
+                rows.append({
+                    'subsystem': subsystem,
+                    'endpoint': endpoint,
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'error_rate': stats.errors / stats.count if stats.count else 0.0,
+                    'mean_ms': stats.total_ms / stats.count if stats.count else 0.0,
+                    'p50_ms': p50,
+                    'p95_ms': p95,
+                    'p99_ms': p99,
+                    'max_ms': stats.max_ms,
+                })
+            counters = [{'subsystem': subsystem, 'name': name, 'value': value}
+                        for (subsystem, name), value in sorted(self.counters.items())]
+        return {'started_at': self.started_at, 'taken_at': time.time(),
+                'histograms': rows, 'counters': counters}
+
+    def export(self, path):
+        """
+        purpose: write a snapshot to disk for offline analysis
+        arguments:
+            path: .csv writes the histogram rows, anything else writes the full snapshot as json
+        """
+        snapshot = self.snapshot()
+        if path.lower().endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                columns = ['subsystem', 'endpoint', 'count', 'errors', 'error_rate',
+                           'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+                writer = csv.DictWriter(f, fieldnames=columns)
+                writer.writeheader()
+                writer.writerows(snapshot['histograms'])
+        else:
+            with open(path, 'w') as f:
+                json.dump(snapshot, f, indent=2)
+
+
+metrics = MetricsRegistry()
+
+
+def enable_metrics_from_config():
+    """
+    purpose: turn recording on at startup if METRICS_ENABLED is set in config.py
+    """
+    try:
+        import config
+    except ImportError:
+        return
+    metrics.enable(getattr(config, 'METRICS_ENABLED', False))
+
+
+def timed(subsystem, endpoint):
+    """
+    purpose: decorator form of metrics.timer()
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return fn(*args, **kwargs)
+            with metrics.timer(subsystem, endpoint):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,202 @@
+"""
+Warm-start snapshot of the dashboard: the last account, economic and chart data,
+written as gzipped JSON on shutdown and periodically, and read back at launch so
+the window has something to show before OAuth and the first fetches complete.
+
+Each section carries its own as_of timestamp, so restoring a snapshot and
+saving it again before live data arrives keeps the original age.
+"""
+
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from utils.metrics import metrics
+
+logger = logging.getLogger('snapshot')
+logger.setLevel(logging.WARNING)
+handler = RotatingFileHandler("python_client.log", maxBytes=5*1024*1024, backupCount=3)
+FORMAT = "%(asctime)-15s %(message)s"
+fmt = logging.Formatter(FORMAT, datefmt='%m/%d/%Y %I:%M:%S %p')
+handler.setFormatter(fmt)
+logger.addHandler(handler)
+
+SNAPSHOT_VERSION = 1
+DEFAULT_PATH = "dashboard_snapshot.json.gz"
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+# a chart pane is a few hundred pixels wide; more points than this are invisible
+DEFAULT_MAX_CHART_POINTS = 500
+
+
+def _json_default(value):
+    # numpy scalars (FRED values, DataFrame cells) -> plain python
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def downsample(values, max_points):
+    """
+    purpose: evenly thin a sequence to at most max_points, always keeping the last point
+    """
+    n = len(values)
+    if max_points <= 0 or n <= max_points:
+        return list(values)
+    step = (n - 1) / (max_points - 1)
+    return [values[round(i * step)] for i in range(max_points)]
+
+
+def frame_to_series(symbol_closes, max_points=DEFAULT_MAX_CHART_POINTS):
+    """
+    purpose: compact a Close-price frame into {'t': [...], 'close': [...]} for the snapshot
+    """
+    index = downsample(list(range(len(symbol_closes))), max_points)
+    closes = symbol_closes['Close'].iloc[index]
+    if getattr(closes.index, 'tz', None) is not None:
+        # keep exchange wall-clock time; that is what the chart axis shows
+        closes.index = closes.index.tz_localize(None)
+    return {
+        't': [ts.isoformat() for ts in closes.index],
+        'close': [round(float(v), 4) for v in closes.values],
+    }
+
+
+def series_to_frame(series):
+    """
+    purpose: inverse of frame_to_series; returns a DataFrame with a 'Close' column
+    """
+    import pandas as pd
+    index = pd.to_datetime(series['t'])
+    return pd.DataFrame({'Close': series['close']}, index=index)
+
+
+def format_age(as_of, now=None):
+    """
+    returns:
+        'HH:MM:SS' for today, else 'MM/DD HH:MM'
+    """
+    stamp = datetime.fromtimestamp(as_of)
+    now = datetime.fromtimestamp(now if now is not None else time.time())
+    if stamp.date() == now.date():
+        return stamp.strftime('%H:%M:%S')
+    return stamp.strftime('%m/%d %H:%M')
+
+
+class SnapshotStore:
+    """
+    purpose: read and write the dashboard snapshot file
+    arguments:
+        path: snapshot file (relative paths land next to python_client.log)
+        max_bytes: compressed size ceiling; larger snapshots are trimmed, then skipped
+    note: the file holds account positions and balances in plain (gzipped) JSON
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.last_load_ms = None
+        self.last_save_ms = None
+        self.last_size = None
+
+    def _encode(self, state):
+        payload = {'version': SNAPSHOT_VERSION, 'saved_at': time.time(), **state}
+        raw = json.dumps(payload, separators=(',', ':'), default=_json_default).encode()
+        return gzip.compress(raw, compresslevel=6)
+
+    def save(self, state):
+        """
+        purpose: write state atomically, trimming it to max_bytes
+        arguments:
+            state: dict of sections, e.g. {'etrade': {...}, 'economic': {...}, 'charts': {...}}
+        returns:
+            bytes written, or None if nothing was written
+        """
+        started = time.perf_counter()
+        with metrics.timer('snapshot', 'save') as t:
+            try:
+                blob = self._encode(state)
+                if len(blob) > self.max_bytes:
+                    blob = self._encode(self._trimmed(state))
+                if len(blob) > self.max_bytes:
+                    logger.warning("snapshot is %d bytes after trimming (limit %d), not saved",
+                                   len(blob), self.max_bytes)
+                    t.fail()
+                    return None
+
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(blob)
+                os.replace(tmp_path, self.path)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning("failed to save snapshot to %s: %s", self.path, e)
+                t.fail()
+                return None
+        self.last_save_ms = (time.perf_counter() - started) * 1000.0
+        self.last_size = len(blob)
+        return len(blob)
+
+    def _trimmed(self, state):
+        """
+        purpose: drop the bulkiest, least important data first: positions of accounts
+                 other than the selected one, then the chart series
+        """
+        trimmed = dict(state)
+        etrade = state.get('etrade')
+        if etrade:
+            current = etrade.get('current_account_index')
+            accounts = []
+            for i, account in enumerate(etrade.get('accounts', [])):
+                if i != current:
+                    account = {**account, 'positionsRaw': {}}
+                accounts.append(account)
+            trimmed['etrade'] = {**etrade, 'accounts': accounts}
+        if len(self._encode(trimmed)) > self.max_bytes:
+            trimmed.pop('charts', None)
+        logger.warning("snapshot over %d bytes, trimmed", self.max_bytes)
+        return trimmed
+
+    def load(self):
+        """
+        returns:
+            the saved state dict (with 'saved_at'), or None if there is no usable snapshot
+        """
+        if not os.path.exists(self.path):
+            return None
+        started = time.perf_counter()
+        with metrics.timer('snapshot', 'load') as t:
+            try:
+                with open(self.path, 'rb') as f:
+                    blob = f.read()
+                state = json.loads(gzip.decompress(blob))
+            except (OSError, EOFError, ValueError) as e:
+                logger.warning("ignoring unreadable snapshot %s: %s", self.path, e)
+                t.fail()
+                return None
+            if state.get('version') != SNAPSHOT_VERSION:
+                logger.warning("ignoring snapshot %s with version %s", self.path, state.get('version'))
+                t.fail()
+                return None
+        self.last_load_ms = (time.perf_counter() - started) * 1000.0
+        self.last_size = len(blob)
+        return state
+
+
+def snapshot_store_from_config():
+    """
+    purpose: build the SnapshotStore described by config.py, or None unless SNAPSHOT_ENABLED is on
+    note: off by default - the file holds positions and balances unencrypted, so it is opted into
+    """
+    try:
+        import config
+    except ImportError:
+        config = None
+    if not getattr(config, 'SNAPSHOT_ENABLED', False):
+        return None
+    return SnapshotStore(getattr(config, 'SNAPSHOT_PATH', DEFAULT_PATH),
+                         getattr(config, 'SNAPSHOT_MAX_BYTES', DEFAULT_MAX_BYTES))
@@ -0,0 +1,217 @@
+"""
+Opt-in watchdog for stalls on the Qt main thread.
+
+A QTimer on the GUI thread beats every few milliseconds; a side thread watches
+the beats and, when the main thread stops beating for longer than a threshold,
+samples the main thread's Python stack to find out what is blocking it.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+from PyQt6.QtCore import QObject, QTimer
+
+logger = logging.getLogger('stall_detector')
+logger.setLevel(logging.WARNING)
+handler = RotatingFileHandler("python_client.log", maxBytes=5*1024*1024, backupCount=3)
+FORMAT = "%(asctime)-15s %(message)s"
+fmt = logging.Formatter(FORMAT, datefmt='%m/%d/%Y %I:%M:%S %p')
+handler.setFormatter(fmt)
+logger.addHandler(handler)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{os.path.basename(code.co_filename)}:{name}:{frame.f_lineno}"
+
+
+class StallDetector(QObject):
+    """
+    purpose: measure event-loop latency and catch main-thread stalls
+    arguments:
+        threshold_ms: how long the main thread may go without a heartbeat before it counts as a stall
+        heartbeat_ms: interval of the GUI-thread heartbeat timer
+    note: must be created on the GUI thread, before or after QApplication.exec(); started before
+          the window is built, everything up to the event loop's first beat (logging in, the first
+          loads) is watched too and reported as a '<startup>' stall
+    """
+
+    def __init__(self, threshold_ms=200, heartbeat_ms=50, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000.0
+        self.heartbeat = heartbeat_ms / 1000.0
+        self._main_ident = threading.get_ident()
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(heartbeat_ms)
+        self._timer.timeout.connect(self._beat)
+
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self._last_beat = None
+        self._base_depth = None
+        self._stall = None
+
+        self.loop_latency = {'samples': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+        self.handler_stats = {}
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        # the reference for the first beat: blocking work before the event loop runs is a stall too
+        self._last_beat = time.perf_counter()
+        self._timer.start()
+        self._thread = threading.Thread(target=self._watch, name="stall-detector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._timer.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self.log_summary()
+
+    def _beat(self):
+        now = time.perf_counter()
+        first = self._base_depth is None
+        if first:
+            # python frames underneath this slot belong to whoever called app.exec();
+            # anything the event loop dispatches sits exactly at this depth
+            depth, frame = 0, sys._getframe(1)
+            while frame is not None:
+                depth += 1
+                frame = frame.f_back
+            self._base_depth = depth
+        last = self._last_beat
+        if last is not None and not first:
+            latency_ms = max(0.0, (now - last - self.heartbeat) * 1000.0)
+            stats = self.loop_latency
+            stats['samples'] += 1
+            stats['total_ms'] += latency_ms
+            if latency_ms > stats['max_ms']:
+                stats['max_ms'] = latency_ms
+        self._last_beat = now
+
+    def _watch(self):
+        poll = max(0.01, min(self.heartbeat, self.threshold / 4))
+        while self._running:
+            time.sleep(poll)
+            last = self._last_beat
+            if last is None:
+                continue
+            with self._lock:
+                if self._stall is None:
+                    if time.perf_counter() - last >= self.threshold:
+                        self._stall = {'since': last, 'handler': None, 'culprits': Counter()}
+                        self._sample()
+                elif last != self._stall['since']:
+                    self._finish_stall(last)
+                else:
+                    self._sample()
+
+    def _sample(self):
+        frame = sys._current_frames().get(self._main_ident)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            stack.append(frame)
+            frame = frame.f_back
+        stack.reverse()
+
+        culprit = stack[-1]
+        for candidate in reversed(stack):
+            if candidate.f_code.co_filename.startswith(PROJECT_ROOT) and \
+                    os.path.abspath(candidate.f_code.co_filename) != os.path.abspath(__file__):
+                culprit = candidate
+                break
+        self._stall['culprits'][_frame_label(culprit)] += 1
+
+        if self._stall['handler'] is None:
+            if self._base_depth is None:
+                # the event loop hasn't beaten yet: the app is still starting up
+                self._stall['handler'] = "<startup>"
+                return
+            depth = self._base_depth
+            if len(stack) > depth:
+                code = stack[depth].f_code
+                self._stall['handler'] = f"{os.path.basename(code.co_filename)}:" \
+                                         f"{getattr(code, 'co_qualname', code.co_name)}"
+
+    def _finish_stall(self, resumed_at):
+        stall, self._stall = self._stall, None
+        duration_ms = max(0.0, (resumed_at - stall['since'] - self.heartbeat) * 1000.0)
+        handler_name = stall['handler'] or "<event loop>"
+        culprit = stall['culprits'].most_common(1)[0][0] if stall['culprits'] else "<unknown>"
+
+        stats = self.handler_stats.setdefault(handler_name, {
+            'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'culprits': Counter()
+        })
+        stats['count'] += 1
+        stats['total_ms'] += duration_ms
+        stats['max_ms'] = max(stats['max_ms'], duration_ms)
+        stats['culprits'][culprit] += 1
+
+        logger.warning("UI stall %.0f ms in %s (culprit %s)", duration_ms, handler_name, culprit)
+
+    def summary(self):
+        """
+        purpose: aggregated stall stats per handler, worst total first
+        returns:
+            list of dicts with handler, count, total_ms, max_ms, mean_ms, top culprit
+        """
+        with self._lock:
+            rows = []
+            for name, stats in self.handler_stats.items():
+                rows.append({
+                    'handler': name,
+                    'count': stats['count'],
+                    'total_ms': stats['total_ms'],
+                    'max_ms': stats['max_ms'],
+                    'mean_ms': stats['total_ms'] / stats['count'],
+                    'culprit': stats['culprits'].most_common(1)[0][0],
+                })
+        rows.sort(key=lambda row: row['total_ms'], reverse=True)
+        return rows
+
+    def log_summary(self):
+        latency = self.loop_latency
+        if latency['samples']:
+            logger.warning("Event loop latency: mean %.1f ms, max %.1f ms over %d beats",
+                           latency['total_ms'] / latency['samples'], latency['max_ms'], latency['samples'])
+        for row in self.summary():
+            logger.warning("Stalls in %s: %d, total %.0f ms, max %.0f ms, mostly at %s",
+                           row['handler'], row['count'], row['total_ms'], row['max_ms'], row['culprit'])
+
+
+def install_stall_detector(app):
+    """
+    purpose: start a StallDetector for app if enabled in config.py
+    arguments:
+        app: the running QApplication
+    returns:
+        the started StallDetector, or None when disabled
+    note: opt-in through STALL_DETECTOR_ENABLED / STALL_THRESHOLD_MS in config.py
+    """
+    try:
+        import config
+    except ImportError:
+        return None
+    if not getattr(config, 'STALL_DETECTOR_ENABLED', False):
+        return None
+
+    detector = StallDetector(threshold_ms=getattr(config, 'STALL_THRESHOLD_MS', 200), parent=app)
+    app.aboutToQuit.connect(detector.stop)
+    detector.start()
+    return detector